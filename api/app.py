@@ -19,6 +19,7 @@ from logging_elody.log import log
 from opentelemetry.instrumentation.flask import FlaskInstrumentor
 from policy_factory import get_user_context, init_policy_factory
 from rabbit import get_rabbit, init_rabbit
+from storage.identity_map import IdentityMap
 from tracing import init_tracer
 from werkzeug.exceptions import Forbidden, HTTPException, NotFound, Unauthorized
 from werkzeug.middleware.proxy_fix import ProxyFix
@@ -206,6 +207,11 @@ def set_dry_run():
     g.dry_run = bool(request.args.get("dry_run", 0, int) or request.args.get("soft"))
 
 
+@app.before_request
+def open_identity_map():
+    g.identity_map = IdentityMap()
+
+
 @app.errorhandler(HTTPException)
 @app.errorhandler(Exception)
 def exception(exception):
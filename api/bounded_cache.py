@@ -0,0 +1,133 @@
+from collections import OrderedDict
+from threading import Lock
+from time import monotonic
+from weakref import WeakValueDictionary
+
+from metrics import cache_entries, cache_events
+
+_caches = WeakValueDictionary()
+_MISSING = object()
+
+
+class BoundedCache:
+    """
+    Thread-safe LRU with an optional TTL, for process-wide caches.
+
+    At most ``max_size`` entries are kept, the least recently used one is
+    evicted first. With a ``ttl`` (seconds) an entry expires that long after it
+    was set. Reads behave like a dict (``get``, ``in``, ``pop``), so a cache
+    can stand in for the dict or set it replaces. Hits, misses, evictions and
+    expirations are counted per cache ``name``, in ``stats()`` and in the
+    ``cache_events`` metric.
+    """
+
+    def __init__(self, name, max_size=1024, ttl=None):
+        self.name = name
+        self.max_size = max(1, max_size)
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        _caches[name] = self
+
+    def get(self, key, default=None):
+        with self._lock:
+            value = self.__get(key)
+        return default if value is _MISSING else value
+
+    def set(self, key, value=True):
+        with self._lock:
+            expires_at = monotonic() + self.ttl if self.ttl else None
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.__count("eviction")
+            cache_entries.labels(self.name).set(len(self._entries))
+
+    def add(self, key):
+        self.set(key)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            cache_entries.labels(self.name).set(len(self._entries))
+        return default if entry is None else entry[0]
+
+    def discard(self, key):
+        self.pop(key)
+
+    def invalidate(self, predicate):
+        """Drop the entries for which ``predicate(key, value)`` holds."""
+        with self._lock:
+            for key, (value, _) in list(self._entries.items()):
+                if predicate(key, value):
+                    del self._entries[key]
+            cache_entries.labels(self.name).set(len(self._entries))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            cache_entries.labels(self.name).set(0)
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "size": len(self._entries),
+        }
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __getitem__(self, key):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self.set(key, value)
+
+    def __delitem__(self, key):
+        self.pop(key)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.__count("miss")
+            return _MISSING
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= monotonic():
+            del self._entries[key]
+            self.__count("expiration")
+            self.__count("miss")
+            return _MISSING
+        self._entries.move_to_end(key)
+        self.__count("hit")
+        return value
+
+    def __count(self, event):
+        match event:
+            case "hit":
+                self.hits += 1
+            case "miss":
+                self.misses += 1
+            case "eviction":
+                self.evictions += 1
+            case "expiration":
+                self.expirations += 1
+        cache_events.labels(self.name, event).inc()
+
+
+def get_cache_stats():
+    """Return the stats of every live cache by name."""
+    return {name: cache.stats() for name, cache in list(_caches.items())}
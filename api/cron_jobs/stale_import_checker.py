@@ -0,0 +1,36 @@
+import logging
+from datetime import UTC, datetime, timedelta
+
+from elody.job import fail_job
+from rabbit import get_rabbit
+from resources.base.import_jobs import BATCH_STALE_JOB_SECONDS
+from storage.storagemanager import StorageManager
+
+
+class StaleImportChecker:
+    """
+    Fails the jobs of asynchronous imports that were lost with the worker
+    that ran them.
+
+    A pending import writes a heartbeat on its job, see
+    resources/base/import_jobs.py. Queued or running jobs whose heartbeat is
+    older than BATCH_STALE_JOB_SECONDS are failed, their imports have to be
+    submitted again. Jobs lost before their first heartbeat stay as they are.
+    """
+
+    def __init__(self, *, stale_seconds=None):
+        self.stale_seconds = stale_seconds or BATCH_STALE_JOB_SECONDS
+        self.storage = StorageManager().get_db_engine()
+
+    def __call__(self):
+        heartbeat_before = datetime.now(UTC) - timedelta(seconds=self.stale_seconds)
+        job_ids = self.storage.get_stale_import_job_ids(heartbeat_before) or []
+        for job_id in job_ids:
+            fail_job(
+                job_id,
+                f"Import lost: no heartbeat for {self.stale_seconds}s, the worker "
+                "running it probably restarted",
+                get_rabbit=get_rabbit,
+            )
+        logging.info(f"FAILED {len(job_ids)} STALE IMPORT JOBS")
+        return job_ids
@@ -1,50 +1,101 @@
 import logging
 import os
+from time import perf_counter
 
 from elody.util import get_raw_id, signal_mediafile_deleted
+from metrics import ttl_expired_items, ttl_expiry_backlog, ttl_expiry_chunk_seconds
 from rabbit import get_rabbit
+from storage.index_manager import TTL_INDEX_COLLECTIONS
 from storage.storagemanager import StorageManager
 
+TTL_EXPIRY_CHUNK_SIZE = int(os.getenv("TTL_EXPIRY_CHUNK_SIZE") or 1000)
+TTL_EXPIRY_MAX_ITEMS = int(os.getenv("TTL_EXPIRY_MAX_ITEMS") or 0)
+
 
 class TtlChecker:
-    def __init__(self):
+    """
+    Deletes the items whose ttl metadata lies in the past.
+
+    The ids of the expired items of a collection are read from one cursor and
+    deleted in chunks of TTL_EXPIRY_CHUNK_SIZE, each with one delete_many,
+    together with the relations pointing at them and, with DELETE_MEDIAFILES
+    and HARD_DELETE, their mediafiles and history. The mediafile_deleted
+    signals of a chunk are sent after its mediafiles are deleted.
+    TTL_EXPIRY_MAX_ITEMS caps the items deleted per collection and run, what
+    is left is the backlog of the next run.
+
+    Collections in TTL_INDEX_COLLECTIONS are expired by Mongo on a TTL index
+    instead, see ensure_ttl_index.
+    """
+
+    def __init__(self, *, chunk_size=None, max_items=None):
         self.hard_delete: bool = os.getenv("HARD_DELETE", False)
         self.delete_mediafiles: bool = os.getenv("DELETE_MEDIAFILES", False)
+        self.chunk_size = max(1, chunk_size or TTL_EXPIRY_CHUNK_SIZE)
+        self.max_items = TTL_EXPIRY_MAX_ITEMS if max_items is None else max_items
         self.storage = StorageManager().get_db_engine()
 
     def __call__(self):
         collections = self.storage.get_existing_collections()
         for collection in collections:
-            logging.info(f"DELETE ITEMS IN COLLECTION: {collection}")
-            expired_ttl_items = self.storage.get_ttl_expired_items_from_collection(
-                collection
-            )
-            for item in expired_ttl_items:
-                item_id = get_raw_id(item)
-                logging.info(f"DELETE ITEM WITH ID: {item_id}")
-                if self.delete_mediafiles:
-                    self._delete_item_mediafiles(item_id, collection)
-                self.storage.delete_item_from_collection(collection, item_id)
-                if self.hard_delete in [True, "True", "true"]:
-                    self._delete_history_of_item(item_id, collection)
-
-    def _delete_history_of_item(self, item_id, collection):
-        history_items = self.storage.get_history_for_item(
-            collection, item_id, all_entries=True
+            if collection in TTL_INDEX_COLLECTIONS:
+                handed_over = self.storage.ensure_ttl_index(collection)
+                logging.info(
+                    f"LEFT {handed_over or 0} EXPIRED ITEMS IN COLLECTION "
+                    f"{collection} TO ITS TTL INDEX"
+                )
+                continue
+            self.expire_collection(collection)
+
+    def expire_collection(self, collection):
+        """Delete the expired items of collection, return how many items,
+        mediafiles and history entries were deleted and the backlog."""
+        report = {"items": 0, "mediafiles": 0, "history": 0}
+        started, seen = perf_counter(), 0
+        for ids in self.storage.iter_ttl_expired_ids(collection, self.chunk_size) or []:
+            if self.max_items:
+                ids = ids[: self.max_items - seen]
+            seen += len(ids)
+            with ttl_expiry_chunk_seconds.labels(collection).time():
+                self.__delete_chunk(collection, ids, report)
+            if self.max_items and seen >= self.max_items:
+                break
+        duration = perf_counter() - started
+        report["backlog"] = self.storage.count_ttl_expired_items(collection) or 0
+        ttl_expiry_backlog.labels(collection).set(report["backlog"])
+        logging.info(
+            f"DELETED {report['items']} EXPIRED ITEMS IN COLLECTION {collection} "
+            f"IN {duration:.1f}s ({report['items'] / max(duration, 1e-3):.0f}/s), "
+            f"{report['mediafiles']} MEDIAFILES, {report['history']} HISTORY "
+            f"ENTRIES, {report['backlog']} LEFT"
+        )
+        return report
+
+    def __delete_chunk(self, collection, ids, report):
+        if self.delete_mediafiles:
+            deleted = self.__delete_mediafiles(ids)
+            ttl_expired_items.labels(collection, "mediafile").inc(deleted)
+            report["mediafiles"] += deleted
+        deleted = self.storage.delete_items_from_collection(collection, ids) or 0
+        ttl_expired_items.labels(collection, "item").inc(deleted)
+        report["items"] += deleted
+        if self.hard_delete in [True, "True", "true"]:
+            deleted = self.storage.delete_history_for_items(collection, ids) or 0
+            ttl_expired_items.labels(collection, "history").inc(deleted)
+            report["history"] += deleted
+
+    def __delete_mediafiles(self, ids):
+        mediafiles = self.storage.get_mediafiles_of_items(ids) or []
+        if not mediafiles:
+            return 0
+        linked_entities = [
+            self.storage.get_mediafile_linked_entities(mediafile)
+            for mediafile in mediafiles
+        ]
+        deleted = self.storage.delete_items_from_collection(
+            "mediafiles", [get_raw_id(mediafile) for mediafile in mediafiles]
         )
-        for history_item in history_items:
-            history_item_id = get_raw_id(history_item)
-            logging.info(f"DELETE ITEM FROM HISTORY WITH ID: {history_item_id}")
-            self.storage.delete_item_from_collection("history", history_item_id)
-
-    def _delete_item_mediafiles(self, item_id, collection):
-        mediafiles = self.storage.get_collection_item_mediafiles(collection, item_id)
-        for mediafile in mediafiles:
-            linked_entities = self.storage.get_mediafile_linked_entities(mediafile)
-            self.storage.delete_item_from_collection(
-                "mediafiles", get_raw_id(mediafile)
-            )
-            signal_mediafile_deleted(get_rabbit(), mediafile, linked_entities)
-            logging.info(
-                f"DELETE MEDIAFILE UNDER ENTITY WITH ID: {get_raw_id(mediafile)}"
-            )
+        rabbit = get_rabbit()
+        for mediafile, entities in zip(mediafiles, linked_entities, strict=True):
+            signal_mediafile_deleted(rabbit, mediafile, entities)
+        return deleted or 0
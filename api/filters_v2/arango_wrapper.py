@@ -1,4 +1,7 @@
+from os import getenv
+
 from filters_v2.helpers.arango_helper import (
+    BindVars,
     get_comparison,
     get_filter_option_label,
     handle_object_lists,
@@ -6,9 +9,15 @@ from filters_v2.helpers.arango_helper import (
 )
 from filters_v2.helpers.base_helper import get_options_requesting_filter
 from filters_v2.mongo_filters import MongoFilters
+from filters_v2.stages.cursor_stage import InvalidCursor
 from logging_elody.log import log
 from storage.storagemanager import StorageManager
 
+# Ask Arango to serve repeated filter queries from its query results cache,
+# which only has an effect when the server runs the cache in "demand" mode.
+# Off unless ARANGO_QUERY_CACHE is set, like the server side cache itself.
+ARANGO_QUERY_CACHE = getenv("ARANGO_QUERY_CACHE", False) in [True, "true", "True"]
+
 
 class ArangoWrapper:
     def __init__(self):
@@ -23,25 +32,38 @@ class ArangoWrapper:
         order_by=None,
         asc=True,
         exact_count=False,
+        cursor=None,
     ):
+        if cursor:
+            raise InvalidCursor("Cursor pagination is not supported on Arango")
         mongo_pipeline: list[dict] = MongoFilters().filter(
             filter_request_body, skip, limit, collection, order_by, asc, True, False
         )  # pyright: ignore
         options_requesting_filter = get_options_requesting_filter(filter_request_body)
 
-        aql = self.__generate_query(collection, mongo_pipeline, order_by)
+        aql, bind_vars = self.__generate_query(collection, mongo_pipeline, order_by)
         return self.__execute_query(
-            aql, collection, skip, limit, options_requesting_filter
+            aql, bind_vars, collection, skip, limit, options_requesting_filter
         )
 
     def __generate_query(self, collection, mongo_pipeline, order_by):
+        """Return the AQL template for ``mongo_pipeline`` and its bind parameters.
+
+        Filter values, paging and relation collections are bound, so the query
+        text only depends on the shape of the request.
+        """
         aql = f"FOR document IN {collection}"
+        bind_vars = BindVars()
         for stage in mongo_pipeline:
             try:
                 key = list(stage.keys())[0]
                 handle = getattr(self, f"_handle_{key[1:]}_stage")
                 aql = handle(
-                    stage[key], aql, mongo_pipeline=mongo_pipeline, sort_fields=order_by
+                    stage[key],
+                    aql,
+                    mongo_pipeline=mongo_pipeline,
+                    sort_fields=order_by,
+                    bind_vars=bind_vars,
                 )
             except AttributeError:
                 pass
@@ -50,17 +72,21 @@ class ArangoWrapper:
             aql += "\nRETURN result"
         else:
             aql += "\nRETURN document"
-        return aql
+        return aql, dict(bind_vars)
 
-    def __execute_query(self, aql, collection, skip, limit, options_requesting_filter):
+    def __execute_query(
+        self, aql, bind_vars, collection, skip, limit, options_requesting_filter
+    ):
         try:
-            documents = self.storage.db.aql.execute(aql, full_count=True)  # pyright: ignore
+            documents = self.storage.db.aql.execute(  # pyright: ignore
+                aql, bind_vars=bind_vars, full_count=True, cache=ARANGO_QUERY_CACHE
+            )
         except Exception as exception:
             log.exception(
                 f"{exception.__class__.__name__}: {exception}",
                 {},
                 exc_info=exception,
-                info_labels={"aql": aql},
+                info_labels={"aql": aql, "bind_vars": str(bind_vars)},
             )
             raise exception
 
@@ -76,12 +102,10 @@ class ArangoWrapper:
             items["count"] = documents.statistics()["fullCount"]  # pyright: ignore
         else:
             items = {
-                "results": [
-                    self.storage.get_item_from_collection_by_id(
-                        collection, document["_id"]
-                    )
-                    for document in documents  # pyright: ignore
-                ]
+                "results": self.storage._prepare_arango_documents(  # pyright: ignore
+                    collection,
+                    list(documents),  # pyright: ignore
+                )
             }
             items["skip"] = skip
             items["limit"] = limit
@@ -89,7 +113,15 @@ class ArangoWrapper:
         return items
 
     def _handle_match_stage(
-        self, match, aql, *, element_name="document", operator="FILTER", index=0, **_
+        self,
+        match,
+        aql,
+        *,
+        bind_vars,
+        element_name="document",
+        operator="FILTER",
+        index=0,
+        **_,
     ):
         get_filter_prefix = lambda operator, index: (
             f"\n{'FILTER (' if operator.endswith('(') else 'FILTER' if index == 0 else operator}"
@@ -105,6 +137,7 @@ class ArangoWrapper:
                     index,
                     get_filter_prefix,
                     self._handle_match_stage,
+                    bind_vars,
                 )
             elif key == "$nor":
                 aql, index = parse_matcher_list(
@@ -115,6 +148,7 @@ class ArangoWrapper:
                     index,
                     get_filter_prefix,
                     self._handle_match_stage,
+                    bind_vars,
                     is_none_matcher=True,
                 )
             elif isinstance(value, dict) and value.get("$all"):
@@ -127,14 +161,15 @@ class ArangoWrapper:
                     "FILTER",
                     get_filter_prefix,
                     self._handle_match_stage,
+                    bind_vars,
                 )
             else:
-                aql += f"{get_filter_prefix(operator, index)}{'' if operator.endswith('(') else ' '}{get_comparison(key, value, element_name)}"
+                aql += f"{get_filter_prefix(operator, index)}{'' if operator.endswith('(') else ' '}{get_comparison(key, value, element_name, bind_vars)}"
                 index += 1
 
         return aql
 
-    def _handle_sort_stage(self, sort, aql, sort_fields, **_):
+    def _handle_sort_stage(self, sort, aql, sort_fields, bind_vars, **_):
         sort_aqls = []
         sort_fields = sort_fields.split(",")
         for sort_field in sort_fields:
@@ -142,7 +177,7 @@ class ArangoWrapper:
                 field_name = sort_field.split(".")[-2]
                 aql += f"\nLET {field_name} = FIRST("
                 aql += "\nFOR metadata IN IS_ARRAY(document.metadata) ? document.metadata : []"
-                aql += f"\nFILTER metadata.key == '{field_name}'"
+                aql += f"\nFILTER metadata.key == {bind_vars.add(field_name)}"
                 aql += "\nRETURN metadata"
                 aql += "\n)"
             else:
@@ -154,7 +189,7 @@ class ArangoWrapper:
         aql += f"\nSORT {', '.join(sort_aqls)}"
         return aql
 
-    def _handle_limit_stage(self, limit, aql, mongo_pipeline, **_):
+    def _handle_limit_stage(self, limit, aql, mongo_pipeline, bind_vars, **_):
         skip_stage = [
             stage for stage in mongo_pipeline if stage.get("$skip") is not None
         ]
@@ -164,10 +199,10 @@ class ArangoWrapper:
                 stage for stage in mongo_pipeline if stage.get("$skip") is not None
             ][0]["$skip"]
 
-        aql += f"\nLIMIT {skip}, {limit}"
+        aql += f"\nLIMIT {bind_vars.add(skip)}, {bind_vars.add(limit)}"
         return aql
 
-    def _handle_project_stage(self, project, aql, **_):
+    def _handle_project_stage(self, project, aql, bind_vars, **_):
         map = project["options"]["$concatArrays"][0]["$map"]
         object_list = map["input"]["$filter"]["input"][1:]
         filter_cond = map["input"]["$filter"]["cond"]
@@ -181,11 +216,11 @@ class ArangoWrapper:
 
         aql += "\nLET options = ("
         if object_list == "relations":
-            aql += f"\nFOR item IN {value}"
+            aql += f"\nFOR item IN {bind_vars.add_collection(value)}"
             aql += "\nFILTER item._from == document._id"
         else:
             aql += f"\nFOR item IN IS_ARRAY(document.{object_list}) ? document.{object_list} : []"
-            aql += f"\nFILTER item.{item_key} == '{value}'"
+            aql += f"\nFILTER item.{item_key} == {bind_vars.add(value)}"
         aql += f"\nRETURN {{ label: item.{item_value}, value: item.{item_value} }}"
         aql += "\n)"
         aql += "\nFOR option IN UNIQUE(options)"
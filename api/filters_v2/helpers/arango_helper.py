@@ -8,7 +8,26 @@ AGGREGATOR_MAP = {"$size": "LENGTH"}
 OPERATOR_MAP = {"$eq": "==", "$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<="}
 
 
-def get_comparison(key, value, element_name):
+class BindVars(dict):
+    """
+    Bind parameters of a generated AQL query.
+
+    Values are named after their position, so requests that only differ in
+    their values produce the same query text and Arango can reuse its plan.
+    """
+
+    def add(self, value):
+        name = f"value{len(self)}"
+        self[name] = value
+        return f"@{name}"
+
+    def add_collection(self, collection):
+        name = f"@collection{len(self)}"
+        self[name] = collection
+        return f"@{name}"
+
+
+def get_comparison(key, value, element_name, bind_vars):
     if isinstance(value, dict):
         value_key = list(value.keys())[0]
         if key == "$expr":
@@ -28,17 +47,17 @@ def get_comparison(key, value, element_name):
                     comparison += f"\nFOR item IN {edge}"
                     comparison += "\nFILTER item._from == document._id"
                     comparison += "\nRETURN item"
-                    comparison += f"\n) {OPERATOR_MAP.get(operator)} {field_value}"
+                    comparison += (
+                        f"\n) {OPERATOR_MAP.get(operator)} {bind_vars.add(field_value)}"
+                    )
                 else:
-                    comparison += f"{' AND ' if i > 0 else ''}{AGGREGATOR_MAP.get(aggregator)}({element_name}.{field_key}) {OPERATOR_MAP.get(operator)} {field_value}"
+                    comparison += f"{' AND ' if i > 0 else ''}{AGGREGATOR_MAP.get(aggregator)}({element_name}.{field_key}) {OPERATOR_MAP.get(operator)} {bind_vars.add(field_value)}"
             return f"({comparison})"
         elif value_key == "$in":
-            comparison = ""
-            for i in range(len(value[value_key])):
-                comparison += f"{' OR ' if i > 0 else ''}'{value[value_key][i]}' IN {element_name}.{key}"
-            return f"IS_ARRAY({element_name}.{key}) ? ({comparison}) : {element_name}.{key} IN {value[value_key]}"
+            values = bind_vars.add(list(value[value_key]))
+            return f"IS_ARRAY({element_name}.{key}) ? LENGTH(INTERSECTION({element_name}.{key}, {values})) > 0 : {element_name}.{key} IN {values}"
         elif value_key == "$regex":
-            return f"LOWER({element_name}.{key}) LIKE '%{value[value_key].lower()}%'"
+            return f"LOWER({element_name}.{key}) LIKE CONCAT('%', {bind_vars.add(value[value_key].lower())}, '%')"
         elif value_key == "$exists":
             key_parts = regex.findall(r"(?:`[^`]+`|[^.]+)", key)
             element_parts = ".".join(key_parts[:-1])
@@ -49,13 +68,13 @@ def get_comparison(key, value, element_name):
             comparison = ""
             operator = ""
             for value_key in value.keys():
-                comparison += f"{operator}{element_name}.{key} {OPERATOR_MAP.get(value_key)} {value[value_key]}"
+                comparison += f"{operator}{element_name}.{key} {OPERATOR_MAP.get(value_key)} {bind_vars.add(value[value_key])}"
                 operator = " AND "
             return f"({comparison})"
     elif isinstance(value, str):
-        return f"LOWER({element_name}.{key}) == '{value.lower()}'"
+        return f"LOWER({element_name}.{key}) == {bind_vars.add(value.lower())}"
 
-    return f"{element_name}.{key} == {value}"
+    return f"{element_name}.{key} == {bind_vars.add(value)}"
 
 
 def get_filter_option_label(get_item_from_collection_by_id, identifier, key):
@@ -85,15 +104,20 @@ def handle_object_lists(
     operator,
     get_filter_prefix,
     _handle_match_stage,
+    bind_vars,
     is_none_matcher=False,
 ):
     for elem_match in value["$all"]:
         aql += f"{get_filter_prefix(operator, index)}{'' if operator.endswith('(') else ' '}LENGTH("
         if key == "relations":
-            element = elem_match["$elemMatch"].pop("type")
+            element = bind_vars.add_collection(elem_match["$elemMatch"].pop("type"))
         aql += f"\nFOR item IN {element if key == 'relations' else f'IS_ARRAY({element}) ? {element} : []'}"
         aql += _handle_match_stage(
-            elem_match["$elemMatch"], "", element_name="item", operator="AND"
+            elem_match["$elemMatch"],
+            "",
+            element_name="item",
+            operator="AND",
+            bind_vars=bind_vars,
         )
         if key == "relations":
             aql += "\nFILTER item._from == document._id"
@@ -111,6 +135,7 @@ def parse_matcher_list(
     index,
     get_filter_prefix,
     _handle_match_stage,
+    bind_vars,
     is_none_matcher=False,
 ):
     operator_index = 0
@@ -134,6 +159,7 @@ def parse_matcher_list(
                     ),
                     get_filter_prefix,
                     _handle_match_stage,
+                    bind_vars,
                     is_none_matcher=is_none_matcher,
                 )
             else:
@@ -147,6 +173,7 @@ def parse_matcher_list(
                         else "FILTER ("
                     ),
                     index=operator_index if index == 0 else index,
+                    bind_vars=bind_vars,
                 )
             operator_index += 1
 
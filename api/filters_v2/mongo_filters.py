@@ -1,6 +1,10 @@
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from contextvars import copy_context
 from os import getenv
+from threading import Lock
 from time import monotonic
 
+from bounded_cache import BoundedCache
 from filters_v2.helpers.base_helper import (
     get_distinct_by,
     get_facets,
@@ -17,6 +21,7 @@ from filters_v2.helpers.mongo_helper import (
 )
 from filters_v2.matchers.base_matchers import BaseMatchers
 from filters_v2.stages import (
+    cursor_stage,
     facet_stage,
     group_stage,
     limit_stage,
@@ -26,6 +31,8 @@ from filters_v2.stages import (
     sort_stage,
 )
 from logging_elody.log import log
+from metrics import listing_counts
+from pymongo.errors import ExecutionTimeout
 from storage.storagemanager import StorageManager
 from tracing import get_tracer
 
@@ -45,6 +52,35 @@ DISTINCT_TYPES_TTL_SECONDS = 300
 # something deeper are expected to narrow the filter. Set 0 to never cap.
 LISTING_COUNT_CAP = int(getenv("LISTING_COUNT_CAP") or 0)
 
+# The count aggregation runs on this shared pool while the page aggregation is
+# drained, so a listing takes as long as the slower of the two instead of their
+# sum (pymongo clients are thread-safe).
+LISTING_COUNT_WORKERS = int(getenv("LISTING_COUNT_WORKERS") or 16)
+
+# Seconds a listing waits for its count. A count that is still running then is
+# replaced by a lower bound and the response gets "count_pending": true. Counts
+# requested with exact_count always run to completion. Set 0 to always wait.
+LISTING_COUNT_DEADLINE_SECONDS = float(getenv("LISTING_COUNT_DEADLINE_SECONDS") or 0)
+
+_count_executor = None
+_count_executor_lock = Lock()
+_distinct_types_cache = BoundedCache(
+    "mongo_distinct_types", max_size=256, ttl=DISTINCT_TYPES_TTL_SECONDS
+)
+
+
+def get_count_executor():
+    global _count_executor
+    if _count_executor:
+        return _count_executor
+    with _count_executor_lock:
+        if not _count_executor:
+            _count_executor = ThreadPoolExecutor(
+                max_workers=max(1, LISTING_COUNT_WORKERS),
+                thread_name_prefix="listing-count",
+            )
+    return _count_executor
+
 
 def get_type_only_filter_values(match: list, group: list):
     """Return the ``type`` values when a count reduces to a single type-only $match.
@@ -75,8 +111,7 @@ def get_type_only_filter_values(match: list, group: list):
 class MongoFilters:
     def __init__(self):
         self.storage = StorageManager().get_db_engine()
-        # collection -> (set_of_types, monotonic_timestamp)
-        self._distinct_types_cache: dict = {}
+        self._distinct_types_cache = _distinct_types_cache
 
     @tracer.start_as_current_span("base.MongoFilters.filter")
     def filter(
@@ -91,7 +126,14 @@ class MongoFilters:
         tidy_up_match=True,
         return_cursor=False,
         exact_count=False,
+        cursor=None,
     ):
+        """Run a v2 filter request.
+
+        ``cursor`` switches to keyset pagination: ``None`` paginates with
+        ``skip``, any string (empty for the first page) resumes after that
+        cursor and adds a ``next_cursor`` to the result when the page is full.
+        """
         entity_type = get_type_filter_value(filter_request_body)
         if not entity_type:
             entity_type = get_selection_type_filter_value(filter_request_body)
@@ -111,7 +153,7 @@ class MongoFilters:
         ):
             facets_request = get_facets(filter_request_body)
 
-            pipeline, match, group = self.__build_aggregation_query(
+            pipeline, match, group, sort = self.__build_aggregation_query(
                 filter_request_body,
                 skip,
                 limit,
@@ -120,6 +162,7 @@ class MongoFilters:
                 options_requesting_filter,
                 facets_request,
                 tidy_up_match,
+                cursor,
             )
             if return_query_without_executing:
                 return pipeline
@@ -134,6 +177,7 @@ class MongoFilters:
                 facets_request,
                 return_cursor,
                 exact_count,
+                sort if cursor is not None else None,
             )
 
     def __build_aggregation_query(
@@ -146,9 +190,11 @@ class MongoFilters:
         options_requesting_filter: dict,
         facets_request: list[dict],
         tidy_up_match: bool,
+        cursor: str | None = None,
     ):
         match = match_stage.build(filter_request_body, tidy_up_match)
         group = group_stage.build(get_distinct_by(filter_request_body))
+        sort = []
         if options_requesting_filter:
             project = project_stage.build(
                 options_requesting_filter=options_requesting_filter, match=match
@@ -156,7 +202,11 @@ class MongoFilters:
             pipeline = [*match, *project]
         else:
             sort = sort_stage.build(order_by, asc, filter_request_body, self.storage)
-            skip = skip_stage.build(skip)
+            if cursor is not None:
+                sort = cursor_stage.build(sort, cursor)
+                skip = []
+            else:
+                skip = skip_stage.build(skip)
             limit = limit_stage.build(limit) if limit != -1 else []
             if facets_request:
                 facet = facet_stage.build(facets_request, sort, skip, limit)
@@ -167,8 +217,9 @@ class MongoFilters:
         if geo_bucket_filter := has_bucket_filter(filter_request_body):
             bucket_group, replace_root = get_bucket_stages(geo_bucket_filter)
             pipeline = [*match, *bucket_group, *replace_root]
+            sort = []
 
-        return pipeline, match, group
+        return pipeline, match, group, sort
 
     @tracer.start_as_current_span("base.MongoFilters.__execute_aggregation_query")
     def __execute_aggregation_query(
@@ -182,7 +233,13 @@ class MongoFilters:
         facets_request,
         return_cursor=False,
         exact_count=False,
+        keyset_sort=None,
     ):
+        count_future = None
+        if not return_cursor and not options_requesting_filter:
+            count_future = self.__submit_count(
+                BaseMatchers.collection, match, group, exact_count
+            )
         try:
             with tracer.start_as_current_span(
                 "base.MongoFilters.__execute_aggregation_query.aggregate"
@@ -199,6 +256,8 @@ class MongoFilters:
                 exc_info=exception,
                 info_labels={"pipeline": pipeline},
             )
+            if count_future:
+                count_future.cancel()
             raise exception
 
         if facets_request:
@@ -207,7 +266,10 @@ class MongoFilters:
         else:
             output = {"results": list(cursor)}
 
-        return self.__get_items(
+        next_cursor = None
+        if keyset_sort and limit > 0 and len(output["results"]) == limit:
+            next_cursor = cursor_stage.encode(keyset_sort, output["results"][-1])
+        items = self.__get_items(
             output,
             match,
             group,
@@ -215,7 +277,11 @@ class MongoFilters:
             limit,
             options_requesting_filter,
             exact_count,
+            count_future,
         )
+        if keyset_sort:
+            items["next_cursor"] = next_cursor
+        return items
 
     @tracer.start_as_current_span("base.MongoFilters.__get_items")
     def __get_items(
@@ -227,6 +293,7 @@ class MongoFilters:
         limit,
         options_requesting_filter=None,
         exact_count=False,
+        count_future=None,
     ):
         items = {"results": [], "count": 0, "facets": output.get("facets", [])}
 
@@ -261,9 +328,14 @@ class MongoFilters:
         else:
             items["skip"] = skip
             items["limit"] = limit
-            items["count"] = self.__count(
-                BaseMatchers.collection, match, group, output, exact_count
-            )
+            if count_future:
+                items.update(
+                    self.__await_count(count_future, output, skip, limit, exact_count)
+                )
+            else:
+                items["count"] = self.__count(
+                    BaseMatchers.collection, match, group, output, exact_count
+                )
             for document in output["results"]:
                 items["results"].append(
                     self.storage._prepare_mongo_document(document, True)
@@ -271,7 +343,53 @@ class MongoFilters:
 
         return items
 
-    def __count(self, collection, match, group, output, exact_count=False):
+    def __submit_count(self, collection, match, group, exact_count):
+        # Copy the context so the count's spans stay under the request's trace.
+        context = copy_context()
+        # Nobody waits for the count past the deadline, so Mongo stops it there.
+        max_time_ms = None
+        if LISTING_COUNT_DEADLINE_SECONDS > 0 and not exact_count:
+            max_time_ms = max(1, int(LISTING_COUNT_DEADLINE_SECONDS * 1000))
+        future = get_count_executor().submit(
+            context.run,
+            self.__count,
+            collection,
+            match,
+            group,
+            None,
+            exact_count,
+            max_time_ms,
+        )
+        future.collection = collection
+        future.submitted_at = monotonic()
+        return future
+
+    def __await_count(self, future, output, skip, limit, exact_count):
+        """Wait for the count submitted next to the page aggregation.
+
+        Past LISTING_COUNT_DEADLINE_SECONDS (counted from submission) the page is
+        returned with a lower bound instead: one past the page when it is full,
+        so a next link is still offered, and ``count_pending`` set.
+        """
+        timeout = None
+        if LISTING_COUNT_DEADLINE_SECONDS > 0 and not exact_count:
+            elapsed = monotonic() - future.submitted_at
+            timeout = max(0, LISTING_COUNT_DEADLINE_SECONDS - elapsed)
+        try:
+            count = future.result(timeout=timeout)
+        except (TimeoutError, ExecutionTimeout):
+            listing_counts.labels(future.collection, "pending").inc()
+            results = len(output["results"])
+            return {
+                "count": skip + results + (1 if results >= limit > 0 else 0),
+                "count_pending": True,
+            }
+        listing_counts.labels(future.collection, "completed").inc()
+        return {"count": count or len(output["results"])}
+
+    def __count(
+        self, collection, match, group, output, exact_count=False, max_time_ms=None
+    ):
         """Count matching documents, avoiding a full scan for large result sets.
 
         Two short-circuits keep this off the hot path:
@@ -286,6 +404,8 @@ class MongoFilters:
         drops the cap so ``$count`` runs to the true total. The whole-collection
         estimate short-circuit stays in place regardless — running a real
         count_documents there buys negligible accuracy for real cost.
+
+        ``max_time_ms`` is passed to the aggregate as ``maxTimeMS``.
         """
         type_values = get_type_only_filter_values(match, group)
         if type_values is not None:
@@ -295,22 +415,24 @@ class MongoFilters:
 
         cap_active = LISTING_COUNT_CAP > 0 and not exact_count
         cap_stage = [{"$limit": LISTING_COUNT_CAP + 1}] if cap_active else []
+        max_time = {"maxTimeMS": max_time_ms} if max_time_ms else {}
         count = self.storage.db[collection].aggregate(
             [*match, *group, *cap_stage, {"$count": "count"}],
             allowDiskUse=self.storage.allow_disk_use,
+            **max_time,
         )
-        return next(count, {"count": len(output["results"])})["count"]
+        fallback = len(output["results"]) if output else 0
+        return next(count, {"count": fallback})["count"]
 
     def __get_collection_types(self, collection):
-        """Return the collection's distinct ``type`` values, cached with a TTL.
+        """Return the collection's distinct ``type`` values, cached with a TTL
+        in a cache shared by every instance.
 
         ``distinct`` is served by the ``type``-prefixed index (DISTINCT_SCAN), and
         the result is cached so the count short-circuit stays cheap on every call.
         """
-        cached = self._distinct_types_cache.get(collection)
-        now = monotonic()
-        if cached and now - cached[1] < DISTINCT_TYPES_TTL_SECONDS:
-            return cached[0]
+        if (types := self._distinct_types_cache.get(collection)) is not None:
+            return types
         types = set(self.storage.db[collection].distinct("type"))
-        self._distinct_types_cache[collection] = (types, now)
+        self._distinct_types_cache[collection] = types
         return types
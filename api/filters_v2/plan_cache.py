@@ -0,0 +1,184 @@
+import json
+from collections import OrderedDict
+from copy import deepcopy
+from os import getenv
+from threading import Lock
+
+from filters_v2.matchers.base_matchers import BaseMatchers
+from metrics import filter_plan_cache_lookups
+
+# Number of compiled match plans kept per process. Set 0 to build every match
+# from scratch.
+FILTER_PLAN_CACHE_SIZE = int(getenv("FILTER_PLAN_CACHE_SIZE") or 512)
+
+# Filter types whose exact-match string values reach the query untouched, and
+# can therefore be swapped for a placeholder while compiling the plan.
+PARAMETERIZED_FILTER_TYPES = ["selection", "text", "type"]
+
+# Values the matchers give a meaning of their own; these stay in the plan key.
+RESERVED_VALUES = ["", "*", "ANY_MATCH", "NONE_MATCH"]
+
+PLACEHOLDER_MARKER = "\x00FilterParam-"
+ESCAPED_PLACEHOLDER_MARKER = json.dumps(PLACEHOLDER_MARKER)[1:-1]
+
+_plan_cache = None
+_plan_cache_lock = Lock()
+_UNCACHEABLE = object()
+
+
+class FilterPlanCache:
+    """
+    Caches compiled ``$match`` pipelines by the structure of a filter request.
+
+    The string values of exact-match filters are replaced by placeholders and
+    the result is keyed on the rest of the request (keys, filter types,
+    operators, lookups, other values) and the ``BaseMatchers`` context. A plan
+    is compiled once from the placeholder request; later requests of the same
+    shape only bind their values into a copy of it.
+
+    A plan is only kept when every placeholder shows up unchanged as a value in
+    the compiled pipeline. When a matcher transformed, dropped or embedded one,
+    the shape is remembered as uncacheable and compiled as before.
+    """
+
+    def __init__(self, max_size=512):
+        self.max_size = max(1, max_size)
+        self._plans = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_compile(self, compile, filter_request_bodies, *args):
+        """Return ``compile(*filter_request_bodies, *args)`` through the cache."""
+        values = []
+        parameterized_bodies = [
+            self.__parameterize(body, values) for body in filter_request_bodies
+        ]
+        fingerprint = json.dumps(
+            [parameterized_bodies, args], sort_keys=True, default=repr
+        )
+        if fingerprint.count(ESCAPED_PLACEHOLDER_MARKER) != len(values):
+            # A value that looks like a placeholder could be bound over.
+            return compile(*filter_request_bodies, *args)
+        key = (
+            fingerprint,
+            BaseMatchers.collection,
+            BaseMatchers.type,
+            BaseMatchers.force_base_nested_matcher_builder,
+        )
+        with self._lock:
+            plan = self._plans.get(key)
+            if plan is not None:
+                self._plans.move_to_end(key)
+        if plan is None:
+            self.misses += 1
+            filter_plan_cache_lookups.labels("miss").inc()
+            plan = self.__compile_plan(compile, parameterized_bodies, len(values), args)
+            with self._lock:
+                self._plans[key] = plan
+                while len(self._plans) > self.max_size:
+                    self._plans.popitem(last=False)
+        else:
+            self.hits += 1
+            filter_plan_cache_lookups.labels("hit").inc()
+
+        if plan is _UNCACHEABLE:
+            return compile(*filter_request_bodies, *args)
+        placeholders = {self.__placeholder(i): value for i, value in enumerate(values)}
+        return self.__bind(plan, placeholders)
+
+    def clear(self):
+        with self._lock:
+            self._plans.clear()
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._plans)}
+
+    def __compile_plan(self, compile, parameterized_bodies, value_count, args):
+        try:
+            plan = compile(*deepcopy(parameterized_bodies), *args)
+        except Exception:
+            # Placeholders can trip a matcher that a real value would not.
+            return _UNCACHEABLE
+        expected = {self.__placeholder(i) for i in range(value_count)}
+        found = set()
+        if not self.__collect_placeholders(plan, expected, found) or found != expected:
+            return _UNCACHEABLE
+        return plan
+
+    def __collect_placeholders(self, plan, expected, found):
+        """Gather the placeholders in ``plan``, fail on one that is not intact."""
+        if isinstance(plan, str):
+            if PLACEHOLDER_MARKER in plan:
+                if plan not in expected:
+                    return False
+                found.add(plan)
+            return True
+        if isinstance(plan, dict):
+            return all(
+                PLACEHOLDER_MARKER not in str(key)
+                and self.__collect_placeholders(value, expected, found)
+                for key, value in plan.items()
+            )
+        if isinstance(plan, list):
+            return all(
+                self.__collect_placeholders(item, expected, found) for item in plan
+            )
+        return PLACEHOLDER_MARKER not in repr(plan)
+
+    def __bind(self, plan, placeholders):
+        if isinstance(plan, str):
+            return placeholders.get(plan, plan)
+        if isinstance(plan, dict):
+            return {
+                key: self.__bind(value, placeholders) for key, value in plan.items()
+            }
+        if isinstance(plan, list):
+            return [self.__bind(item, placeholders) for item in plan]
+        return plan
+
+    def __parameterize(self, filter_request_body, values):
+        parameterized_body = []
+        for filter_criteria in filter_request_body:
+            filter_criteria = dict(filter_criteria)
+            if self.__has_parameterizable_value(filter_criteria):
+                filter_criteria["value"] = self.__to_placeholders(
+                    filter_criteria["value"], values
+                )
+            if isinstance(filter_criteria.get("or"), list):
+                filter_criteria["or"] = self.__parameterize(
+                    filter_criteria["or"], values
+                )
+            parameterized_body.append(filter_criteria)
+        return parameterized_body
+
+    def __has_parameterizable_value(self, filter_criteria):
+        if filter_criteria.get("type") not in PARAMETERIZED_FILTER_TYPES:
+            return False
+        if filter_criteria["type"] != "type" and (
+            not filter_criteria.get("match_exact") or filter_criteria.get("regex")
+        ):
+            return False
+        return "value" in filter_criteria
+
+    def __to_placeholders(self, value, values):
+        if isinstance(value, list):
+            return [self.__to_placeholders(item, values) for item in value]
+        if not isinstance(value, str) or value in RESERVED_VALUES:
+            return value
+        values.append(value)
+        return self.__placeholder(len(values) - 1)
+
+    @staticmethod
+    def __placeholder(index):
+        return f"{PLACEHOLDER_MARKER}{index}\x00"
+
+
+def get_filter_plan_cache():
+    global _plan_cache
+    if _plan_cache or FILTER_PLAN_CACHE_SIZE <= 0:
+        return _plan_cache
+    with _plan_cache_lock:
+        if not _plan_cache:
+            _plan_cache = FilterPlanCache(FILTER_PLAN_CACHE_SIZE)
+    return _plan_cache
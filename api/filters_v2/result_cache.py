@@ -0,0 +1,197 @@
+import hashlib
+import json
+from collections import OrderedDict
+from datetime import UTC, datetime, timedelta
+from os import getenv
+from threading import Lock
+from time import monotonic
+
+from bson import json_util
+from filters_v2.helpers.base_helper import (
+    get_selection_type_filter_value,
+    get_type_filter_value,
+)
+from logging_elody.log import log
+from metrics import filter_result_cache_lookups
+from pymongo import ASCENDING
+from storage.storagemanager import StorageManager
+
+# "memory" keeps an LRU per process, "mongo" shares the entries between every
+# instance of the API. Leave empty to disable the cache.
+FILTER_RESULT_CACHE_BACKEND = getenv("FILTER_RESULT_CACHE_BACKEND", "")
+FILTER_RESULT_CACHE_SIZE = int(getenv("FILTER_RESULT_CACHE_SIZE") or 1024)
+# Entries are dropped on entity_changed and entity_deleted, the TTL only bounds
+# how stale a listing can get when such an event does not cover it (e.g. a
+# listing that shows a relation of the changed entity).
+FILTER_RESULT_CACHE_TTL_SECONDS = int(getenv("FILTER_RESULT_CACHE_TTL_SECONDS") or 60)
+
+_cache = None
+_cache_lock = Lock()
+
+
+class MemoryResultCacheBackend:
+    """In-process LRU of filter results."""
+
+    def __init__(self, max_size=1024):
+        self.max_size = max(1, max_size)
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry["expires_at"] <= monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry["value"]
+
+    def set(self, key, value, collection, types, ttl):
+        with self._lock:
+            self._entries[key] = {
+                "value": value,
+                "collection": collection,
+                "types": types,
+                "expires_at": monotonic() + ttl,
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, collection, type):
+        with self._lock:
+            for key, entry in list(self._entries.items()):
+                if entry["collection"] == collection and (
+                    entry["types"] is None or type in entry["types"]
+                ):
+                    del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class MongoResultCacheBackend:
+    """Filter results shared between API instances through a Mongo collection.
+
+    Expired entries are removed by a TTL index; reads also skip them, since the
+    TTL monitor only runs once a minute.
+    """
+
+    collection_name = "filter_result_cache"
+
+    def __init__(self, db):
+        self.collection = db[self.collection_name]
+        self.collection.create_index("expires_at", expireAfterSeconds=0)
+        self.collection.create_index([("collection", ASCENDING), ("types", ASCENDING)])
+
+    def get(self, key):
+        entry = self.collection.find_one(
+            {"_id": key, "expires_at": {"$gt": datetime.now(UTC)}}
+        )
+        return entry["value"] if entry else None
+
+    def set(self, key, value, collection, types, ttl):
+        self.collection.replace_one(
+            {"_id": key},
+            {
+                "value": value,
+                "collection": collection,
+                "types": types,
+                "expires_at": datetime.now(UTC) + timedelta(seconds=ttl),
+            },
+            upsert=True,
+        )
+
+    def invalidate(self, collection, type):
+        self.collection.delete_many(
+            {"collection": collection, "types": {"$in": [type, None]}}
+        )
+
+    def clear(self):
+        self.collection.delete_many({})
+
+
+class FilterResultCache:
+    """
+    Caches the result of a v2 filter call for identical arguments.
+
+    The key is a hash of the canonical JSON of the filter body, which already
+    holds the access restricting filters of the user, and of the paging and
+    sorting arguments. Entries are tagged with their collection and the types
+    they filter on, so a change to an entity only drops the listings it can be
+    part of. Results are stored serialized, callers get a fresh copy to mutate.
+    """
+
+    def __init__(self, backend, ttl=60):
+        self.backend = backend
+        self.ttl = ttl
+
+    def get_or_compute(self, compute, query, *args, collection="entities", **kwargs):
+        try:
+            key = self.key(query, collection, *args, **kwargs)
+            cached = self.backend.get(key)
+        except Exception as exception:
+            log.exception(
+                f"Filter result cache lookup failed: {exception}", exc_info=exception
+            )
+            return compute()
+        if cached is not None:
+            filter_result_cache_lookups.labels(collection, "hit").inc()
+            return json_util.loads(cached)
+        filter_result_cache_lookups.labels(collection, "miss").inc()
+
+        items = compute()
+        if not items.get("count_pending"):
+            try:
+                self.backend.set(
+                    key,
+                    json_util.dumps(items),
+                    collection,
+                    self.get_types(query),
+                    self.ttl,
+                )
+            except Exception as exception:
+                log.exception(
+                    f"Filter result cache store failed: {exception}",
+                    exc_info=exception,
+                )
+        return items
+
+    def invalidate(self, collection, type):
+        self.backend.invalidate(collection, type)
+
+    @staticmethod
+    def key(query, collection, *args, **kwargs):
+        canonical = json.dumps(
+            [query, collection, args, kwargs],
+            sort_keys=True,
+            separators=(",", ":"),
+            default=str,
+        )
+        return hashlib.sha256(canonical.encode()).hexdigest()
+
+    @staticmethod
+    def get_types(query):
+        """Return the types ``query`` is limited to, ``None`` when it is not."""
+        if type := get_type_filter_value(query):
+            return [type]
+        if types := get_selection_type_filter_value(query):
+            return list(types) if isinstance(types, list) else [types]
+        return None
+
+
+def get_filter_result_cache():
+    global _cache
+    if _cache or not FILTER_RESULT_CACHE_BACKEND:
+        return _cache
+    with _cache_lock:
+        if not _cache:
+            if FILTER_RESULT_CACHE_BACKEND == "mongo":
+                backend = MongoResultCacheBackend(StorageManager().get_db_engine().db)
+            else:
+                backend = MemoryResultCacheBackend(FILTER_RESULT_CACHE_SIZE)
+            _cache = FilterResultCache(backend, FILTER_RESULT_CACHE_TTL_SECONDS)
+    return _cache
@@ -0,0 +1,144 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from bson import json_util
+from pymongo import ASCENDING
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def build(sort: list[dict], cursor: str | None) -> list[dict]:
+    """Turn ``sort`` into a keyset page that starts right after ``cursor``.
+
+    The last ``$sort`` gets ``_id`` as tiebreaker so the order is total, and the
+    cursor becomes a range ``$match`` placed right before that ``$sort``, after
+    any stage a custom ``sorting`` hook adds to compute its sort keys. Every
+    page is then as cheap as the first one, no ``$skip`` needed.
+    """
+    sort = list(sort)
+    sort_index = __get_sort_index(sort)
+    if sort_index is None:
+        sort.append({"$sort": {}})
+        sort_index = len(sort) - 1
+    sort_spec = {**sort[sort_index]["$sort"]}
+    sort_spec.setdefault("_id", ASCENDING)
+    sort[sort_index] = {"$sort": sort_spec}
+    if cursor:
+        values = __decode(cursor, sort_spec)
+        sort.insert(sort_index, {"$match": __get_range_query(sort_spec, values)})
+    return sort
+
+
+def encode(sort: list[dict], document: dict) -> str:
+    """Return the cursor of the page that follows ``document``."""
+    sort_spec = sort[__get_sort_index(sort)]["$sort"]
+    position = {
+        "sort": [[key, direction] for key, direction in sort_spec.items()],
+        "values": [
+            __get_sort_value(document, key, direction)
+            for key, direction in sort_spec.items()
+        ],
+    }
+    encoded = urlsafe_b64encode(json_util.dumps(position).encode()).decode()
+    return encoded.rstrip("=")
+
+
+def __decode(cursor, sort_spec):
+    try:
+        padding = "=" * (-len(cursor) % 4)
+        position = json_util.loads(urlsafe_b64decode(cursor + padding))
+        sort = [tuple(key) for key in position["sort"]]
+        values = position["values"]
+    except Exception as exception:
+        raise InvalidCursor("Invalid cursor") from exception
+    if sort != list(sort_spec.items()) or len(values) != len(sort):
+        raise InvalidCursor("Cursor does not match the requested order")
+    return values
+
+
+def __get_sort_index(sort):
+    for index in range(len(sort) - 1, -1, -1):
+        if "$sort" in sort[index]:
+            return index
+    return None
+
+
+def __get_range_query(sort_spec, values):
+    """Match the documents that sort after ``values``.
+
+    For sort keys k1..kn this is ``k1 after v1 OR (k1 == v1 AND k2 after v2)
+    OR ...``. Null and missing values sort before everything else in Mongo,
+    which the per-key conditions take into account.
+
+    A query operator on an array matches if any element does, while ``$sort``
+    orders an array on its lowest element ascending and its highest element
+    descending. The ``$or`` is therefore only an index friendly superset, the
+    ``$expr`` compares the same scalar ``$sort`` orders on.
+    """
+    branches, exact_branches = [], []
+    equal, exact_equal = {}, []
+    for (key, direction), value in zip(sort_spec.items(), values, strict=True):
+        if after := __get_after_query(key, direction, value):
+            branches.append({**equal, **after})
+            exact_branches.append(
+                {"$and": [*exact_equal, __get_exact_after(key, direction, value)]}
+            )
+        equal[key] = value
+        exact_equal.append(
+            {"$eq": [__get_sorted_on(key, direction), {"$literal": value}]}
+        )
+    if not branches:
+        return {"_id": {"$exists": False}}
+    return {"$or": branches, "$expr": {"$or": exact_branches}}
+
+
+def __get_after_query(key, direction, value):
+    if direction == ASCENDING:
+        if value is None:
+            return {key: {"$ne": None}}
+        return {key: {"$gt": value}}
+    if value is None:
+        return None
+    return {"$or": [{key: {"$lt": value}}, {key: None}]}
+
+
+def __get_sorted_on(key, direction):
+    return {"$min" if direction == ASCENDING else "$max": f"${key}"}
+
+
+def __get_exact_after(key, direction, value):
+    operator = "$gt" if direction == ASCENDING else "$lt"
+    return {operator: [__get_sorted_on(key, direction), {"$literal": value}]}
+
+
+def __get_sort_value(document, key, direction):
+    """Return the value Mongo sorts ``document`` on for ``key``.
+
+    For an array Mongo sorts on its lowest element ascending and on its highest
+    element descending.
+    """
+    values = [document]
+    for part in key.split("."):
+        next_values = []
+        for value in values:
+            if isinstance(value, list):
+                value = [item.get(part) for item in value if isinstance(item, dict)]
+                next_values.extend(value)
+            elif isinstance(value, dict):
+                next_values.append(value.get(part))
+        values = next_values
+    flattened = []
+    for value in values:
+        if isinstance(value, list):
+            flattened.extend(value)
+        elif value is not None:
+            flattened.append(value)
+    if not flattened:
+        return None
+    if len(flattened) == 1:
+        return flattened[0]
+    try:
+        return min(flattened) if direction == ASCENDING else max(flattened)
+    except TypeError:
+        return flattened[0]
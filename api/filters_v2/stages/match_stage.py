@@ -11,11 +11,27 @@ from filters_v2.helpers.mongo_helper import (
     lookup_already_exists_in_pipeline,
     unify_matchers_per_schema_into_one_match,
 )
+from filters_v2.plan_cache import get_filter_plan_cache
 from filters_v2.stages import lookup_stage
 from filters_v2.types.filter_types import get_filter
 
 
 def build(filter_request_body: list[dict], tidy_up_match: bool) -> list[dict]:
+    policy_signatured_request_body = __pop_policy_signatured_filters(
+        filter_request_body
+    )
+    if plan_cache := get_filter_plan_cache():
+        return plan_cache.get_or_compile(
+            __compile_match,
+            [filter_request_body, policy_signatured_request_body],
+            tidy_up_match,
+        )
+    return __compile_match(
+        filter_request_body, policy_signatured_request_body, tidy_up_match
+    )
+
+
+def __pop_policy_signatured_filters(filter_request_body: list[dict]) -> list[dict]:
     policy_signatured_request_body = []
     for filter_criteria in deepcopy(filter_request_body):
         if getenv("STATIC_JWT") and filter_criteria.get("policy_signature") == getenv(
@@ -23,7 +39,14 @@ def build(filter_request_body: list[dict], tidy_up_match: bool) -> list[dict]:
         ):
             filter_request_body.remove(filter_criteria)
             policy_signatured_request_body.append(filter_criteria)
+    return policy_signatured_request_body
+
 
+def __compile_match(
+    filter_request_body: list[dict],
+    policy_signatured_request_body: list[dict],
+    tidy_up_match: bool,
+) -> list[dict]:
     policy_signatured_match = __construct_match(
         policy_signatured_request_body, tidy_up_match
     )
@@ -120,7 +143,11 @@ def __construct_matchers_per_schema(
             matchers_per_schema["general"].append({"type": {"$in": item_types}})
 
         if or_filter_request_body := filter_criteria.get("or", []):
-            match = build(or_filter_request_body, False)
+            match = __compile_match(
+                or_filter_request_body,
+                __pop_policy_signatured_filters(or_filter_request_body),
+                False,
+            )
             for schema, matchers in matchers_per_schema.items():
                 if matchers and (
                     (len(matchers_per_schema.keys()) > 1 and schema != "general")
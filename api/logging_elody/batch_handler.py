@@ -0,0 +1,86 @@
+import atexit
+import logging
+from os import getpid
+from queue import Empty, Full, Queue
+from threading import Lock, Thread
+from time import monotonic
+
+from metrics import log_records_dropped
+
+
+class BackgroundBatchHandler(logging.Handler):
+    """
+    Hands log records to a bounded queue that a background thread pushes in
+    batches through ``target.emit_batch``, e.g. a ``logging_loki.LokiHandler``.
+
+    A batch is pushed once it holds ``batch_size`` records or ``batch_interval``
+    seconds after its first record. When the queue is full the record is dropped
+    and counted, logging never blocks the calling thread. The worker is started
+    on the first record of every process, so it survives a fork.
+    """
+
+    def __init__(self, target, max_size=10000, batch_size=100, batch_interval=1.0):
+        super().__init__()
+        self.target = target
+        self.queue = Queue(max(1, max_size))
+        self.batch_size = max(1, batch_size)
+        self.batch_interval = batch_interval
+        self._worker = None
+        self._worker_pid = None
+        self._worker_lock = Lock()
+        atexit.register(self.close)
+
+    def emit(self, record):
+        if self._worker_pid != getpid():
+            self.__start_worker()
+        try:
+            self.queue.put_nowait(record)
+        except Full:
+            log_records_dropped.labels(record.levelname.lower()).inc()
+
+    def flush(self):
+        """Push every queued record from the calling thread."""
+        while batch := self.__drain(self.batch_size, 0):
+            self.__push(batch)
+
+    def close(self):
+        self.flush()
+        super().close()
+
+    def __start_worker(self):
+        with self._worker_lock:
+            if self._worker_pid == getpid():
+                return
+            self._worker = Thread(
+                target=self.__run, name="log-batch-handler", daemon=True
+            )
+            self._worker_pid = getpid()
+            self._worker.start()
+
+    def __run(self):
+        while True:
+            first = self.queue.get()
+            batch = [first] + self.__drain(self.batch_size - 1, self.batch_interval)
+            self.__push(batch)
+
+    def __drain(self, size, timeout):
+        batch = []
+        deadline = monotonic() + timeout
+        while len(batch) < size:
+            try:
+                remaining = deadline - monotonic()
+                if remaining > 0:
+                    batch.append(self.queue.get(timeout=remaining))
+                else:
+                    batch.append(self.queue.get_nowait())
+            except Empty:
+                break
+        return batch
+
+    def __push(self, batch):
+        try:
+            self.target.emit_batch(batch)
+        except Exception:
+            # LokiHandler reports its own failures, anything else must not
+            # take the worker down.
+            self.handleError(batch[-1])
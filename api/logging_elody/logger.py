@@ -1,10 +1,28 @@
-import inspect
 import logging
+import sys
 from os import getenv
 
 from configuration import get_object_configuration_mapper
 from elody.util import flatten_dict
+from logging_elody.batch_handler import BackgroundBatchHandler
 from logging_loki import JsonLokiLogger, LokiLogger
+from logging_loki.handlers import LokiHandler
+
+# Records waiting for the background push to Loki. When the queue is full new
+# records are dropped and counted in log_records_dropped. Set 0 to push every
+# record to Loki from the logging thread.
+LOG_QUEUE_SIZE = int(getenv("LOG_QUEUE_SIZE") or 10000)
+LOG_BATCH_SIZE = int(getenv("LOG_BATCH_SIZE") or 100)
+LOG_BATCH_INTERVAL_SECONDS = float(getenv("LOG_BATCH_INTERVAL_SECONDS") or 1)
+
+SEVERITY_LEVELS = {
+    "debug": logging.DEBUG,
+    "info": logging.INFO,
+    "warning": logging.WARNING,
+    "error": logging.ERROR,
+    "critical": logging.CRITICAL,
+    "exception": logging.ERROR,
+}
 
 
 class Logger:
@@ -34,61 +52,54 @@ class Logger:
             log_level=log_level,
         )
         self.logger = JsonLokiLogger(logger)
+        self.loki_url = getenv("LOKI_URL", None)
+        self._logger = logger.logger
+        if self.loki_url and LOG_QUEUE_SIZE > 0:
+            self.__push_in_background(self._logger)
+
+    def __push_in_background(self, logger):
+        for handler in list(logger.handlers):
+            if isinstance(handler, LokiHandler):
+                logger.removeHandler(handler)
+                logger.addHandler(
+                    BackgroundBatchHandler(
+                        handler,
+                        max_size=LOG_QUEUE_SIZE,
+                        batch_size=LOG_BATCH_SIZE,
+                        batch_interval=LOG_BATCH_INTERVAL_SECONDS,
+                    )
+                )
 
     def debug(self, message: str, item={}, **kwargs):
-        self._log(
-            "debug",
-            message,
-            item,
-            frame_info=inspect.getframeinfo(inspect.stack()[1][0]),
-            **kwargs,
-        )
+        if self._logger.isEnabledFor(SEVERITY_LEVELS["debug"]):
+            self._log("debug", message, item, frame=sys._getframe(1), **kwargs)
 
     def info(self, message: str, item={}, **kwargs):
-        self._log(
-            "info",
-            message,
-            item,
-            frame_info=inspect.getframeinfo(inspect.stack()[1][0]),
-            **kwargs,
-        )
+        if self._logger.isEnabledFor(SEVERITY_LEVELS["info"]):
+            self._log("info", message, item, frame=sys._getframe(1), **kwargs)
 
     def warning(self, message: str, item={}, **kwargs):
-        self._log(
-            "warning",
-            message,
-            item,
-            frame_info=inspect.getframeinfo(inspect.stack()[1][0]),
-            **kwargs,
-        )
+        if self._logger.isEnabledFor(SEVERITY_LEVELS["warning"]):
+            self._log("warning", message, item, frame=sys._getframe(1), **kwargs)
 
     def error(self, message: str, item={}, **kwargs):
-        self._log(
-            "error",
-            message,
-            item,
-            frame_info=inspect.getframeinfo(inspect.stack()[1][0]),
-            **kwargs,
-        )
+        if self._logger.isEnabledFor(SEVERITY_LEVELS["error"]):
+            self._log("error", message, item, frame=sys._getframe(1), **kwargs)
 
     def critical(self, message: str, item={}, **kwargs):
-        self._log(
-            "critical",
-            message,
-            item,
-            frame_info=inspect.getframeinfo(inspect.stack()[1][0]),
-            **kwargs,
-        )
+        if self._logger.isEnabledFor(SEVERITY_LEVELS["critical"]):
+            self._log("critical", message, item, frame=sys._getframe(1), **kwargs)
 
     def exception(self, message: str, item={}, *, exc_info=None, **kwargs):
-        self._log(
-            "exception",
-            message,
-            item,
-            frame_info=inspect.getframeinfo(inspect.stack()[1][0]),
-            exc_info=exc_info,
-            **kwargs,
-        )
+        if self._logger.isEnabledFor(SEVERITY_LEVELS["exception"]):
+            self._log(
+                "exception",
+                message,
+                item,
+                frame=sys._getframe(1),
+                exc_info=exc_info,
+                **kwargs,
+            )
 
     def _log(
         self,
@@ -96,7 +107,7 @@ class Logger:
         message: str,
         item={},
         *,
-        frame_info,
+        frame,
         exc_info=None,
         **kwargs,
     ):
@@ -116,12 +127,12 @@ class Logger:
             extra_json_properties = info["info_labels"]
             extra_json_properties.update(
                 {
-                    "frame_info": f"Logged from file: {frame_info.filename}, line: {frame_info.lineno}, in function: {frame_info.function}",
+                    "frame_info": f"Logged from file: {frame.f_code.co_filename}, line: {frame.f_lineno}, in function: {frame.f_code.co_name}",
                 },
             )
             if info_labels := kwargs.get("info_labels"):
                 extra_json_properties.update(info_labels)
-            if not getenv("LOKI_URL", None):
+            if not self.loki_url:
                 extra_json_properties.update(tags)
 
         log = getattr(self.logger, severity)
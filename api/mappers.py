@@ -231,6 +231,9 @@ def map_objects_to_csv(
             excluded_fields = general_excluded_fields
         else:
             excluded_fields = general_excluded_fields
+    related_items = __get_related_items_for_csv(
+        storage, entities, fields, excluded_fields
+    )
     for entity in entities:
         values = list()
         for id in entity.get("identifiers", []):
@@ -278,10 +281,7 @@ def map_objects_to_csv(
             if type not in keys:
                 keys.append(type)
             if type in map_name_to_csv_value:
-                item = storage.get_item_from_collection_by_id(
-                    "entities", relation.get("key")
-                )
-                if item:
+                if item := related_items.get(relation.get("key")):
                     values[0][keys.index(type)] = get_item_metadata_value(
                         item, map_name_to_csv_value.get(type)
                     )
@@ -300,6 +300,27 @@ def map_objects_to_csv(
     return csv_writer(keys, root_values)
 
 
+def __get_related_items_for_csv(storage, entities, fields, excluded_fields):
+    ids = list()
+    for entity in entities:
+        for relation in entity.get("relations", []):
+            original_type = relation.get("type")
+            if not can_append_key(original_type, fields, excluded_fields):
+                continue
+            type = map_relation_to_name.get(original_type, original_type)
+            if type in map_name_to_csv_value:
+                ids.append(relation.get("key"))
+    if not ids:
+        return dict()
+    related_items = dict()
+    for item in storage.get_items_from_collection_by_ids(
+        ids, "entities", fields=["metadata"]
+    ):
+        for id in [item.get("_id"), *item.get("identifiers", [])]:
+            related_items.setdefault(id, item)
+    return related_items
+
+
 def map_object_to_csv(entity, fields=None, exclude_non_editable_fields=False):
     keys = list()
     values = list()
@@ -0,0 +1,94 @@
+from prometheus_client import Counter, Gauge, Histogram
+
+# Metrics are registered on the default prometheus_client registry, which is
+# exported on /metrics by register_exporter in app.py when ENABLE_METRICS is set.
+
+identity_map_lookups = Counter(
+    "collection_api_identity_map_lookups_total",
+    "Document lookups served by the request-scoped identity map",
+    ["collection", "result"],
+)
+
+typesense_indexed_documents = Counter(
+    "collection_api_typesense_indexed_documents_total",
+    "Entity changes settled by the batched Typesense indexer",
+    ["collection", "result"],
+)
+
+typesense_import_batch_seconds = Histogram(
+    "collection_api_typesense_import_batch_seconds",
+    "Time to hydrate, convert and import one batch into Typesense",
+    ["collection"],
+)
+
+typesense_import_batch_size = Histogram(
+    "collection_api_typesense_import_batch_size",
+    "Number of documents sent per Typesense import",
+    ["collection"],
+    buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000),
+)
+
+typesense_request_seconds = Histogram(
+    "collection_api_typesense_request_seconds",
+    "Latency of HTTP requests to each Typesense node",
+    ["node", "outcome"],
+)
+
+typesense_circuit_open = Gauge(
+    "collection_api_typesense_circuit_open",
+    "Whether the Typesense circuit breaker currently skips search calls",
+)
+
+listing_counts = Counter(
+    "collection_api_listing_counts_total",
+    "Listing counts run next to the page query, by whether they met the deadline",
+    ["collection", "result"],
+)
+
+filter_result_cache_lookups = Counter(
+    "collection_api_filter_result_cache_lookups_total",
+    "Filter listings served from or missing in the filter result cache",
+    ["collection", "result"],
+)
+
+filter_plan_cache_lookups = Counter(
+    "collection_api_filter_plan_cache_lookups_total",
+    "Match pipelines bound from a cached plan or compiled from scratch",
+    ["result"],
+)
+
+log_records_dropped = Counter(
+    "collection_api_log_records_dropped_total",
+    "Log records dropped because the background Loki queue was full",
+    ["level"],
+)
+
+cache_events = Counter(
+    "collection_api_cache_events_total",
+    "Hits, misses, evictions and expirations of the bounded in-process caches",
+    ["cache", "event"],
+)
+
+cache_entries = Gauge(
+    "collection_api_cache_entries",
+    "Number of entries held by each bounded in-process cache",
+    ["cache"],
+)
+
+ttl_expired_items = Counter(
+    "collection_api_ttl_expired_items_total",
+    "Expired items, mediafiles and history entries deleted by the TTL checker",
+    ["collection", "kind"],
+)
+
+ttl_expiry_chunk_seconds = Histogram(
+    "collection_api_ttl_expiry_chunk_seconds",
+    "Time to delete one chunk of expired items with everything that cascades",
+    ["collection"],
+)
+
+ttl_expiry_backlog = Gauge(
+    "collection_api_ttl_expiry_backlog",
+    "Expired items still stored after the last TTL checker run",
+    ["collection"],
+)
@@ -1,3 +1,4 @@
+from functools import wraps
 from importlib import import_module
 
 from app_context import g
@@ -24,12 +25,44 @@ def init_policy_factory():
 
 def apply_policies(request_context: RequestContext):
     global _policy_factory
-    return _policy_factory.apply_policies(request_context)
+    return _reuse_import_user_context(
+        _policy_factory.apply_policies(request_context), request_context, True
+    )
 
 
 def authenticate(request_context: RequestContext):
     global _policy_factory
-    return _policy_factory.authenticate(request_context)
+    return _reuse_import_user_context(
+        _policy_factory.authenticate(request_context), request_context
+    )
+
+
+def _reuse_import_user_context(decorator, request_context, authorize=False):
+    """
+    Imports running on the import pool (resources/base/import_jobs.py) were
+    authenticated by the request that submitted them, whose token may have
+    expired by the time they run. While g.import_user_context holds the user
+    context captured there, it is used as is instead of authenticating the
+    headers of the original request again; authorization still applies.
+    """
+
+    def wrapper(decorated_function):
+        decorated_function_wrapper = decorator(decorated_function)
+
+        @wraps(decorated_function)
+        def import_user_context_wrapper(*args, **kwargs):
+            if not (user_context := g.get("import_user_context")):
+                return decorated_function_wrapper(*args, **kwargs)
+            if authorize:
+                user_context = _policy_factory._authorize(
+                    decorated_function, user_context, request_context
+                )
+            user_context_setter(user_context)
+            return decorated_function(*args, **kwargs)
+
+        return import_user_context_wrapper
+
+    return wrapper
 
 
 def get_user_context():
@@ -1,6 +1,9 @@
+from os import getenv, remove
+
 from configuration import get_object_configuration_mapper
+from elody.exceptions import NonUniqueException
 from elody.job import fail_job, finish_job, init_job, start_job
-from flask import g, request
+from flask import current_app, g, request
 from flask_restful import Headers
 from inuits_policy_based_auth import RequestContext
 from policy_factory import authenticate, get_user_context
@@ -8,8 +11,10 @@ from rabbit import get_rabbit
 from requests.exceptions import HTTPError
 from resources.base.document import Document
 from resources.base.documents import Documents
+from resources.base.import_jobs import spool_request_body, submit_import
 from resources.base_resource import BaseResource
 from serialization.serialize import serialize
+from serialization.streaming import get_request_stream
 from util import encode_content_type_header
 from werkzeug.exceptions import (
     BadGateway,
@@ -19,17 +24,39 @@ from werkzeug.exceptions import (
     Unauthorized,
 )
 
+BATCH_BULK_MODE = getenv("BATCH_BULK_MODE", False) in [True, "true", "True"]
+BATCH_BULK_CHUNK_SIZE = int(getenv("BATCH_BULK_CHUNK_SIZE") or 500)
+# Hand the batch serializer the request body as a binary stream instead of
+# bytes, so rows are prepared and written while the upload is still coming in.
+# The serializer has to read it incrementally, see serialization/streaming.py.
+BATCH_STREAM_BODY = getenv("BATCH_STREAM_BODY", False) in [True, "true", "True"]
+# Spool the body, answer with the job id and import on the import pool, see
+# resources/base/import_jobs.py.
+BATCH_ASYNC = getenv("BATCH_ASYNC", False) in [True, "true", "True"]
+
 
 ### DO NOT EDIT THIS FILE AND DO NOT USE DIRECTLY ###
 ### contact @eray for more info or feature/bug reports; refs #146921 ###
 class Batch(BaseResource):
     @authenticate(RequestContext(request))
     def post(self, *, spec, force_patch_only=False, **_):
+        if (
+            request.args.get("async", int(BATCH_ASYNC), int)
+            and not g.get("batch_job_id")
+            and not g.get("dry_run")
+            and not int(request.args.get("soft", 0))
+        ):
+            return self.__post_async(spec=spec, force_patch_only=force_patch_only)
         self.__set_request("POST")
         g.enable_parsers = True
         status_code = 201 if not force_patch_only else 200
         documents, errors, mediafile_errors, warnings = [], [], [], []
-        line_count, content = 1, {}
+        line_count, content, chunk = 1, {}, []
+        is_bulk = (
+            request.args.get("bulk", int(BATCH_BULK_MODE), int)
+            and not force_patch_only
+            and not int(request.args.get("soft", 0))
+        )
         self.job_id = ""
         self.parent_job_id = None
         document_type = request.args.get("type", "")
@@ -56,21 +83,19 @@ class Batch(BaseResource):
             if not g.get("dry_run"):
                 self.parent_job_id = request.args.get("parent_job_id", "")
                 g.parent_job_id = self.parent_job_id
-                self.job_id = init_job(
-                    f"Import {request.args.get('filename', document_type.replace('_', ' ') if document_type else 'file')}",  # noqa
-                    "Data Import",
-                    get_rabbit=get_rabbit,
-                    user_email=get_user_context().email,
-                    parent_id=self.parent_job_id,
-                    track_async_children=True,
+                self.job_id = g.get("batch_job_id") or self.__init_import_job(
+                    document_type
                 )
-                start_job(self.job_id, get_rabbit=get_rabbit)
                 g.current_job_id = self.job_id
 
             documents_resource = Documents()
             document_resource = Document()
+            if request.args.get("stream", int(BATCH_STREAM_BODY), int):
+                body = get_request_stream(request)
+            else:
+                body = request.get_data()
             for content in serialize_batch(
-                request.get_data(),
+                body,
                 document_type=document_type,
                 request_args=request.args.to_dict(),
             ):
@@ -150,8 +175,20 @@ class Batch(BaseResource):
 
                         if force_patch_only or any(
                             set(content["identifiers"]) & set(document["identifiers"])
-                            for document in documents
+                            for document in [*documents, *(item for _, item in chunk)]
                         ):
+                            if chunk:
+                                status_code = self.__post_chunk(
+                                    documents_resource,
+                                    chunk,
+                                    spec,
+                                    documents,
+                                    errors,
+                                    mediafile_errors,
+                                    warnings,
+                                    status_code,
+                                )
+                                chunk = []
                             if not g.get("dry_run"):
                                 id = content.pop("identifiers")[0]
                                 g.content = serialize(
@@ -167,6 +204,23 @@ class Batch(BaseResource):
                                     response = None
                             else:
                                 response = None
+                        elif is_bulk:
+                            chunk.append(
+                                (line_count, documents_resource.prepare_post(spec=spec))
+                            )
+                            if len(chunk) >= BATCH_BULK_CHUNK_SIZE:
+                                status_code = self.__post_chunk(
+                                    documents_resource,
+                                    chunk,
+                                    spec,
+                                    documents,
+                                    errors,
+                                    mediafile_errors,
+                                    warnings,
+                                    status_code,
+                                )
+                                chunk = []
+                            continue
                         else:
                             response = documents_resource.post(
                                 spec=spec,
@@ -223,6 +277,12 @@ class Batch(BaseResource):
                             )
 
                 g.parsed_contents = []
+                if progress := g.get("batch_progress"):
+                    progress.report(
+                        parsed=line_count - 1,
+                        written=len(documents),
+                        failed=len(errors) + len(mediafile_errors),
+                    )
                 if int(request.args.get("soft", 0)):
                     break
 
@@ -245,10 +305,28 @@ class Batch(BaseResource):
                 document_type=document_type,
             )
         finally:
+            if chunk:
+                status_code = self.__post_chunk(
+                    documents_resource,
+                    chunk,
+                    spec,
+                    documents,
+                    errors,
+                    mediafile_errors,
+                    warnings,
+                    status_code,
+                )
             if int(request.args.get("soft", 0)):
                 return {}, 200 if status_code == 400 else status_code
             if view_args_id:
                 request.view_args = {"id": view_args_id}
+            if progress := g.get("batch_progress"):
+                progress.report(
+                    parsed=line_count - 1,
+                    written=len(documents),
+                    failed=len(errors) + len(mediafile_errors),
+                )
+                progress.flush()
             if not g.get("dry_run"):
                 if len(errors) == 0:
                     finish_job(self.job_id, get_rabbit=get_rabbit)
@@ -293,6 +371,84 @@ class Batch(BaseResource):
                 "parent_job_id": self.parent_job_id,
             }, status_code
 
+    def __init_import_job(self, document_type):
+        job_id = init_job(
+            f"Import {request.args.get('filename', document_type.replace('_', ' ') if document_type else 'file')}",  # noqa
+            "Data Import",
+            get_rabbit=get_rabbit,
+            user_email=get_user_context().email,
+            parent_id=request.args.get("parent_job_id", ""),
+            track_async_children=True,
+        )
+        start_job(job_id, get_rabbit=get_rabbit)
+        return job_id
+
+    def __post_async(self, *, spec, force_patch_only):
+        spool_path = spool_request_body(request)
+        try:
+            job_id = self.__init_import_job(request.args.get("type", ""))
+            submit_import(
+                current_app._get_current_object(),  # pyright: ignore
+                spool_path,
+                request,
+                get_user_context(),
+                job_id,
+                lambda: Batch().post(spec=spec, force_patch_only=force_patch_only),
+            )
+        except Exception:
+            remove(spool_path)
+            raise
+        return {
+            "job_id": job_id,
+            "parent_job_id": request.args.get("parent_job_id", ""),
+        }, 202
+
+    def __post_chunk(
+        self,
+        documents_resource,
+        chunk,
+        spec,
+        documents,
+        errors,
+        mediafile_errors,
+        warnings,
+        status_code,
+    ):
+        items = [item for _, item in chunk]
+        try:
+            responses = documents_resource.post_prepared(items, spec=spec)
+        except Exception as exception:
+            responses = [exception] * len(items)
+        for (line_count, item), response in zip(chunk, responses, strict=True):
+            document_type = item.get("type")
+            if not isinstance(response, Exception):
+                documents.append(response)
+            elif isinstance(response, NonUniqueException):
+                warnings, _ = self.__process_errors(
+                    warnings,
+                    str(response.args[0]),
+                    status_code,
+                    line_count=line_count,
+                    document_type=document_type,
+                )
+            elif document_type != "mediafile" or g.get("dry_run"):
+                errors, status_code = self.__process_errors(
+                    errors,
+                    response,
+                    status_code,
+                    line_count=line_count,
+                    document_type=document_type,
+                )
+            else:
+                mediafile_errors, status_code = self.__process_errors(
+                    mediafile_errors,
+                    response,
+                    status_code,
+                    line_count=line_count,
+                    document_type="mediafile",
+                )
+        return status_code
+
     def __process_errors(
         self,
         errors,
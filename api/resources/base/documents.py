@@ -79,30 +79,41 @@ class Documents(GenericObjectV2):
                         request.args.get("current_job_id") or g.get("current_job_id")
                     )
                 ):
-                    if isinstance(response, dict):
-                        add_document_to_job(
-                            current_job_id,
-                            response.get("_id"),
-                            get_rabbit=get_rabbit,
-                        )
-                    else:
-                        if request.headers.get("Accept", "").startswith("text/"):
-                            if isinstance(response, str):
-                                queries = parse_qs(
-                                    response.split("?")[-1],
-                                )
-                                id = queries.get("id")
-                                if isinstance(id, list):
-                                    id = id[0]
-                                add_document_to_job(
-                                    current_job_id,
-                                    id,
-                                    get_rabbit=get_rabbit,
-                                )
+                    self.__add_response_to_job(current_job_id, response)
             return response
         except BadRequest as exception:
             return {"message": exception.description}, 400
 
+    def prepare_post(self, *, spec):
+        self.__set_request("POST")
+        g.enable_parsers = True
+        content = g.get("content") or request.get_json() or {}
+        try:
+            return super().prepare_post(collection=None, content=content, spec=spec)
+        except Forbidden as exception:
+            config = get_object_configuration_mapper().get(content.get("type"))
+            construct_document_exception_message = config.crud()[
+                "document_exception_message_constructor"
+            ]
+            raise BadRequest(
+                construct_document_exception_message(
+                    exception, str(exception.description)
+                )
+            ) from exception  # temporary BadRequest until error codes are reworked
+
+    def post_prepared(self, items, *, spec, enable_jobs=True):
+        self.__set_request("POST")
+        responses = super().post_prepared(items, spec=spec)
+        if enable_jobs and (
+            current_job_id := (
+                request.args.get("current_job_id") or g.get("current_job_id")
+            )
+        ):
+            for response in responses:
+                if not isinstance(response, Exception):
+                    self.__add_response_to_job(current_job_id, response)
+        return responses
+
     def put(self, *, spec):
         from resources.base.batch import Batch
 
@@ -153,6 +164,27 @@ class Documents(GenericObjectV2):
         finish_job(job_id, get_rabbit=get_rabbit)
         return self._create_response_according_accept_header({"parent_job_id": job_id})
 
+    def __add_response_to_job(self, current_job_id, response):
+        if isinstance(response, dict):
+            add_document_to_job(
+                current_job_id,
+                response.get("_id"),
+                get_rabbit=get_rabbit,
+            )
+        elif request.headers.get("Accept", "").startswith("text/"):
+            if isinstance(response, str):
+                queries = parse_qs(
+                    response.split("?")[-1],
+                )
+                id = queries.get("id")
+                if isinstance(id, list):
+                    id = id[0]
+                add_document_to_job(
+                    current_job_id,
+                    id,
+                    get_rabbit=get_rabbit,
+                )
+
     def __set_request(self, method):
         request.method = method
         request.path = "/entities"
@@ -0,0 +1,221 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import UTC, datetime
+from os import getenv
+from shutil import copyfileobj
+from tempfile import NamedTemporaryFile, gettempdir
+from threading import Lock, Thread
+from time import monotonic, sleep
+
+from elody.job import fail_job
+from flask import g
+from logging_elody.log import log
+from rabbit import get_rabbit
+from serialization.streaming import STREAM_READ_SIZE, get_request_stream
+from storage.storagemanager import StorageManager
+
+# Imports run on their own pool, next to and independent of the web workers:
+# a request only spools the body and returns the job id.
+#
+# The pool lives in the memory of the worker process: when the worker
+# restarts, the imports it had queued or running are lost, together with their
+# spooled bodies. While an import is pending, its job gets a heartbeat in its
+# progress metadata as soon as the job document exists and from then on every
+# third of BATCH_STALE_JOB_SECONDS, the
+# StaleImportChecker cron job fails the jobs whose heartbeat stopped for longer
+# than BATCH_STALE_JOB_SECONDS. Such imports have to be submitted again.
+BATCH_IMPORT_WORKERS = int(getenv("BATCH_IMPORT_WORKERS") or 2)
+BATCH_SPOOL_DIR = getenv("BATCH_SPOOL_DIR") or gettempdir()
+BATCH_PROGRESS_INTERVAL_SECONDS = float(getenv("BATCH_PROGRESS_INTERVAL_SECONDS") or 5)
+BATCH_STALE_JOB_SECONDS = int(getenv("BATCH_STALE_JOB_SECONDS") or 900)
+
+_import_executor = None
+_import_executor_lock = Lock()
+_pending_imports = {}
+_pending_imports_lock = Lock()
+
+
+def get_import_executor():
+    global _import_executor
+    if _import_executor:
+        return _import_executor
+    with _import_executor_lock:
+        if not _import_executor:
+            _import_executor = ThreadPoolExecutor(
+                max_workers=max(1, BATCH_IMPORT_WORKERS),
+                thread_name_prefix="batch-import",
+            )
+            Thread(
+                target=_send_heartbeats, name="batch-import-heartbeat", daemon=True
+            ).start()
+    return _import_executor
+
+
+def _send_heartbeats():
+    while True:
+        sleep(max(1, BATCH_PROGRESS_INTERVAL_SECONDS))
+        send_heartbeats()
+
+
+def send_heartbeats():
+    """Write a heartbeat on the job of every import queued or running in this
+    process that has none yet or whose last one is a third of
+    BATCH_STALE_JOB_SECONDS old."""
+    with _pending_imports_lock:
+        pending_imports = list(_pending_imports.values())
+    for progress in pending_imports:
+        if (
+            progress.has_progress_metadata
+            and monotonic() - progress.last_write < BATCH_STALE_JOB_SECONDS / 3
+        ):
+            continue
+        try:
+            progress.flush(heartbeat=True)
+        except Exception as exception:
+            log.warning(
+                f"Heartbeat for import {progress.job_id} failed: {exception}",
+                info_labels={"job_id": progress.job_id},
+            )
+
+
+def spool_request_body(request):
+    """Copy the request body to a file in BATCH_SPOOL_DIR, return its path."""
+    with NamedTemporaryFile(dir=BATCH_SPOOL_DIR, prefix="batch-", delete=False) as file:
+        copyfileobj(get_request_stream(request), file, STREAM_READ_SIZE)
+    return file.name
+
+
+def submit_import(app, spool_path, request, user_context, job_id, run):
+    """
+    Run run() for the spooled body on the import pool, in a request context
+    rebuilt from request: same path, query and headers, with the spooled file
+    as body. g.batch_job_id holds the job created for the import,
+    g.batch_progress the ImportProgress to report rows on and
+    g.import_user_context the user_context of the submitting request, which
+    the import uses instead of authenticating again.
+    """
+    environ = {
+        "path": request.path,
+        "method": request.method,
+        "query_string": request.query_string.decode("latin-1"),
+        "headers": list(request.headers.items()),
+    }
+    executor = get_import_executor()
+    with _pending_imports_lock:
+        _pending_imports[job_id] = ImportProgress(job_id)
+    try:
+        return executor.submit(
+            _run_import, app, spool_path, environ, user_context, job_id, run
+        )
+    except Exception:
+        with _pending_imports_lock:
+            _pending_imports.pop(job_id, None)
+        raise
+
+
+def _run_import(app, spool_path, environ, user_context, job_id, run):
+    with _pending_imports_lock:
+        progress = _pending_imports.get(job_id) or ImportProgress(job_id)
+    try:
+        with (
+            open(spool_path, "rb") as body,
+            app.test_request_context(
+                **environ,
+                input_stream=body,
+                content_length=os.path.getsize(spool_path),
+            ),
+        ):
+            g.user_context = user_context
+            g.import_user_context = user_context
+            g.batch_job_id = job_id
+            g.batch_progress = progress
+            run()
+    except Exception as exception:
+        log.exception(
+            f"Import {job_id} failed: {exception}",
+            info_labels={"job_id": job_id},
+            exc_info=exception,
+        )
+        fail_job(job_id, repr(exception), get_rabbit=get_rabbit)
+    finally:
+        with _pending_imports_lock:
+            _pending_imports.pop(job_id, None)
+        try:
+            os.remove(spool_path)
+        except OSError:
+            pass
+
+
+class ImportProgress:
+    """
+    Keeps the rows parsed, written and failed by an import on its job, in
+    the ``progress`` metadata of the job document.
+
+    ``report`` takes running totals and only writes every
+    BATCH_PROGRESS_INTERVAL_SECONDS, as one ``$inc`` of what changed since the
+    last write. While the job document does not exist yet, the counts are kept
+    for the next write. Every write also sets the ``heartbeat`` of the progress,
+    ``flush(heartbeat=True)`` writes it when no counts changed.
+    """
+
+    keys = ["parsed", "written", "failed"]
+
+    def __init__(self, job_id, storage=None, interval=None):
+        self.job_id = job_id
+        self.storage = storage
+        self.interval = (
+            BATCH_PROGRESS_INTERVAL_SECONDS if interval is None else interval
+        )
+        self.totals = dict.fromkeys(self.keys, 0)
+        self.written_totals = dict.fromkeys(self.keys, 0)
+        self.has_progress_metadata = False
+        self.last_write = monotonic()
+        self.lock = Lock()
+
+    def report(self, **totals):
+        self.totals.update(totals)
+        if monotonic() - self.last_write >= self.interval:
+            self.flush()
+
+    def flush(self, heartbeat=False):
+        with self.lock:
+            self.last_write = monotonic()
+            totals = dict(self.totals)
+            increments = {
+                key: totals[key] - self.written_totals[key]
+                for key in self.keys
+                if totals[key] != self.written_totals[key]
+            }
+            if not (increments or heartbeat) or not self.__ensure_progress_metadata():
+                return
+            if self.__get_storage().increment_metadata_values(
+                self.job_id,
+                "jobs",
+                "progress",
+                increments,
+                set_fields={"heartbeat": datetime.now(UTC)},
+            ):
+                self.written_totals = totals
+
+    def __ensure_progress_metadata(self):
+        if self.has_progress_metadata:
+            return True
+        storage = self.__get_storage()
+        if not (job := storage.get_item_from_collection_by_id("jobs", self.job_id)):
+            return False
+        if not any(
+            metadata.get("key") == "progress" for metadata in job.get("metadata", [])
+        ):
+            storage.add_sub_item_to_collection_item(
+                "jobs",
+                self.job_id,
+                "metadata",
+                [{"key": "progress", "value": dict.fromkeys(self.keys, 0)}],
+            )
+        self.has_progress_metadata = True
+        return True
+
+    def __get_storage(self):
+        if not self.storage:
+            self.storage = StorageManager().get_db_engine()
+        return self.storage
@@ -0,0 +1,98 @@
+from os import getenv
+from threading import Lock
+from time import sleep
+from zlib import crc32
+
+from logging_elody.log import log
+from rabbit import get_rabbit
+
+# Job messages are handled by one single active consumer, unless
+# JOB_QUEUE_SHARDS spreads them over that many single active consumer queues,
+# keyed on the job id so the messages of one job keep their order.
+JOB_QUEUE_SHARDS = int(getenv("JOB_QUEUE_SHARDS") or 0)
+JOB_RETRY_DELAY_SECONDS = int(getenv("JOB_RETRY_DELAY_SECONDS") or 5)
+JOB_RETRY_MAX_ATTEMPTS = int(getenv("JOB_RETRY_MAX_ATTEMPTS") or 5)
+
+queue_prefix = getenv("QUEUE_PREFIX", "dams")
+routing_key_prefix = getenv("ROUTING_KEY_PREFIX", "dams")
+JOB_DEFERRED_ROUTING_KEY = f"{routing_key_prefix}.job_deferred"
+JOB_DELAYED_ROUTING_KEY = f"{routing_key_prefix}.job_delayed"
+
+_delay_queue_declared = False
+_delay_queue_lock = Lock()
+
+
+def get_job_message_id(body):
+    """Return the id of the job a job message is about, the parent job for a
+    deferred parent update."""
+    data = body["data"]
+    return data.get("parent_job_id") or data.get("id", data.get("_id"))
+
+
+def get_job_shard_routing_key(job_id):
+    return f"{routing_key_prefix}.job_state.{get_job_shard(job_id)}"
+
+
+def get_job_shard(job_id):
+    return crc32(str(job_id).encode()) % JOB_QUEUE_SHARDS
+
+
+def defer_job_message(body):
+    """
+    Hand a job message to the delay queue, from which the broker routes it
+    back to the job queue on JOB_DEFERRED_ROUTING_KEY after
+    JOB_RETRY_DELAY_SECONDS, so a job that does not exist yet does not stall
+    the consumer. Returns False, and drops the message, once it was deferred
+    JOB_RETRY_MAX_ATTEMPTS times.
+
+    Only amqpstorm_flask can declare the delay queue. With another
+    AMQP_MANAGER the consumer waits JOB_RETRY_DELAY_SECONDS itself and sends
+    the message straight back on JOB_DEFERRED_ROUTING_KEY.
+    """
+    attempt = body.get("attempt", 0) + 1
+    if attempt > JOB_RETRY_MAX_ATTEMPTS:
+        log.error(
+            f"Dropping job message for {get_job_message_id(body)} after "
+            f"{JOB_RETRY_MAX_ATTEMPTS} attempts",
+            info_labels={"mq_message": body},
+        )
+        return False
+    if getenv("AMQP_MANAGER", "amqpstorm_flask") != "amqpstorm_flask":
+        sleep(JOB_RETRY_DELAY_SECONDS)
+        get_rabbit().send(
+            {**body, "attempt": attempt}, routing_key=JOB_DEFERRED_ROUTING_KEY
+        )
+        return True
+    _declare_delay_queue()
+    get_rabbit().send({**body, "attempt": attempt}, routing_key=JOB_DELAYED_ROUTING_KEY)
+    return True
+
+
+def _declare_delay_queue():
+    global _delay_queue_declared
+    if _delay_queue_declared:
+        return
+    with _delay_queue_lock:
+        if _delay_queue_declared:
+            return
+        rabbit = get_rabbit()
+        queue = f"{queue_prefix}-update_job-delayed"
+        channel = rabbit.get_connection().channel()
+        try:
+            channel.queue.declare(
+                queue=queue,
+                durable=True,
+                arguments={
+                    "x-message-ttl": JOB_RETRY_DELAY_SECONDS * 1000,
+                    "x-dead-letter-exchange": rabbit.mq_exchange,
+                    "x-dead-letter-routing-key": JOB_DEFERRED_ROUTING_KEY,
+                },
+            )
+            channel.queue.bind(
+                queue=queue,
+                exchange=rabbit.mq_exchange,
+                routing_key=JOB_DELAYED_ROUTING_KEY,
+            )
+        finally:
+            channel.close()
+        _delay_queue_declared = True
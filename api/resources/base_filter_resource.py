@@ -1,7 +1,11 @@
+from urllib.parse import urlencode
+
 from configuration import get_object_configuration_mapper
 from filters_v2.filter_manager import FilterManager as FilterManagerV2
 from filters_v2.helpers.base_helper import get_distinct_by
 from filters_v2.mongo_filters import LISTING_COUNT_CAP
+from filters_v2.result_cache import get_filter_result_cache
+from filters_v2.stages.cursor_stage import InvalidCursor
 from flask import after_this_request, request
 from flask_restful import abort
 from logging_elody.log import log
@@ -334,35 +338,57 @@ class BaseFilterResource(BaseResource):
     def _fetch_documents_from_mongo(self, matching_ids, collections):
         """Fetch documents from multiple MongoDB collections, ordered by Typesense relevance."""
         storage = StorageManager().get_db_engine()
-        id_query = {
-            "$or": [
-                {"_id": {"$in": matching_ids}},
-                {"identifiers": {"$in": matching_ids}},
-            ]
-        }
-        documents = []
-        for col in collections:
-            documents.extend(storage.db[col].find(id_query))
-        id_order = {doc_id: i for i, doc_id in enumerate(matching_ids)}
-        documents.sort(key=lambda doc: id_order.get(doc["_id"], float("inf")))
-        return [storage._prepare_mongo_document(doc, True) for doc in documents]
-
-    def _add_pagination_links(self, items, skip, limit, collection):
-        """Add next/previous pagination links to response."""
-        count = items.get("count", 0)
-        # A count above LISTING_COUNT_CAP is a sentinel, not the real total
-        # (see MongoFilters.__count): past the cap it can no longer tell
-        # whether more results exist, but a full page can.
-        count_is_capped = LISTING_COUNT_CAP > 0 and count > LISTING_COUNT_CAP
-        has_next = skip + limit < count or (
-            count_is_capped and len(items.get("results", [])) == limit
+        return storage.get_items_from_collection_by_ids(matching_ids, collections)
+
+    def _filter_v2(self, query, skip, limit, collection, order_by, asc, **kwargs):
+        """Run ``filter_engine_v2.filter``, through the result cache if enabled."""
+
+        def run_filter():
+            return self.filter_engine_v2.filter(
+                query, skip, limit, collection, order_by, asc, **kwargs
+            )
+
+        if not (cache := get_filter_result_cache()):
+            return run_filter()
+        return cache.get_or_compute(
+            run_filter,
+            query,
+            skip,
+            limit,
+            order_by,
+            asc,
+            collection=collection,
+            **kwargs,
         )
-        if has_next:
-            items["next"] = f"/{collection}/filter?skip={skip + limit}&limit={limit}"
-        if skip > 0:
-            items["previous"] = (
-                f"/{collection}/filter?skip={max(0, skip - limit)}&limit={limit}"
+
+    def _add_pagination_links(
+        self, items, skip, limit, collection, *, order_by=None, asc=True
+    ):
+        """Add next/previous pagination links to response."""
+        if "next_cursor" in items:
+            # Keyset pages only link forward, and a cursor is bound to its order.
+            if next_cursor := items["next_cursor"]:
+                parameters = {"cursor": next_cursor, "limit": limit}
+                if order_by:
+                    parameters.update({"order_by": order_by, "asc": int(bool(asc))})
+                items["next"] = f"/{collection}/filter?{urlencode(parameters)}"
+        else:
+            count = items.get("count", 0)
+            # A count above LISTING_COUNT_CAP is a sentinel, not the real total
+            # (see MongoFilters.__count): past the cap it can no longer tell
+            # whether more results exist, but a full page can.
+            count_is_capped = LISTING_COUNT_CAP > 0 and count > LISTING_COUNT_CAP
+            has_next = skip + limit < count or (
+                count_is_capped and len(items.get("results", [])) == limit
             )
+            if has_next:
+                items["next"] = (
+                    f"/{collection}/filter?skip={skip + limit}&limit={limit}"
+                )
+            if skip > 0:
+                items["previous"] = (
+                    f"/{collection}/filter?skip={max(0, skip - limit)}&limit={limit}"
+                )
         if collection in [
             "entities",
             "mediafiles",
@@ -410,6 +436,7 @@ class BaseFilterResource(BaseResource):
         exact_count = (
             bool(request.args.get("exact_count", 0, int)) if request else False
         )
+        cursor = request.args.get("cursor", None) if request else None
         if request:
             skip = skip if skip is not None else request.args.get("skip", 0, int)
             limit = limit if limit is not None else request.args.get("limit", 20, int)
@@ -422,10 +449,26 @@ class BaseFilterResource(BaseResource):
         if not self.filter_engine_v2:
             abort(500, message="Failed to init search engine")
 
-        items = self.filter_engine_v2.filter(
-            query, skip, limit, collection, order_by, asc, exact_count=exact_count
+        # Only the Mongo engine paginates on a cursor, the others reject it
+        # with InvalidCursor, so it is only passed on when the client asked for
+        # keyset pagination.
+        keyset = {"cursor": cursor} if cursor is not None else {}
+        try:
+            items = self._filter_v2(
+                query,
+                skip,
+                limit,
+                collection,
+                order_by,
+                asc,
+                exact_count=exact_count,
+                **keyset,
+            )
+        except InvalidCursor as error:
+            abort(400, message=str(error))
+        return self._add_pagination_links(
+            items, skip, limit, collection, order_by=order_by, asc=asc
         )
-        return self._add_pagination_links(items, skip, limit, collection)
 
     @tracer.start_as_current_span(
         "base.BaseFilterResource._execute_typesense_accelerated_search"
@@ -578,7 +621,7 @@ class BaseFilterResource(BaseResource):
                     "match_exact": True,
                 }
             )
-            items = self.filter_engine_v2.filter(
+            items = self._filter_v2(
                 remaining_filters,
                 skip,
                 limit,
@@ -8,6 +8,7 @@ from os import getenv
 from urllib.parse import quote
 
 import mappers
+from bounded_cache import BoundedCache
 from configuration import get_object_configuration_mapper, get_storage_mapper
 from elody.csv import CSVSingleObject
 from elody.error_codes import ErrorCode, get_error_code, get_read, get_write
@@ -31,6 +32,8 @@ from flask_restful import Resource, abort
 from policy_factory import get_user_context
 from rabbit import get_rabbit
 from serialization.serialize import serialize
+from serialization.streaming import iter_csv_rows
+from storage.index_manager import TTL_INDEX_COLLECTIONS, TTL_INDEX_FIELD
 from storage.storagemanager import StorageManager
 from tracing import get_tracer
 from werkzeug.exceptions import BadRequest
@@ -39,7 +42,7 @@ tracer = get_tracer()
 
 
 class BaseResource(Resource):
-    known_collections = []
+    known_collections = BoundedCache("known_collections", ttl=300)
     schemas_by_type = {
         "entity": entity_schema,
         "key_value_store": key_value_store_schema,
@@ -151,7 +154,7 @@ class BaseResource(Resource):
                 400,
                 message=f"{get_error_code(ErrorCode.COLLECTION_NOT_FOUND, get_read())} | collection:{collection} - Collection {collection} does not exist.",
             )
-        self.known_collections.append(collection)
+        self.known_collections.add(collection)
 
     def _check_if_collection_and_item_exists(
         self, collection, id, item=None, is_validating_content=False
@@ -194,19 +197,8 @@ class BaseResource(Resource):
                     message=f"{get_error_code(ErrorCode.ITEM_NOT_FOUND, get_read())} | id:{id} - Item with id {id} does not exist.",
                 )
 
-    def _count_children_from_mediafile(self, parent_mediafile, count=0):
-        relations = self.storage.get_collection_item_relations(
-            "mediafiles", parent_mediafile["_id"]
-        )
-        for relation in relations:
-            if relation.get("type") == "hasChild":
-                child_mediafile = self.storage.get_item_from_collection_by_id(
-                    "mediafiles", relation["key"]
-                )
-                if child_mediafile:
-                    count += 1
-                    return self._count_children_from_mediafile(child_mediafile, count)
-        return count
+    def _count_children_from_mediafile(self, parent_mediafile):
+        return len(self._get_children_from_mediafile(parent_mediafile))
 
     def _create_linked_data(self, request, content_type):
         content = request.get_data(as_text=True)
@@ -306,23 +298,18 @@ class BaseResource(Resource):
                     abort(400, message=str(ex))
 
     def _create_ticket(self, filename, mediafile_id=None, exp=None, **kwargs):
+        expires_at = datetime.now(tz=UTC) + timedelta(
+            seconds=int(getenv("TICKET_LIFESPAN", 3600))
+            + int(getenv("TICKET_CLEANUP", 86400))
+        )
         ticket = {
             "bucket": self._get_upload_bucket(),
             "location": self._get_upload_location(filename),
             "type": "ticket",
-            "metadata": [
-                {
-                    "key": "ttl",
-                    "value": (
-                        datetime.now(tz=UTC)
-                        + timedelta(
-                            seconds=int(getenv("TICKET_LIFESPAN", 3600))
-                            + int(getenv("TICKET_CLEANUP", 86400))
-                        )
-                    ).timestamp(),
-                }
-            ],
+            "metadata": [{"key": "ttl", "value": expires_at.timestamp()}],
         }
+        if "abstracts" in TTL_INDEX_COLLECTIONS:
+            ticket[TTL_INDEX_FIELD] = expires_at
         try:
             user_context = get_user_context()
             ticket["user"] = user_context.email if user_context else "default_uploader"
@@ -371,23 +358,10 @@ class BaseResource(Resource):
                 "entities", f"tenant:{entity['_id']}"
             )
 
-    def _get_children_from_mediafile(self, parent_mediafile, linked_mediafiles=None):
-        if not linked_mediafiles:
-            linked_mediafiles = []
-        relations = self.storage.get_collection_item_relations(
-            "mediafiles", parent_mediafile["_id"]
+    def _get_children_from_mediafile(self, parent_mediafile):
+        return self.storage.traverse_collection_item_relations(
+            "mediafiles", parent_mediafile["_id"], "hasChild"
         )
-        for relation in relations:
-            if relation.get("type") == "hasChild":
-                child_mediafile = self.storage.get_item_from_collection_by_id(
-                    "mediafiles", relation["key"]
-                )
-                if child_mediafile:
-                    linked_mediafiles.append(child_mediafile)
-                    return self._get_children_from_mediafile(
-                        child_mediafile, linked_mediafiles
-                    )
-        return linked_mediafiles
 
     # this method will slowly transform into a simple unified method
     def _get_content_according_content_type(
@@ -513,16 +487,10 @@ class BaseResource(Resource):
         return items
 
     def get_parent_mediafile(self, mediafile, parent_mediafile=None):
-        relations = self.storage.get_collection_item_relations(
-            "mediafiles", mediafile["_id"]
-        )
-        for relation in relations:
-            if relation.get("type") == "belongsToParent":
-                parent_mediafile = self.storage.get_item_from_collection_by_id(
-                    "mediafiles", relation["key"]
-                )
-                if parent_mediafile:
-                    return self.get_parent_mediafile(parent_mediafile, parent_mediafile)
+        if parents := self.storage.traverse_collection_item_relations(
+            "mediafiles", mediafile["_id"], "belongsToParent"
+        ):
+            return parents[-1]
         return parent_mediafile
 
     def _get_tenant_label(self, item):
@@ -564,10 +532,7 @@ class BaseResource(Resource):
         return objects
 
     def update_object_values_from_csv(self, csv_data, collection="entities"):
-        csv_file = io.StringIO(csv_data)
-        csv_dialect = csv.Sniffer().sniff(csv_file.read())
-        csv_file.seek(0)
-        reader = csv.reader(csv_file, dialect=csv_dialect)
+        reader = iter_csv_rows(csv_data)
         header = next(reader)
 
         items, updated_values = self.process_csv_rows(reader, header, collection)
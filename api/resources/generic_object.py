@@ -292,19 +292,52 @@ class GenericObjectV2(BaseFilterResource, BaseResource):
     ):
         if request.args.get("soft", 0, int):
             return "good", 200
-        accept_header = request.headers.get("Accept")
+        item = self.__create_item(collection, content, spec)
+        try:
+            item = self.storage.save_item_to_collection_v2(collection, item)
+        except NonUniqueException as ex:
+            return ex.args[0], 409
+        signal_entity_changed(get_rabbit(), item)
+        return self.__create_post_response(item, spec)
+
+    @apply_policies(RequestContext(request))
+    @validate("post", request)
+    def prepare_post(
+        self,
+        collection,
+        content=None,
+        spec="elody",
+    ):
+        """Authorize, validate and create the item post would save, without
+        saving it. Prepared items are saved together by post_prepared."""
+        return self.__create_item(collection, content, spec)
+
+    def post_prepared(self, items, spec="elody"):
+        """Save items returned by prepare_post in bulk.
+
+        Returns a list aligned with items holding the response post would
+        have given for every saved item, or the exception it failed with.
+        """
+        responses = []
+        for item in self.storage.save_items_to_collection_v2(None, items):
+            if isinstance(item, Exception):
+                responses.append(item)
+                continue
+            signal_entity_changed(get_rabbit(), item)
+            responses.append(self.__create_post_response(item, spec))
+        return responses
+
+    def __create_item(self, collection, content, spec):
         content = self._get_content_according_content_type(
             request, collection, content, {}, spec, True
         )
         create = (
             get_object_configuration_mapper().get(content["type"]).crud()["creator"]
         )
-        item = create(content)
-        try:
-            item = self.storage.save_item_to_collection_v2(collection, item)
-        except NonUniqueException as ex:
-            return ex.args[0], 409
-        signal_entity_changed(get_rabbit(), item)
+        return create(content)
+
+    def __create_post_response(self, item, spec):
+        accept_header = request.headers.get("Accept")
         return self._create_response_according_accept_header(
             mappers.map_data_according_to_accept_header(
                 item,
@@ -1,9 +1,15 @@
+from itertools import chain
+from urllib.parse import urlencode
+
 from elody.error_codes import ErrorCode, get_error_code, get_read
-from flask import request
+from elody.util import custom_json_dumps
+from filters_v2.stages.cursor_stage import InvalidCursor
+from flask import Response, request, stream_with_context
 from flask_restful import abort
 from inuits_policy_based_auth import RequestContext
 from policy_factory import apply_policies
 from resources.base_resource import BaseResource
+from storage.history_store import HISTORY_PAGE_MAX_LIMIT, project_history_entry
 
 
 class History(BaseResource):
@@ -11,17 +17,99 @@ class History(BaseResource):
     def get(self, collection, id):
         timestamp = request.args.get("timestamp")
         all_entries = request.args.get("all", 0, int)
-        if timestamp and all_entries:
+        cursor = request.args.get("cursor")
+        limit = request.args.get("limit", None, int)
+        fields = [*request.args.getlist("field"), *request.args.getlist("field[]")]
+        skip_relations = request.args.get("skip_relations", 0, int)
+        is_ndjson = request.accept_mimetypes.best == "application/x-ndjson"
+        if timestamp and (
+            all_entries or cursor is not None or limit is not None or is_ndjson
+        ):
+            abort(
+                400,
+                message=f"{get_error_code(ErrorCode.CANNOT_SPECIFY_BOTH, get_read())} - Can't specify 'timestamp' with 'all', 'cursor', 'limit' or an NDJSON response",
+            )
+        if limit is not None and limit < 1:
             abort(
                 400,
-                message=f"{get_error_code(ErrorCode.CANNOT_SPECIFY_BOTH, get_read())} - Can't specify both 'timestamp' and 'all'",
+                message=f"{get_error_code(ErrorCode.INVALID_VALUE, get_read())} - 'limit' must be at least 1",
+            )
+        if is_ndjson:
+            return self.__stream_history(collection, id, cursor, fields, skip_relations)
+        if cursor is not None or limit is not None:
+            return self.__get_history_page(
+                collection,
+                id,
+                cursor,
+                min(limit or 20, HISTORY_PAGE_MAX_LIMIT),
+                fields,
+                skip_relations,
             )
         history_object = self.storage.get_history_for_item(
             collection, id, timestamp, all_entries
         )
         if not history_object:
-            abort(
-                404,
-                message=f"{get_error_code(ErrorCode.HISTORY_ITEM_NOT_FOUND, get_read())} - Could not find history object",
+            self.__abort_history_not_found()
+        if isinstance(history_object, list):
+            return [
+                project_history_entry(entry, fields, skip_relations=skip_relations)
+                for entry in history_object
+            ]
+        return project_history_entry(
+            history_object, fields, skip_relations=skip_relations
+        )
+
+    def __abort_history_not_found(self):
+        abort(
+            404,
+            message=f"{get_error_code(ErrorCode.HISTORY_ITEM_NOT_FOUND, get_read())} - Could not find history object",
+        )
+
+    def __get_history_page(self, collection, id, cursor, limit, fields, skip_relations):
+        try:
+            page = self.storage.get_history_page_for_item(
+                collection, id, cursor=cursor or None, limit=limit
             )
-        return history_object
+        except InvalidCursor as error:
+            abort(400, message=str(error))
+        if not page or (not page["results"] and not cursor):
+            self.__abort_history_not_found()
+        page["results"] = [
+            project_history_entry(entry, fields, skip_relations=skip_relations)
+            for entry in page["results"]
+        ]
+        page["limit"] = limit
+        if next_cursor := page["next_cursor"]:
+            parameters = {"cursor": next_cursor, "limit": limit}
+            if fields:
+                parameters["field"] = fields
+            if skip_relations:
+                parameters["skip_relations"] = 1
+            page["next"] = (
+                f"/history/{collection}/{id}?{urlencode(parameters, doseq=True)}"
+            )
+        return page
+
+    def __stream_history(self, collection, id, cursor, fields, skip_relations):
+        """Stream the history as one json entry per line, newest first, as it
+        is read from the database."""
+        entries = self.storage.iter_history_for_item(
+            collection, id, cursor=cursor or None
+        )
+        try:
+            first_entry = next(entries, None) if entries is not None else None
+        except InvalidCursor as error:
+            abort(400, message=str(error))
+        if not first_entry:
+            self.__abort_history_not_found()
+
+        def generate():
+            for entry in chain([first_entry], entries):
+                projected = project_history_entry(
+                    entry, fields, skip_relations=skip_relations
+                )
+                yield f"{custom_json_dumps(projected)}\n"
+
+        return Response(
+            stream_with_context(generate()), mimetype="application/x-ndjson"
+        )
@@ -296,10 +296,9 @@ class MediafileDerivatives(GenericObjectDetail):
     def get(self, id):
         parent_mediafile = super().get("mediafiles", id)
         mediafiles = dict()
-        mediafiles["count"] = self._count_children_from_mediafile(parent_mediafile)
-        mediafiles["results"] = self._inject_api_urls_into_mediafiles(
-            self._get_children_from_mediafile(parent_mediafile)
-        )
+        children = self._get_children_from_mediafile(parent_mediafile)
+        mediafiles["count"] = len(children)
+        mediafiles["results"] = self._inject_api_urls_into_mediafiles(children)
 
         @after_this_request
         def add_header(response):
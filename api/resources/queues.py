@@ -1,6 +1,6 @@
 from datetime import UTC, datetime
-from os import getenv
-from time import sleep
+from os import getenv, getpid
+from socket import gethostname
 
 from configuration import get_object_configuration_mapper
 from elody.job import handle_parent_job_finished
@@ -11,28 +11,48 @@ from elody.util import (
     get_raw_id,
     mediafile_is_public,
 )
+from filters_v2.result_cache import FILTER_RESULT_CACHE_BACKEND, get_filter_result_cache
 from logging_elody.log import log
 from rabbit import get_rabbit
+from resources.base.job_state import (
+    JOB_DEFERRED_ROUTING_KEY,
+    JOB_QUEUE_SHARDS,
+    defer_job_message,
+    get_job_message_id,
+    get_job_shard_routing_key,
+)
+from storage.identity_map import with_identity_map
 from storage.storagemanager import StorageManager
 
 queue_prefix = getenv("QUEUE_PREFIX", "dams")
 queue_type = getenv("QUEUE_TYPE")
 routing_key_prefix = getenv("ROUTING_KEY_PREFIX", "dams")
+typesense_index_batch_size = int(getenv("TYPESENSE_INDEX_BATCH_SIZE") or 100)
 
 
 def __argument_wrapper(
-    *, queue_name, routing_key, single_active_consumer=False, full_message_object=False
+    *,
+    queue_name,
+    routing_key,
+    single_active_consumer=False,
+    full_message_object=False,
+    expires=None,
+    prefetch_count=None,
 ):
     arguments = {"routing_key": routing_key}
     if getenv("AMQP_MANAGER", "amqpstorm_flask") == "amqpstorm_flask":
         arguments["queue_name"] = queue_name
         if full_message_object:
             arguments["full_message_object"] = full_message_object
+        if prefetch_count:
+            arguments["prefetch_count"] = prefetch_count
         queue_arguments = {}
         if queue_type:
             queue_arguments.update({"x-queue-type": queue_type})
         if single_active_consumer:
             queue_arguments.update({"x-single-active-consumer": True})
+        if expires:
+            queue_arguments.update({"x-expires": expires})
         if queue_arguments:
             arguments["queue_arguments"] = queue_arguments
     return arguments
@@ -45,12 +65,23 @@ def __is_malformed_message(data, fields):
     return False
 
 
+def __get_items_by_id(storage, collection, ids):
+    items = dict()
+    if not ids:
+        return items
+    for item in storage.get_items_from_collection_by_ids(ids, collection):
+        for id in [item.get("_id"), item.get("_key"), *item.get("identifiers", [])]:
+            items.setdefault(id, item)
+    return items
+
+
 @get_rabbit().queue(
     **__argument_wrapper(
         queue_name=f"{queue_prefix}-update_parent_relation_values",
         routing_key=f"{routing_key_prefix}.child_relation_changed",
     ),
 )
+@with_identity_map
 def update_parent_relation_values(routing_key, body, message_id):
     data = body["data"]
     if __is_malformed_message(data, ["collection", "parent_id"]):
@@ -67,6 +98,7 @@ def update_parent_relation_values(routing_key, body, message_id):
         routing_key=f"{routing_key_prefix}.entity_changed",
     ),
 )
+@with_identity_map
 def add_entity_to_history(routing_key, body, message_id):
     data = body["data"]
     entity_id = data["location"].removeprefix("/entities/")
@@ -80,6 +112,7 @@ def add_entity_to_history(routing_key, body, message_id):
         routing_key=f"{routing_key_prefix}.mediafile_changed",
     ),
 )
+@with_identity_map
 def add_mediafile_to_history(routing_key, body, message_id):
     data = body["data"]
     mediafile_id = get_raw_id(data.get("mediafile"))
@@ -123,9 +156,9 @@ def add_item_to_history(
             item["date_updated"] = item_date_updated
             item["date_created"] = item_date_created
             content["entity"] = item
-            storage.save_item_to_collection("history", content)
+            storage.add_item_to_history(content)
     else:
-        storage.save_item_to_collection("history", content)
+        storage.add_item_to_history(content)
 
 
 @get_rabbit().queue(
@@ -134,6 +167,7 @@ def add_item_to_history(
         routing_key=f"{routing_key_prefix}.file_scanned",
     ),
 )
+@with_identity_map
 def add_scan_info_to_mediafile(routing_key, body, message_id):
     data = body["data"]
     if __is_malformed_message(data, ["clamav_version", "infected", "mediafile_id"]):
@@ -165,12 +199,43 @@ def add_scan_info_to_mediafile(routing_key, body, message_id):
         routing_key=[
             f"{routing_key_prefix}.job_changed",
             f"{routing_key_prefix}.job_created",
+            JOB_DEFERRED_ROUTING_KEY,
         ],
         single_active_consumer=True,
     ),
 )
+@with_identity_map
 def handle_job_change(routing_key, body, message_id):
-    if not body["data"].get("patch"):
+    if JOB_QUEUE_SHARDS:
+        get_rabbit().send(
+            body, routing_key=get_job_shard_routing_key(get_job_message_id(body))
+        )
+    else:
+        __handle_job_message(routing_key, body, message_id)
+
+
+def __register_job_shard(shard):
+    def handle_job_change_shard(routing_key, body, message_id):
+        __handle_job_message(routing_key, body, message_id)
+
+    handle_job_change_shard.__name__ = f"handle_job_change_{shard}"
+    get_rabbit().queue(
+        **__argument_wrapper(
+            queue_name=f"{queue_prefix}-update_job-{shard}",
+            routing_key=f"{routing_key_prefix}.job_state.{shard}",
+            single_active_consumer=True,
+        ),
+    )(with_identity_map(handle_job_change_shard))
+
+
+for shard in range(JOB_QUEUE_SHARDS):
+    __register_job_shard(shard)
+
+
+def __handle_job_message(routing_key, body, message_id):
+    if body.get("deferred") == "parent_job":
+        update_deferred_parent_job(routing_key, body, message_id)
+    elif not body["data"].get("patch"):
         create_job(routing_key, body, message_id)
     else:
         update_job(routing_key, body, message_id)
@@ -186,9 +251,7 @@ def update_job(routing_key, body, message_id):
             storage = StorageManager().get_db_engine()
             document = storage.get_item_from_collection_by_id(collection, job_id)
             if not document:
-                sleep(5)
-                document = storage.get_item_from_collection_by_id(collection, job_id)
-            if not document:
+                defer_job_message(body)
                 return
             current_status = get_item_metadata_value(document, "status")
             new_status = get_item_metadata_value(body["data"]["patch"], "status")
@@ -218,29 +281,66 @@ def update_job(routing_key, body, message_id):
         )
 
 
+def update_deferred_parent_job(routing_key, body, message_id):
+    try:
+        _update_parent_job(**body["data"], attempt=body.get("attempt", 0))
+    except Exception as exception:  # noqa: BLE001
+        log.exception(
+            f"{exception.__class__.__name__}: {exception}",
+            info_labels={"mq_message": body},
+            exc_info=exception,
+        )
+
+
 def _handle_status_update(job_id, collection, current_status, new_status):
     if current_status == new_status:
         return
 
-    storage = StorageManager().get_db_engine()
-    parent_job = storage.get_item_from_collection_by_id(collection, job_id)
-    if not parent_job:
-        sleep(5)
-        parent_job = storage.get_item_from_collection_by_id(collection, job_id)
-    if not parent_job:
-        return
-    if not get_item_metadata_value(parent_job, "child_jobs"):
-        return
+    _update_parent_job(
+        job_id,
+        collection,
+        {current_status: -1, new_status: 1},
+        new_status,
+    )
 
+
+def _update_parent_job(
+    parent_job_id,
+    collection,
+    increment_fields,
+    new_status=None,
+    attempt=0,
+):
+    """
+    Add increment_fields to the child_jobs counters of the parent job in one
+    round-trip and, for a status change, finish the parent once all of its
+    children are done. A parent that does not exist yet is retried later
+    through the delay queue.
+    """
+    storage = StorageManager().get_db_engine()
     parent_job = storage.increment_metadata_values(
-        id=job_id,
+        id=parent_job_id,
         collection=collection,
         metadata_key="child_jobs",
-        increment_fields={
-            current_status: -1,
-            new_status: 1,
-        },
+        increment_fields=increment_fields,
     )
+    if not parent_job:
+        if not storage.get_item_from_collection_by_id(collection, parent_job_id):
+            defer_job_message(
+                {
+                    "data": {
+                        "parent_job_id": parent_job_id,
+                        "collection": collection,
+                        "increment_fields": increment_fields,
+                        "new_status": new_status,
+                    },
+                    "deferred": "parent_job",
+                    "attempt": attempt,
+                }
+            )
+        return
+    if not new_status:
+        return
 
     parent_status = next(
         metadata_entry.get("value", None)
@@ -250,9 +350,9 @@ def _handle_status_update(job_id, collection, current_status, new_status):
 
     finished, parent_child_status_value = _check_parent_children_status(parent_job)
     if finished:
-        log.info(f"Finishing Parent Job: {job_id}")
+        log.info(f"Finishing Parent Job: {parent_job_id}")
         handle_parent_job_finished(
-            job_id,
+            parent_job_id,
             parent_child_status_value,
             get_rabbit=get_rabbit,
         )
@@ -261,7 +361,7 @@ def _handle_status_update(job_id, collection, current_status, new_status):
         Status.WARNING,
         Status.FAILED,
     ):
-        _handle_parent_wrong_status(job_id, collection)
+        _handle_parent_wrong_status(parent_job_id, collection)
 
 
 def _check_parent_children_status(document) -> tuple[bool, dict[str, str]]:
@@ -312,28 +412,12 @@ def _handle_parent_wrong_status(parent_job_id, collection):
 
 
 def _attach_child(parent_job_id, collection):
-    storage = StorageManager().get_db_engine()
     config = get_object_configuration_mapper().get("job")
-    collection = config.crud()["collection"]
-    parent_job = storage.get_item_from_collection_by_id(
-        collection=collection,
-        id=parent_job_id,
+    _update_parent_job(
+        parent_job_id,
+        config.crud()["collection"],
+        {"initiated": 1, "queued": 1},
     )
-    if not parent_job:
-        sleep(5)
-        parent_job = storage.get_item_from_collection_by_id(
-            collection=collection,
-            id=parent_job_id,
-        )
-    if not parent_job:
-        return
-    if parent_job and get_item_metadata_value(parent_job, "child_jobs"):
-        parent_job = storage.increment_metadata_values(
-            parent_job_id,
-            collection,
-            "child_jobs",
-            {"initiated": 1, "queued": 1},
-        )
 
 
 def create_job(routing_key, body, message_id):
@@ -362,6 +446,7 @@ def create_job(routing_key, body, message_id):
         routing_key=f"{routing_key_prefix}.mediafile_changed",
     ),
 )
+@with_identity_map
 def handle_mediafile_status_change(routing_key, body, message_id):
     data = body["data"]
     if __is_malformed_message(data, ["mediafile", "old_mediafile"]):
@@ -389,6 +474,7 @@ def handle_mediafile_status_change(routing_key, body, message_id):
         routing_key=f"{routing_key_prefix}.mediafiles_added_for_entity",
     ),
 )
+@with_identity_map
 def handle_mediafiles_added_for_entity(routing_key, body, message_id):
     data = body["data"]
     mediafiles = data["mediafiles"]
@@ -463,6 +549,7 @@ def create_ocr_body(mediafiles_data, relation):
         routing_key=f"{routing_key_prefix}.mediafile_deleted",
     ),
 )
+@with_identity_map
 def handle_mediafile_deleted(routing_key, body, message_id):  # noqa: PLR0912
     data = body["data"]
     deleted_mediafile = data["mediafile"]
@@ -470,59 +557,56 @@ def handle_mediafile_deleted(routing_key, body, message_id):  # noqa: PLR0912
         return
     storage = StorageManager().get_db_engine()
     ocr_keys = []
-    for relation in deleted_mediafile.get("relations", []):
-        if relation.get("is_ocr"):
-            mediafile_id = relation.get("key")
-            mediafile = storage.get_item_from_collection_by_id(
-                "mediafiles",
-                mediafile_id,
-            )
-
-            if mediafile and mediafile.get("technical_origin") != "original":
-                ocr_keys.append(mediafile_id)
-                storage.delete_item_from_collection("mediafiles", mediafile_id)
-
-    for relation in deleted_mediafile.get("relations", []):
-        if relation.get("type") == "belongsTo" and "is_ocr" not in relation:
-            entity = storage.get_item_from_collection_by_id(
-                "entities",
-                relation.get("key"),
-            )
-            if entity:
-                entity_relations = entity.get("relations", [])
-                if pdf_relation := has_ocr_operation(entity_relations, "pdf"):
+    ocr_mediafile_ids = [
+        relation.get("key")
+        for relation in deleted_mediafile.get("relations", [])
+        if relation.get("is_ocr")
+    ]
+    ocr_mediafiles = __get_items_by_id(storage, "mediafiles", ocr_mediafile_ids)
+    for mediafile_id in ocr_mediafile_ids:
+        mediafile = ocr_mediafiles.get(mediafile_id)
+        if mediafile and mediafile.get("technical_origin") != "original":
+            ocr_keys.append(mediafile_id)
+            storage.delete_item_from_collection("mediafiles", mediafile_id)
+
+    entity_ids = [
+        relation.get("key")
+        for relation in deleted_mediafile.get("relations", [])
+        if relation.get("type") == "belongsTo" and "is_ocr" not in relation
+    ]
+    entities = __get_items_by_id(storage, "entities", entity_ids)
+    for entity_id in entity_ids:
+        if entity := entities.get(entity_id):
+            entity_relations = entity.get("relations", [])
+            if pdf_relation := has_ocr_operation(entity_relations, "pdf"):
+                storage.delete_collection_item_relations(
+                    "entities",
+                    get_raw_id(entity),
+                    [pdf_relation],
+                )
+                storage.delete_item_from_collection(
+                    "mediafiles",
+                    pdf_relation.get("key"),
+                )
+                entity_mediafiles_ids = []
+                for relation in entity_relations:
+                    if (
+                        relation.get("type") == "hasMediafile"
+                        and relation.get("label") == "hasMediafile"
+                    ):
+                        entity_mediafiles_ids.append(relation.get("key"))
+                if len(entity_mediafiles_ids) > 0:
+                    mediafile_image_data = storage.get_items_from_collection_by_ids(
+                        entity_mediafiles_ids, "mediafiles"
+                    )
+                    process_ocr(mediafile_image_data, pdf_relation)
+            for entity_relation in entity_relations:
+                if entity_relation.get("key") in ocr_keys:
                     storage.delete_collection_item_relations(
                         "entities",
                         get_raw_id(entity),
-                        [pdf_relation],
-                    )
-                    storage.delete_item_from_collection(
-                        "mediafiles",
-                        pdf_relation.get("key"),
+                        [entity_relation],
                     )
-                    entity_mediafiles_ids = []
-                    for relation in entity_relations:  # noqa: PLW2901
-                        if (
-                            relation.get("type") == "hasMediafile"
-                            and relation.get("label") == "hasMediafile"
-                        ):
-                            entity_mediafiles_ids.append(relation.get("key"))
-                    if len(entity_mediafiles_ids) > 0:
-                        mediafile_image_data = []
-                        for mediafile_id in entity_mediafiles_ids:
-                            mediafile = storage.get_item_from_collection_by_id(
-                                "mediafiles",
-                                mediafile_id,
-                            )
-                            mediafile_image_data.append(mediafile)
-                        process_ocr(mediafile_image_data, pdf_relation)
-                for entity_relation in entity_relations:
-                    if entity_relation.get("key") in ocr_keys:
-                        storage.delete_collection_item_relations(
-                            "entities",
-                            get_raw_id(entity),
-                            [entity_relation],
-                        )
     if "entity_id" in data["linked_entities"]:
         storage.handle_mediafile_deleted(data["linked_entities"])
         storage.reindex_mediafile_parents(parents=data["linked_entities"])
@@ -533,9 +617,13 @@ def handle_mediafile_deleted(routing_key, body, message_id):  # noqa: PLR0912
         queue_name=f"{queue_prefix}-sync_entity_to_typesense",
         routing_key=f"{routing_key_prefix}.entity_changed",
         full_message_object=True,
+        # The indexer acks a message only once its batch is flushed, so the
+        # broker has to deliver a full batch before the first ack.
+        prefetch_count=typesense_index_batch_size,
     ),
     auto_ack=False,
 )
+@with_identity_map
 def sync_entity_to_typesense(message):
     if getenv("AMQP_MANAGER", "amqpstorm_flask") != "amqpstorm_flask":
         return
@@ -544,12 +632,9 @@ def sync_entity_to_typesense(message):
     # re-queues the message instead of losing it (which auto-ack does), and an
     # indexing failure is retried once before being dropped to the reconcile job
     # as a last resort -- so a transient hiccup no longer silently drops an
-    # entity from the search index.
-    from search.typesense_client import (  # noqa: PLC0415
-        get_collection_field_types,
-        prepare_document_for_typesense,
-        upsert_document,
-    )
+    # entity from the search index. Indexing itself happens in micro-batches,
+    # the indexer settles the message once its document has been imported.
+    from search.typesense_indexer import get_typesense_indexer  # noqa: PLC0415
 
     entity_id = None
     try:
@@ -568,24 +653,7 @@ def sync_entity_to_typesense(message):
             return
 
         collection = config.crud().get("collection", "entities")
-        storage = StorageManager().get_db_engine()
-        entity = storage.get_item_from_collection_by_id(collection, entity_id)
-        if not entity:
-            message.ack()
-            return
-
-        ts_collection = ts_config.get("collection", "entities")
-        doc = prepare_document_for_typesense(
-            entity,
-            ts_config.get("search_fields", []),
-            facet_fields=ts_config.get("facet_fields", []),
-            field_types=get_collection_field_types(ts_collection),
-        )
-        if not upsert_document(ts_collection, doc):
-            raise RuntimeError(
-                f"Typesense upsert failed for collection '{ts_collection}'"
-            )
-        message.ack()
+        get_typesense_indexer().submit(message, collection, entity_id, ts_config)
     except Exception as exception:
         log.error(
             f"Failed to sync entity {entity_id} to Typesense: "
@@ -607,6 +675,7 @@ def sync_entity_to_typesense(message):
     ),
     auto_ack=False,
 )
+@with_identity_map
 def delete_entity_from_typesense(message):
     if getenv("AMQP_MANAGER", "amqpstorm_flask") != "amqpstorm_flask":
         return
@@ -646,3 +715,30 @@ def delete_entity_from_typesense(message):
             message.reject(requeue=False)
         else:
             message.nack(requeue=True)
+
+
+if FILTER_RESULT_CACHE_BACKEND:
+    # An in-process cache needs every process to see every event, so each one
+    # consumes its own queue, removed by the broker once the process is gone.
+    # The shared backend is invalidated once, by whichever instance gets it.
+    cache_queue_suffix = (
+        "" if FILTER_RESULT_CACHE_BACKEND == "mongo" else f"-{gethostname()}-{getpid()}"
+    )
+
+    @get_rabbit().queue(
+        **__argument_wrapper(
+            queue_name=f"{queue_prefix}-invalidate_filter_result_cache{cache_queue_suffix}",
+            routing_key=[
+                f"{routing_key_prefix}.entity_changed",
+                f"{routing_key_prefix}.entity_deleted",
+            ],
+            expires=600000 if cache_queue_suffix else None,
+        ),
+    )
+    def invalidate_filter_result_cache(routing_key, body, message_id):
+        data = body["data"]
+        if __is_malformed_message(data, ["type"]):
+            return
+        config = get_object_configuration_mapper().get(data["type"] or "entities")
+        collection = config.crud().get("collection", "entities")
+        get_filter_result_cache().invalidate(collection, data["type"])
@@ -0,0 +1,116 @@
+"""Count the distinct AQL query strings a filter workload sends to Arango.
+
+The workload is built from the entity filters in filters_new.json: every
+request filters on a type and one or two of those filters, with values drawn
+from a small vocabulary, and asks for one of the first pages of the listing.
+
+Before bind parameters, filter values and paging were written into the AQL
+text, so Arango saw a new query string, to parse and optimize again, for every
+distinct combination of template and values. Now only the template is sent as
+text and the values travel as bind parameters.
+
+Needs no database; the object configurations are loaded the way the API does.
+Run from the api/ directory:
+
+    python -m scripts.benchmark_arango_query_strings
+    python -m scripts.benchmark_arango_query_strings --requests 20000 --seed 7
+"""
+
+import argparse
+import json
+import random
+
+from configuration import init_mappers
+from filters_v2.arango_wrapper import ArangoWrapper
+from filters_v2.mongo_filters import MongoFilters
+
+VOCABULARY_SIZE = 200
+PAGES = 25
+PAGE_SIZE = 20
+
+
+def load_filters(path):
+    with open(path) as file:
+        filters = json.load(file)["entityFilters"]
+    return [
+        filter
+        for filter in filters
+        if filter["type"] in ["id", "text", "selection", "boolean"]
+    ]
+
+
+def build_filter(filter, rng):
+    value = f"{filter['key']}-{rng.randrange(VOCABULARY_SIZE)}"
+    match filter["type"]:
+        case "id":
+            return {
+                "type": "selection",
+                "key": "identifiers",
+                "value": [value],
+                "match_exact": True,
+            }
+        case "selection":
+            return {
+                "type": "selection",
+                "key": filter["key"],
+                "value": [value],
+                "match_exact": True,
+            }
+        case "boolean":
+            return {
+                "type": "boolean",
+                "key": filter["key"],
+                "value": rng.random() < 0.5,
+            }
+        case _:
+            return {
+                "type": "text",
+                "key": filter["key"],
+                "value": value,
+                "match_exact": rng.random() < 0.5,
+            }
+
+
+def build_workload(filters, requests, rng):
+    for _ in range(requests):
+        body = [{"type": "type", "value": "asset"}]
+        body += [
+            build_filter(filter, rng)
+            for filter in rng.sample(filters, rng.randint(1, 2))
+        ]
+        yield body, rng.randrange(PAGES) * PAGE_SIZE
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--filters", default="filters_new.json")
+    args = parser.parse_args(argv)
+
+    init_mappers()
+    mongo_filters = MongoFilters.__new__(MongoFilters)
+    mongo_filters.storage = None
+    arango_wrapper = ArangoWrapper.__new__(ArangoWrapper)
+    rng = random.Random(args.seed)
+
+    templates, literal_queries = set(), set()
+    for body, skip in build_workload(load_filters(args.filters), args.requests, rng):
+        pipeline = mongo_filters.filter(
+            body, skip, PAGE_SIZE, "entities", None, True, True, False
+        )
+        aql, bind_vars = arango_wrapper._ArangoWrapper__generate_query(
+            "entities", pipeline, None
+        )
+        templates.add(aql)
+        literal_queries.add((aql, json.dumps(bind_vars, sort_keys=True)))
+
+    print(f"requests:                 {args.requests}")
+    print(f"query strings before:     {len(literal_queries)}")
+    print(f"query strings after:      {len(templates)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Measure the time match_stage.build takes per request, with and without plans.
+
+Every request of a listing is built with different identifiers, the way a
+dashboard or a paged relation listing varies its values but keeps its shape,
+so all but the first request of a shape are bound from the compiled plan.
+
+Needs no database; the object configurations are loaded the way the API does.
+Run from the api/ directory:
+
+    python -m scripts.benchmark_filter_plan_cache
+    python -m scripts.benchmark_filter_plan_cache --requests 20000
+"""
+
+import argparse
+from time import perf_counter
+
+from configuration import init_mappers
+from filters_v2.matchers.base_matchers import BaseMatchers
+from filters_v2.plan_cache import FilterPlanCache
+from filters_v2.stages import match_stage
+
+
+def build_request(index):
+    return [
+        {"type": "type", "value": "asset"},
+        {
+            "type": "selection",
+            "key": "identifiers",
+            "value": [f"asset-{index}", f"asset-{index + 1}"],
+            "match_exact": True,
+        },
+        {
+            "type": "text",
+            "key": "title",
+            "value": f"title {index}",
+            "match_exact": True,
+            "or": [
+                {
+                    "type": "text",
+                    "key": "name",
+                    "value": f"name {index}",
+                    "match_exact": True,
+                }
+            ],
+        },
+        {
+            "type": "selection",
+            "key": "relations.hasCollection.key",
+            "value": [f"collection-{index % 10}"],
+            "match_exact": True,
+            "lookup": {
+                "from": "entities",
+                "local_field": "relations.hasCollection.key",
+                "foreign_field": "_id",
+                "as": "collection",
+            },
+        },
+    ]
+
+
+def measure(requests, plan_cache):
+    original = match_stage.get_filter_plan_cache
+    match_stage.get_filter_plan_cache = lambda: plan_cache
+    try:
+        with BaseMatchers.context(collection="entities", type_name="asset"):
+            started = perf_counter()
+            for index in range(requests):
+                match_stage.build(build_request(index), True)
+            return (perf_counter() - started) / requests
+    finally:
+        match_stage.get_filter_plan_cache = original
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--requests", type=int, default=5000)
+    args = parser.parse_args(argv)
+
+    init_mappers()
+    compiled = measure(args.requests, None)
+    plan_cache = FilterPlanCache()
+    bound = measure(args.requests, plan_cache)
+    print(f"requests:       {args.requests}")
+    print(f"compiled:       {compiled * 1e6:8.1f} us/request")
+    print(f"plan cache:     {bound * 1e6:8.1f} us/request")
+    print(f"speedup:        {compiled / bound:8.1f}x")
+    print(f"plan cache use: {plan_cache.stats()}")
+
+
+if __name__ == "__main__":
+    main()
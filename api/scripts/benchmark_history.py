@@ -0,0 +1,152 @@
+"""Measure the storage size and point-in-time lookups of the history formats.
+
+Writes the same synthetic history, ``--items`` entities that change two
+metadata values in each of ``--versions`` versions, into two scratch
+collections: one with a full snapshot per entry, the way history has always
+been stored, and one with snapshots and diffs (HISTORY_DIFFS). Both get the
+history indexes. Then it reports their size and the time of ``--lookups``
+point-in-time reads on:
+
+- scan:      the previous aggregation, which computes the distance to the
+             timestamp of every entry of the item and sorts on it;
+- snapshots: an index seek on the full snapshots;
+- diffs:     an index seek plus replaying the diffs since the last snapshot.
+
+Needs the Mongo the API is configured for; the scratch collections are
+dropped afterwards. Run from the api/ directory:
+
+    python -m scripts.benchmark_history
+    python -m scripts.benchmark_history --items 50 --versions 500 --interval 50
+"""
+
+import argparse
+import random
+from datetime import UTC, datetime, timedelta
+from time import perf_counter
+
+
+def make_entity(index, keys):
+    return {
+        "_id": f"entity-{index}",
+        "identifiers": [f"entity-{index}"],
+        "type": "asset",
+        "metadata": [{"key": key, "value": f"{key} 0"} for key in keys],
+        "relations": [
+            {"key": f"mediafile-{index}-{i}", "type": "hasMediafile"} for i in range(10)
+        ],
+    }
+
+
+def write_history(history, items, versions, started):
+    keys = [f"field_{i}" for i in range(30)]
+    for index in range(items):
+        entity = make_entity(index, keys)
+        for version in range(versions):
+            for metadata in random.sample(entity["metadata"], 2):
+                metadata["value"] = f"{metadata['key']} {version}"
+            history.add(
+                {
+                    "_id": f"history-{index}-{version}",
+                    "identifiers": [f"history-{index}-{version}"],
+                    "collection": "entities",
+                    "object": entity,
+                    "relations": entity["relations"],
+                    "timestamp": started + timedelta(minutes=version),
+                }
+            )
+
+
+def scan(db, collection, id, timestamp):
+    return next(
+        db[collection].aggregate(
+            [
+                {
+                    "$match": {
+                        "collection": "entities",
+                        "$or": [{"object._id": id}, {"object.identifiers": id}],
+                    }
+                },
+                {
+                    "$addFields": {
+                        "difference": {"$abs": {"$subtract": [timestamp, "$timestamp"]}}
+                    }
+                },
+                {"$sort": {"difference": 1}},
+                {"$limit": 1},
+            ]
+        )
+    )
+
+
+def measure(lookup, lookups, items, versions, started):
+    random.seed(0)
+    began = perf_counter()
+    for _ in range(lookups):
+        id = f"entity-{random.randrange(items)}"
+        timestamp = started + timedelta(minutes=random.uniform(0, versions))
+        lookup(id, timestamp)
+    return (perf_counter() - began) / lookups
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--items", type=int, default=20)
+    parser.add_argument("--versions", type=int, default=200)
+    parser.add_argument("--interval", type=int, default=20)
+    parser.add_argument("--lookups", type=int, default=500)
+    args = parser.parse_args(argv)
+
+    from storage.history_store import HistoryStore
+    from storage.index_manager import HISTORY_INDEXES
+    from storage.storagemanager import StorageManager
+
+    db = StorageManager().get_db_engine().db
+    started = datetime(2024, 1, 1, tzinfo=UTC)
+    collections = {
+        "snapshots": "history_benchmark_snapshots",
+        "diffs": "history_benchmark_diffs",
+    }
+    stores = {
+        name: HistoryStore(
+            db, collection, store_diffs=name == "diffs", interval=args.interval
+        )
+        for name, collection in collections.items()
+    }
+    try:
+        for name, collection in collections.items():
+            db[collection].drop()
+            for keys in HISTORY_INDEXES:
+                db[collection].create_index(keys)
+            random.seed(0)
+            write_history(stores[name], args.items, args.versions, started)
+
+        print(f"entries:   {args.items * args.versions}")
+        for name, collection in collections.items():
+            stats = db.command("collStats", collection)
+            print(
+                f"{name + ':':<10} {stats['size'] / 1024:10.1f} KiB data, "
+                f"{stats['storageSize'] / 1024:10.1f} KiB on disk"
+            )
+        timings = {
+            "scan": lambda id, timestamp: scan(
+                db, collections["snapshots"], id, timestamp
+            ),
+            "snapshots": lambda id, timestamp: stores["snapshots"].get_at(
+                "entities", id, timestamp
+            ),
+            "diffs": lambda id, timestamp: stores["diffs"].get_at(
+                "entities", id, timestamp
+            ),
+        }
+        for name, lookup in timings.items():
+            duration = measure(lookup, args.lookups, args.items, args.versions, started)
+            print(f"{name + ':':<10} {duration * 1e3:10.2f} ms/lookup")
+    finally:
+        for collection in collections.values():
+            db[collection].drop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""Measure the per-call overhead of log.info and of a disabled log.debug.
+
+"before" resolves the caller with inspect.stack, flattens the item for every
+call and pushes each record to Loki from the calling thread. "after" is the
+current Logger: caller from sys._getframe, nothing done for disabled levels and
+records handed to the background batch handler. Loki is simulated by a handler
+that sleeps --loki-latency-ms per push, so no Loki instance is needed.
+
+Run from the api/ directory:
+
+    python -m scripts.benchmark_logger
+    python -m scripts.benchmark_logger --calls 20000 --loki-latency-ms 2
+"""
+
+import argparse
+import inspect
+import logging
+from time import perf_counter, sleep
+
+from configuration import init_mappers
+from logging_elody.batch_handler import BackgroundBatchHandler
+from logging_elody.logger import Logger
+
+ITEM = {
+    "_id": "asset-1",
+    "type": "asset",
+    "identifiers": ["asset-1", "urn:asset-1"],
+    "metadata": [
+        {"key": "title", "value": "A title", "lang": "en"},
+        {"key": "description", "value": "A description " * 20, "lang": "en"},
+    ],
+    "relations": [{"key": f"mediafile-{i}", "type": "hasMediafile"} for i in range(20)],
+}
+
+
+class SimulatedLokiHandler(logging.Handler):
+    def __init__(self, latency):
+        super().__init__()
+        self.latency = latency
+        self.records = 0
+
+    def emit(self, record):
+        self.format(record)
+        self.records += 1
+        sleep(self.latency)
+
+    def emit_batch(self, records):
+        for record in records:
+            self.format(record)
+        self.records += len(records)
+        sleep(self.latency)
+
+
+class LegacyLogger(Logger):
+    """The Logger as it was: full stack inspection and no level check."""
+
+    def info(self, message, item=None, **kwargs):
+        self._log(
+            "info",
+            message,
+            item,
+            frame=inspect.stack()[1][0],
+            **kwargs,
+        )
+
+    def debug(self, message, item=None, **kwargs):
+        self._log(
+            "debug",
+            message,
+            item,
+            frame=inspect.stack()[1][0],
+            **kwargs,
+        )
+
+
+def measure(logger, calls, severity):
+    log = getattr(logger, severity)
+    started = perf_counter()
+    for _ in range(calls):
+        log("Successfully patched item", ITEM)
+    return (perf_counter() - started) / calls
+
+
+def install(logger, handler):
+    logger._logger.handlers.clear()
+    logger._logger.addHandler(handler)
+    logger._logger.propagate = False
+    logger._logger.setLevel(logging.INFO)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--loki-latency-ms", type=float, default=5)
+    args = parser.parse_args(argv)
+
+    init_mappers()
+    latency = args.loki_latency_ms / 1000
+
+    before = LegacyLogger()
+    install(before, SimulatedLokiHandler(latency))
+    before_info = measure(before, args.calls, "info")
+    before_debug = measure(before, args.calls, "debug")
+
+    after = Logger()
+    handler = BackgroundBatchHandler(SimulatedLokiHandler(latency), max_size=args.calls)
+    install(after, handler)
+    after_info = measure(after, args.calls, "info")
+    after_debug = measure(after, args.calls, "debug")
+    handler.flush()
+
+    print(f"calls:                 {args.calls}")
+    print(f"simulated Loki push:   {args.loki_latency_ms:8.1f} ms")
+    print(f"info before:           {before_info * 1e6:8.1f} us/call")
+    print(f"info after:            {after_info * 1e6:8.1f} us/call")
+    print(f"disabled debug before: {before_debug * 1e6:8.1f} us/call")
+    print(f"disabled debug after:  {after_debug * 1e6:8.1f} us/call")
+
+
+if __name__ == "__main__":
+    main()
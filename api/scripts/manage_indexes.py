@@ -0,0 +1,76 @@
+"""Plan, apply or review the Mongo indexes derived from the object configurations.
+
+``plan`` prints the indexes every configured collection needs, ``apply``
+creates the missing ones (idempotent, safe to rerun) and ``advise`` reports
+missing indexes, indexes without any use since the last server restart and
+queries that scan a whole collection. The scans are taken from the explain
+output of the pipelines in ``--pipelines`` (JSON lines of
+``{"collection": ..., "pipeline": [...]}``, e.g. as returned by a filter with
+``return_query_without_executing``) and from the database profiler, if it is
+enabled (``db.setProfilingLevel(1)``).
+
+Setting MONGODB_MANAGE_INDEXES=true applies the same indexes when the API
+starts.
+
+Run inside a collection-api container, from the api/ directory:
+
+    python -m scripts.manage_indexes plan
+    python -m scripts.manage_indexes apply
+    python -m scripts.manage_indexes advise [--pipelines pipelines.jsonl]
+"""
+
+import argparse
+import json
+import sys
+
+
+def load_pipelines(path):
+    if not path:
+        return []
+    with open(path) as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def format_keys(keys):
+    return ", ".join(f"{field}: {direction}" for field, direction in keys)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("command", choices=["plan", "apply", "advise"])
+    parser.add_argument("--pipelines", help="JSON lines file of pipelines to explain")
+    args = parser.parse_args(argv)
+
+    from configuration import init_mappers
+    from storage.index_manager import IndexManager
+    from storage.storagemanager import StorageManager
+
+    init_mappers()
+    manager = IndexManager(StorageManager().get_db_engine().db)
+    plan = manager.plan()
+
+    if args.command == "plan":
+        for collection, indexes in plan.items():
+            for keys in indexes:
+                print(f"{collection}: {{{format_keys(keys)}}}")
+    elif args.command == "apply":
+        report = manager.apply(plan)
+        for state in ["created", "existing", "failed"]:
+            for collection, keys in report[state]:
+                print(f"  [{state}] {collection}: {{{format_keys(keys)}}}")
+        if report["failed"]:
+            sys.exit(1)
+    else:
+        report = manager.advise(plan, load_pipelines(args.pipelines))
+        for collection, keys in report["missing"]:
+            print(f"  [missing] {collection}: {{{format_keys(keys)}}}")
+        for collection, name in report["unused"]:
+            print(f"  [unused]  {collection}: {name}")
+        for collection, query in report["collection_scans"]:
+            print(f"  [scan]    {collection}: {json.dumps(query, default=str)[:200]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Rewrite the existing history as snapshots and diffs.
+
+Every item's history is rewritten the way the API stores it with
+HISTORY_DIFFS=true: a full snapshot every HISTORY_SNAPSHOT_INTERVAL entries
+(``--interval``) with compact diffs in between. Timestamps that older versions
+stored as strings become dates, so point-in-time reads can seek them on the
+``(collection, object._id, timestamp)`` index. Entries keep their ``_id``, and
+an item that was migrated already is rewritten to the same entries, so the
+migration is safe to rerun.
+
+``--dry-run`` only reports the number of entries and their size before and
+after. Create the history indexes first (``python -m scripts.manage_indexes
+apply``), the migration reads every item's history on them.
+
+Run inside a collection-api container, from the api/ directory:
+
+    python -m scripts.migrate_history --dry-run
+    python -m scripts.migrate_history [--collection entities] [--interval 20]
+"""
+
+import argparse
+
+
+def format_size(size):
+    for unit in ["B", "KiB", "MiB", "GiB"]:
+        if size < 1024 or unit == "GiB":
+            return f"{size:.1f} {unit}"
+        size /= 1024
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--collection", help="only migrate the history of this one")
+    parser.add_argument("--interval", type=int, help="entries per snapshot")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args(argv)
+
+    from storage.history_store import HistoryStore
+    from storage.storagemanager import StorageManager
+
+    db = StorageManager().get_db_engine().db
+    history = HistoryStore(db, interval=args.interval)
+    pipeline = [
+        {"$match": {"object._id": {"$exists": True}}},
+        {"$group": {"_id": {"collection": "$collection", "id": "$object._id"}}},
+    ]
+    if args.collection:
+        pipeline[0]["$match"]["collection"] = args.collection
+
+    totals = {"items": 0, "entries": 0, "size_before": 0, "size_after": 0}
+    for group in db["history"].aggregate(pipeline, allowDiskUse=True):
+        report = history.compact(
+            group["_id"]["collection"], group["_id"]["id"], dry_run=args.dry_run
+        )
+        totals["items"] += 1
+        for key in ["entries", "size_before", "size_after"]:
+            totals[key] += report[key]
+        if totals["items"] % 1000 == 0:
+            print(f"  {totals['items']} items, {totals['entries']} entries")
+
+    print(f"items:   {totals['items']}")
+    print(f"entries: {totals['entries']}")
+    print(f"before:  {format_size(totals['size_before'])}")
+    print(f"after:   {format_size(totals['size_after'])}")
+    if args.dry_run:
+        print("dry run, nothing was written")
+
+
+if __name__ == "__main__":
+    main()
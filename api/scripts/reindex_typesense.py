@@ -0,0 +1,486 @@
+"""Rebuild or verify the Typesense collections from Mongo.
+
+This is the reconcile job the entity_changed indexer falls back on. Every
+Typesense collection that an object configuration enables is rebuilt into a
+fresh, versioned collection (``<alias>_<timestamp>``), and the alias the API
+searches on is swapped to it atomically once the import has finished, so
+searches never see a half-built index.
+
+Documents are streamed from Mongo with a cursor sorted on ``_id`` and a bounded
+batch size, converted in a process pool with prepare_document_for_typesense and
+bulk-imported with ``documents/import``. After every imported batch the last
+``_id`` is written to a checkpoint file, so an interrupted rebuild of millions
+of documents resumes where it stopped instead of starting over. Writes made
+while the rebuild runs go to the collection behind the alias, so right before
+the swap a catch-up pass imports the documents created or updated since the
+rebuild started. Documents deleted during the rebuild are left for
+``--verify --repair``.
+
+``--verify`` re-reads Mongo, converts every document and compares ids and a
+content hash with what Typesense holds, batch by batch, without importing
+anything. The Typesense side of a batch is exported with a filter on its ids;
+documents only Typesense has are found afterwards from an export of the ids
+alone. Add ``--repair`` to upsert only the missing or stale documents and
+delete the ones Mongo no longer has.
+
+The first rebuild of a collection that is not behind an alias yet needs
+``--replace-collection``: the existing collection is dropped right before the
+alias with its name is created, which leaves a short gap in search results.
+
+Run inside a collection-api container, from the api/ directory:
+
+    python -m scripts.reindex_typesense                         # rebuild all
+    python -m scripts.reindex_typesense --collection entities   # rebuild one
+    python -m scripts.reindex_typesense --resume                # continue
+    python -m scripts.reindex_typesense --verify [--repair]     # reconcile
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import UTC, datetime
+from time import time
+
+# Field attributes carried over from the live collection into the new version.
+_SCHEMA_ATTRS = (
+    "name",
+    "type",
+    "facet",
+    "optional",
+    "index",
+    "infix",
+    "sort",
+    "locale",
+    "stem",
+    "store",
+)
+
+
+def collect_reindex_plan(only=None):
+    """Return ``{ts_collection: {mongo_collection: {type: typesense_config}}}``."""
+    from configuration import get_object_configuration_mapper, init_mappers
+
+    init_mappers()
+    mapper = get_object_configuration_mapper().get_all()
+    if not mapper:
+        sys.exit(
+            "No ObjectConfigurations registered — run from api/ inside a "
+            "collection-api container."
+        )
+
+    plan = {}
+    for key, ConfigClass in mapper.items():
+        try:
+            crud = ConfigClass().crud()
+        except Exception:
+            continue
+        typesense = crud.get("typesense") or {}
+        if not typesense.get("enabled"):
+            continue
+        ts_collection = typesense.get("collection", "entities")
+        if only and ts_collection not in only:
+            continue
+        collection = crud.get("collection", "entities")
+        entity_type = key.split("|")[-1]
+        plan.setdefault(ts_collection, {}).setdefault(collection, {})[entity_type] = (
+            typesense
+        )
+    return plan
+
+
+def build_schema(name, current_fields, facet_fields):
+    """Schema for a new collection version.
+
+    The fields of the live collection are carried over, so explicit types,
+    infix search and facets survive the rebuild. Without a live collection
+    the auto schema of ensure_collection is used.
+    """
+    fields = [
+        {key: field[key] for key in _SCHEMA_ATTRS if key in field}
+        for field in current_fields or []
+    ]
+    if not fields:
+        fields = [{"name": ".*", "type": "auto"}]
+    declared = {field["name"] for field in fields}
+    for field_path in sorted(facet_fields):
+        flat_key = field_path.replace(".", "_")
+        if flat_key not in declared:
+            fields.append({"name": flat_key, "type": "auto", "facet": True})
+    return {"name": name, "fields": fields}
+
+
+def document_hash(doc):
+    return hashlib.sha1(
+        json.dumps(doc, sort_keys=True, default=str).encode()
+    ).hexdigest()
+
+
+def diff_hashes(mongo_hashes, typesense_hashes):
+    """Return ``(missing, stale, extra)`` id lists between Mongo and Typesense."""
+    missing, stale = [], []
+    for id, hash in mongo_hashes.items():
+        if id not in typesense_hashes:
+            missing.append(id)
+        elif typesense_hashes[id] != hash:
+            stale.append(id)
+    extra = [id for id in typesense_hashes if id not in mongo_hashes]
+    return missing, stale, extra
+
+
+def load_checkpoint(path):
+    try:
+        with open(path) as checkpoint_file:
+            return json.load(checkpoint_file)
+    except FileNotFoundError:
+        return {}
+
+
+def save_checkpoint(path, checkpoint):
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, "w") as checkpoint_file:
+        json.dump(checkpoint, checkpoint_file, indent=2)
+    os.replace(temporary_path, path)
+
+
+def convert_batch(entities, type_configs, field_types):
+    """Process-pool worker: convert Mongo documents into Typesense documents."""
+    from search.typesense_client import prepare_document_for_typesense
+
+    docs = []
+    for entity in entities:
+        ts_config = type_configs[entity.get("type")]
+        docs.append(
+            prepare_document_for_typesense(
+                entity,
+                ts_config.get("search_fields", []),
+                facet_fields=ts_config.get("facet_fields", []),
+                field_types=field_types,
+            )
+        )
+    return docs
+
+
+def stream_batches(
+    storage, collection, types, batch_size, after_id=None, changed_since=None
+):
+    """Yield batches of prepared Mongo documents of ``types``, in ``_id`` order.
+
+    With ``changed_since`` only the documents created or updated since then.
+    """
+    query = {"type": {"$in": sorted(types)}}
+    if after_id is not None:
+        query["_id"] = {"$gt": after_id}
+    if changed_since is not None:
+        query["$or"] = [
+            {key: {"$gte": changed_since}}
+            for key in ("date_created", "date_updated", "date_updated_by_service")
+        ]
+    cursor = storage.db[collection].find(query).sort("_id", 1).batch_size(batch_size)
+    batch = []
+    for document in cursor:
+        batch.append(storage._prepare_mongo_document(document, True))
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def convert_stream(pool, batches, type_configs, field_types, workers):
+    """Yield ``(last_id, docs)`` per batch, converted in the pool, in order."""
+    in_flight = []
+    for batch in batches:
+        in_flight.append(
+            (
+                batch[-1]["_id"],
+                pool.submit(convert_batch, batch, type_configs, field_types),
+            )
+        )
+        if len(in_flight) >= workers * 2:
+            last_id, future = in_flight.pop(0)
+            yield last_id, future.result()
+    for last_id, future in in_flight:
+        yield last_id, future.result()
+
+
+def get_alias_target(client, alias):
+    try:
+        return client.aliases[alias].retrieve()["collection_name"]
+    except Exception:
+        return None
+
+
+def get_collection_fields(client, collection):
+    try:
+        return client.collections[collection].retrieve()["fields"]
+    except Exception:
+        return None
+
+
+def export_docs(client, collection, ids):
+    """Return the Typesense documents with ``ids``, as ``{id: document}``."""
+    filter_ids = ",".join(f"`{id}`" for id in ids)
+    exported = client.collections[collection].documents.export(
+        {"filter_by": f"id:[{filter_ids}]"}
+    )
+    return {
+        doc["id"]: doc
+        for doc in (json.loads(line) for line in io.StringIO(exported) if line.strip())
+    }
+
+
+def find_extra_ids(client, storage, alias, sources, batch_size):
+    """Yield the ids Typesense holds for ``alias`` and Mongo has no document of
+    the types of ``sources`` for, checked per ``batch_size`` ids."""
+
+    def extra_in(ids):
+        known = set()
+        for collection, types in sources.items():
+            known.update(
+                document["_id"]
+                for document in storage.db[collection].find(
+                    {"_id": {"$in": ids}, "type": {"$in": sorted(types)}}, {"_id": 1}
+                )
+            )
+        return [id for id in ids if id not in known]
+
+    exported = client.collections[alias].documents.export({"include_fields": "id"})
+    ids = []
+    for line in io.StringIO(exported):
+        if not line.strip():
+            continue
+        ids.append(json.loads(line)["id"])
+        if len(ids) >= batch_size:
+            yield from extra_in(ids)
+            ids = []
+    if ids:
+        yield from extra_in(ids)
+
+
+def import_docs(client, collection, docs):
+    results = client.collections[collection].documents.import_(
+        docs, {"action": "upsert"}
+    )
+    failures = [result for result in results if not result.get("success")]
+    for failure in failures[:5]:
+        print(f"    [err]  {str(failure.get('error'))[:160]}")
+    return len(docs) - len(failures), len(failures)
+
+
+def swap_alias(client, alias, target, replace_collection):
+    """Point ``alias`` at ``target``, return ``(swapped, previous_target)``."""
+    previous = get_alias_target(client, alias)
+    if previous is None and get_collection_fields(client, alias) is not None:
+        if not replace_collection:
+            print(
+                f"  {alias} is a collection, not an alias: rerun with "
+                f"--resume --replace-collection to drop it and alias {target}"
+            )
+            return False, None
+        client.collections[alias].delete()
+    client.aliases.upsert(alias, {"collection_name": target})
+    print(f"  [swap] {alias} -> {target}")
+    return True, previous
+
+
+def rebuild(client, storage, alias, sources, args, checkpoint):
+    from search.typesense_client import get_collection_field_types
+
+    state = checkpoint.get(alias)
+    if not (args.resume and state and not state.get("done")):
+        facet_fields = {
+            field
+            for type_configs in sources.values()
+            for ts_config in type_configs.values()
+            for field in ts_config.get("facet_fields", [])
+        }
+        current = get_alias_target(client, alias) or alias
+        state = {
+            "collection": f"{alias}_{int(time())}",
+            "started_at": datetime.now(UTC).isoformat(),
+            "after_ids": {},
+            "imported": 0,
+            "failed": 0,
+        }
+        client.collections.create(
+            build_schema(
+                state["collection"],
+                get_collection_fields(client, current),
+                facet_fields,
+            )
+        )
+        checkpoint[alias] = state
+        save_checkpoint(args.checkpoint, checkpoint)
+    target = state["collection"]
+    print(f"  {alias}: importing into {target}")
+
+    field_types = get_collection_field_types(target)
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        for collection, type_configs in sources.items():
+            batches = stream_batches(
+                storage,
+                collection,
+                type_configs,
+                args.batch_size,
+                state["after_ids"].get(collection),
+            )
+            for last_id, docs in convert_stream(
+                pool, batches, type_configs, field_types, args.workers
+            ):
+                imported, failed = import_docs(client, target, docs)
+                state["imported"] += imported
+                state["failed"] += failed
+                state["after_ids"][collection] = last_id
+                save_checkpoint(args.checkpoint, checkpoint)
+                print(
+                    f"    {collection}: {state['imported']} imported, "
+                    f"{state['failed']} failed (last _id {last_id})"
+                )
+        catch_up(pool, client, storage, target, sources, args, state, field_types)
+
+    swapped, previous = swap_alias(client, alias, target, args.replace_collection)
+    if not swapped:
+        return
+    if previous and previous != target and args.drop_old:
+        client.collections[previous].delete()
+        print(f"  [drop] {previous}")
+    state["done"] = True
+    save_checkpoint(args.checkpoint, checkpoint)
+
+
+def catch_up(pool, client, storage, target, sources, args, state, field_types):
+    """Import the documents created or updated since the rebuild started."""
+    if not state.get("started_at"):
+        print(f"  {target}: no start time in the checkpoint, catch-up skipped")
+        return
+    changed_since = datetime.fromisoformat(state["started_at"])
+    caught_up = 0
+    for collection, type_configs in sources.items():
+        batches = stream_batches(
+            storage,
+            collection,
+            type_configs,
+            args.batch_size,
+            changed_since=changed_since,
+        )
+        for _, docs in convert_stream(
+            pool, batches, type_configs, field_types, args.workers
+        ):
+            imported, _ = import_docs(client, target, docs)
+            caught_up += imported
+    print(f"  [catch-up] {caught_up} changed since {state['started_at']}")
+
+
+def verify(client, storage, alias, sources, args):
+    from search.typesense_client import get_collection_field_types
+
+    field_types = get_collection_field_types(alias)
+    in_mongo = missing = stale = upserted = 0
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        for collection, type_configs in sources.items():
+            batches = stream_batches(storage, collection, type_configs, args.batch_size)
+            for _, docs in convert_stream(
+                pool, batches, type_configs, field_types, args.workers
+            ):
+                mongo_hashes = {doc["id"]: document_hash(doc) for doc in docs}
+                typesense_hashes = {
+                    id: document_hash(doc)
+                    for id, doc in export_docs(client, alias, mongo_hashes).items()
+                }
+                batch_missing, batch_stale, _ = diff_hashes(
+                    mongo_hashes, typesense_hashes
+                )
+                in_mongo += len(mongo_hashes)
+                missing += len(batch_missing)
+                stale += len(batch_stale)
+                if args.repair and (batch_missing or batch_stale):
+                    out_of_sync = {*batch_missing, *batch_stale}
+                    import_docs(
+                        client,
+                        alias,
+                        [doc for doc in docs if doc["id"] in out_of_sync],
+                    )
+                    upserted += len(out_of_sync)
+
+    extra = 0
+    for id in find_extra_ids(client, storage, alias, sources, args.batch_size):
+        extra += 1
+        if args.repair:
+            client.collections[alias].documents[id].delete()
+    print(
+        f"  {alias}: {in_mongo} in Mongo, {missing} missing, {stale} stale, "
+        f"{extra} extra"
+    )
+    if not args.repair:
+        return not (missing or stale or extra)
+    print(f"  [fix]  {upserted} upserted, {extra} deleted")
+    return True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--collection",
+        action="append",
+        help="Typesense collection (alias) to process, repeatable. Default: all.",
+    )
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--checkpoint", default=".reindex_typesense.checkpoint.json")
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue an unfinished rebuild from the checkpoint file.",
+    )
+    parser.add_argument(
+        "--replace-collection",
+        action="store_true",
+        help="Drop a plain collection that has the alias name before aliasing.",
+    )
+    parser.add_argument(
+        "--drop-old",
+        action="store_true",
+        help="Delete the collection the alias pointed to before the swap.",
+    )
+    parser.add_argument(
+        "--verify",
+        action="store_true",
+        help="Compare Typesense with Mongo instead of rebuilding.",
+    )
+    parser.add_argument(
+        "--repair",
+        action="store_true",
+        help="With --verify: upsert missing/stale and delete extra documents.",
+    )
+    args = parser.parse_args(argv)
+
+    from search.typesense_client import get_typesense_client
+    from storage.storagemanager import StorageManager
+
+    client = get_typesense_client()
+    if not client:
+        sys.exit("No Typesense client available (TYPESENSE_API_KEY set?).")
+    plan = collect_reindex_plan(args.collection)
+    if not plan:
+        sys.exit("No object configuration has typesense enabled.")
+    storage = StorageManager().get_db_engine()
+
+    in_sync = True
+    checkpoint = load_checkpoint(args.checkpoint)
+    for alias in sorted(plan):
+        if args.verify:
+            in_sync = verify(client, storage, alias, plan[alias], args) and in_sync
+        else:
+            rebuild(client, storage, alias, plan[alias], args, checkpoint)
+    if not in_sync:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,172 @@
 import threading
 from os import getenv
-from time import sleep
+from time import monotonic, perf_counter, sleep
+from urllib.parse import urlsplit
 
+from bounded_cache import BoundedCache
 from logging_elody.log import log
+from metrics import typesense_circuit_open, typesense_request_seconds
+from requests.adapters import HTTPAdapter
+
+# How long a collection is trusted to exist, with the schema read from it,
+# before Typesense is asked again, e.g. after the collection was dropped.
+TYPESENSE_SCHEMA_CACHE_TTL_SECONDS = int(
+    getenv("TYPESENSE_SCHEMA_CACHE_TTL_SECONDS") or 300
+)
 
 _client = None
 _initialized = False
-_ensured_collections = set()
-_field_types_cache = {}
+_ensured_collections = BoundedCache(
+    "typesense_ensured_collections", ttl=TYPESENSE_SCHEMA_CACHE_TTL_SECONDS
+)
+_field_types_cache = BoundedCache(
+    "typesense_field_types", ttl=TYPESENSE_SCHEMA_CACHE_TTL_SECONDS
+)
 _lock = threading.Lock()
 
+# Typesense answers these with a 4xx: the node is up, only the request is wrong.
+_CLIENT_ERRORS = {
+    "ObjectAlreadyExists",
+    "ObjectNotFound",
+    "ObjectUnprocessable",
+    "RequestForbidden",
+    "RequestMalformed",
+    "RequestUnauthorized",
+}
+
+
+class CircuitBreaker:
+    """
+    Stops calling Typesense after consecutive failures.
+
+    After ``failure_threshold`` consecutive failures the breaker opens and
+    :meth:`allow` refuses calls for ``cooldown_seconds``. The first call after
+    the cool-down is let through as a trial: its success closes the breaker,
+    its failure opens it for another cool-down.
+    """
+
+    def __init__(self, failure_threshold=5, cooldown_seconds=30.0):
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_progress = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        return self._opened_at is not None
+
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._trial_in_progress:
+                return False
+            if monotonic() - self._opened_at < self.cooldown_seconds:
+                return False
+            self._trial_in_progress = True
+            return True
+
+    def record(self, exception=None):
+        if exception is None or type(exception).__name__ in _CLIENT_ERRORS:
+            self.record_success()
+        else:
+            self.record_failure()
+
+    def record_success(self):
+        with self._lock:
+            if self._opened_at is not None:
+                log.info("Typesense circuit breaker closed")
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_progress = False
+            typesense_circuit_open.set(0)
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_progress = False
+            if self._opened_at is None and self._failures < self.failure_threshold:
+                return
+            if self._opened_at is None:
+                log.warning(
+                    f"Typesense circuit breaker opened after {self._failures} "
+                    f"consecutive failures, skipping Typesense for "
+                    f"{self.cooldown_seconds}s"
+                )
+            self._opened_at = monotonic()
+            typesense_circuit_open.set(1)
+
+    def reset(self):
+        self.record_success()
+
+
+_circuit_breaker = CircuitBreaker(
+    failure_threshold=int(getenv("TYPESENSE_BREAKER_FAILURE_THRESHOLD", 5)),
+    cooldown_seconds=float(getenv("TYPESENSE_BREAKER_COOLDOWN_SECONDS", 30)),
+)
+
+
+class _NodeLatencyAdapter(HTTPAdapter):
+    """Connection pool of the Typesense session, timing every request per node."""
+
+    def send(self, request, **kwargs):
+        outcome = "error"
+        started = perf_counter()
+        try:
+            response = super().send(request, **kwargs)
+            outcome = "error" if response.status_code >= 500 else "ok"
+            return response
+        finally:
+            typesense_request_seconds.labels(
+                urlsplit(request.url).netloc, outcome
+            ).observe(perf_counter() - started)
+
+
+def _parse_node(url):
+    parts = urlsplit(url if "://" in url else f"http://{url}")
+    return {
+        "host": parts.hostname,
+        "port": str(parts.port or (443 if parts.scheme == "https" else 8108)),
+        "path": parts.path.rstrip("/"),
+        "protocol": parts.scheme,
+    }
+
+
+def _get_nodes():
+    if nodes := getenv("TYPESENSE_NODES"):
+        return [_parse_node(node.strip()) for node in nodes.split(",") if node.strip()]
+    return [
+        {
+            "host": getenv(
+                "TYPESENSE_SERVER_HOST",
+                getenv("TYPESENSE_HOST", "typesense"),
+            ),
+            "port": getenv(
+                "TYPESENSE_SERVER_PORT",
+                getenv("TYPESENSE_PORT", "8108"),
+            ),
+            "protocol": getenv("TYPESENSE_PROTOCOL", "http"),
+        }
+    ]
+
+
+def _mount_connection_pool():
+    """Size the keep-alive pool of the session every typesense.Client shares.
+
+    typesense-python sends all requests through one module-level
+    requests.Session. Its default pool keeps 10 connections per node, fewer
+    than the gunicorn threads and AMQP consumers that search and index
+    concurrently, so connections were dropped and re-opened under load.
+    """
+    from typesense import api_call
+
+    pool_size = int(getenv("TYPESENSE_POOL_SIZE", 32))
+    adapter = _NodeLatencyAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    api_call.session.mount("http://", adapter)
+    api_call.session.mount("https://", adapter)
+
 
 def get_typesense_client():
     global _client, _initialized
@@ -28,27 +185,25 @@ def get_typesense_client():
         try:
             import typesense
 
-            _client = typesense.Client(
-                {
-                    "api_key": api_key,
-                    "nodes": [
-                        {
-                            "host": getenv(
-                                "TYPESENSE_SERVER_HOST",
-                                getenv("TYPESENSE_HOST", "typesense"),
-                            ),
-                            "port": getenv(
-                                "TYPESENSE_SERVER_PORT",
-                                getenv("TYPESENSE_PORT", "8108"),
-                            ),
-                            "protocol": "http",
-                        }
-                    ],
-                    "connection_timeout_seconds": int(
-                        getenv("TYPESENSE_CONNECTION_TIMEOUT_SECONDS", 5)
-                    ),
-                }
-            )
+            nodes = _get_nodes()
+            config = {
+                "api_key": api_key,
+                "nodes": nodes,
+                "connection_timeout_seconds": int(
+                    getenv("TYPESENSE_CONNECTION_TIMEOUT_SECONDS", 5)
+                ),
+                "num_retries": int(getenv("TYPESENSE_NUM_RETRIES", len(nodes))),
+                "retry_interval_seconds": float(
+                    getenv("TYPESENSE_RETRY_INTERVAL_SECONDS", 0.1)
+                ),
+                "healthcheck_interval_seconds": int(
+                    getenv("TYPESENSE_HEALTHCHECK_INTERVAL_SECONDS", 15)
+                ),
+            }
+            if nearest_node := getenv("TYPESENSE_NEAREST_NODE"):
+                config["nearest_node"] = _parse_node(nearest_node)
+            _client = typesense.Client(config)
+            _mount_connection_pool()
         except Exception as e:
             log.warning(f"Failed to initialize Typesense client: {e}")
             _client = None
@@ -133,7 +288,7 @@ def search(
     group_by=None,
 ):
     client = get_typesense_client()
-    if not client:
+    if not client or not _circuit_breaker.allow():
         return None
 
     try:
@@ -155,6 +310,7 @@ def search(
             search_params["group_limit"] = 1
 
         result = client.collections[collection].documents.search(search_params)
+        _circuit_breaker.record()
         skipped_groups = 0
         if group_by and "grouped_hits" in result:
             ids, skipped_groups = _ids_from_grouped_hits(result)
@@ -174,6 +330,7 @@ def search(
             response["facets"] = _transform_facets(result.get("facet_counts", []))
         return response
     except Exception as e:
+        _circuit_breaker.record(e)
         if "Could not find a field named" in str(e) and query_by:
             missing = str(e).split("`")[1] if "`" in str(e) else ""
             filtered = ",".join(f for f in query_by.split(",") if f != missing)
@@ -199,7 +356,7 @@ def search(
 def search_all_ids(collection, query, query_by, filter_by=None, group_by=None):
     """Fetch all matching IDs from Typesense by paginating through results."""
     client = get_typesense_client()
-    if not client:
+    if not client or not _circuit_breaker.allow():
         return None
 
     try:
@@ -225,6 +382,7 @@ def search_all_ids(collection, query, query_by, filter_by=None, group_by=None):
                 search_params["group_limit"] = 1
 
             result = client.collections[collection].documents.search(search_params)
+            _circuit_breaker.record()
             if total is None:
                 total = result["found"]
 
@@ -254,6 +412,7 @@ def search_all_ids(collection, query, query_by, filter_by=None, group_by=None):
             "highlights": all_highlights,
         }
     except Exception as e:
+        _circuit_breaker.record(e)
         if "Could not find a field named" in str(e) and query_by:
             missing = str(e).split("`")[1] if "`" in str(e) else ""
             filtered = ",".join(f for f in query_by.split(",") if f != missing)
@@ -275,7 +434,7 @@ def group_values(collection, field, filter_by=None, max_groups=250):
     of querying Mongo by the (unindexed) field value. Requires a facet field.
     """
     client = get_typesense_client()
-    if not client:
+    if not client or not _circuit_breaker.allow():
         return None
     try:
         params = {
@@ -288,6 +447,7 @@ def group_values(collection, field, filter_by=None, max_groups=250):
         if filter_by:
             params["filter_by"] = filter_by
         result = client.collections[collection].documents.search(params)
+        _circuit_breaker.record()
         pairs = []
         for group in result.get("grouped_hits", []):
             keys = group.get("group_key") or []
@@ -296,6 +456,7 @@ def group_values(collection, field, filter_by=None, max_groups=250):
                 pairs.append((keys[0], hits[0]["document"]["_id"]))
         return pairs
     except Exception as e:
+        _circuit_breaker.record(e)
         log.warning(f"Typesense group_by on '{field}' failed: {e}")
         return None
 
@@ -379,6 +540,36 @@ def upsert_document(collection, doc, max_attempts=10):
     return False
 
 
+def import_documents(collection, docs, action="upsert", max_attempts=3):
+    """Import a batch of documents into Typesense in one ``documents/import`` call.
+
+    The documents are sent as JSONL and Typesense answers with one result line
+    per document, in order. Returns that list of ``{"success": bool, ...}``
+    dicts so callers can settle every document on its own, or None when
+    Typesense is unavailable or the request itself keeps failing.
+    """
+    client = get_typesense_client()
+    if not client:
+        return None
+
+    last_error = None
+    for attempt in range(1, max_attempts + 1):
+        try:
+            ensure_collection(collection)
+            return client.collections[collection].documents.import_(
+                docs, {"action": action}
+            )
+        except Exception as e:
+            last_error = e
+            if attempt < max_attempts:
+                sleep(min(0.5 * 2 ** (attempt - 1), 2))
+    log.error(
+        f"Typesense import of {len(docs)} docs in '{collection}' failed "
+        f"after {max_attempts} attempts: {last_error}"
+    )
+    return None
+
+
 def delete_document(collection, doc_id, max_attempts=3):
     """Delete a document from Typesense, retrying transient failures.
 
@@ -450,8 +641,8 @@ def get_collection_field_types(collection):
     Returns an empty dict when Typesense is unavailable or the collection does not
     exist yet, in which case callers leave values untouched.
     """
-    if collection in _field_types_cache:
-        return _field_types_cache[collection]
+    if (field_types := _field_types_cache.get(collection)) is not None:
+        return field_types
     client = get_typesense_client()
     if not client:
         return {}
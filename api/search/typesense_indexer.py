@@ -0,0 +1,182 @@
+import threading
+from os import getenv
+from time import monotonic
+
+from logging_elody.log import log
+from metrics import (
+    typesense_import_batch_seconds,
+    typesense_import_batch_size,
+    typesense_indexed_documents,
+)
+from storage.storagemanager import StorageManager
+
+from search.typesense_client import (
+    get_collection_field_types,
+    import_documents,
+    prepare_document_for_typesense,
+)
+
+_indexer = None
+_indexer_lock = threading.Lock()
+
+
+class TypesenseIndexer:
+    """
+    Collects entity_changed messages into micro-batches for Typesense.
+
+    A batch is flushed when it reaches ``batch_size`` messages or when its
+    oldest message has waited ``flush_interval`` seconds. Flushing bulk-reads
+    the entities, converts them and sends one ``documents/import`` per
+    Typesense collection. Every message is acked, nacked or rejected according
+    to the import result line of its own document.
+    """
+
+    def __init__(self, batch_size=100, flush_interval=1.0):
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self._pending = []
+        self._condition = threading.Condition()
+        self._flusher = None
+
+    def submit(self, message, collection, entity_id, ts_config):
+        with self._condition:
+            self._pending.append(
+                {
+                    "message": message,
+                    "collection": collection,
+                    "entity_id": entity_id,
+                    "ts_config": ts_config,
+                    "submitted_at": monotonic(),
+                }
+            )
+            is_full = len(self._pending) >= self.batch_size
+            if not is_full:
+                self.__ensure_flusher()
+                self._condition.notify()
+        if is_full:
+            self.flush()
+
+    def flush(self):
+        with self._condition:
+            batch, self._pending = self._pending, []
+        groups = {}
+        for pending in batch:
+            key = (
+                pending["collection"],
+                pending["ts_config"].get("collection", "entities"),
+            )
+            groups.setdefault(key, []).append(pending)
+        for (collection, ts_collection), group in groups.items():
+            with typesense_import_batch_seconds.labels(ts_collection).time():
+                self.__index(collection, ts_collection, group)
+
+    def __ensure_flusher(self):
+        if self._flusher and self._flusher.is_alive():
+            return
+        self._flusher = threading.Thread(
+            target=self.__run_flusher, name="typesense-indexer", daemon=True
+        )
+        self._flusher.start()
+
+    def __run_flusher(self):
+        while True:
+            with self._condition:
+                while not self._pending:
+                    self._condition.wait()
+                wait = (
+                    self._pending[0]["submitted_at"] + self.flush_interval - monotonic()
+                )
+                if wait > 0:
+                    self._condition.wait(wait)
+                    continue
+            try:
+                self.flush()
+            except Exception as exception:
+                log.exception(
+                    f"Typesense indexer flush failed: {exception}", exc_info=exception
+                )
+
+    def __index(self, collection, ts_collection, group):
+        try:
+            storage = StorageManager().get_db_engine()
+            entities = storage.get_items_from_collection_by_ids(
+                [pending["entity_id"] for pending in group], collection
+            )
+            field_types = get_collection_field_types(ts_collection)
+        except Exception as exception:
+            for pending in group:
+                self.__fail(pending, ts_collection, exception)
+            return
+
+        entities_by_id = {}
+        for entity in entities:
+            for id in [entity["_id"], *entity.get("identifiers", [])]:
+                entities_by_id.setdefault(id, entity)
+
+        docs = []
+        messages_per_doc = []
+        doc_index_by_id = {}
+        for pending in group:
+            entity = entities_by_id.get(pending["entity_id"])
+            if not entity:
+                self.__ack(pending, ts_collection, "skipped")
+                continue
+            if entity["_id"] in doc_index_by_id:
+                messages_per_doc[doc_index_by_id[entity["_id"]]].append(pending)
+                continue
+            try:
+                doc = prepare_document_for_typesense(
+                    entity,
+                    pending["ts_config"].get("search_fields", []),
+                    facet_fields=pending["ts_config"].get("facet_fields", []),
+                    field_types=field_types,
+                )
+            except Exception as exception:
+                self.__fail(pending, ts_collection, exception)
+                continue
+            doc_index_by_id[entity["_id"]] = len(docs)
+            docs.append(doc)
+            messages_per_doc.append([pending])
+        if not docs:
+            return
+
+        typesense_import_batch_size.labels(ts_collection).observe(len(docs))
+        results = import_documents(ts_collection, docs) or []
+        for index, doc_messages in enumerate(messages_per_doc):
+            result = results[index] if index < len(results) else None
+            for pending in doc_messages:
+                if result and result.get("success"):
+                    self.__ack(pending, ts_collection, "indexed")
+                else:
+                    error = (result or {}).get("error", "no import result")
+                    self.__fail(pending, ts_collection, RuntimeError(error))
+
+    def __ack(self, pending, ts_collection, result):
+        typesense_indexed_documents.labels(ts_collection, result).inc()
+        pending["message"].ack()
+
+    def __fail(self, pending, ts_collection, exception):
+        typesense_indexed_documents.labels(ts_collection, "failed").inc()
+        log.error(
+            f"Failed to sync entity {pending['entity_id']} to Typesense: "
+            f"{exception.__class__.__name__}: {exception}"
+        )
+        if pending["message"].redelivered:
+            # Already retried once: drop it and let the reconcile job recover it,
+            # instead of hot-looping on a deterministic failure.
+            pending["message"].reject(requeue=False)
+        else:
+            pending["message"].nack(requeue=True)
+
+
+def get_typesense_indexer():
+    global _indexer
+    if _indexer:
+        return _indexer
+    with _indexer_lock:
+        if not _indexer:
+            _indexer = TypesenseIndexer(
+                batch_size=int(getenv("TYPESENSE_INDEX_BATCH_SIZE", 100)),
+                flush_interval=float(getenv("TYPESENSE_INDEX_FLUSH_INTERVAL", 1.0)),
+            )
+    return _indexer
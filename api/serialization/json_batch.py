@@ -1,6 +1,5 @@
-from json import loads
-
 from flask import has_request_context, request
+from serialization.streaming import iter_json_array
 from werkzeug.exceptions import BadRequest
 
 
@@ -18,7 +17,8 @@ def serialize_json_batch(data, *, document_type="", umbrella_types={}, **_):
             return serialize_json_batch(data, umbrella_types=UMBRELLA_TYPES, **kwargs)
 
     An item that fails validation is yielded as the exception, which the batch loop
-    attributes to a line number instead of failing the whole body.
+    attributes to a line number instead of failing the whole body. data is the body
+    as bytes or, for streamed imports, a stream.
     """
     try:
         # Only the update path patches per document; the create batch posts already
@@ -31,15 +31,12 @@ def serialize_json_batch(data, *, document_type="", umbrella_types={}, **_):
             raise BadRequest(
                 "json is only supported to update documents, import with csv"
             )
-        items = loads(data)
-        if not isinstance(items, list):
-            raise BadRequest("The json body must be an array of documents")
+        # The body may be a stream: items are parsed one at a time, so an
+        # invalid body can fail after the first items were yielded.
+        for item in iter_json_array(data):
+            yield _prepare_document(item, document_type, umbrella_types)
     except Exception as exception:
         yield exception
-        return
-
-    for item in items:
-        yield _prepare_document(item, document_type, umbrella_types)
 
 
 def _prepare_document(item, document_type, umbrella_types):
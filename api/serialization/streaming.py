@@ -0,0 +1,122 @@
+import csv
+from io import BytesIO, StringIO, TextIOWrapper
+from itertools import chain
+from json import JSONDecodeError, JSONDecoder
+from os import getenv
+
+from werkzeug.exceptions import BadRequest
+
+CSV_SNIFF_SIZE = int(getenv("CSV_SNIFF_SIZE") or 64 * 1024)
+STREAM_READ_SIZE = int(getenv("STREAM_READ_SIZE") or 64 * 1024)
+
+_decoder = JSONDecoder()
+_WHITESPACE = " \t\n\r"
+_NUMBER_CHARACTERS = "0123456789+-.eE"
+
+
+def get_request_stream(request):
+    """
+    Return the body of request as a binary stream without reading it into
+    memory. When something already read the body, e.g. a policy calling
+    get_json(), werkzeug keeps it cached and the stream is exhausted, so the
+    cached bytes are used instead.
+    """
+    cached_data = getattr(request, "_cached_data", None)
+    if cached_data is not None:
+        return BytesIO(cached_data)
+    return request.stream
+
+
+def is_stream(data):
+    return hasattr(data, "read")
+
+
+def iter_csv_rows(data, *, dict_reader=False):
+    """
+    Read csv from a string or a (binary or text) stream row by row.
+
+    The dialect is sniffed on the first CSV_SNIFF_SIZE characters, completed
+    to the end of their last line, instead of on the whole body.
+    """
+    text = _to_text_stream(data)
+    prefix = text.read(CSV_SNIFF_SIZE)
+    if prefix and not prefix.endswith("\n"):
+        prefix += text.readline()
+    dialect = csv.Sniffer().sniff(prefix) if prefix.strip() else csv.excel
+    lines = chain(StringIO(prefix), text)
+    if dict_reader:
+        return csv.DictReader(lines, dialect=dialect)
+    return csv.reader(lines, dialect=dialect)
+
+
+def iter_json_array(data):
+    """
+    Yield the items of a json array read from a string or a stream, holding
+    one item and at most one read of STREAM_READ_SIZE in memory.
+
+    Raises BadRequest when the body is not a json array.
+    """
+    text = _to_text_stream(data)
+    buffer, position, is_exhausted = "", 0, False
+
+    def fill():
+        nonlocal buffer, position, is_exhausted
+        chunk = text.read(STREAM_READ_SIZE)
+        buffer = buffer[position:] + chunk
+        position = 0
+        is_exhausted = not chunk
+
+    def skip_whitespace():
+        nonlocal position
+        while True:
+            while position < len(buffer) and buffer[position] in _WHITESPACE:
+                position += 1
+            if position < len(buffer) or is_exhausted:
+                return
+            fill()
+
+    skip_whitespace()
+    if buffer[position : position + 1] != "[":
+        raise BadRequest("The json body must be an array of documents")
+    position += 1
+    skip_whitespace()
+    if buffer[position : position + 1] == "]":
+        return
+    while True:
+        try:
+            item, end = _decoder.raw_decode(buffer, position)
+            # A value at the end of the buffer may continue in the next read,
+            # so may a number followed by nothing but ".", "e" or digits: it
+            # is only complete once a delimiter follows it.
+            if not is_exhausted and not buffer[end:].strip(_NUMBER_CHARACTERS):
+                if end == len(buffer) or _is_number(item):
+                    raise JSONDecodeError("Incomplete value", buffer, end)
+        except JSONDecodeError as error:
+            if is_exhausted:
+                raise BadRequest(f"Invalid json body: {error}") from error
+            fill()
+            continue
+        position = end
+        yield item
+        skip_whitespace()
+        separator = buffer[position : position + 1]
+        position += 1
+        if separator == "]":
+            return
+        if separator != ",":
+            raise BadRequest("Invalid json body: expected ',' or ']'")
+        skip_whitespace()
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _to_text_stream(data):
+    if isinstance(data, bytes):
+        data = data.decode("utf-8-sig")
+    if isinstance(data, str):
+        return StringIO(data)
+    if isinstance(data.read(0), bytes):
+        return TextIOWrapper(data, encoding="utf-8-sig", newline="")
+    return data
@@ -9,6 +9,7 @@ from arango import (
 )
 from arango.client import ArangoClient
 from arango.http import DefaultHTTPClient
+from bounded_cache import BoundedCache
 from configuration import get_object_configuration_mapper
 from elody.exceptions import NonUniqueException
 from elody.util import (
@@ -21,7 +22,12 @@ from elody.util import (
 from logging_elody.log import log
 from policy_factory import get_user_context
 from rabbit import get_rabbit
-from storage.genericstore import GenericStorageManager
+from storage.genericstore import RELATION_TRAVERSAL_MAX_DEPTH, GenericStorageManager
+
+# Number of identifier -> _id lookups kept per process, and how long they are
+# trusted before they are resolved again.
+ARANGO_ID_CACHE_SIZE = int(getenv("ARANGO_ID_CACHE_SIZE") or 10000)
+ARANGO_ID_CACHE_TTL_SECONDS = int(getenv("ARANGO_ID_CACHE_TTL_SECONDS") or 3600)
 
 
 class ArangoStorageManager(GenericStorageManager):
@@ -97,9 +103,22 @@ class ArangoStorageManager(GenericStorageManager):
             password=getenv("ARANGO_DB_PASSWORD"),
         )
         self.db = None
-        self.id_cache = {}
+        self.id_cache = BoundedCache(
+            "arango_ids", ARANGO_ID_CACHE_SIZE, ARANGO_ID_CACHE_TTL_SECONDS
+        )
         self.__create_database_if_not_exists()
 
+    def __add_iiif_presentation(self, item):
+        iiif_presentation = getenv("IMAGE_API_URL_EXT", "")
+        if iiif_presentation.find("/iiif/image") > -1 and item.get("object_id"):
+            iiif_presentation = iiif_presentation.replace(
+                "/iiif/image", f"/iiif/presentation/v2/manifest/{item['object_id']}"
+            )
+        if item.get("metadata"):
+            item["metadata"].append(
+                {"key": "iiif_presentation", "value": iiif_presentation}
+            )
+
     def __create_database_if_not_exists(self):
         if not self.sys_db.has_database(self.arango_db_name):
             self.sys_db.create_database(self.arango_db_name)
@@ -208,9 +227,7 @@ class ArangoStorageManager(GenericStorageManager):
         return [x for x in relations if not exclude or x not in exclude]
 
     def __invalidate_id_cache_for_item(self, item_id):
-        self.id_cache = {
-            key: value for key, value in self.id_cache.items() if value != item_id
-        }
+        self.id_cache.invalidate(lambda _, value: value == item_id)
 
     def __map_entity_relation(self, relation):
         return {
@@ -271,6 +288,44 @@ class ArangoStorageManager(GenericStorageManager):
                 self.db.update_document(edge)
                 return
 
+    def __to_relation_object(self, edge, relation):
+        relation_object = {key: value for key, value in edge.items() if key[0] != "_"}
+        relation_object["key"] = edge["_to"]
+        relation_object["type"] = relation
+        return relation_object
+
+    def _prepare_arango_documents(self, collection, documents):
+        """Shape documents read by a query like get_item_from_collection_by_id.
+
+        The relations of all documents are read with one query per edge
+        collection instead of fetching every document again.
+        """
+        if collection == "mediafiles":
+            for document in documents:
+                document["type"] = "mediafile"
+        ids_by_relation = {}
+        for document in documents:
+            for relation in self.__get_relevant_relations(document.get("type")):
+                ids_by_relation.setdefault(relation, []).append(document["_id"])
+        edges = {}
+        for relation, ids in ids_by_relation.items():
+            for edge in self.db.aql.execute(
+                "FOR edge IN @@relation FILTER edge._from IN @ids RETURN edge",
+                bind_vars={"@relation": relation, "ids": ids},
+            ):
+                edges.setdefault((relation, edge["_from"]), []).append(edge)
+        for document in documents:
+            relations = []
+            for relation in self.__get_relevant_relations(document.get("type")):
+                for edge in edges.get((relation, document["_id"]), []):
+                    relation_object = self.__to_relation_object(edge, relation)
+                    if relation_object not in relations:
+                        relations.append(relation_object)
+            document["relations"] = self.strip_relations(relations)
+            if document.get("type") == "asset":
+                self.__add_iiif_presentation(document)
+        return documents
+
     def add_mediafile_to_collection_item(
         self, collection, id, mediafile_id, mediafile_public, relation_properties=[]
     ):
@@ -462,12 +517,7 @@ class ArangoStorageManager(GenericStorageManager):
         relations = []
         for relation in relevant_relations:
             for edge in self.db.collection(relation).find({"_from": entity["_id"]}):
-                relation_object = {}
-                for key in edge.keys():
-                    if key[0] != "_":
-                        relation_object[key] = edge[key]
-                relation_object["key"] = edge["_to"]
-                relation_object["type"] = relation
+                relation_object = self.__to_relation_object(edge, relation)
                 if relation_object not in relations:
                     relations.append(relation_object)
                 if include_sub_relations and (
@@ -567,17 +617,32 @@ class ArangoStorageManager(GenericStorageManager):
             relations = self.get_collection_item_relations(collection, id, entity=item)
             item["relations"] = relations
         if item.get("type") == "asset":
-            iiif_presentation = getenv("IMAGE_API_URL_EXT", "")
-            if iiif_presentation.find("/iiif/image") > -1 and item.get("object_id"):
-                iiif_presentation = iiif_presentation.replace(
-                    "/iiif/image", f"/iiif/presentation/v2/manifest/{item['object_id']}"
-                )
-            if item.get("metadata"):
-                item["metadata"].append(
-                    {"key": "iiif_presentation", "value": iiif_presentation}
-                )
+            self.__add_iiif_presentation(item)
         return item
 
+    def get_items_from_collection_by_ids(self, ids, collections=None, fields=None):
+        keys = list(dict.fromkeys(id.split("/")[-1] for id in ids))
+        aql = """
+            FOR item IN @@collection
+                FILTER item._key IN @ids
+                OR item.object_id IN @ids
+                OR item.identifiers ANY IN @ids
+                RETURN @fields ? KEEP(item, @fields) : item
+        """
+        if fields:
+            fields = ["_id", "_key", "identifiers", *fields]
+        items = []
+        for collection in self._get_collections_for_bulk_read(collections):
+            bind = {"@collection": collection, "ids": keys, "fields": fields}
+            collection_items = list(self.db.aql.execute(aql, bind_vars=bind))
+            if not fields:
+                self._prepare_arango_documents(collection, collection_items)
+            elif collection == "mediafiles":
+                for item in collection_items:
+                    item["type"] = "mediafile"
+            items.extend(collection_items)
+        return self._order_items_by_ids(keys, items)
+
     def get_items_from_collection(
         self,
         collection,
@@ -656,24 +721,21 @@ class ArangoStorageManager(GenericStorageManager):
         items["results"] = item_results
         return items
 
-    def get_mediafile_linked_entities(self, mediafile, linked_entities=[]):
+    def get_mediafile_linked_entities(self, mediafile):
         relations = self.get_collection_item_relations("mediafiles", mediafile["_id"])
-        for relation in relations:
-            if relation.get("type") == "_from":
-                linked_entities.append(
-                    {
-                        "entity_id": relation["key"],
-                        "primary_mediafile": relation.get("is_primary"),
-                        "primary_thumbnail": relation.get("is_primary_thumbnail"),
-                    }
-                )
-            if relation.get("type") == "belongsToParent":
-                return self.get_mediafile_linked_entities(
-                    self.get_item_from_collection_by_id(
-                        "mediafiles", relation.get("key"), linked_entities
-                    )
-                )
-        return linked_entities
+        for parent in self.traverse_collection_item_relations(
+            "mediafiles", mediafile["_id"], "belongsToParent"
+        ):
+            relations.extend(parent.get("relations", []))
+        return [
+            {
+                "entity_id": relation["key"],
+                "primary_mediafile": relation.get("is_primary"),
+                "primary_thumbnail": relation.get("is_primary_thumbnail"),
+            }
+            for relation in relations
+            if relation.get("type") == "isMediafileFor"
+        ]
 
     def get_metadata_values_for_collection_item_by_key(self, collection, key):
         if key not in ["type"]:
@@ -898,6 +960,32 @@ class ArangoStorageManager(GenericStorageManager):
                 relation["key"] = relation["key"].split("/")[1]
         return relations
 
+    def traverse_collection_item_relations(
+        self, collection, id, relation_type, max_depth=None
+    ):
+        if not (item_id := self.__get_id_for_collection_item(collection, id)):
+            return []
+        direction = "OUTBOUND"
+        if relation_type not in [*self.edges, "hasChild"]:
+            direction = "INBOUND"
+            relation_type = self.__map_entity_relation(relation_type)
+        # Edge collections outside self.edges, like hasChild, only exist once
+        # an edge was written to them.
+        if not relation_type or not self.db.has_collection(relation_type):
+            return []
+        aql = f"""
+            FOR item IN 1..@depth {direction} @start @@relation
+                OPTIONS {{order: "bfs", uniqueVertices: "global"}}
+                RETURN item
+        """
+        bind_vars = {
+            "@relation": relation_type,
+            "depth": max_depth or RELATION_TRAVERSAL_MAX_DEPTH,
+            "start": item_id,
+        }
+        items = list(self.db.aql.execute(aql, bind_vars=bind_vars))
+        return self._prepare_arango_documents(collection, items)
+
     def update_collection_item_relations(self, collection, id, content, parent=True):
         item_id = self.__get_id_for_collection_item(collection, id)
         for relation in self.entity_relations:
@@ -1,9 +1,12 @@
 import uuid
+from os import getenv
 
 from configuration import get_object_configuration_mapper
 from elody.util import flatten_dict
 from serialization.serialize import serialize
 
+RELATION_TRAVERSAL_MAX_DEPTH = int(getenv("RELATION_TRAVERSAL_MAX_DEPTH") or 50)
+
 
 class GenericStorageManager:
     def _does_request_changes(self, item, content, overwrite=False):
@@ -108,6 +111,68 @@ class GenericStorageManager:
 
         return False
 
+    def _get_collections_for_bulk_read(self, collections):
+        if not collections:
+            return ["entities"]
+        if isinstance(collections, str):
+            return [collections]
+        return list(collections)
+
+    def _order_items_by_ids(self, ids, items):
+        """Return items in the order of the ids they were requested by.
+
+        An item matches an id on its _id, _key or any of its identifiers. Every
+        item is returned once, also when several ids resolve to it, items
+        matching none of the ids come last.
+        """
+        unique_items = {}
+        for position, item in enumerate(items):
+            unique_items.setdefault(item.get("_id", position), item)
+        items = list(unique_items.values())
+        position_by_id = {}
+        for position, item in enumerate(items):
+            keys = [item.get("_id"), item.get("_key"), *item.get("identifiers", [])]
+            for key in keys:
+                position_by_id.setdefault(key, position)
+        ordered_positions = dict.fromkeys(
+            position_by_id[id] for id in ids if id in position_by_id
+        )
+        ordered_positions.update(dict.fromkeys(range(len(items))))
+        return [items[position] for position in ordered_positions]
+
+    def _project_item(self, item, fields):
+        if not fields:
+            return item
+        keys = {"_id", "_key", "identifiers", *(key.split(".")[0] for key in fields)}
+        return {key: value for key, value in item.items() if key in keys}
+
+    def _walk_relations(self, item, relation_type, get_item, max_depth=None):
+        """Breadth-first walk from item along its relation_type relations.
+
+        get_item resolves a relation key to an item, or None when it is not
+        there. The items reached are returned nearest first, each once and
+        without item itself, at most max_depth hops away.
+        """
+        seen = {item["_id"]}
+        frontier, related = [item], []
+        for _ in range(max_depth or RELATION_TRAVERSAL_MAX_DEPTH):
+            next_frontier = []
+            for current in frontier:
+                for relation in current.get("relations", []):
+                    if relation.get("type") != relation_type:
+                        continue
+                    if relation["key"] in seen:
+                        continue
+                    if (next_item := get_item(relation["key"])) is None:
+                        continue
+                    seen.update([relation["key"], next_item["_id"]])
+                    next_frontier.append(next_item)
+            if not next_frontier:
+                break
+            related.extend(next_frontier)
+            frontier = next_frontier
+        return related
+
     def _get_autogenerated_id_for_item(self, item):
         return str(uuid.uuid4())
 
@@ -120,6 +185,9 @@ class GenericStorageManager:
                 identifiers.add(item[key])
         return list(filter(None, identifiers))
 
+    def add_item_to_history(self, content):
+        return self.save_item_to_collection("history", content)
+
     def add_mediafile_to_collection_item(
         self, collection, id, mediafile_id, mediafile_public
     ):
@@ -163,9 +231,15 @@ class GenericStorageManager:
                 patch_data[sub_item].append(obj)
         self.patch_item_from_collection(collection, id, patch_data)
 
+    def delete_history_for_items(self, collection, ids):
+        pass
+
     def delete_item_from_collection(self, collection, id):
         pass
 
+    def delete_items_from_collection(self, collection, ids):
+        pass
+
     def get_empty_mediafiles_with_no_relations(self, time=24):
         pass
 
@@ -206,6 +280,9 @@ class GenericStorageManager:
     def get_history_for_item(self, collection, id, timestamp=None, all_entries=None):
         pass
 
+    def get_history_page_for_item(self, collection, id, *, cursor=None, limit=20):
+        pass
+
     def get_item_from_collection_by_id(self, collection, id) -> dict:
         pass
 
@@ -214,6 +291,17 @@ class GenericStorageManager:
     ) -> dict:
         pass
 
+    def get_items_from_collection_by_ids(
+        self, ids, collections=None, fields=None
+    ) -> list[dict]:
+        collections = self._get_collections_for_bulk_read(collections)
+        items = []
+        for collection in collections:
+            for id in dict.fromkeys(ids):
+                if item := self.get_item_from_collection_by_id(collection, id):
+                    items.append(self._project_item(item, fields))
+        return self._order_items_by_ids(ids, items)
+
     def count_items_from_collection(self, collection, fields=None, filters=[]):
         pass
 
@@ -232,9 +320,18 @@ class GenericStorageManager:
     def get_ttl_expired_items_from_collection(self, collection):
         pass
 
+    def count_ttl_expired_items(self, collection):
+        pass
+
+    def ensure_ttl_index(self, collection):
+        pass
+
     def get_mediafile_linked_entities(self, mediafile):
         pass
 
+    def get_mediafiles_of_items(self, ids):
+        pass
+
     def get_metadata_values_for_collection_item_by_key(self, collection, key):
         pass
 
@@ -244,6 +341,20 @@ class GenericStorageManager:
     def handle_mediafile_status_change(self, mediafile):
         pass
 
+    def get_stale_import_job_ids(self, heartbeat_before):
+        pass
+
+    def increment_metadata_values(
+        self, id, collection, metadata_key, increment_fields, set_fields=None
+    ):
+        pass
+
+    def iter_history_for_item(self, collection, id, *, cursor=None):
+        pass
+
+    def iter_ttl_expired_ids(self, collection, chunk_size=1000):
+        pass
+
     def is_dry_run(self):
         try:
             from flask import g
@@ -302,9 +413,39 @@ class GenericStorageManager:
     ):
         pass
 
+    def save_items_to_collection_v2(
+        self, collection, items, *, run_post_crud_hook=True
+    ):
+        """Save items one by one with save_item_to_collection_v2.
+
+        Returns a list aligned with items holding the saved item, or the
+        exception it failed with. Engines that can write several items at
+        once override this.
+        """
+        results = []
+        for item in items:
+            try:
+                results.append(
+                    self.save_item_to_collection_v2(
+                        collection, item, run_post_crud_hook=run_post_crud_hook
+                    )
+                )
+            except Exception as error:
+                results.append(error)
+        return results
+
     def set_primary_field_collection_item(self, collection, id, mediafile_id, field):
         pass
 
+    def traverse_collection_item_relations(
+        self, collection, id, relation_type, max_depth=None
+    ):
+        """Return every item reached from item id by following relation_type
+        relations, e.g. all ancestors of a mediafile along belongsToParent or
+        all its derivatives along hasChild. Items come nearest first, the item
+        itself is not included and max_depth caps the number of hops."""
+        pass
+
     def update_collection_item_relations(self, collection, id, content, parent=True):
         pass
 
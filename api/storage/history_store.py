@@ -0,0 +1,380 @@
+from datetime import UTC, datetime
+from os import getenv
+
+from bson import encode
+from filters_v2.stages import cursor_stage
+from pymongo import DESCENDING, ReplaceOne
+
+# With HISTORY_DIFFS, only every HISTORY_SNAPSHOT_INTERVAL-th entry of an item
+# keeps the full object and relations, the entries in between a diff with the
+# entry before them.
+HISTORY_DIFFS = getenv("HISTORY_DIFFS", False) in [True, "true", "True"]
+HISTORY_SNAPSHOT_INTERVAL = int(getenv("HISTORY_SNAPSHOT_INTERVAL") or 20)
+# Pages of history hold at most HISTORY_PAGE_MAX_LIMIT entries.
+HISTORY_PAGE_MAX_LIMIT = int(getenv("HISTORY_PAGE_MAX_LIMIT") or 100)
+
+# Newest first, with _id as tiebreaker (added by cursor_stage), which the
+# (collection, object._id, timestamp, _id) history index serves.
+HISTORY_SORT = [{"$sort": {"timestamp": DESCENDING}}]
+
+
+class HistoryStore:
+    """
+    Reads and writes the history of items as full snapshots and diffs.
+
+    A snapshot is an entry as it has always been stored: ``object``,
+    ``relations``, ``collection``, ``timestamp`` and, for changed items,
+    ``entity``. A diff entry keeps ``object._id`` and ``object.identifiers``
+    for the history indexes, the ``diff`` of object, relations and entity
+    with the entry before it, the ``previous_id`` of that entry, its
+    ``sequence`` since the last snapshot and that snapshot's
+    ``snapshot_timestamp``. Entries without a ``diff``, so all existing
+    history, are snapshots.
+
+    Reads seek the entry on ``(collection, object._id, timestamp)`` and, for
+    a diff, replay the diffs from its snapshot forward, each on the state of
+    its ``previous_id``. Consumers adding entries of an item at the same time
+    can diff against the same entry, so the chain is not always a line.
+    Reads return the entry with the full ``object`` and ``relations``, like
+    a snapshot.
+    """
+
+    def __init__(self, db, collection="history", *, store_diffs=None, interval=None):
+        self.db = db
+        self.collection = collection
+        self.store_diffs = HISTORY_DIFFS if store_diffs is None else store_diffs
+        self.interval = max(1, interval or HISTORY_SNAPSHOT_INTERVAL)
+
+    def add(self, entry):
+        """Insert entry, a snapshot, as a diff when store_diffs is set and
+        the item has a snapshot less than interval entries ago."""
+        if self.store_diffs and (id := (entry.get("object") or {}).get("_id")):
+            latest = self.db[self.collection].find_one(
+                {"collection": entry["collection"], "object._id": id},
+                sort=[("timestamp", -1), ("_id", -1)],
+            )
+            # Entries of older versions with a string timestamp start a new
+            # snapshot, their chain cannot be range queried on timestamp. So
+            # does an entry older than latest, its diff would be replayed
+            # before the entry it is a diff with.
+            if (
+                latest
+                and latest.get("sequence", 0) + 1 < self.interval
+                and not isinstance(latest["timestamp"], str)
+                and self.__parse_timestamp(entry["timestamp"])
+                >= self.__parse_timestamp(latest["timestamp"])
+            ):
+                entry = self.__to_diff_entry(entry, latest, self.__get_state(latest))
+        self.db[self.collection].insert_one(entry)
+        return entry
+
+    def compact(self, collection, id, *, dry_run=False):
+        """
+        Rewrite the history of an item as snapshots every interval entries
+        with diffs in between, the way add would have stored it. Timestamps
+        stored as strings by older versions become dates. Returns the number
+        of entries and their BSON size before and after.
+        """
+        entries = sorted(
+            self.db[self.collection].find({"collection": collection, "object._id": id}),
+            key=lambda entry: (
+                self.__parse_timestamp(entry["timestamp"]),
+                entry["_id"],
+            ),
+        )
+        report = {"entries": len(entries), "size_before": 0, "size_after": 0}
+        operations, previous, previous_state = [], None, None
+        for index, entry in enumerate(self.__replay(entries)):
+            report["size_before"] += len(encode(entries[index]))
+            state = self.__get_entry_state(entry)
+            compacted = self.__get_snapshot_fields(entry)
+            compacted["timestamp"] = self.__parse_timestamp(entry["timestamp"])
+            if index % self.interval:
+                compacted = self.__to_diff_entry(compacted, previous, previous_state)
+            report["size_after"] += len(encode(compacted))
+            operations.append(ReplaceOne({"_id": entry["_id"]}, compacted))
+            previous, previous_state = compacted, state
+        if operations and not dry_run:
+            self.db[self.collection].bulk_write(operations, ordered=False)
+        return report
+
+    def get_all(self, collection, id):
+        """Return all entries of an item, newest first."""
+        return list(self.iter_entries(collection, id))
+
+    def get_at(self, collection, id, timestamp):
+        """Return the entry of an item at timestamp: the last one before it,
+        or the first one when the history starts after timestamp. Entries of
+        older versions, whose timestamp is a string until
+        scripts/migrate_history.py rewrote them, are taken into account."""
+        query = self.__get_item_query(collection, id)
+        for before in [True, False]:
+            entries = [
+                self.db[self.collection].find_one(
+                    {**query, "timestamp": {"$lte" if before else "$gt": timestamp}},
+                    sort=[("timestamp", -1 if before else 1)],
+                ),
+                self.__find_string_timestamp_entry(query, timestamp, before),
+            ]
+            if entries := [entry for entry in entries if entry]:
+                entry = (max if before else min)(
+                    entries,
+                    key=lambda entry: self.__parse_timestamp(entry["timestamp"]),
+                )
+                return self.__get_full_entry(entry)
+        return None
+
+    def get_latest(self, collection, id):
+        entry = self.db[self.collection].find_one(
+            self.__get_item_query(collection, id), sort=[("timestamp", -1)]
+        )
+        return self.__get_full_entry(entry) if entry else None
+
+    def get_page(self, collection, id, *, cursor=None, limit=20):
+        """
+        Return ``{"results": [...], "next_cursor": ...}`` with limit entries,
+        at most HISTORY_PAGE_MAX_LIMIT, of an item, newest first, after
+        cursor. next_cursor is None on the last page. Raises
+        cursor_stage.InvalidCursor for a malformed cursor.
+        """
+        limit = min(limit, HISTORY_PAGE_MAX_LIMIT)
+        results = list(self.iter_entries(collection, id, cursor=cursor, limit=limit))
+        next_cursor = None
+        if limit > 0 and len(results) == limit:
+            next_cursor = cursor_stage.encode(
+                cursor_stage.build(HISTORY_SORT, None), results[-1]
+            )
+        return {"results": results, "next_cursor": next_cursor}
+
+    def iter_entries(self, collection, id, *, cursor=None, limit=None):
+        """
+        Yield the full entries of an item, newest first, after cursor, from
+        one cursor on the history. Only the entries since the last snapshot
+        are held in memory, to replay their diffs.
+        """
+        entry = self.db[self.collection].find_one(
+            self.__get_item_query(collection, id), {"object._id": 1}
+        )
+        if not entry:
+            return
+        pipeline = [
+            {
+                "$match": {
+                    "collection": collection,
+                    "object._id": entry["object"]["_id"],
+                }
+            },
+            *cursor_stage.build(HISTORY_SORT, cursor),
+        ]
+        if limit:
+            pipeline.append({"$limit": limit})
+        chain = []
+        for entry in self.db[self.collection].aggregate(pipeline):
+            chain.append(entry)
+            if "diff" not in entry:
+                yield from reversed(self.__replay(chain[::-1]))
+                chain = []
+        if chain:
+            yield from reversed(self.__replay(chain[::-1]))
+
+    def __find_string_timestamp_entry(self, query, timestamp, before):
+        """Return the entry with a string timestamp closest before, or after,
+        timestamp. Range queries on dates do not match string timestamps."""
+        timestamp = self.__parse_timestamp(timestamp)
+        entries = []
+        for entry in self.db[self.collection].find(
+            {**query, "timestamp": {"$type": "string"}}, {"timestamp": 1}
+        ):
+            parsed = self.__parse_timestamp(entry["timestamp"])
+            if (parsed <= timestamp) == before:
+                entries.append((parsed, entry["_id"]))
+        if not entries:
+            return None
+        _, id = (max if before else min)(entries, key=lambda entry: entry[0])
+        return self.db[self.collection].find_one({"_id": id})
+
+    def __get_base(self, entry, states, state):
+        """Return the state the diff of entry applies to: that of its
+        previous_id in states, or state, the one before it, for diffs
+        stored before previous_id was."""
+        if "previous_id" not in entry:
+            return state
+        return states.get(entry["previous_id"])
+
+    def __get_entry_state(self, entry):
+        state = {"object": entry.get("object"), "relations": entry.get("relations")}
+        if "entity" in entry:
+            state["entity"] = entry["entity"]
+        return state
+
+    def __get_full_entry(self, entry):
+        if "diff" not in entry:
+            return entry
+        return {**self.__get_snapshot_fields(entry), **self.__get_state(entry)}
+
+    def __get_item_query(self, collection, id):
+        return {
+            "collection": collection,
+            "$or": [{"object._id": id}, {"object.identifiers": id}],
+        }
+
+    def __get_snapshot_fields(self, entry):
+        return {
+            key: value
+            for key, value in entry.items()
+            if key not in ["diff", "previous_id", "sequence", "snapshot_timestamp"]
+        }
+
+    def __get_state(self, entry):
+        if "diff" not in entry:
+            return self.__get_entry_state(entry)
+        chain = self.db[self.collection].find(
+            {
+                "collection": entry["collection"],
+                "object._id": entry["object"]["_id"],
+                "timestamp": {
+                    "$gte": entry["snapshot_timestamp"],
+                    "$lte": entry["timestamp"],
+                },
+            },
+            sort=[("timestamp", 1), ("_id", 1)],
+        )
+        states, state = {}, None
+        for link in chain:
+            if "diff" not in link:
+                state = self.__get_entry_state(link)
+            elif (base := self.__get_base(link, states, state)) is not None:
+                state = apply_history_diff(base, link["diff"])
+            else:
+                state = None
+            states[link["_id"]] = state
+            if link["_id"] == entry["_id"]:
+                break
+        return state or {"object": entry["object"], "relations": []}
+
+    def __parse_timestamp(self, timestamp):
+        if isinstance(timestamp, str):
+            timestamp = datetime.fromisoformat(timestamp)
+        if not timestamp.tzinfo:
+            timestamp = timestamp.replace(tzinfo=UTC)
+        return timestamp
+
+    def __replay(self, entries):
+        """Return entries, in ascending order, as full entries."""
+        full_entries, states, state = [], {}, None
+        for entry in entries:
+            if "diff" not in entry:
+                state = states[entry["_id"]] = self.__get_entry_state(entry)
+                full_entries.append(entry)
+                continue
+            # A page can start inside a chain, without the previous entry.
+            if (base := self.__get_base(entry, states, state)) is None:
+                state = self.__get_state(entry)
+            else:
+                state = apply_history_diff(base, entry["diff"])
+            states[entry["_id"]] = state
+            full_entries.append({**self.__get_snapshot_fields(entry), **state})
+        return full_entries
+
+    def __to_diff_entry(self, entry, previous, previous_state):
+        item = entry["object"]
+        return {
+            **{
+                key: value
+                for key, value in entry.items()
+                if key not in ["object", "relations", "entity"]
+            },
+            "object": {
+                "_id": item["_id"],
+                "identifiers": item.get("identifiers", []),
+            },
+            "diff": get_history_diff(previous_state, self.__get_entry_state(entry)),
+            "previous_id": previous["_id"],
+            "sequence": previous.get("sequence", 0) + 1,
+            "snapshot_timestamp": previous.get(
+                "snapshot_timestamp", previous["timestamp"]
+            ),
+        }
+
+
+def get_history_diff(old, new):
+    """
+    Return the changes from old to new as ``{"set": [[path, value], ...],
+    "unset": [path, ...]}``, a path being the list of keys and list indexes
+    to the value. Dictionaries and lists of the same length are compared
+    item by item, other changed values are set as a whole.
+    """
+    diff = {"set": [], "unset": []}
+    _add_changes(diff, [], old, new)
+    return diff
+
+
+def apply_history_diff(document, diff):
+    """Return a copy of document with diff, see get_history_diff, applied."""
+    document = _copy(document)
+    for path in diff.get("unset", []):
+        parent = _walk(document, path[:-1])
+        if isinstance(parent, dict):
+            parent.pop(path[-1], None)
+    for path, value in diff.get("set", []):
+        if not path:
+            document = _copy(value)
+            continue
+        _walk(document, path[:-1])[path[-1]] = _copy(value)
+    return document
+
+
+def _add_changes(diff, path, old, new):
+    if isinstance(old, dict) and isinstance(new, dict):
+        for key in old.keys() - new.keys():
+            diff["unset"].append([*path, key])
+        for key, value in new.items():
+            if key not in old:
+                diff["set"].append([[*path, key], value])
+            else:
+                _add_changes(diff, [*path, key], old[key], value)
+    elif isinstance(old, list) and isinstance(new, list) and len(old) == len(new):
+        for index, (old_value, new_value) in enumerate(zip(old, new, strict=True)):
+            _add_changes(diff, [*path, index], old_value, new_value)
+    elif type(old) is not type(new) or old != new:
+        diff["set"].append([path, new])
+
+
+def _copy(value):
+    if isinstance(value, dict):
+        return {key: _copy(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_copy(item) for item in value]
+    return value
+
+
+def _walk(document, path):
+    for key in path:
+        document = document[key]
+    return document
+
+
+def project_history_entry(entry, fields=None, *, skip_relations=False):
+    """
+    Return entry with only its _id, collection and timestamp and the fields,
+    dotted paths like ``object.metadata``, asked for. skip_relations leaves
+    out the relations.
+    """
+    if not fields and not skip_relations:
+        return entry
+    if not fields:
+        return {key: value for key, value in entry.items() if key != "relations"}
+    projected = {
+        key: entry[key] for key in ["_id", "collection", "timestamp"] if key in entry
+    }
+    for field in fields:
+        *parents, key = field.split(".")
+        source, target = entry, projected
+        for parent in parents:
+            source = source.get(parent) if isinstance(source, dict) else None
+            target = target.setdefault(parent, {})
+        if isinstance(source, dict) and key in source:
+            target[key] = source[key]
+    if skip_relations:
+        projected.pop("relations", None)
+    return projected
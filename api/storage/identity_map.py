@@ -0,0 +1,101 @@
+from contextlib import contextmanager
+from copy import deepcopy
+from functools import wraps
+from os import getenv
+
+from app_context import g
+from metrics import identity_map_lookups
+
+IDENTITY_MAP_ENABLED = getenv("IDENTITY_MAP_ENABLED", True) in [True, "true", "True"]
+
+
+class IdentityMap:
+    """
+    Request-scoped cache of documents read by id.
+
+    A document is registered under its ``_id`` and every one of its
+    ``identifiers``, so a lookup by any of them is served from memory. Documents
+    are copied on the way in and on the way out, callers are free to mutate what
+    they get back.
+    """
+
+    def __init__(self):
+        self._documents = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, collection, id):
+        entry = self._documents.get((collection, id))
+        if entry is None:
+            self.misses += 1
+            identity_map_lookups.labels(collection=collection, result="miss").inc()
+            return None
+        self.hits += 1
+        identity_map_lookups.labels(collection=collection, result="hit").inc()
+        return deepcopy(entry)
+
+    def put(self, collection, document):
+        if not document or "_id" not in document:
+            return
+        entry = deepcopy(document)
+        for key in self.__get_keys(entry):
+            self._documents[(collection, key)] = entry
+
+    def invalidate(self, collection, ids):
+        """Drop the documents known under any of ``ids``.
+
+        Without a collection the ids are dropped from every collection, for
+        writes that resolve their target collection from the object
+        configuration.
+        """
+        for id in ids:
+            for key, entry in list(self._documents.items()):
+                if key[1] == id and (not collection or key[0] == collection):
+                    self.__evict(key[0], entry)
+
+    def invalidate_document(self, collection, document):
+        if document and "_id" in document:
+            self.invalidate(collection, self.__get_keys(document))
+
+    def clear(self):
+        self._documents.clear()
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses}
+
+    def __evict(self, collection, entry):
+        for key in self.__get_keys(entry):
+            if self._documents.get((collection, key)) is entry:
+                del self._documents[(collection, key)]
+
+    def __get_keys(self, document):
+        return {document["_id"], *document.get("identifiers", [])} - {None}
+
+
+def get_identity_map():
+    """Return the identity map of the current request or message, if any."""
+    if not IDENTITY_MAP_ENABLED:
+        return None
+    return g.get("identity_map")
+
+
+@contextmanager
+def identity_map_scope():
+    """Open an identity map for the duration of a request or AMQP message."""
+    previous = g.get("identity_map")
+    g.identity_map = IdentityMap()
+    try:
+        yield g.identity_map
+    finally:
+        g.identity_map = previous
+
+
+def with_identity_map(func):
+    """Run a queue handler inside its own identity map scope."""
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        with identity_map_scope():
+            return func(*args, **kwargs)
+
+    return wrapper
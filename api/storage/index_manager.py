@@ -0,0 +1,194 @@
+from os import getenv
+
+from configuration import get_object_configuration_mapper
+from elody.util import interpret_flat_key
+from logging_elody.log import log
+from object_configurations.none_configuration import NoneConfiguration
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure
+
+# Lookups of an item's history by the id or one of the identifiers of the item,
+# newest entry first (see MongoStorageManager.get_history_for_item). The _id
+# key lets pages of history (see HistoryStore.iter_entries) sort on the index.
+HISTORY_INDEXES = [
+    [
+        ("collection", ASCENDING),
+        ("object._id", ASCENDING),
+        ("timestamp", DESCENDING),
+        ("_id", ASCENDING),
+    ],
+    [
+        ("collection", ASCENDING),
+        ("object.identifiers", ASCENDING),
+        ("timestamp", DESCENDING),
+    ],
+]
+
+# Items of the collections in TTL_INDEX_COLLECTIONS are deleted by Mongo on a
+# TTL index on TTL_INDEX_FIELD, the date their ttl metadata expires, instead of
+# by the TtlChecker cron job. Mongo deletes only the item itself, so this fits
+# items without relations, mediafiles or history, like the tickets in abstracts.
+TTL_INDEX_FIELD = "ttl_expires_at"
+TTL_INDEX_COLLECTIONS = [
+    collection.strip()
+    for collection in getenv("TTL_INDEX_COLLECTIONS", "").split(",")
+    if collection.strip()
+]
+
+
+class IndexManager:
+    """
+    Derives the indexes the API needs from the object configurations.
+
+    Per configured collection this covers:
+    - ``type``, which every v2 filter and count matches on first;
+    - per object list (``document_info()["object_lists"]``) a multikey index
+      on its discriminator and value, e.g. ``metadata.key`` + ``metadata.value``
+      for ``$elemMatch`` filters, and for lists that point at other items
+      (``relations``) one on ``key`` to find the items pointing at an id;
+    - the Typesense ``facet_fields`` that distinct options group on;
+    - the indexes a configuration declares itself in ``crud()["indexes"]``,
+      as lists of ``(field, direction)``. Sort keys belong here: ``sorting`` is
+      a hook, so the fields it sorts on cannot be derived.
+
+    Indexes are compared on their key pattern, an index that already exists
+    under another name counts as present.
+    """
+
+    def __init__(self, db):
+        self.db = db
+
+    def plan(self):
+        """Return ``{collection: [key pattern, ...]}`` of the required indexes."""
+        plan = {"history": [list(keys) for keys in HISTORY_INDEXES]}
+        configs = list(get_object_configuration_mapper().get_all().values()) or [
+            NoneConfiguration
+        ]
+        for config_class in configs:
+            try:
+                config = config_class()
+                crud = config.crud()
+                object_lists = config.document_info().get("object_lists", {})
+            except Exception as exception:
+                log.warning(f"Skipping {config_class} for indexes: {exception}")
+                continue
+            if crud.get("storage_type", "db") != "db":
+                continue
+            indexes = plan.setdefault(crud.get("collection", "entities"), [])
+            self.__add(indexes, [("type", ASCENDING)])
+            for object_list, discriminator in object_lists.items():
+                for keys in self.__get_object_list_indexes(object_list, discriminator):
+                    self.__add(indexes, keys)
+            typesense = crud.get("typesense") or {}
+            for field in typesense.get("facet_fields", []):
+                self.__add(indexes, self.__get_field_index(field, object_lists))
+            for keys in crud.get("indexes", []):
+                self.__add(indexes, [tuple(key) for key in keys])
+        return plan
+
+    def apply(self, plan=None):
+        """Create the missing indexes of ``plan``, return what was done."""
+        report = {"created": [], "existing": [], "failed": []}
+        for collection, indexes in (plan or self.plan()).items():
+            existing = self.__get_existing_key_patterns(collection)
+            for keys in indexes:
+                if tuple(keys) in existing:
+                    report["existing"].append((collection, keys))
+                    continue
+                try:
+                    self.db[collection].create_index(keys)
+                    report["created"].append((collection, keys))
+                except OperationFailure as exception:
+                    log.error(
+                        f"Failed to create index {keys} on {collection}: {exception}"
+                    )
+                    report["failed"].append((collection, keys))
+        return report
+
+    def advise(self, plan=None, pipelines=None, profile_limit=100):
+        """Report missing and unused indexes and the queries that scan collections.
+
+        Unused indexes come from ``$indexStats``, counted since the last restart
+        of the server. Collection scans come from the explain output of
+        ``pipelines`` (``[{"collection": ..., "pipeline": [...]}]``) and from
+        the database profiler, when it is enabled.
+        """
+        plan = plan or self.plan()
+        report = {"missing": [], "unused": [], "collection_scans": []}
+        for collection, indexes in plan.items():
+            existing = self.__get_existing_key_patterns(collection)
+            report["missing"].extend(
+                (collection, keys) for keys in indexes if tuple(keys) not in existing
+            )
+            for stats in self.db[collection].aggregate([{"$indexStats": {}}]):
+                if stats["name"] != "_id_" and not stats["accesses"]["ops"]:
+                    report["unused"].append((collection, stats["name"]))
+        for captured in pipelines or []:
+            explain = self.db.command(
+                "explain",
+                {
+                    "aggregate": captured["collection"],
+                    "pipeline": captured["pipeline"],
+                    "cursor": {},
+                },
+                verbosity="queryPlanner",
+            )
+            if "COLLSCAN" in self.__get_plan_stages(explain):
+                report["collection_scans"].append(
+                    (captured["collection"], captured["pipeline"])
+                )
+        for profiled in self.db["system.profile"].find(
+            {"planSummary": "COLLSCAN"}, limit=profile_limit
+        ):
+            collection = profiled.get("ns", "").split(".", 1)[-1]
+            command = profiled.get("command", {})
+            report["collection_scans"].append(
+                (collection, command.get("pipeline") or command.get("filter"))
+            )
+        return report
+
+    def __add(self, indexes, keys):
+        if keys and keys not in indexes:
+            indexes.append(keys)
+
+    def __get_object_list_indexes(self, object_list, discriminator):
+        value_key = "value" if discriminator == "key" else "key"
+        indexes = [
+            [
+                (f"{object_list}.{discriminator}", ASCENDING),
+                (f"{object_list}.{value_key}", ASCENDING),
+            ]
+        ]
+        if discriminator != "key":
+            indexes.append([(f"{object_list}.key", ASCENDING)])
+        return indexes
+
+    def __get_field_index(self, field, object_lists):
+        keys_info = interpret_flat_key(field, object_lists)
+        if object_list := keys_info[0]["object_list"]:
+            return [
+                (f"{keys_info[0]['key']}.{object_lists[object_list]}", ASCENDING),
+                (f"{keys_info[0]['key']}.{keys_info[-1]['key']}", ASCENDING),
+            ]
+        return [
+            ("type", ASCENDING),
+            (".".join(info["key"] for info in keys_info), ASCENDING),
+        ]
+
+    def __get_existing_key_patterns(self, collection):
+        return {
+            tuple(index["key"].items()) for index in self.db[collection].list_indexes()
+        }
+
+    def __get_plan_stages(self, explain):
+        stages = set()
+        nodes = [explain]
+        while nodes:
+            node = nodes.pop()
+            if isinstance(node, dict):
+                if "stage" in node:
+                    stages.add(node["stage"])
+                nodes.extend(node.values())
+            elif isinstance(node, list):
+                nodes.extend(node)
+        return stages
@@ -205,6 +205,18 @@ class MemoryStorageManager(GenericStorageManager):
             else self.collections[collection][content["_id"]]
         )
 
+    def traverse_collection_item_relations(
+        self, collection, obj_id, relation_type, max_depth=None
+    ):
+        if not (item := self.get_item_from_collection_by_id(collection, obj_id)):
+            return []
+        return self._walk_relations(
+            item,
+            relation_type,
+            lambda key: self.get_item_from_collection_by_id(collection, key),
+            max_depth,
+        )
+
     def update_collection_item_relations(
         self, collection, obj_id, content, parent=True
     ):
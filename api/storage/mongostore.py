@@ -20,10 +20,14 @@ from elody.util import (
 from logging_elody.log import log
 from migration.migrate import migrate
 from policy_factory import get_user_context
-from pymongo import ASCENDING, DESCENDING, MongoClient
-from pymongo.errors import DuplicateKeyError, WriteError
+from pymongo import ASCENDING, DESCENDING, MongoClient, ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError, WriteError
 from rabbit import get_rabbit
-from storage.genericstore import GenericStorageManager
+from storage.genericstore import RELATION_TRAVERSAL_MAX_DEPTH, GenericStorageManager
+from storage.history_store import HistoryStore
+from storage.identity_map import get_identity_map
+from storage.index_manager import TTL_INDEX_FIELD, IndexManager
+from storage.relation_writer import RelationWriter
 from tracing import get_tracer, init_mongo_instrumentation
 from werkzeug.exceptions import Conflict, PreconditionFailed
 
@@ -54,6 +58,17 @@ class MongoStorageManager(GenericStorageManager):
             True,
         ]
         self.read_preference = getenv("MONGODB_READ_PREFERENCE", "secondaryPreferred")
+        self.bulk_read_chunk_size = int(getenv("MONGODB_BULK_READ_CHUNK_SIZE", 1000))
+        self.manage_indexes = getenv("MONGODB_MANAGE_INDEXES", False) in [
+            "True",
+            "true",
+            True,
+        ]
+        self.relation_transactions = getenv("MONGODB_RELATION_TRANSACTIONS", False) in [
+            "True",
+            "true",
+            True,
+        ]
 
         self.client = MongoClient(
             self.__create_mongo_connection_string(),
@@ -65,8 +80,21 @@ class MongoStorageManager(GenericStorageManager):
         if apply_default_entities_index:
             self.db.entities.create_index("identifiers", unique=True)
             self.db.entities.create_index("object_id", unique=True, sparse=True)
+        if self.manage_indexes:
+            self.__apply_managed_indexes()
+
+    def __apply_managed_indexes(self):
+        try:
+            report = IndexManager(self.db).apply()
+        except Exception as exception:
+            log.exception(
+                f"Failed to apply managed indexes: {exception}", exc_info=exception
+            )
+            return
+        for collection, keys in report["created"]:
+            log.info(f"Created index {keys} on {collection}")
 
-    def __add_child_relations(self, id, relations, collection=None):
+    def __add_child_relations(self, writer, id, relations, collection=None):
         for relation in relations:
             collection_for_this_iteration = (
                 collection or self._map_relation_to_collection(relation["type"])
@@ -76,14 +104,7 @@ class MongoStorageManager(GenericStorageManager):
             if not dst_relation.get("type"):
                 continue
             dst_relation["key"] = id
-            dst_id = relation["key"]
-            dst_content = [dst_relation]
-            self.add_sub_item_to_collection_item(
-                collection_for_this_iteration,
-                dst_id,
-                "relations",
-                dst_content,
-            )
+            writer.add(collection_for_this_iteration, relation["key"], dst_relation)
 
     def __create_sortable_metadata(self, metadata):
         sort = dict()
@@ -125,15 +146,74 @@ class MongoStorageManager(GenericStorageManager):
         return connection_string
 
     def _delete_impacted_relations(self, collection, id):
+        return self.__write_relations(
+            self.__get_impacted_relations_writer(collection, id)
+        )
+
+    def __get_impacted_relations_writer(self, collection, id):
         relations = self.get_collection_item_sub_item(collection, id, "relations")
-        relations = relations or []
-        for obj in relations:
-            self.delete_collection_item_sub_item_key(
-                self._map_relation_to_collection(obj["type"]),
-                obj["key"],
-                "relations",
-                id,
+        writer = RelationWriter(self.db, self._get_id_query)
+        for obj in relations or []:
+            writer.remove(self._map_relation_to_collection(obj["type"]), obj["key"], id)
+        return writer
+
+    def __find_duplicate_identifiers(self, items):
+        """Return {index: NonUniqueException} for the items whose identifiers
+        exist already, with one projected $in per resolved collection, or are
+        claimed by an earlier item of the list."""
+        try:
+            resolve_collections = get_user_context().bag.get("collection_resolver")
+        except:
+            resolve_collections = None
+        if not resolve_collections:
+            return {}
+
+        identifiers = list(
+            dict.fromkeys(
+                identifier
+                for item in items
+                if not item.get("data")
+                for identifier in item.get("identifiers", [])
             )
+        )
+        existing_identifiers = set()
+        for collection in resolve_collections():
+            for i in range(0, len(identifiers), self.bulk_read_chunk_size):
+                chunk = identifiers[i : i + self.bulk_read_chunk_size]
+                for document in self.db[collection].find(
+                    {"identifiers": {"$in": chunk}}, {"identifiers": 1}
+                ):
+                    existing_identifiers.update(document.get("identifiers", []))
+        duplicates = {}
+        for index, item in enumerate(items):
+            if item.get("data"):
+                continue
+            if duplicate_keys := [
+                identifier
+                for identifier in item.get("identifiers", [])
+                if identifier in existing_identifiers
+            ]:
+                duplicates[index] = self.__get_duplicate_identifiers_exception(
+                    duplicate_keys
+                )
+            else:
+                existing_identifiers.update(item.get("identifiers", []))
+        return duplicates
+
+    def __get_duplicate_entry_exception(self, config, errmsg):
+        try:
+            duplicate_entry = errmsg.split('"')[1].split(":")[-1]
+        except Exception:
+            duplicate_entry = errmsg
+        exception = NonUniqueException(
+            f"{get_error_code(ErrorCode.DUPLICATE_ENTRY, get_write())} | duplicate_entry:{duplicate_entry} - Following entry must be unique: {duplicate_entry}",
+        )
+        return self.__get_non_unique_exception(config, exception)
+
+    def __get_duplicate_identifiers_exception(self, duplicate_keys):
+        return NonUniqueException(
+            f"{get_error_code(ErrorCode.DUPLICATE_IDENTIFIERS, get_write())} | prefix: | duplicate_keys:{', '.join(list(duplicate_keys))} - Entity with following identifiers already exists: {', '.join(list(duplicate_keys))}",
+        )
 
     def __get_filter_fields(self, fields):
         filter_fields = {}
@@ -159,6 +239,13 @@ class MongoStorageManager(GenericStorageManager):
             query["type"] = type
         return query
 
+    def __get_ttl_expired_query(self):
+        return {
+            "metadata": {
+                "$elemMatch": {"key": "ttl", "value": {"$lt": time.time()}},
+            },
+        }
+
     def __get_ids_query(self, ids):
         return {"$or": [{"_id": {"$in": ids}}, {"identifiers": {"$in": ids}}]}
 
@@ -176,6 +263,50 @@ class MongoStorageManager(GenericStorageManager):
             items["results"].append(self._prepare_mongo_document(document, True))
         return items
 
+    def __get_non_unique_exception(self, config, error):
+        construct_document_exception_message = config.crud()[
+            "document_exception_message_constructor"
+        ]
+        return NonUniqueException(
+            construct_document_exception_message(error, str(error))
+        )
+
+    def __get_relation_order_expression(self, id):
+        relation = {
+            "$first": {
+                "$filter": {
+                    "input": {"$ifNull": ["$relations", []]},
+                    "cond": {"$eq": ["$$this.key", id]},
+                }
+            }
+        }
+        return {
+            "$let": {
+                "vars": {"relation": {"$ifNull": [relation, {}]}},
+                "in": {
+                    "$first": {
+                        "$map": {
+                            "input": {
+                                "$filter": {
+                                    "input": {"$ifNull": ["$$relation.metadata", []]},
+                                    "cond": {"$eq": ["$$this.key", "order"]},
+                                }
+                            },
+                            "in": "$$this.value",
+                        }
+                    }
+                },
+            }
+        }
+
+    def __invalidate_identity_map(self, collection, ids=None, documents=None):
+        if not (identity_map := get_identity_map()):
+            return
+        if ids:
+            identity_map.invalidate(collection, ids)
+        for document in documents or []:
+            identity_map.invalidate_document(collection, document)
+
     def __replace_dictionary_keys(self, data, reversed):
         if type(data) is dict:
             new_dict = dict()
@@ -241,9 +372,41 @@ class MongoStorageManager(GenericStorageManager):
                 duplicate_keys = set(documents[0]["identifiers"]) & set(
                     item["identifiers"],
                 )
-                raise NonUniqueException(
-                    f"{get_error_code(ErrorCode.DUPLICATE_IDENTIFIERS, get_write())} | prefix: | duplicate_keys:{', '.join(list(duplicate_keys))} - Entity with following identifiers already exists: {', '.join(list(duplicate_keys))}",
+                raise self.__get_duplicate_identifiers_exception(duplicate_keys)
+
+    def __write_relations(self, *writers):
+        """Execute writers one after the other, in one transaction with
+        MONGODB_RELATION_TRANSACTIONS."""
+        if self.relation_transactions:
+            with self.client.start_session() as session:
+                results = session.with_transaction(
+                    lambda session: [
+                        result
+                        for writer in writers
+                        for result in writer.execute(session, raise_on_error=True)
+                    ]
+                )
+        else:
+            results = [result for writer in writers for result in writer.execute()]
+        ids_by_collection = {}
+        for result in results:
+            ids_by_collection.setdefault(result["collection"], set()).add(result["id"])
+            if result["status"] == "failed":
+                log.warning(
+                    f"Failed to write relation {result['type']} to {result['key']} "
+                    f"on {result['collection']}/{result['id']}: {result['error']}"
                 )
+        for collection, ids in ids_by_collection.items():
+            self.__invalidate_identity_map(collection, list(ids))
+        return results
+
+    def __write_item_relations(self, collection, id, relations, removals, added):
+        items = RelationWriter(self.db, self._get_id_query)
+        items.set(collection, id, relations)
+        additions = RelationWriter(self.db, self._get_id_query)
+        self.__add_child_relations(additions, id, added)
+        self.__write_relations(removals, items, additions)
+        self.__invalidate_identity_map(collection, [id])
 
     def _map_entity_relation(self, relation):
         relations = {
@@ -312,6 +475,11 @@ class MongoStorageManager(GenericStorageManager):
             document["sort"] = self.__create_sortable_metadata(document["metadata"])
         return migrate(document)
 
+    def add_item_to_history(self, content):
+        content["_id"] = self._get_autogenerated_id_for_item(content)
+        content["identifiers"] = self._get_autogenerated_identifiers_for_item(content)
+        return HistoryStore(self.db).add(content)
+
     def add_mediafile_to_collection_item(
         self,
         collection,
@@ -408,8 +576,11 @@ class MongoStorageManager(GenericStorageManager):
         dst_collection=None,
     ):
         relations = [relation for relation in relations if relation.get("type")]
-        self.add_sub_item_to_collection_item(collection, id, "relations", relations)
-        self.__add_child_relations(id, relations, dst_collection)
+        writer = RelationWriter(self.db, self._get_id_query)
+        for relation in relations:
+            writer.add(collection, id, relation)
+        self.__add_child_relations(writer, id, relations, dst_collection)
+        self.__write_relations(writer)
         return relations
 
     def add_sub_item_to_collection_item(self, collection, id, sub_item, content):
@@ -417,6 +588,7 @@ class MongoStorageManager(GenericStorageManager):
             self._get_id_query(id),
             {"$addToSet": {sub_item: {"$each": content}}},
         )
+        self.__invalidate_identity_map(collection, [id])
         return content if result.modified_count else None
 
     def check_health(self):
@@ -446,6 +618,7 @@ class MongoStorageManager(GenericStorageManager):
                     },
                 },
             )
+            self.__invalidate_identity_map(collection, impacted_ids)
             if parent:
                 self.delete_collection_item_sub_item_key(
                     self._map_relation_to_collection(relation["type"]),
@@ -470,6 +643,7 @@ class MongoStorageManager(GenericStorageManager):
                 self.db[config.crud()["collection"]].delete_one(
                     self._get_id_query(item["_id"]),
                 )
+                self.__invalidate_identity_map(None, documents=[item])
             post_crud_hook(
                 crud="delete",
                 document=item,
@@ -486,6 +660,38 @@ class MongoStorageManager(GenericStorageManager):
     def delete_item_from_collection(self, collection, id):
         self._delete_impacted_relations(collection, id)
         self.db[collection].delete_one(self._get_id_query(id))
+        self.__invalidate_identity_map(collection, [id])
+
+    def delete_items_from_collection(self, collection, ids):
+        """
+        Delete the items with _id in ids like delete_item_from_collection,
+        with one bulk write per collection for the relations pointing at them
+        and one delete_many for the items. Returns how many were deleted.
+        """
+        ids = list(ids)
+        writer = RelationWriter(self.db, self._get_id_query)
+        for item in self.db[collection].find(
+            {"_id": {"$in": ids}, "relations": {"$exists": True}}, {"relations": 1}
+        ):
+            for relation in item.get("relations") or []:
+                writer.remove(
+                    self._map_relation_to_collection(relation["type"]),
+                    relation["key"],
+                    item["_id"],
+                )
+        self.__write_relations(writer)
+        deleted = self.db[collection].delete_many({"_id": {"$in": ids}}).deleted_count
+        self.__invalidate_identity_map(collection, ids)
+        return deleted
+
+    def delete_history_for_items(self, collection, ids):
+        """Delete the history of the items with _id in ids, return how many
+        entries were deleted."""
+        return (
+            self.db["history"]
+            .delete_many({"collection": collection, "object._id": {"$in": list(ids)}})
+            .deleted_count
+        )
 
     def delete_data_from_collection_item(self, collection, item, content, spec):
         config = get_object_configuration_mapper().get(item["type"])
@@ -514,6 +720,7 @@ class MongoStorageManager(GenericStorageManager):
                 get_user_context=get_user_context,
             )
             self.db[collection].replace_one({"_id": item["_id"]}, item)
+            self.__invalidate_identity_map(collection, documents=[item])
             post_crud_hook(
                 crud="update",
                 document=item,
@@ -564,39 +771,53 @@ class MongoStorageManager(GenericStorageManager):
         asc=0,
         sort="order",
     ):
-        item = self.get_item_from_collection_by_id(collection, id)
-        mediafiles = []
-        documents = self.db["mediafiles"].find(
-            {"relations.key": id},
-            skip=skip,
-            limit=limit,
-        )
-        documents.sort(
-            self.get_sort_field(sort, True),
-            ASCENDING if asc else DESCENDING,
-        )
-        for document in documents:
-            mediafiles.append(self._prepare_mongo_document(document, True))
+        """Return a page of the mediafiles related to item ``id``.
+
+        Sorting, skip and limit run in one aggregation. With ``sort="order"``
+        mediafiles are ordered on the ``order`` metadata of their relation to
+        the item, which the item's hasMediafile relation is mirrored into;
+        mediafiles without a numeric order come last (first when ``asc``).
+        Only the ids are sorted, the documents of the page are read afterwards.
+        """
+        page = [{"$skip": skip}] if skip else []
+        if limit:
+            page.append({"$limit": limit})
         if sort == "order":
-            mediafiles_sort = []
-            for relation in item.get("relations", []):
-                if relation.get("type") == "hasMediafile":
-                    for metadata in relation.get("metadata", []):
-                        sort_order = ""
-                        if metadata["key"] == "order":
-                            sort_order = metadata["value"]
-                        if isinstance(sort_order, (int, float)):
-                            data = {"id": relation.get("key"), "sort_order": sort_order}
-                            mediafiles_sort.append(data)
-            sort_dict = {item["id"]: item["sort_order"] for item in mediafiles_sort}
-            # Sort the results using the sort dictionary
-            sorted_results = sorted(
-                mediafiles,
-                key=lambda x: sort_dict.get(x["_id"], len(mediafiles) + 1),
-                reverse=asc,
-            )
-            return sorted_results
-        return mediafiles
+            direction = DESCENDING if asc else ASCENDING
+            pipeline = [
+                {"$match": {"relations.key": id}},
+                {"$project": {"_order": self.__get_relation_order_expression(id)}},
+                {"$set": {"_unordered": {"$not": [{"$isNumber": "$_order"}]}}},
+                {"$sort": {"_unordered": direction, "_order": direction, "_id": 1}},
+                *page,
+                {
+                    "$lookup": {
+                        "from": "mediafiles",
+                        "localField": "_id",
+                        "foreignField": "_id",
+                        "as": "mediafile",
+                    }
+                },
+                {"$unwind": "$mediafile"},
+                {"$replaceRoot": {"newRoot": "$mediafile"}},
+            ]
+        else:
+            direction = ASCENDING if asc else DESCENDING
+            pipeline = [
+                {"$match": {"relations.key": id}},
+                {"$sort": {self.get_sort_field(sort, True): direction, "_id": 1}},
+                *page,
+            ]
+        documents = self.db["mediafiles"].aggregate(
+            pipeline, allowDiskUse=self.allow_disk_use
+        )
+        return [self._prepare_mongo_document(document, True) for document in documents]
+
+    def get_mediafiles_of_items(self, ids):
+        """Return the mediafiles related to any of the items with _id in ids,
+        with one query, see get_collection_item_mediafiles for one item."""
+        documents = self.db["mediafiles"].find({"relations.key": {"$in": list(ids)}})
+        return [self._prepare_mongo_document(document, True) for document in documents]
 
     def get_collection_item_relations(
         self,
@@ -650,87 +871,74 @@ class MongoStorageManager(GenericStorageManager):
         return list(self.db["mediafiles"].find(query))
 
     def get_history_for_item(self, collection, id, timestamp=None, all_entries=None):
-        query = {
-            "$and": [
-                {"collection": collection},
-                {"$or": [{"object._id": id}, {"object.identifiers": id}]},
-            ],
-        }
+        history = HistoryStore(self.db)
         if timestamp:
-            results = self.db.history.aggregate(
-                [
-                    {
-                        "$match": {
-                            "$and": [
-                                {"collection": collection},
-                                {
-                                    "$or": [
-                                        {"object._id": id},
-                                        {"object.identifiers": id},
-                                    ],
-                                },
-                            ],
-                        },
-                    },
-                    {
-                        "$project": {
-                            "_id": 1,
-                            "identifiers": 1,
-                            "object": 1,
-                            "relations": 1,
-                            "timestamp": 1,
-                            "difference": {
-                                "$abs": {
-                                    "$subtract": [
-                                        datetime.fromisoformat(timestamp),
-                                        {
-                                            "$dateFromString": {
-                                                "dateString": "$timestamp",
-                                            },
-                                        },
-                                    ],
-                                },
-                            },
-                        },
-                    },
-                    {"$sort": {"difference": 1}},
-                    {"$limit": 1},
-                ],
-                allowDiskUse=self.allow_disk_use,
-            )
-            result = list(results)[0]
-            del result["difference"]
-            return result
+            return history.get_at(collection, id, datetime.fromisoformat(timestamp))
         if all_entries:
-            return list(self.db["history"].find(query, sort=[("timestamp", -1)]))
-        return self.db["history"].find_one(query, sort=[("timestamp", -1)])
+            return history.get_all(collection, id)
+        return history.get_latest(collection, id)
 
-    def get_mediafile_linked_entities(self, mediafile, linked_entities=[]):
+    def get_history_page_for_item(self, collection, id, *, cursor=None, limit=20):
+        return HistoryStore(self.db).get_page(
+            collection, id, cursor=cursor, limit=limit
+        )
+
+    def get_mediafile_linked_entities(self, mediafile):
         relations = self.get_collection_item_relations("mediafiles", mediafile["_id"])
-        for relation in relations:
-            if relation.get("type") == "belongsTo":
-                linked_entities.append(
-                    {
-                        "entity_id": relation["key"],
-                        "primary_mediafile": relation.get("is_primary"),
-                        "primary_thumbnail": relation.get("is_primary_thumbnail"),
-                    },
-                )
-            if relation.get("type") == "belongsToParent":
-                return self.get_mediafile_linked_entities(
-                    self.get_item_from_collection_by_id(
-                        "mediafiles",
-                        relation.get("key"),
-                    ),
-                    linked_entities,
-                )
-        return linked_entities
+        for parent in self.traverse_collection_item_relations(
+            "mediafiles", mediafile["_id"], "belongsToParent"
+        ):
+            relations.extend(parent.get("relations", []))
+        return [
+            {
+                "entity_id": relation["key"],
+                "primary_mediafile": relation.get("is_primary"),
+                "primary_thumbnail": relation.get("is_primary_thumbnail"),
+            }
+            for relation in relations
+            if relation.get("type") == "belongsTo"
+        ]
 
     def get_item_from_collection_by_id(self, collection, id, *, to_format="elody"):
+        identity_map = get_identity_map() if to_format == "elody" else None
+        if identity_map and (document := identity_map.get(collection, id)):
+            return document
         if document := self.db[collection].find_one(self._get_id_query(id)):
-            return self._prepare_mongo_document(document, True, to_format=to_format)
+            document = self._prepare_mongo_document(
+                document,
+                True,
+                to_format=to_format,
+            )
+            if identity_map:
+                identity_map.put(collection, document)
+            return document
         return None
 
+    def get_items_from_collection_by_ids(self, ids, collections=None, fields=None):
+        collections = self._get_collections_for_bulk_read(collections)
+        identity_map = get_identity_map() if not fields else None
+        projection = None
+        if fields:
+            projection = dict.fromkeys(["identifiers", *fields], 1)
+        items = []
+        for collection in collections:
+            missing_ids = []
+            for id in dict.fromkeys(ids):
+                if identity_map and (document := identity_map.get(collection, id)):
+                    items.append(document)
+                else:
+                    missing_ids.append(id)
+            for i in range(0, len(missing_ids), self.bulk_read_chunk_size):
+                chunk = missing_ids[i : i + self.bulk_read_chunk_size]
+                for document in self.db[collection].find(
+                    self.__get_ids_query(chunk), projection
+                ):
+                    document = self._prepare_mongo_document(document, True)
+                    if identity_map:
+                        identity_map.put(collection, document)
+                    items.append(document)
+        return self._order_items_by_ids(ids, items)
+
     def get_item_from_collection_by_metadata(self, collection, key, value, type=None):
         if document := self.db[collection].find_one(
             self.__get_metatdata_query(key, value, type),
@@ -795,13 +1003,60 @@ class MongoStorageManager(GenericStorageManager):
         return items
 
     def get_ttl_expired_items_from_collection(self, collection):
-        current_timestamp = time.time()
-        query = {
-            "metadata": {
-                "$elemMatch": {"key": "ttl", "value": {"$lt": current_timestamp}},
-            },
+        return list(self.db[collection].find(self.__get_ttl_expired_query()))
+
+    def iter_ttl_expired_ids(self, collection, chunk_size=1000):
+        """Yield the _ids of the expired items of collection in lists of at
+        most chunk_size, read from one cursor."""
+        chunk = []
+        for item in self.db[collection].find(
+            self.__get_ttl_expired_query(), {"_id": 1}, batch_size=chunk_size
+        ):
+            chunk.append(item["_id"])
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def count_ttl_expired_items(self, collection):
+        return self.db[collection].count_documents(self.__get_ttl_expired_query())
+
+    def ensure_ttl_index(self, collection):
+        """
+        Let Mongo expire the items of collection with a TTL index on
+        TTL_INDEX_FIELD. The expired items without that field, created before
+        it was set or by clients that only set the ttl metadata, get it from
+        their ttl metadata. Returns how many items got the field.
+        """
+        self.db[collection].create_index(
+            [(TTL_INDEX_FIELD, ASCENDING)], expireAfterSeconds=0
+        )
+        ttl = {
+            "$arrayElemAt": [
+                {
+                    "$filter": {
+                        "input": "$metadata",
+                        "cond": {"$eq": ["$$this.key", "ttl"]},
+                    }
+                },
+                0,
+            ]
         }
-        return list(self.db[collection].find(query))
+        expires_at = {
+            "$let": {
+                "vars": {"ttl": ttl},
+                "in": {"$toDate": {"$multiply": ["$$ttl.value", 1000]}},
+            }
+        }
+        return (
+            self.db[collection]
+            .update_many(
+                {**self.__get_ttl_expired_query(), TTL_INDEX_FIELD: {"$exists": False}},
+                [{"$set": {TTL_INDEX_FIELD: expires_at}}],
+            )
+            .modified_count
+        )
 
     def get_metadata_values_for_collection_item_by_key(self, collection, key):
         if key in ["type"]:
@@ -868,21 +1123,21 @@ class MongoStorageManager(GenericStorageManager):
                 self.__set_new_primary(entity, primary_mediafile, primary_thumbnail)
 
     def patch_collection_item_relations(self, collection, id, content, parent=True):
+        """Replace the relations of the item with the keys in content and their
+        reverse edges. The removed reverse edges, the relations of the item and
+        the added reverse edges are written in this order, in one transaction
+        with MONGODB_RELATION_TRANSACTIONS."""
+        removals = RelationWriter(self.db, self._get_id_query)
         for item in content:
-            self.delete_collection_item_sub_item_key(
-                collection,
-                id,
-                "relations",
-                item["key"],
-            )
-            self.delete_collection_item_sub_item_key(
-                self._map_relation_to_collection(item["type"]),
-                item["key"],
-                "relations",
-                id,
+            removals.remove(
+                self._map_relation_to_collection(item["type"]), item["key"], id
             )
+        keys = {item["key"] for item in content}
         relations = self.get_collection_item_sub_item(collection, id, "relations")
-        relations = [*relations, *content] if relations else content
+        relations = [
+            *[relation for relation in relations or [] if relation["key"] not in keys],
+            *content,
+        ]
         for relation in relations:
             if relation.get("metadata") is not None:
                 relation["sort"] = self.__create_sortable_metadata(
@@ -892,8 +1147,7 @@ class MongoStorageManager(GenericStorageManager):
                         if item.get("key") == "order"
                     ],
                 )
-        self.update_collection_item_sub_item(collection, id, "relations", relations)
-        self.__add_child_relations(id, content)
+        self.__write_item_relations(collection, id, relations, removals, content)
         return content
 
     def patch_item_from_collection(
@@ -916,6 +1170,7 @@ class MongoStorageManager(GenericStorageManager):
                     f"{get_error_code(ErrorCode.DUPLICATE_ENTRY, get_write())} - {ex.details.get('errmsg')}",
                 )
             raise ex
+        self.__invalidate_identity_map(collection, [id])
         return self.get_item_from_collection_by_id(collection, id)
 
     def patch_item_from_collection_v2(
@@ -971,6 +1226,10 @@ class MongoStorageManager(GenericStorageManager):
                     {"_id": item["_id"], **({etag_key: etag} if etag else {})},
                     item,
                 )
+                self.__invalidate_identity_map(
+                    collection,
+                    documents=[unpatched_item, item],
+                )
                 if result.matched_count == 0:
                     raise Conflict(
                         "Optimistic concurrency failure. Target document version has changed.",
@@ -1078,6 +1337,11 @@ class MongoStorageManager(GenericStorageManager):
                         raise exception
                 except Exception as exception:
                     raise exception
+                finally:
+                    self.__invalidate_identity_map(
+                        None,
+                        documents=[unpatched_item, item],
+                    )
                 if run_post_crud_hook:
                     post_crud_hook(
                         crud="update",
@@ -1153,6 +1417,24 @@ class MongoStorageManager(GenericStorageManager):
         is_history=False,
         run_post_crud_hook=True,
     ):
+        if isinstance(items, list) and items and not is_history:
+            results = self.save_items_to_collection_v2(
+                collection,
+                items,
+                run_post_crud_hook=run_post_crud_hook,
+                raise_on_error=True,
+            )
+            errors = [result for result in results if isinstance(result, Exception)]
+            for error in errors:
+                if not isinstance(error, NonUniqueException):
+                    raise error
+            if errors and (len(errors) == len(items) or self.is_dry_run()):
+                raise errors[-1]
+            return next(
+                result
+                for result in reversed(results)
+                if not isinstance(result, Exception)
+            )
         errors = []
         if not isinstance(items, list):
             items = [items]
@@ -1186,28 +1468,15 @@ class MongoStorageManager(GenericStorageManager):
                 if not self.is_dry_run():
                     log.info("Successfully saved item", item)
             except (DuplicateKeyError, NonUniqueException) as error:
-                construct_document_exception_message = config.crud()[
-                    "document_exception_message_constructor"
-                ]
                 if isinstance(error, DuplicateKeyError):
                     if error.code == 11000:
-                        try:
-                            duplicate_entry = (
-                                error.details.get("errmsg").split('"')[1].split(":")[-1]
+                        errors.append(
+                            self.__get_duplicate_entry_exception(
+                                config, error.details.get("errmsg")
                             )
-                        except Exception:
-                            duplicate_entry = error.details.get("errmsg")
-                        exception = NonUniqueException(
-                            f"{get_error_code(ErrorCode.DUPLICATE_ENTRY, get_write())} | duplicate_entry:{duplicate_entry} - Following entry must be unique: {duplicate_entry}",
                         )
-                        message = construct_document_exception_message(
-                            exception,
-                            str(exception),
-                        )
-                        errors.append(NonUniqueException(message))
                 else:
-                    message = construct_document_exception_message(error, str(error))
-                    errors.append(NonUniqueException(message))
+                    errors.append(self.__get_non_unique_exception(config, error))
             except Exception as error:
                 log.exception(
                     f"{error.__class__.__name__}: {error}",
@@ -1220,6 +1489,86 @@ class MongoStorageManager(GenericStorageManager):
                 raise errors[-1]
         return self._prepare_mongo_document(item, True, to_format="elody")
 
+    def save_items_to_collection_v2(
+        self, collection, items, *, run_post_crud_hook=True, raise_on_error=False
+    ):
+        """Save items with one unordered insert_many per collection.
+
+        Returns a list aligned with items holding the saved item, or the
+        exception it failed with, so one failing item does not stop the rest.
+        With raise_on_error, the first item failing its pre_crud_hook for
+        another reason than uniqueness is raised before anything is written.
+        """
+        results = [None] * len(items)
+        pending = {}
+        duplicates = self.__find_duplicate_identifiers(items)
+        for index, item in enumerate(items):
+            config = get_object_configuration_mapper().get(item["type"])
+            try:
+                if duplicate := duplicates.get(index):
+                    raise duplicate
+                pre_crud_hook = config.crud()["pre_crud_hook"]
+                item = pre_crud_hook(
+                    crud="create", timestamp=datetime.now(timezone.utc), document=item
+                )
+            except NonUniqueException as error:
+                results[index] = self.__get_non_unique_exception(config, error)
+                continue
+            except Exception as error:
+                results[index] = error
+                continue
+            pending.setdefault(config.crud()["collection"], []).append(
+                (index, item, config)
+            )
+        if raise_on_error:
+            for error, item in zip(results, items, strict=True):
+                if isinstance(error, Exception) and not isinstance(
+                    error, NonUniqueException
+                ):
+                    log.exception(
+                        f"{error.__class__.__name__}: {error}", item, exc_info=error
+                    )
+                    raise error
+        for collection, entries in pending.items():
+            write_errors = {}
+            if not self.is_dry_run():
+                try:
+                    self.db[collection].insert_many(
+                        [item for _, item, _ in entries], ordered=False
+                    )
+                except BulkWriteError as error:
+                    write_errors = {
+                        write_error["index"]: write_error
+                        for write_error in error.details.get("writeErrors", [])
+                    }
+            for position, (index, item, config) in enumerate(entries):
+                if write_error := write_errors.get(position):
+                    if write_error.get("code") == 11000:
+                        results[index] = self.__get_duplicate_entry_exception(
+                            config, write_error.get("errmsg")
+                        )
+                    else:
+                        results[index] = WriteError(
+                            write_error.get("errmsg"),
+                            write_error.get("code"),
+                            write_error,
+                        )
+                    continue
+                if not self.is_dry_run():
+                    if run_post_crud_hook:
+                        config.crud()["post_crud_hook"](
+                            crud="create",
+                            document=item,
+                            storage=self,
+                            get_user_context=get_user_context,
+                            get_rabbit=get_rabbit,
+                        )
+                    log.info("Successfully saved item", item)
+                results[index] = self._prepare_mongo_document(
+                    item, True, to_format="elody"
+                )
+        return results
+
     def set_primary_field_collection_item(self, collection, id, mediafile_id, field):
         for src_id, dst_id in [
             (id, mediafile_id),
@@ -1261,20 +1610,45 @@ class MongoStorageManager(GenericStorageManager):
                 break
         self.patch_item_from_collection(collection, id, {"relations": relations})
 
-    def update_collection_item_relations(self, collection, id, content, parent=True):
-        collection_sub_item = None
-        relations = self.get_collection_item_sub_item(collection, id, "relations")
-        relations = relations or []
-        for item in relations:
-            collection_sub_item = self._map_relation_to_collection(item["type"])
-            self.delete_collection_item_sub_item_key(
-                collection_sub_item,
-                item["key"],
-                "relations",
-                id,
+    def traverse_collection_item_relations(
+        self, collection, id, relation_type, max_depth=None
+    ):
+        max_depth = max_depth or RELATION_TRAVERSAL_MAX_DEPTH
+        # $graphLookup can only follow every relation key, so the lookup
+        # returns all items connected within max_depth hops, whatever the
+        # relation type. The walk over that set keeps the relation_type ones.
+        pipeline = [
+            {"$match": self._get_id_query(id)},
+            {
+                "$graphLookup": {
+                    "from": collection,
+                    "startWith": "$relations.key",
+                    "connectFromField": "relations.key",
+                    "connectToField": "_id",
+                    "as": "graph",
+                    "maxDepth": max_depth - 1,
+                }
+            },
+        ]
+        documents = list(
+            self.db[collection].aggregate(pipeline, allowDiskUse=self.allow_disk_use)
+        )
+        if not documents:
+            return []
+        item = documents[0]
+        graph = {document["_id"]: document for document in item.pop("graph")}
+        return [
+            self._prepare_mongo_document(document, True)
+            for document in self._walk_relations(
+                item, relation_type, graph.get, max_depth
             )
-        self.update_collection_item_sub_item(collection, id, "relations", content)
-        self.__add_child_relations(id, content)
+        ]
+
+    def update_collection_item_relations(self, collection, id, content, parent=True):
+        """Replace the relations of the item and their reverse edges, see
+        patch_collection_item_relations."""
+        removals = self.__get_impacted_relations_writer(collection, id)
+        self.__write_item_relations(collection, id, content, removals, content)
         return content
 
     @tracer.start_as_current_span("base.mongostore.update_item_from_collection")
@@ -1297,6 +1671,7 @@ class MongoStorageManager(GenericStorageManager):
         )
         try:
             self.db[collection].replace_one(self._get_id_query(id), content)
+            self.__invalidate_identity_map(collection, [id])
         except DuplicateKeyError as ex:
             if ex.code == 11000:
                 raise NonUniqueException(
@@ -1318,18 +1693,59 @@ class MongoStorageManager(GenericStorageManager):
         collection,
         metadata_key,
         increment_fields: dict[str, int],
+        set_fields: dict | None = None,
     ):
-        if not self.get_item_from_collection_by_id(collection, id):
-            return None
-
+        """Atomically add increment_fields to the value of the metadata_key
+        metadata, set its set_fields in the same update and return the updated
+        document, or None when the document or its metadata_key metadata does
+        not exist."""
         increment_dict = {
             f"metadata.$[elem].value.{key}": value
             for key, value in increment_fields.items()
         }
+        update = {"$inc": {**increment_dict, "document_version": 1}}
+        if set_fields:
+            update["$set"] = {
+                f"metadata.$[elem].value.{key}": value
+                for key, value in set_fields.items()
+            }
 
-        self.db[collection].update_one(
-            {"_id": id},
-            {"$inc": {**increment_dict, "document_version": 1}},
+        document = self.db[collection].find_one_and_update(
+            {"_id": id, "metadata.key": metadata_key},
+            update,
             array_filters=[{"elem.key": metadata_key}],
+            return_document=ReturnDocument.AFTER,
         )
-        return self.get_item_from_collection_by_id(collection, id)
+        self.__invalidate_identity_map(collection, [id])
+        if not document:
+            return None
+        return self._prepare_mongo_document(document, True)
+
+    def get_stale_import_job_ids(self, heartbeat_before):
+        """Return the ids of the queued or running jobs whose progress
+        heartbeat is older than heartbeat_before."""
+        stale_jobs = self.db["jobs"].find(
+            {
+                "metadata": {
+                    "$all": [
+                        {
+                            "$elemMatch": {
+                                "key": "status",
+                                "value": {"$in": ["queued", "running"]},
+                            }
+                        },
+                        {
+                            "$elemMatch": {
+                                "key": "progress",
+                                "value.heartbeat": {"$lt": heartbeat_before},
+                            }
+                        },
+                    ]
+                }
+            },
+            {"_id": 1},
+        )
+        return [job["_id"] for job in stale_jobs]
+
+    def iter_history_for_item(self, collection, id, *, cursor=None):
+        return HistoryStore(self.db).iter_entries(collection, id, cursor=cursor)
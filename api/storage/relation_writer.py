@@ -0,0 +1,90 @@
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+
+class RelationWriter:
+    """
+    Collects relation edge writes and sends them as one unordered
+    ``bulk_write`` of ``UpdateOne`` operations per collection.
+
+    Edges added to or removed from the same item are merged into a single
+    update, ``set`` replaces all relations of an item. ``execute`` reports every
+    edge: ``status`` is ``"written"`` or
+    ``"failed"``, with the error of the update it was part of. A write that
+    fails does not stop the other ones, unless ``raise_on_error`` is set,
+    which a transaction needs to abort. ``execute`` can be called again with
+    the same writes, as a retried transaction does.
+    """
+
+    def __init__(self, db, get_id_query):
+        self.db = db
+        self.get_id_query = get_id_query
+        self.additions = {}
+        self.removals = {}
+        self.sets = {}
+
+    def add(self, collection, id, relation):
+        self.additions.setdefault((collection, id), []).append(relation)
+
+    def remove(self, collection, id, key):
+        self.removals.setdefault((collection, id), []).append(key)
+
+    def set(self, collection, id, relations):
+        self.sets[(collection, id)] = relations
+
+    def execute(self, session=None, raise_on_error=False):
+        operations, edges = {}, {}
+        for (collection, id), relations in self.sets.items():
+            operations.setdefault(collection, []).append(
+                UpdateOne(self.get_id_query(id), {"$set": {"relations": relations}})
+            )
+            edges.setdefault(collection, []).append(
+                [
+                    {"id": id, "key": relation["key"], "type": relation.get("type")}
+                    for relation in relations
+                ]
+            )
+        for (collection, id), relations in self.additions.items():
+            operations.setdefault(collection, []).append(
+                UpdateOne(
+                    self.get_id_query(id),
+                    {"$addToSet": {"relations": {"$each": relations}}},
+                )
+            )
+            edges.setdefault(collection, []).append(
+                [
+                    {"id": id, "key": relation["key"], "type": relation.get("type")}
+                    for relation in relations
+                ]
+            )
+        for (collection, id), keys in self.removals.items():
+            operations.setdefault(collection, []).append(
+                UpdateOne(
+                    self.get_id_query(id),
+                    {"$pull": {"relations": {"key": {"$in": keys}}}},
+                )
+            )
+            edges.setdefault(collection, []).append(
+                [{"id": id, "key": key, "type": None} for key in keys]
+            )
+        results = []
+        for collection, collection_operations in operations.items():
+            errors = {}
+            try:
+                self.db[collection].bulk_write(
+                    collection_operations, ordered=False, session=session
+                )
+            except BulkWriteError as error:
+                if raise_on_error:
+                    raise
+                errors = {
+                    write_error["index"]: write_error.get("errmsg")
+                    for write_error in error.details.get("writeErrors", [])
+                }
+            for index, operation_edges in enumerate(edges[collection]):
+                for edge in operation_edges:
+                    result = {"collection": collection, **edge, "status": "written"}
+                    if index in errors:
+                        result.update(status="failed", error=errors[index])
+                    results.append(result)
+        return results
@@ -74,6 +74,7 @@ class _FakeCollection:
     def aggregate(self, pipeline, **kwargs):
         self.aggregate_calls += 1
         self.last_pipeline = list(pipeline)
+        self.last_kwargs = kwargs
         return iter([{"count": self._agg_count}])
 
 
@@ -263,3 +264,81 @@ class TestExactCountOnDemand:
 
         assert result == 5_000_000
         assert col.aggregate_calls == 0
+
+
+class TestParallelCount:
+    """The count runs next to the page aggregation and is awaited up to a deadline."""
+
+    def _submit(self, mf, match, exact_count=False):
+        return mf._MongoFilters__submit_count("entities_actual", match, [], exact_count)
+
+    def _await(self, mf, future, results, skip=0, limit=20, exact_count=False):
+        output = {"results": [{}] * results}
+        return mf._MongoFilters__await_count(future, output, skip, limit, exact_count)
+
+    def test_returns_count_from_the_pool(self):
+        col = _FakeCollection(types={"a", "b"}, estimated=999, agg_count=42)
+        mf = _make_filters(col)
+
+        future = self._submit(mf, [{"$match": {"type": {"$in": ["a"]}}}])
+
+        assert self._await(mf, future, 20) == {"count": 42}
+        assert "maxTimeMS" not in col.last_kwargs
+
+    def test_count_is_stopped_by_mongo_at_the_deadline(self, monkeypatch):
+        import filters_v2.mongo_filters as mf_mod
+
+        monkeypatch.setattr(mf_mod, "LISTING_COUNT_DEADLINE_SECONDS", 1.5)
+        col = _FakeCollection(types={"a", "b"}, estimated=999, agg_count=42)
+        mf = _make_filters(col)
+
+        future = self._submit(mf, [{"$match": {"type": {"$in": ["a"]}}}])
+
+        assert self._await(mf, future, 20) == {"count": 42}
+        assert col.last_kwargs["maxTimeMS"] == 1500
+
+    def test_count_stopped_by_mongo_is_a_pending_lower_bound(self, monkeypatch):
+        from concurrent.futures import Future
+
+        import filters_v2.mongo_filters as mf_mod
+        from pymongo.errors import ExecutionTimeout
+
+        monkeypatch.setattr(mf_mod, "LISTING_COUNT_DEADLINE_SECONDS", 10)
+        mf = _make_filters(_FakeCollection(types={"a"}, estimated=1, agg_count=1))
+        future = Future()
+        future.collection = "entities_actual"
+        future.submitted_at = mf_mod.monotonic()
+        future.set_exception(ExecutionTimeout("operation exceeded time limit"))
+
+        items = self._await(mf, future, 5)
+
+        assert items == {"count": 5, "count_pending": True}
+
+    def test_count_past_deadline_is_a_pending_lower_bound(self, monkeypatch):
+        from concurrent.futures import Future
+
+        import filters_v2.mongo_filters as mf_mod
+
+        monkeypatch.setattr(mf_mod, "LISTING_COUNT_DEADLINE_SECONDS", 0.01)
+        mf = _make_filters(_FakeCollection(types={"a"}, estimated=1, agg_count=1))
+        future = Future()
+        future.collection = "entities_actual"
+        future.submitted_at = 0
+
+        items = self._await(mf, future, 20, skip=40)
+
+        # A full page means at least one more document, so "next" stays reachable.
+        assert items == {"count": 61, "count_pending": True}
+
+    def test_exact_count_ignores_the_deadline(self, monkeypatch):
+        import filters_v2.mongo_filters as mf_mod
+
+        monkeypatch.setattr(mf_mod, "LISTING_COUNT_DEADLINE_SECONDS", 0.01)
+        col = _FakeCollection(types={"a", "b"}, estimated=999, agg_count=700712)
+        mf = _make_filters(col)
+
+        future = self._submit(mf, [{"$match": {"type": {"$in": ["a"]}}}], True)
+        future.submitted_at = 0
+
+        assert self._await(mf, future, 20, exact_count=True) == {"count": 700712}
+        assert "maxTimeMS" not in col.last_kwargs
@@ -0,0 +1,137 @@
+"""Unit tests for the pure helpers of scripts/reindex_typesense.py.
+
+The rebuild and verify loops run against live Mongo and Typesense instances;
+here we cover the schema carried into a new collection version, the content
+hash diff behind --verify, the Mongo and Typesense reads it is fed from and
+the resumable checkpoint file.
+"""
+
+from datetime import UTC, datetime
+from unittest.mock import MagicMock
+
+from scripts.reindex_typesense import (
+    build_schema,
+    diff_hashes,
+    document_hash,
+    export_docs,
+    find_extra_ids,
+    load_checkpoint,
+    save_checkpoint,
+    stream_batches,
+)
+
+
+class TestBuildSchema:
+    def test_without_live_collection_uses_auto_schema_with_facets(self):
+        schema = build_schema("entities_1", None, {"properties.type.value"})
+        assert schema == {
+            "name": "entities_1",
+            "fields": [
+                {"name": ".*", "type": "auto"},
+                {"name": "properties_type_value", "type": "auto", "facet": True},
+            ],
+        }
+
+    def test_live_fields_are_carried_over_without_server_keys(self):
+        current = [
+            {"name": ".*", "type": "auto", "num_documents": 3},
+            {"name": "title", "type": "string", "infix": True, "facet": False},
+        ]
+        schema = build_schema("entities_2", current, set())
+        assert schema["fields"] == [
+            {"name": ".*", "type": "auto"},
+            {"name": "title", "type": "string", "facet": False, "infix": True},
+        ]
+
+    def test_declared_facet_is_not_duplicated(self):
+        current = [{"name": "title", "type": "string", "facet": True}]
+        schema = build_schema("entities_3", current, {"title"})
+        assert [field["name"] for field in schema["fields"]] == ["title"]
+
+
+class TestDiffHashes:
+    def test_hash_ignores_key_order(self):
+        assert document_hash({"id": "a", "title": "x"}) == document_hash(
+            {"title": "x", "id": "a"}
+        )
+
+    def test_reports_missing_stale_and_extra_ids(self):
+        mongo = {"a": "1", "b": "2", "c": "3"}
+        typesense = {"a": "1", "b": "changed", "d": "4"}
+        assert diff_hashes(mongo, typesense) == (["c"], ["b"], ["d"])
+
+
+class TestTypesenseReads:
+    def test_a_batch_is_exported_by_its_ids(self):
+        client = MagicMock()
+        client.collections[
+            "entities"
+        ].documents.export.return_value = '{"id": "a", "title": "x"}\n{"id": "b"}\n'
+
+        docs = export_docs(client, "entities", ["a", "b"])
+
+        assert docs == {"a": {"id": "a", "title": "x"}, "b": {"id": "b"}}
+        client.collections["entities"].documents.export.assert_called_once_with(
+            {"filter_by": "id:[`a`,`b`]"}
+        )
+
+    def test_extra_ids_are_checked_against_mongo_per_batch(self):
+        client = MagicMock()
+        client.collections[
+            "entities"
+        ].documents.export.return_value = '{"id": "a"}\n{"id": "b"}\n{"id": "c"}\n'
+        storage = MagicMock()
+        storage.db["entities"].find.side_effect = [[{"_id": "a"}], [{"_id": "c"}]]
+
+        extra = list(
+            find_extra_ids(client, storage, "entities", {"entities": {"asset"}}, 2)
+        )
+
+        assert extra == ["b"]
+        client.collections["entities"].documents.export.assert_called_once_with(
+            {"include_fields": "id"}
+        )
+        assert [
+            call.args[0] for call in storage.db["entities"].find.call_args_list
+        ] == [
+            {"_id": {"$in": ["a", "b"]}, "type": {"$in": ["asset"]}},
+            {"_id": {"$in": ["c"]}, "type": {"$in": ["asset"]}},
+        ]
+
+
+class TestStreamBatches:
+    def test_catch_up_reads_the_documents_changed_since_the_start(self):
+        storage = MagicMock()
+        storage._prepare_mongo_document = lambda document, *_: document
+        find = storage.db["entities"].find
+        find.return_value.sort.return_value.batch_size.return_value = [
+            {"_id": "a"},
+            {"_id": "b"},
+            {"_id": "c"},
+        ]
+        started_at = datetime(2026, 1, 1, tzinfo=UTC)
+
+        batches = list(
+            stream_batches(storage, "entities", {"asset"}, 2, changed_since=started_at)
+        )
+
+        assert batches == [[{"_id": "a"}, {"_id": "b"}], [{"_id": "c"}]]
+        assert find.call_args.args[0] == {
+            "type": {"$in": ["asset"]},
+            "$or": [
+                {"date_created": {"$gte": started_at}},
+                {"date_updated": {"$gte": started_at}},
+                {"date_updated_by_service": {"$gte": started_at}},
+            ],
+        }
+
+
+class TestCheckpoint:
+    def test_missing_file_is_an_empty_checkpoint(self, tmp_path):
+        assert load_checkpoint(tmp_path / "checkpoint.json") == {}
+
+    def test_round_trip(self, tmp_path):
+        path = str(tmp_path / "checkpoint.json")
+        checkpoint = {"entities": {"collection": "entities_1", "after_ids": {}}}
+        save_checkpoint(path, checkpoint)
+        assert load_checkpoint(path) == checkpoint
@@ -0,0 +1,80 @@
+"""Unit tests for the process-wide cache in bounded_cache.py."""
+
+from threading import Thread
+
+import bounded_cache
+from bounded_cache import BoundedCache, get_cache_stats
+
+
+class TestBoundedCache:
+    def test_reads_like_a_dict(self):
+        cache = BoundedCache("test_dict")
+        cache["a"] = 1
+
+        assert cache["a"] == 1
+        assert cache.get("b") is None
+        assert "a" in cache
+        assert cache.pop("a") == 1
+        assert "a" not in cache
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = BoundedCache("test_lru", max_size=2)
+        cache["a"] = 1
+        cache["b"] = 2
+        cache.get("a")
+        cache["c"] = 3
+
+        assert "b" not in cache
+        assert cache.get("a") == 1
+        assert cache.stats()["evictions"] == 1
+
+    def test_entries_expire_after_the_ttl(self, monkeypatch):
+        now = [100.0]
+        monkeypatch.setattr(bounded_cache, "monotonic", lambda: now[0])
+        cache = BoundedCache("test_ttl", ttl=10)
+        cache.add("a")
+
+        now[0] += 9
+        assert "a" in cache
+        now[0] += 2
+        assert "a" not in cache
+        assert cache.stats() == {
+            "hits": 1,
+            "misses": 1,
+            "evictions": 0,
+            "expirations": 1,
+            "size": 0,
+        }
+
+    def test_invalidate_drops_matching_entries(self):
+        cache = BoundedCache("test_invalidate")
+        cache["a"] = "entities/1"
+        cache["entities/1"] = "entities/1"
+        cache["b"] = "entities/2"
+
+        cache.invalidate(lambda _, value: value == "entities/1")
+
+        assert len(cache) == 1
+        assert cache["b"] == "entities/2"
+
+    def test_stats_are_listed_by_name(self):
+        cache = BoundedCache("test_named")
+        cache.get("a")
+
+        assert get_cache_stats()["test_named"]["misses"] == 1
+
+    def test_concurrent_writes_stay_within_bounds(self):
+        cache = BoundedCache("test_threads", max_size=50)
+
+        def write(offset):
+            for i in range(1000):
+                cache[offset + i] = i
+                cache.get(offset + i - 1)
+
+        threads = [Thread(target=write, args=(i * 1000,)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(cache) == 50
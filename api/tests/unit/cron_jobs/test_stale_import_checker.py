@@ -0,0 +1,22 @@
+"""Unit tests for cron_jobs/stale_import_checker.py."""
+
+from datetime import UTC, datetime, timedelta
+from unittest.mock import MagicMock, patch
+
+from cron_jobs.stale_import_checker import StaleImportChecker
+
+
+class TestStaleImportChecker:
+    def test_jobs_without_a_recent_heartbeat_are_failed(self):
+        checker = StaleImportChecker.__new__(StaleImportChecker)
+        checker.stale_seconds = 600
+        checker.storage = MagicMock()
+        checker.storage.get_stale_import_job_ids.return_value = ["job-1", "job-2"]
+
+        with patch("cron_jobs.stale_import_checker.fail_job") as fail_job:
+            assert checker() == ["job-1", "job-2"]
+
+        heartbeat_before = checker.storage.get_stale_import_job_ids.call_args.args[0]
+        expected = datetime.now(UTC) - timedelta(seconds=600)
+        assert abs(heartbeat_before - expected) < timedelta(seconds=5)
+        assert [call.args[0] for call in fail_job.call_args_list] == ["job-1", "job-2"]
@@ -0,0 +1,81 @@
+"""Unit tests for the batched expiry of cron_jobs/ttl_checker.py."""
+
+from unittest.mock import MagicMock, call, patch
+
+from cron_jobs.ttl_checker import TtlChecker
+
+
+def make_checker(chunks, *, max_items=0, hard_delete=False, delete_mediafiles=False):
+    checker = TtlChecker.__new__(TtlChecker)
+    checker.storage = MagicMock()
+    checker.storage.iter_ttl_expired_ids.return_value = iter(chunks)
+    checker.storage.delete_items_from_collection.side_effect = lambda collection, ids: (
+        len(ids)
+    )
+    checker.storage.delete_history_for_items.side_effect = lambda collection, ids: (
+        2 * len(ids)
+    )
+    checker.storage.count_ttl_expired_items.return_value = 0
+    checker.chunk_size = 2
+    checker.max_items = max_items
+    checker.hard_delete = hard_delete
+    checker.delete_mediafiles = delete_mediafiles
+    return checker
+
+
+class TestTtlChecker:
+    def test_expired_items_are_deleted_per_chunk(self):
+        checker = make_checker([["a", "b"], ["c"]], hard_delete="true")
+
+        report = checker.expire_collection("abstracts")
+
+        assert report == {"items": 3, "mediafiles": 0, "history": 6, "backlog": 0}
+        checker.storage.iter_ttl_expired_ids.assert_called_once_with("abstracts", 2)
+        assert checker.storage.delete_items_from_collection.call_args_list == [
+            call("abstracts", ["a", "b"]),
+            call("abstracts", ["c"]),
+        ]
+        checker.storage.get_mediafiles_of_items.assert_not_called()
+
+    def test_a_run_stops_at_max_items_and_reports_the_backlog(self):
+        checker = make_checker([["a", "b"], ["c", "d"]], max_items=3)
+        checker.storage.count_ttl_expired_items.return_value = 1
+
+        report = checker.expire_collection("abstracts")
+
+        assert report["items"] == 3
+        assert report["backlog"] == 1
+        assert checker.storage.delete_items_from_collection.call_args_list[-1] == (
+            call("abstracts", ["c"])
+        )
+        checker.storage.delete_history_for_items.assert_not_called()
+
+    def test_the_mediafiles_of_a_chunk_are_deleted_and_signalled(self):
+        checker = make_checker([["a", "b"]], delete_mediafiles=True)
+        mediafiles = [{"_id": "m1"}, {"_id": "m2"}]
+        checker.storage.get_mediafiles_of_items.return_value = mediafiles
+        checker.storage.get_mediafile_linked_entities.side_effect = lambda m: [
+            {"entity_id": m["_id"]}
+        ]
+
+        with patch("cron_jobs.ttl_checker.signal_mediafile_deleted") as signal:
+            report = checker.expire_collection("entities")
+
+        assert report["mediafiles"] == 2
+        assert checker.storage.delete_items_from_collection.call_args_list[0] == (
+            call("mediafiles", ["m1", "m2"])
+        )
+        assert [c.args[1:] for c in signal.call_args_list] == [
+            (mediafiles[0], [{"entity_id": "m1"}]),
+            (mediafiles[1], [{"entity_id": "m2"}]),
+        ]
+
+    def test_ttl_index_collections_are_left_to_mongo(self):
+        checker = make_checker([["a"]])
+        checker.storage.get_existing_collections.return_value = ["abstracts"]
+
+        with patch("cron_jobs.ttl_checker.TTL_INDEX_COLLECTIONS", ["abstracts"]):
+            checker()
+
+        checker.storage.ensure_ttl_index.assert_called_once_with("abstracts")
+        checker.storage.iter_ttl_expired_ids.assert_not_called()
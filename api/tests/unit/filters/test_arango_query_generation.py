@@ -0,0 +1,73 @@
+"""Unit tests for the AQL generated by filters_v2/arango_wrapper.py."""
+
+import pytest
+from filters_v2.arango_wrapper import ArangoWrapper
+from filters_v2.stages.cursor_stage import InvalidCursor
+
+
+def generate(pipeline, order_by=None):
+    wrapper = ArangoWrapper.__new__(ArangoWrapper)
+    return wrapper._ArangoWrapper__generate_query("entities", pipeline, order_by)
+
+
+def page(match, skip=0, limit=20):
+    return [{"$match": match}, {"$skip": skip}, {"$limit": limit}]
+
+
+@pytest.mark.parametrize(
+    "match",
+    [
+        {"type": "asset", "title": "Foo"},
+        {"type": {"$in": ["asset", "mediafile"]}},
+        {"title": {"$regex": "foo", "$options": "i"}},
+        {"count": {"$gte": 1, "$lte": 5}},
+        {"public": True},
+        {"$or": [{"title": "x"}, {"name": "y"}]},
+        {
+            "relations": {
+                "$all": [{"$elemMatch": {"type": "hasCollection", "key": "c1"}}]
+            }
+        },
+    ],
+)
+def test_values_are_bound_not_written_into_the_query(match):
+    aql, bind_vars = generate(page(match))
+
+    for name, value in bind_vars.items():
+        assert f"@{name}" in aql
+        if isinstance(value, str):
+            assert value not in aql
+
+
+def test_requests_of_the_same_shape_share_the_query_text():
+    first_aql, first_bind_vars = generate(
+        page({"type": "asset", "creator": {"$in": ["a"]}}, skip=0)
+    )
+    other_aql, other_bind_vars = generate(
+        page({"type": "person", "creator": {"$in": ["b", "c"]}}, skip=40)
+    )
+
+    assert first_aql == other_aql
+    assert first_bind_vars != other_bind_vars
+    assert other_bind_vars == {
+        "value0": "person",
+        "value1": ["b", "c"],
+        "value2": 40,
+        "value3": 20,
+    }
+
+
+def test_relation_collection_is_a_collection_bind_parameter():
+    aql, bind_vars = generate(
+        page({"relations": {"$all": [{"$elemMatch": {"type": "isIn", "key": "c1"}}]}})
+    )
+
+    assert "FOR item IN @@collection0" in aql
+    assert bind_vars["@collection0"] == "isIn"
+
+
+def test_a_cursor_is_rejected():
+    wrapper = ArangoWrapper.__new__(ArangoWrapper)
+
+    with pytest.raises(InvalidCursor):
+        wrapper.filter([{"type": "type", "value": "asset"}], 0, 20, cursor="abc")
@@ -0,0 +1,136 @@
+import pytest
+from filters_v2.stages import cursor_stage
+from filters_v2.stages.cursor_stage import InvalidCursor
+from pymongo import ASCENDING, DESCENDING
+
+
+class TestBuild:
+    def test_first_page_adds_id_tiebreaker_without_match(self):
+        sort = cursor_stage.build([{"$sort": {"date_created": DESCENDING}}], "")
+        assert sort == [{"$sort": {"date_created": DESCENDING, "_id": ASCENDING}}]
+
+    def test_missing_sort_sorts_on_id(self):
+        assert cursor_stage.build([], None) == [{"$sort": {"_id": ASCENDING}}]
+
+    def test_match_goes_right_before_the_last_sort(self):
+        # Stages added by a custom sorting hook must run before the range match.
+        sort = [{"$addFields": {"key": "$title"}}, {"$sort": {"key": ASCENDING}}]
+        keyset_sort = cursor_stage.build(sort, None)
+        cursor = cursor_stage.encode(keyset_sort, {"_id": "b", "key": "x"})
+
+        page = cursor_stage.build(sort, cursor)
+
+        assert page[0] == {"$addFields": {"key": "$title"}}
+        assert page[1]["$match"]["$or"] == [
+            {"key": {"$gt": "x"}},
+            {"key": "x", "_id": {"$gt": "b"}},
+        ]
+        assert page[2] == {"$sort": {"key": ASCENDING, "_id": ASCENDING}}
+
+    def test_descending_key_includes_nulls_after_value(self):
+        sort = cursor_stage.build([{"$sort": {"date": DESCENDING}}], None)
+        cursor = cursor_stage.encode(sort, {"_id": "a", "date": 5})
+
+        match = cursor_stage.build([{"$sort": {"date": DESCENDING}}], cursor)[0]
+
+        assert match["$match"]["$or"][0] == {
+            "$or": [{"date": {"$lt": 5}}, {"date": None}]
+        }
+
+    def test_ascending_null_value_continues_with_non_null_values(self):
+        sort = cursor_stage.build([{"$sort": {"date": ASCENDING}}], None)
+        cursor = cursor_stage.encode(sort, {"_id": "a"})
+
+        match = cursor_stage.build([{"$sort": {"date": ASCENDING}}], cursor)[0]
+
+        assert match["$match"]["$or"] == [
+            {"date": {"$ne": None}},
+            {"date": None, "_id": {"$gt": "a"}},
+        ]
+
+
+class TestEncode:
+    def test_array_value_uses_lowest_element_ascending(self):
+        sort = [{"$sort": {"tags.value": ASCENDING, "_id": ASCENDING}}]
+        cursor = cursor_stage.encode(
+            sort, {"_id": "a", "tags": [{"value": "b"}, {"value": "a"}]}
+        )
+
+        match = cursor_stage.build(sort, cursor)[0]
+
+        assert match["$match"]["$or"][0] == {"tags.value": {"$gt": "a"}}
+
+
+def evaluate(expression, document):
+    """Evaluate the aggregation expressions of the range match on document."""
+    if isinstance(expression, str) and expression.startswith("$"):
+        values = [document]
+        for part in expression[1:].split("."):
+            values = [
+                value.get(part)
+                for item in values
+                for value in (item if isinstance(item, list) else [item])
+                if isinstance(value, dict)
+            ]
+        return values
+    if not isinstance(expression, dict):
+        return expression
+    [(operator, operand)] = expression.items()
+    if operator == "$literal":
+        return operand
+    if operator in ("$min", "$max"):
+        values = [value for value in evaluate(operand, document) if value is not None]
+        if not values:
+            return None
+        return min(values) if operator == "$min" else max(values)
+    if operator in ("$and", "$or"):
+        results = [evaluate(item, document) for item in operand]
+        return all(results) if operator == "$and" else any(results)
+    # Null sorts before every other value.
+    left, right = (
+        (value is not None, 0 if value is None else value)
+        for value in (evaluate(item, document) for item in operand)
+    )
+    if operator == "$eq":
+        return left == right
+    return left > right if operator == "$gt" else left < right
+
+
+class TestMultikeySortKeys:
+    @pytest.mark.parametrize(
+        "direction, order",
+        [(ASCENDING, ["d", "a", "c", "b"]), (DESCENDING, ["a", "c", "b", "d"])],
+    )
+    def test_every_item_is_on_exactly_one_page(self, direction, order):
+        # Ascending sorts on the lowest tag and descending on the highest.
+        documents = {
+            "a": {"_id": "a", "tags": [{"value": 1}, {"value": 9}]},
+            "b": {"_id": "b", "tags": [{"value": 5}]},
+            "c": {"_id": "c", "tags": [{"value": 3}, {"value": 7}]},
+            "d": {"_id": "d"},
+        }
+        sort = cursor_stage.build([{"$sort": {"tags.value": direction}}], None)
+
+        pages = [order[0]]
+        while True:
+            cursor = cursor_stage.encode(sort, documents[pages[-1]])
+            match = cursor_stage.build(sort, cursor)[0]["$match"]
+            after = [id for id in order if evaluate(match["$expr"], documents[id])]
+            if not after:
+                break
+            pages.append(after[0])
+
+        assert pages == order
+
+
+class TestInvalidCursor:
+    def test_garbage_cursor(self):
+        with pytest.raises(InvalidCursor):
+            cursor_stage.build([{"$sort": {"_id": ASCENDING}}], "not-a-cursor")
+
+    def test_cursor_of_another_order(self):
+        sort = cursor_stage.build([{"$sort": {"title": ASCENDING}}], None)
+        cursor = cursor_stage.encode(sort, {"_id": "a", "title": "x"})
+
+        with pytest.raises(InvalidCursor):
+            cursor_stage.build([{"$sort": {"title": DESCENDING}}], cursor)
@@ -0,0 +1,109 @@
+import pytest
+from filters_v2.matchers.base_matchers import BaseMatchers
+from filters_v2.plan_cache import FilterPlanCache
+from filters_v2.stages import match_stage
+
+
+def _selection(*values, key="identifiers"):
+    return {"type": "selection", "key": key, "value": list(values), "match_exact": True}
+
+
+REQUESTS = [
+    [{"type": "type", "value": "asset"}, _selection("a", "b")],
+    [{"type": "type", "value": "asset"}, _selection("a")],
+    [{"type": "text", "key": "title", "value": "Foo", "match_exact": True}],
+    [{"type": "text", "key": "title", "value": "fo*o", "match_exact": False}],
+    [{"type": "selection", "key": "title", "value": "*", "match_exact": True}],
+    [{"type": "number", "key": "count", "value": {"min": 1, "max": 5}}],
+    [{"type": "boolean", "key": "public", "value": False}],
+    [
+        {"type": "type", "value": "asset"},
+        {
+            "type": "text",
+            "key": "title",
+            "value": "x",
+            "match_exact": True,
+            "or": [{"type": "text", "key": "name", "value": "y", "match_exact": True}],
+        },
+    ],
+]
+
+
+@pytest.fixture
+def plan_cache(monkeypatch):
+    plan_cache = FilterPlanCache(max_size=16)
+    monkeypatch.setattr(match_stage, "get_filter_plan_cache", lambda: plan_cache)
+    return plan_cache
+
+
+def _build(filter_request_body, collection="entities", type_name="asset"):
+    with BaseMatchers.context(collection=collection, type_name=type_name):
+        return match_stage.build(filter_request_body, True)
+
+
+def _build_uncached(filter_request_body, monkeypatch):
+    with monkeypatch.context() as patch:
+        patch.setattr(match_stage, "get_filter_plan_cache", lambda: None)
+        return _build(filter_request_body)
+
+
+class TestFilterPlanCache:
+    @pytest.mark.parametrize("filter_request_body", REQUESTS)
+    def test_cached_match_equals_compiled_match(
+        self, plan_cache, monkeypatch, filter_request_body
+    ):
+        expected = _build_uncached(filter_request_body, monkeypatch)
+
+        assert _build(filter_request_body) == expected
+        assert _build(filter_request_body) == expected
+
+    def test_same_shape_with_other_values_is_bound_from_the_plan(
+        self, plan_cache, monkeypatch
+    ):
+        _build([{"type": "type", "value": "asset"}, _selection("a", "b")])
+        other = [{"type": "type", "value": "asset"}, _selection("c", "d")]
+
+        match = _build(other)
+
+        assert plan_cache.stats() == {"hits": 1, "misses": 1, "size": 1}
+        assert match == _build_uncached(other, monkeypatch)
+        assert match[0]["$match"]["identifiers"] == {"$in": ["c", "d"]}
+
+    def test_bound_match_does_not_share_state_with_the_plan(self, plan_cache):
+        first = _build([_selection("a", "b")])
+        first[0]["$match"]["identifiers"]["$in"].append("z")
+
+        assert _build([_selection("a", "b")]) == [
+            {"$match": {"identifiers": {"$in": ["a", "b"]}}}
+        ]
+
+    def test_context_is_part_of_the_key(self, plan_cache):
+        _build([_selection("a", "b")], collection="entities")
+        _build([_selection("a", "b")], collection="mediafiles")
+
+        assert plan_cache.stats()["misses"] == 2
+
+    def test_value_count_is_part_of_the_key(self, plan_cache):
+        _build([_selection("a", "b")])
+        _build([_selection("a")])
+
+        assert plan_cache.stats()["misses"] == 2
+
+    def test_placeholder_lookalike_value_bypasses_the_cache(
+        self, plan_cache, monkeypatch
+    ):
+        body = [
+            {"type": "text", "key": "title", "value": "\x00FilterParam-0\x00"},
+            _selection("a", "b"),
+        ]
+
+        assert _build(body) == _build_uncached(body, monkeypatch)
+        assert plan_cache.stats()["size"] == 0
+
+    def test_least_recently_used_plan_is_evicted(self):
+        plan_cache = FilterPlanCache(max_size=1)
+        with BaseMatchers.context(collection="entities"):
+            plan_cache.get_or_compile(lambda body: body, [[_selection("a")]])
+            plan_cache.get_or_compile(lambda body: body, [[_selection("a", "b")]])
+
+        assert plan_cache.stats()["size"] == 1
@@ -0,0 +1,111 @@
+from unittest.mock import MagicMock
+
+import pytest
+from filters_v2.result_cache import FilterResultCache, MemoryResultCacheBackend
+
+TYPED_QUERY = [{"type": "type", "value": "asset"}]
+UNTYPED_QUERY = [{"type": "text", "key": "title", "value": "x"}]
+
+
+@pytest.fixture
+def cache():
+    return FilterResultCache(MemoryResultCacheBackend(max_size=2), ttl=60)
+
+
+def _compute(items):
+    return MagicMock(side_effect=lambda: dict(items))
+
+
+class TestFilterResultCache:
+    def test_identical_call_is_served_from_cache(self, cache):
+        compute = _compute({"results": [{"_id": "a"}], "count": 1})
+
+        first = cache.get_or_compute(compute, TYPED_QUERY, 0, 20, collection="entities")
+        second = cache.get_or_compute(
+            compute, TYPED_QUERY, 0, 20, collection="entities"
+        )
+
+        assert compute.call_count == 1
+        assert first == second
+        second["results"].append({"_id": "b"})
+        assert cache.get_or_compute(
+            compute, TYPED_QUERY, 0, 20, collection="entities"
+        ) == {"results": [{"_id": "a"}], "count": 1}
+
+    def test_key_ignores_dict_key_order(self):
+        assert FilterResultCache.key(
+            [{"type": "type", "value": "asset"}], "entities", 0, 20
+        ) == FilterResultCache.key(
+            [{"value": "asset", "type": "type"}], "entities", 0, 20
+        )
+
+    def test_paging_is_part_of_the_key(self, cache):
+        compute = _compute({"results": [], "count": 0})
+
+        cache.get_or_compute(compute, TYPED_QUERY, 0, 20, collection="entities")
+        cache.get_or_compute(compute, TYPED_QUERY, 20, 20, collection="entities")
+
+        assert compute.call_count == 2
+
+    def test_pending_count_is_not_cached(self, cache):
+        compute = _compute({"results": [], "count": 21, "count_pending": True})
+
+        cache.get_or_compute(compute, TYPED_QUERY, 0, 20, collection="entities")
+        cache.get_or_compute(compute, TYPED_QUERY, 0, 20, collection="entities")
+
+        assert compute.call_count == 2
+
+    def test_backend_failure_falls_back_to_filter(self):
+        backend = MagicMock()
+        backend.get.side_effect = ConnectionError("down")
+        cache = FilterResultCache(backend)
+
+        items = cache.get_or_compute(
+            _compute({"count": 3}), TYPED_QUERY, collection="entities"
+        )
+
+        assert items == {"count": 3}
+
+
+class TestInvalidation:
+    def test_change_drops_listings_of_its_type_and_untyped_ones(self, cache):
+        typed = _compute({"count": 1})
+        untyped = _compute({"count": 2})
+        cache.get_or_compute(typed, TYPED_QUERY, collection="entities")
+        cache.get_or_compute(untyped, UNTYPED_QUERY, collection="entities")
+
+        cache.invalidate("entities", "asset")
+        cache.get_or_compute(typed, TYPED_QUERY, collection="entities")
+        cache.get_or_compute(untyped, UNTYPED_QUERY, collection="entities")
+
+        assert typed.call_count == 2
+        assert untyped.call_count == 2
+
+    def test_change_keeps_listings_of_other_types_and_collections(self, cache):
+        compute = _compute({"count": 1})
+        cache.get_or_compute(compute, TYPED_QUERY, collection="entities")
+
+        cache.invalidate("entities", "person")
+        cache.invalidate("mediafiles", "asset")
+        cache.get_or_compute(compute, TYPED_QUERY, collection="entities")
+
+        assert compute.call_count == 1
+
+
+class TestMemoryResultCacheBackend:
+    def test_least_recently_used_entry_is_evicted(self):
+        backend = MemoryResultCacheBackend(max_size=2)
+        backend.set("a", "1", "entities", None, 60)
+        backend.set("b", "2", "entities", None, 60)
+        backend.get("a")
+        backend.set("c", "3", "entities", None, 60)
+
+        assert backend.get("a") == "1"
+        assert backend.get("b") is None
+        assert backend.get("c") == "3"
+
+    def test_expired_entry_is_a_miss(self):
+        backend = MemoryResultCacheBackend()
+        backend.set("a", "1", "entities", None, 0)
+
+        assert backend.get("a") is None
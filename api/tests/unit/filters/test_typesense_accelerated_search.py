@@ -656,10 +656,9 @@ class TestTypesensePagination:
                 mock_ts.return_value = make_ts_result(ids, 50)
 
                 mock_storage = MagicMock()
-                mock_storage.db.__getitem__.return_value.find.return_value = [
+                mock_storage.get_items_from_collection_by_ids.return_value = [
                     make_mongo_doc(id) for id in ids
                 ]
-                mock_storage._prepare_mongo_document.side_effect = lambda doc, _: doc
                 mock_sm.return_value.get_db_engine.return_value = mock_storage
 
                 result = resource._execute_typesense_accelerated_search(
@@ -816,10 +815,9 @@ class TestTypesensePagination:
                 mock_ts.return_value = make_ts_result(ids, 50)
 
                 mock_storage = MagicMock()
-                mock_storage.db.__getitem__.return_value.find.return_value = [
+                mock_storage.get_items_from_collection_by_ids.return_value = [
                     make_mongo_doc(id) for id in ids
                 ]
-                mock_storage._prepare_mongo_document.side_effect = lambda doc, _: doc
                 mock_sm.return_value.get_db_engine.return_value = mock_storage
 
                 result = resource._execute_typesense_accelerated_search(
@@ -858,10 +856,9 @@ class TestTypesensePagination:
                 mock_ts.return_value = make_ts_result(ids, 45)
 
                 mock_storage = MagicMock()
-                mock_storage.db.__getitem__.return_value.find.return_value = [
+                mock_storage.get_items_from_collection_by_ids.return_value = [
                     make_mongo_doc(id) for id in ids
                 ]
-                mock_storage._prepare_mongo_document.side_effect = lambda doc, _: doc
                 mock_sm.return_value.get_db_engine.return_value = mock_storage
 
                 result = resource._execute_typesense_accelerated_search(
@@ -1025,14 +1022,11 @@ class TestTypesenseResultOrdering:
             ):
                 mock_ts.return_value = make_ts_result(ts_ids, 3)
 
-                # MongoDB returns in different order
+                # The bulk read returns the documents in the order of the ids
                 mock_storage = MagicMock()
-                mock_storage.db.__getitem__.return_value.find.return_value = [
-                    make_mongo_doc("ok_match"),
-                    make_mongo_doc("best_match"),
-                    make_mongo_doc("good_match"),
-                ]
-                mock_storage._prepare_mongo_document.side_effect = lambda doc, _: doc
+                mock_storage.get_items_from_collection_by_ids.side_effect = (
+                    lambda ids, collections: [make_mongo_doc(id) for id in ids]
+                )
                 mock_sm.return_value.get_db_engine.return_value = mock_storage
 
                 result = resource._execute_typesense_accelerated_search(
@@ -1189,11 +1183,10 @@ class TestTypesenseCrossCollectionFiltering:
                 mock_ts.return_value = make_ts_result(["id1", "id2"], 2)
 
                 mock_storage = MagicMock()
-                mock_storage.db.__getitem__.return_value.find.return_value = [
+                mock_storage.get_items_from_collection_by_ids.return_value = [
                     make_mongo_doc("id1", "work_word"),
                     make_mongo_doc("id2", "person"),
                 ]
-                mock_storage._prepare_mongo_document.side_effect = lambda doc, _: doc
                 mock_sm.return_value.get_db_engine.return_value = mock_storage
 
                 resource._execute_typesense_accelerated_search(
@@ -1215,8 +1208,8 @@ class TestTypesenseCrossCollectionFiltering:
                 assert "person" in filter_by
 
                 # MongoDB should be queried for both collections
-                db_calls = mock_storage.db.__getitem__.call_args_list
-                queried_collections = {call[0][0] for call in db_calls}
+                bulk_read = mock_storage.get_items_from_collection_by_ids
+                queried_collections = set(bulk_read.call_args.args[1])
                 assert "bibliographic_entities_actual" in queried_collections
                 assert "entities_actual" in queried_collections
 
@@ -1287,14 +1280,9 @@ class TestTypesenseCrossCollectionFiltering:
                 mock_ts.return_value = make_ts_result(ids, 25)
 
                 mock_storage = MagicMock()
-                # Each collection returns its subset; use side_effect
-                # to return docs only on first call, empty on second
+                # The bulk read returns the documents of both collections
                 all_docs = [make_mongo_doc(f"id{i}") for i in range(20)]
-                mock_storage.db.__getitem__.return_value.find.side_effect = [
-                    all_docs,
-                    [],
-                ]
-                mock_storage._prepare_mongo_document.side_effect = lambda doc, _: doc
+                mock_storage.get_items_from_collection_by_ids.return_value = all_docs
                 mock_sm.return_value.get_db_engine.return_value = mock_storage
 
                 result = resource._execute_typesense_accelerated_search(
@@ -1339,13 +1327,9 @@ class TestTypesenseCrossCollectionFiltering:
                 mock_ts.return_value = make_ts_result(page2_ids, 45)
 
                 mock_storage = MagicMock()
-                # Return docs only from first collection, empty from second
+                # The bulk read returns the documents of both collections
                 all_docs = [make_mongo_doc(id) for id in page2_ids]
-                mock_storage.db.__getitem__.return_value.find.side_effect = [
-                    all_docs,
-                    [],
-                ]
-                mock_storage._prepare_mongo_document.side_effect = lambda doc, _: doc
+                mock_storage.get_items_from_collection_by_ids.return_value = all_docs
                 mock_sm.return_value.get_db_engine.return_value = mock_storage
 
                 result = resource._execute_typesense_accelerated_search(
@@ -1852,12 +1836,11 @@ class TestFetchDocumentsFromMongo:
     def test_preserves_typesense_relevance_order(self, resource):
         with patch("resources.base_filter_resource.StorageManager") as mock_sm:
             mock_storage = MagicMock()
-            mock_storage.db.__getitem__.return_value.find.return_value = [
+            mock_storage.get_items_from_collection_by_ids.return_value = [
+                make_mongo_doc("c"),
                 make_mongo_doc("a"),
                 make_mongo_doc("b"),
-                make_mongo_doc("c"),
             ]
-            mock_storage._prepare_mongo_document.side_effect = lambda doc, _: doc
             mock_sm.return_value.get_db_engine.return_value = mock_storage
 
             results = resource._fetch_documents_from_mongo(
@@ -1865,31 +1848,31 @@ class TestFetchDocumentsFromMongo:
             )
 
         assert [r["_id"] for r in results] == ["c", "a", "b"]
+        mock_storage.get_items_from_collection_by_ids.assert_called_once_with(
+            ["c", "a", "b"], {"entities"}
+        )
 
     def test_fetches_from_multiple_collections(self, resource):
         with patch("resources.base_filter_resource.StorageManager") as mock_sm:
             mock_storage = MagicMock()
-            mock_col = MagicMock()
-            mock_col.find.return_value = []
-            mock_storage.db.__getitem__.return_value = mock_col
+            mock_storage.get_items_from_collection_by_ids.return_value = []
             mock_sm.return_value.get_db_engine.return_value = mock_storage
 
             resource._fetch_documents_from_mongo(["id1"], {"col1", "col2"})
 
-        db_calls = mock_storage.db.__getitem__.call_args_list
-        queried = {call[0][0] for call in db_calls}
+        bulk_read = mock_storage.get_items_from_collection_by_ids
+        queried = set(bulk_read.call_args.args[1])
         assert "col1" in queried
         assert "col2" in queried
 
     def test_unknown_docs_sorted_to_end(self, resource):
         with patch("resources.base_filter_resource.StorageManager") as mock_sm:
             mock_storage = MagicMock()
-            mock_storage.db.__getitem__.return_value.find.return_value = [
+            mock_storage.get_items_from_collection_by_ids.return_value = [
                 make_mongo_doc("a"),
                 make_mongo_doc("b"),
                 make_mongo_doc("unknown"),
             ]
-            mock_storage._prepare_mongo_document.side_effect = lambda doc, _: doc
             mock_sm.return_value.get_db_engine.return_value = mock_storage
 
             results = resource._fetch_documents_from_mongo(["a", "b"], {"entities"})
@@ -0,0 +1,118 @@
+"""Unit tests for the background Loki push in logging_elody and the fast path of
+logging_elody.logger.Logger."""
+
+import logging
+import threading
+from os import getpid
+
+import pytest
+from logging_elody.batch_handler import BackgroundBatchHandler
+from logging_elody.logger import Logger
+from metrics import log_records_dropped
+
+
+class RecordingTarget:
+    def __init__(self, block=None):
+        self.batches = []
+        self.block = block
+        self.pushed = threading.Event()
+
+    def emit_batch(self, records):
+        if self.block:
+            self.block.wait()
+        self.batches.append([record.getMessage() for record in records])
+        self.pushed.set()
+
+
+def make_record(message, level=logging.INFO):
+    return logging.LogRecord("test", level, __file__, 1, message, None, None)
+
+
+def dropped(level):
+    return log_records_dropped.labels(level)._value.get()
+
+
+class TestBackgroundBatchHandler:
+    def test_records_are_pushed_in_batches(self):
+        target = RecordingTarget()
+        handler = BackgroundBatchHandler(target, batch_size=3, batch_interval=5)
+
+        for i in range(3):
+            handler.emit(make_record(f"message {i}"))
+
+        assert target.pushed.wait(2)
+        assert target.batches == [["message 0", "message 1", "message 2"]]
+
+    def test_partial_batch_is_pushed_after_the_interval(self):
+        target = RecordingTarget()
+        handler = BackgroundBatchHandler(target, batch_size=100, batch_interval=0.05)
+
+        handler.emit(make_record("alone"))
+
+        assert target.pushed.wait(2)
+        assert target.batches == [["alone"]]
+
+    def test_full_queue_drops_and_counts_records(self):
+        block = threading.Event()
+        target = RecordingTarget(block)
+        handler = BackgroundBatchHandler(
+            target, max_size=1, batch_size=1, batch_interval=0
+        )
+        before = dropped("warning")
+
+        handler.emit(make_record("taken by the worker", logging.WARNING))
+        while not handler.queue.empty():
+            pass
+        handler.emit(make_record("queued", logging.WARNING))
+        handler.emit(make_record("dropped", logging.WARNING))
+
+        assert dropped("warning") == before + 1
+        block.set()
+
+    def test_flush_pushes_the_queued_records(self):
+        target = RecordingTarget()
+        handler = BackgroundBatchHandler(target, batch_size=10, batch_interval=60)
+        # Pretend the worker runs, so only flush takes records off the queue.
+        handler._worker_pid = getpid()
+
+        handler.emit(make_record("first"))
+        handler.emit(make_record("second"))
+        handler.flush()
+
+        assert target.batches == [["first", "second"]]
+
+
+@pytest.fixture
+def logger():
+    logger = Logger()
+    level = logger._logger.level
+    yield logger
+    logger._logger.setLevel(level)
+
+
+class TestLoggerFastPath:
+    def test_disabled_level_does_not_flatten_the_item(self, logger, monkeypatch):
+        logged = []
+        logger._logger.setLevel(logging.INFO)
+        monkeypatch.setattr(logger, "_log", lambda *args, **kwargs: logged.append(1))
+
+        logger.debug("not logged", {"type": "asset"})
+        logger.info("logged", {"type": "asset"})
+
+        assert logged == [1]
+
+    def test_frame_info_names_the_caller(self, logger, monkeypatch):
+        logged = []
+        logger._logger.setLevel(logging.DEBUG)
+        monkeypatch.setattr(
+            logger.logger,
+            "info",
+            lambda message, tags, extra: logged.append(extra),
+        )
+
+        logger.info("logged", {})
+
+        assert logged[0]["frame_info"].endswith(
+            "in function: test_frame_info_names_the_caller"
+        )
+        assert f"file: {__file__}" in logged[0]["frame_info"]
@@ -0,0 +1,204 @@
+"""Unit tests for the job queue handlers in queues.py and resources/base/job_state.py."""
+
+from unittest.mock import MagicMock, patch
+
+import pytest
+import resources.base.job_state as job_state
+
+
+def make_parent_job(status="running", **child_jobs):
+    counters = {
+        "initiated": 2,
+        "queued": 0,
+        "running": 1,
+        "failed": 0,
+        "finished": 1,
+        "warning": 0,
+        **child_jobs,
+    }
+    return {
+        "_id": "parent",
+        "type": "job",
+        "metadata": [
+            {"key": "status", "value": status},
+            {"key": "child_jobs", "value": counters},
+        ],
+    }
+
+
+@pytest.fixture
+def storage():
+    mock = MagicMock()
+    with patch("resources.queues.StorageManager") as sm:
+        sm.return_value.get_db_engine.return_value = mock
+        yield mock
+
+
+@pytest.fixture(autouse=True)
+def mapper():
+    mock = MagicMock()
+    mock.get.return_value.crud.return_value = {"collection": "jobs"}
+    with patch("resources.queues.get_object_configuration_mapper", return_value=mock):
+        yield mock
+
+
+@pytest.fixture
+def defer():
+    with patch("resources.queues.defer_job_message") as mock:
+        yield mock
+
+
+class TestParentJobCounters:
+    def test_a_status_change_updates_the_parent_in_one_call(self, storage, defer):
+        from resources.queues import _handle_status_update
+
+        storage.increment_metadata_values.return_value = make_parent_job(running=2)
+
+        _handle_status_update("parent", "jobs", "queued", "running")
+
+        storage.increment_metadata_values.assert_called_once_with(
+            id="parent",
+            collection="jobs",
+            metadata_key="child_jobs",
+            increment_fields={"queued": -1, "running": 1},
+        )
+        storage.get_item_from_collection_by_id.assert_not_called()
+        defer.assert_not_called()
+
+    def test_the_last_finished_child_finishes_the_parent(self, storage):
+        from resources.queues import _handle_status_update
+
+        parent_job = make_parent_job(running=0, finished=2)
+        storage.increment_metadata_values.return_value = parent_job
+
+        with patch("resources.queues.handle_parent_job_finished") as finished:
+            _handle_status_update("parent", "jobs", "running", "finished")
+
+        finished.assert_called_once()
+        assert finished.call_args.args == ("parent", parent_job["metadata"][1]["value"])
+
+    def test_a_missing_parent_is_deferred(self, storage, defer):
+        from resources.queues import _attach_child
+
+        storage.increment_metadata_values.return_value = None
+        storage.get_item_from_collection_by_id.return_value = None
+
+        _attach_child("parent", "jobs")
+
+        body = defer.call_args.args[0]
+        assert body["deferred"] == "parent_job"
+        assert body["data"] == {
+            "parent_job_id": "parent",
+            "collection": "jobs",
+            "increment_fields": {"initiated": 1, "queued": 1},
+            "new_status": None,
+        }
+
+    def test_a_parent_without_child_jobs_is_not_deferred(self, storage, defer):
+        from resources.queues import _attach_child
+
+        storage.increment_metadata_values.return_value = None
+        storage.get_item_from_collection_by_id.return_value = {"_id": "parent"}
+
+        _attach_child("parent", "jobs")
+
+        defer.assert_not_called()
+
+    def test_a_deferred_parent_update_is_retried(self, storage, defer):
+        from resources.queues import handle_job_change
+
+        storage.increment_metadata_values.return_value = make_parent_job()
+        body = {
+            "data": {
+                "parent_job_id": "parent",
+                "collection": "jobs",
+                "increment_fields": {"initiated": 1, "queued": 1},
+                "new_status": None,
+            },
+            "deferred": "parent_job",
+            "attempt": 1,
+        }
+
+        handle_job_change(None, body, "message")
+
+        storage.increment_metadata_values.assert_called_once()
+        defer.assert_not_called()
+
+
+class TestUpdateJob:
+    def test_a_missing_job_is_deferred_instead_of_waited_for(self, storage, defer):
+        from resources.queues import update_job
+
+        storage.get_item_from_collection_by_id.return_value = None
+        body = {"data": {"id": "child", "patch": {"metadata": []}}}
+
+        update_job(None, body, "message")
+
+        defer.assert_called_once_with(body)
+        storage.patch_item_from_collection_v2.assert_not_called()
+
+
+class TestJobShards:
+    def test_messages_are_routed_to_the_shard_of_their_job(self, monkeypatch):
+        import resources.queues as queues
+
+        monkeypatch.setattr(queues, "JOB_QUEUE_SHARDS", 4)
+        monkeypatch.setattr(job_state, "JOB_QUEUE_SHARDS", 4)
+        rabbit = MagicMock()
+        body = {"data": {"id": "child", "patch": {}}}
+
+        with patch("resources.queues.get_rabbit", return_value=rabbit):
+            queues.handle_job_change(None, body, "message")
+
+        shard = job_state.get_job_shard("child")
+        rabbit.send.assert_called_once_with(body, routing_key=f"dams.job_state.{shard}")
+
+    def test_deferred_parent_updates_follow_the_parent(self):
+        body = {"data": {"parent_job_id": "parent"}, "deferred": "parent_job"}
+
+        assert job_state.get_job_message_id(body) == "parent"
+
+
+class TestDeferJobMessage:
+    @pytest.fixture
+    def rabbit(self, monkeypatch):
+        monkeypatch.setattr(job_state, "_delay_queue_declared", False)
+        rabbit = MagicMock()
+        rabbit.mq_exchange = "dams"
+        with patch("resources.base.job_state.get_rabbit", return_value=rabbit):
+            yield rabbit
+
+    def test_messages_go_through_the_delay_queue(self, rabbit):
+        job_state.defer_job_message({"data": {"id": "job"}})
+        job_state.defer_job_message({"data": {"id": "job"}, "attempt": 1})
+
+        channel = rabbit.get_connection.return_value.channel.return_value
+        channel.queue.declare.assert_called_once()
+        arguments = channel.queue.declare.call_args.kwargs["arguments"]
+        assert arguments["x-dead-letter-routing-key"] == "dams.job_deferred"
+        assert [call.args[0]["attempt"] for call in rabbit.send.call_args_list] == [
+            1,
+            2,
+        ]
+        assert rabbit.send.call_args.kwargs["routing_key"] == "dams.job_delayed"
+
+    def test_other_managers_wait_and_send_the_message_back(self, rabbit, monkeypatch):
+        monkeypatch.setenv("AMQP_MANAGER", "rabbitmq_pika_flask")
+
+        with patch("resources.base.job_state.sleep") as sleep:
+            deferred = job_state.defer_job_message({"data": {"id": "job"}})
+
+        assert deferred is True
+        sleep.assert_called_once_with(job_state.JOB_RETRY_DELAY_SECONDS)
+        rabbit.get_connection.assert_not_called()
+        rabbit.send.assert_called_once_with(
+            {"data": {"id": "job"}, "attempt": 1}, routing_key="dams.job_deferred"
+        )
+
+    def test_messages_are_dropped_after_the_last_attempt(self, rabbit):
+        deferred = job_state.defer_job_message(
+            {"data": {"id": "job"}, "attempt": job_state.JOB_RETRY_MAX_ATTEMPTS}
+        )
+
+        assert deferred is False
+        rabbit.send.assert_not_called()
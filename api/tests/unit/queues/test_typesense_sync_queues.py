@@ -27,8 +27,12 @@ def make_mock_config(
 @pytest.fixture
 def storage():
     mock = MagicMock()
-    with patch("resources.queues.StorageManager") as sm:
+    with (
+        patch("resources.queues.StorageManager") as sm,
+        patch("search.typesense_indexer.StorageManager") as indexer_sm,
+    ):
         sm.return_value.get_db_engine.return_value = mock
+        indexer_sm.return_value.get_db_engine.return_value = mock
         yield mock
 
 
@@ -40,31 +44,71 @@ def mapper():
         yield mock
 
 
+@pytest.fixture
+def indexer():
+    from search.typesense_indexer import TypesenseIndexer
+
+    # A batch size of one flushes inline, so every handler call settles its
+    # message before returning.
+    indexer = TypesenseIndexer(batch_size=1)
+    with patch("search.typesense_indexer.get_typesense_indexer", return_value=indexer):
+        yield indexer
+
+
+def make_message(body, redelivered=False):
+    message = MagicMock()
+    message.json.return_value = body
+    message.redelivered = redelivered
+    return message
+
+
+def import_results(*successes):
+    return [
+        {"success": True} if success else {"success": False, "error": "bad doc"}
+        for success in successes
+    ]
+
+
 class TestSyncEntityToTypesense:
     """Tests for the sync_entity_to_typesense queue handler."""
 
     def _call(self, body, redelivered=False):
         from resources.queues import sync_entity_to_typesense
 
-        message = MagicMock()
-        message.json.return_value = body
-        message.redelivered = redelivered
+        message = make_message(body, redelivered)
         sync_entity_to_typesense(message)
         return message
 
-    def test_syncs_entity_to_typesense_and_acks(self, storage, mapper):
+    def test_prefetches_a_full_indexer_batch(self):
+        import rabbit
+        from resources.queues import typesense_index_batch_size
+        from search.typesense_indexer import get_typesense_indexer
+
+        queue_arguments = [
+            call.kwargs
+            for call in rabbit.get_rabbit().queue.call_args_list
+            if call.kwargs.get("queue_name", "").endswith("-sync_entity_to_typesense")
+        ]
+        with patch("search.typesense_indexer._indexer", None):
+            batch_size = get_typesense_indexer().batch_size
+
+        assert queue_arguments[-1]["prefetch_count"] == typesense_index_batch_size
+        assert typesense_index_batch_size >= batch_size
+
+    def test_syncs_entity_to_typesense_and_acks(self, storage, mapper, indexer):
         entity = make_entity("ent-1", "work_word")
-        storage.get_item_from_collection_by_id.return_value = entity
+        storage.get_items_from_collection_by_ids.return_value = [entity]
 
         with (
             patch(
-                "search.typesense_client.upsert_document", return_value=True
-            ) as mock_upsert,
+                "search.typesense_indexer.import_documents",
+                return_value=import_results(True),
+            ) as mock_import,
             patch(
-                "search.typesense_client.prepare_document_for_typesense"
+                "search.typesense_indexer.prepare_document_for_typesense"
             ) as mock_prepare,
             patch(
-                "search.typesense_client.get_collection_field_types",
+                "search.typesense_indexer.get_collection_field_types",
                 return_value={"properties_code_value": "string"},
             ) as mock_field_types,
         ):
@@ -85,47 +129,56 @@ class TestSyncEntityToTypesense:
                 facet_fields=[],
                 field_types={"properties_code_value": "string"},
             )
-            mock_upsert.assert_called_once_with(
-                "entities", {"id": "ent-1", "_id": "ent-1", "type": "work_word"}
+            mock_import.assert_called_once_with(
+                "entities", [{"id": "ent-1", "_id": "ent-1", "type": "work_word"}]
             )
             message.ack.assert_called_once()
             message.nack.assert_not_called()
 
-    def test_skips_when_typesense_not_enabled(self, storage, mapper):
+    def test_skips_when_typesense_not_enabled(self, storage, mapper, indexer):
         mapper.get.return_value = make_mock_config(ts_enabled=False)
 
-        with patch("search.typesense_client.upsert_document") as mock_upsert:
+        with patch("search.typesense_indexer.import_documents") as mock_import:
             message = self._call(
                 {"data": {"location": "/entities/ent-1", "type": "work_word"}}
             )
-            storage.get_item_from_collection_by_id.assert_not_called()
-            mock_upsert.assert_not_called()
+            storage.get_items_from_collection_by_ids.assert_not_called()
+            mock_import.assert_not_called()
             message.ack.assert_called_once()
 
-    def test_skips_when_entity_not_found(self, storage, mapper):
-        storage.get_item_from_collection_by_id.return_value = None
+    def test_skips_when_entity_not_found(self, storage, mapper, indexer):
+        storage.get_items_from_collection_by_ids.return_value = []
 
-        with patch("search.typesense_client.upsert_document") as mock_upsert:
+        with (
+            patch("search.typesense_indexer.import_documents") as mock_import,
+            patch(
+                "search.typesense_indexer.get_collection_field_types", return_value={}
+            ),
+        ):
             message = self._call(
                 {"data": {"location": "/entities/ent-missing", "type": "work_word"}}
             )
-            mock_upsert.assert_not_called()
+            mock_import.assert_not_called()
             message.ack.assert_called_once()
 
-    def test_uses_config_collection(self, storage, mapper):
+    def test_uses_config_collection(self, storage, mapper, indexer):
         entity = make_entity("ent-1", "bibliographic_entity")
-        storage.get_item_from_collection_by_id.return_value = entity
+        storage.get_items_from_collection_by_ids.return_value = [entity]
         mapper.get.return_value = make_mock_config(
             collection="bibliographic_entities_actual"
         )
 
         with (
             patch(
-                "search.typesense_client.upsert_document", return_value=True
-            ) as mock_upsert,
+                "search.typesense_indexer.import_documents",
+                return_value=import_results(True),
+            ) as mock_import,
             patch(
-                "search.typesense_client.prepare_document_for_typesense"
+                "search.typesense_indexer.prepare_document_for_typesense"
             ) as mock_prepare,
+            patch(
+                "search.typesense_indexer.get_collection_field_types", return_value={}
+            ),
         ):
             mock_prepare.return_value = {"id": "ent-1"}
 
@@ -138,24 +191,24 @@ class TestSyncEntityToTypesense:
                 }
             )
 
-            storage.get_item_from_collection_by_id.assert_called_once_with(
-                "bibliographic_entities_actual", "ent-1"
+            storage.get_items_from_collection_by_ids.assert_called_once_with(
+                ["ent-1"], "bibliographic_entities_actual"
             )
-            mock_upsert.assert_called_once()
+            mock_import.assert_called_once()
 
-    def test_nacks_and_requeues_on_first_failure(self, storage, mapper):
+    def test_nacks_and_requeues_on_first_failure(self, storage, mapper, indexer):
         entity = make_entity("ent-1", "work_word")
-        storage.get_item_from_collection_by_id.return_value = entity
+        storage.get_items_from_collection_by_ids.return_value = [entity]
 
         with (
             patch(
-                "search.typesense_client.prepare_document_for_typesense",
+                "search.typesense_indexer.prepare_document_for_typesense",
                 side_effect=Exception("denormalization boom"),
             ),
             patch(
-                "search.typesense_client.get_collection_field_types", return_value={}
+                "search.typesense_indexer.get_collection_field_types", return_value={}
             ),
-            patch("resources.queues.log") as mock_log,
+            patch("search.typesense_indexer.log") as mock_log,
         ):
             message = self._call(
                 {"data": {"location": "/entities/ent-1", "type": "work_word"}},
@@ -166,19 +219,19 @@ class TestSyncEntityToTypesense:
         message.nack.assert_called_once_with(requeue=True)
         message.ack.assert_not_called()
 
-    def test_rejects_without_requeue_after_redelivery(self, storage, mapper):
+    def test_rejects_without_requeue_after_redelivery(self, storage, mapper, indexer):
         entity = make_entity("ent-1", "work_word")
-        storage.get_item_from_collection_by_id.return_value = entity
+        storage.get_items_from_collection_by_ids.return_value = [entity]
 
         with (
             patch(
-                "search.typesense_client.prepare_document_for_typesense",
+                "search.typesense_indexer.prepare_document_for_typesense",
                 side_effect=Exception("still failing"),
             ),
             patch(
-                "search.typesense_client.get_collection_field_types", return_value={}
+                "search.typesense_indexer.get_collection_field_types", return_value={}
             ),
-            patch("resources.queues.log") as mock_log,
+            patch("search.typesense_indexer.log") as mock_log,
         ):
             message = self._call(
                 {"data": {"location": "/entities/ent-1", "type": "work_word"}},
@@ -189,20 +242,20 @@ class TestSyncEntityToTypesense:
         message.reject.assert_called_once_with(requeue=False)
         message.ack.assert_not_called()
 
-    def test_nacks_when_upsert_returns_false(self, storage, mapper):
+    def test_nacks_when_import_fails(self, storage, mapper, indexer):
         entity = make_entity("ent-1", "work_word")
-        storage.get_item_from_collection_by_id.return_value = entity
+        storage.get_items_from_collection_by_ids.return_value = [entity]
 
         with (
-            patch("search.typesense_client.upsert_document", return_value=False),
+            patch("search.typesense_indexer.import_documents", return_value=None),
             patch(
-                "search.typesense_client.prepare_document_for_typesense",
+                "search.typesense_indexer.prepare_document_for_typesense",
                 return_value={"id": "ent-1"},
             ),
             patch(
-                "search.typesense_client.get_collection_field_types", return_value={}
+                "search.typesense_indexer.get_collection_field_types", return_value={}
             ),
-            patch("resources.queues.log") as mock_log,
+            patch("search.typesense_indexer.log") as mock_log,
         ):
             message = self._call(
                 {"data": {"location": "/entities/ent-1", "type": "work_word"}}
@@ -212,38 +265,39 @@ class TestSyncEntityToTypesense:
         message.nack.assert_called_once_with(requeue=True)
         message.ack.assert_not_called()
 
-    def test_skips_malformed_message_no_location(self, storage):
-        with patch("search.typesense_client.upsert_document") as mock_upsert:
+    def test_skips_malformed_message_no_location(self, storage, indexer):
+        with patch("search.typesense_indexer.import_documents") as mock_import:
             message = self._call({"data": {"type": "work_word"}})
 
-            storage.get_item_from_collection_by_id.assert_not_called()
-            mock_upsert.assert_not_called()
+            storage.get_items_from_collection_by_ids.assert_not_called()
+            mock_import.assert_not_called()
             message.ack.assert_called_once()
 
-    def test_skips_malformed_message_no_type(self, storage):
-        with patch("search.typesense_client.upsert_document") as mock_upsert:
+    def test_skips_malformed_message_no_type(self, storage, indexer):
+        with patch("search.typesense_indexer.import_documents") as mock_import:
             message = self._call({"data": {"location": "/entities/ent-1"}})
 
-            storage.get_item_from_collection_by_id.assert_not_called()
-            mock_upsert.assert_not_called()
+            storage.get_items_from_collection_by_ids.assert_not_called()
+            mock_import.assert_not_called()
             message.ack.assert_called_once()
 
-    def test_uses_correct_typesense_collection(self, storage, mapper):
+    def test_uses_correct_typesense_collection(self, storage, mapper, indexer):
         entity = make_entity("ent-1", "work_word")
-        storage.get_item_from_collection_by_id.return_value = entity
+        storage.get_items_from_collection_by_ids.return_value = [entity]
         mapper.get.return_value = make_mock_config(
             ts_collection="bibliographic", search_fields=["title"]
         )
 
         with (
             patch(
-                "search.typesense_client.upsert_document", return_value=True
-            ) as mock_upsert,
+                "search.typesense_indexer.import_documents",
+                return_value=import_results(True),
+            ) as mock_import,
             patch(
-                "search.typesense_client.prepare_document_for_typesense"
+                "search.typesense_indexer.prepare_document_for_typesense"
             ) as mock_prepare,
             patch(
-                "search.typesense_client.get_collection_field_types", return_value={}
+                "search.typesense_indexer.get_collection_field_types", return_value={}
             ) as mock_field_types,
         ):
             mock_prepare.return_value = {"id": "ent-1"}
@@ -254,7 +308,111 @@ class TestSyncEntityToTypesense:
             mock_prepare.assert_called_once_with(
                 entity, ["title"], facet_fields=[], field_types={}
             )
-            mock_upsert.assert_called_once_with("bibliographic", {"id": "ent-1"})
+            mock_import.assert_called_once_with("bibliographic", [{"id": "ent-1"}])
+
+
+class TestTypesenseIndexer:
+    """Tests for batching and per-message settling in TypesenseIndexer."""
+
+    TS_CONFIG = {"collection": "entities", "search_fields": ["title"]}
+
+    def _submit(self, indexer, entity_ids):
+        messages = []
+        for entity_id in entity_ids:
+            message = make_message({})
+            indexer.submit(message, "entities", entity_id, self.TS_CONFIG)
+            messages.append(message)
+        return messages
+
+    @pytest.fixture(autouse=True)
+    def field_types(self):
+        with patch(
+            "search.typesense_indexer.get_collection_field_types", return_value={}
+        ):
+            yield
+
+    def test_full_batch_is_imported_in_one_call(self, storage):
+        from search.typesense_indexer import TypesenseIndexer
+
+        storage.get_items_from_collection_by_ids.return_value = [
+            make_entity("ent-1"),
+            make_entity("ent-2"),
+        ]
+        indexer = TypesenseIndexer(batch_size=2, flush_interval=60)
+
+        with patch(
+            "search.typesense_indexer.import_documents",
+            return_value=import_results(True, True),
+        ) as mock_import:
+            messages = self._submit(indexer, ["ent-1", "ent-2"])
+
+        storage.get_items_from_collection_by_ids.assert_called_once_with(
+            ["ent-1", "ent-2"], "entities"
+        )
+        mock_import.assert_called_once()
+        assert [doc["id"] for doc in mock_import.call_args[0][1]] == [
+            "ent-1",
+            "ent-2",
+        ]
+        for message in messages:
+            message.ack.assert_called_once()
+
+    def test_messages_are_settled_by_their_own_result_line(self, storage):
+        from search.typesense_indexer import TypesenseIndexer
+
+        storage.get_items_from_collection_by_ids.return_value = [
+            make_entity("ent-1"),
+            make_entity("ent-2"),
+        ]
+        indexer = TypesenseIndexer(batch_size=2, flush_interval=60)
+
+        with (
+            patch(
+                "search.typesense_indexer.import_documents",
+                return_value=import_results(False, True),
+            ),
+            patch("search.typesense_indexer.log"),
+        ):
+            failed, indexed = self._submit(indexer, ["ent-1", "ent-2"])
+
+        failed.nack.assert_called_once_with(requeue=True)
+        failed.ack.assert_not_called()
+        indexed.ack.assert_called_once()
+
+    def test_duplicate_changes_share_one_document(self, storage):
+        from search.typesense_indexer import TypesenseIndexer
+
+        storage.get_items_from_collection_by_ids.return_value = [make_entity("ent-1")]
+        indexer = TypesenseIndexer(batch_size=2, flush_interval=60)
+
+        with patch(
+            "search.typesense_indexer.import_documents",
+            return_value=import_results(True),
+        ) as mock_import:
+            messages = self._submit(indexer, ["ent-1", "ent-1"])
+
+        assert len(mock_import.call_args[0][1]) == 1
+        for message in messages:
+            message.ack.assert_called_once()
+
+    def test_partial_batch_waits_for_flush(self, storage):
+        from search.typesense_indexer import TypesenseIndexer
+
+        storage.get_items_from_collection_by_ids.return_value = [make_entity("ent-1")]
+        indexer = TypesenseIndexer(batch_size=10, flush_interval=60)
+
+        with patch(
+            "search.typesense_indexer.import_documents",
+            return_value=import_results(True),
+        ) as mock_import:
+            (message,) = self._submit(indexer, ["ent-1"])
+            mock_import.assert_not_called()
+            message.ack.assert_not_called()
+
+            indexer.flush()
+
+        mock_import.assert_called_once()
+        message.ack.assert_called_once()
 
 
 class TestDeleteEntityFromTypesense:
@@ -0,0 +1,128 @@
+"""Unit tests for the bulk mode of Batch.post in resources/base/batch.py."""
+
+from unittest.mock import MagicMock, patch
+
+import pytest
+from elody.exceptions import NonUniqueException
+from flask import Flask, g
+from werkzeug.exceptions import BadRequest
+
+
+def row(id, type="asset"):
+    return {"_id": id, "type": type, "identifiers": [id]}
+
+
+# Rows post_prepared fails, by id.
+failures = {
+    "duplicate": NonUniqueException("duplicate identifier"),
+    "invalid": BadRequest("invalid asset"),
+    "mediafile": BadRequest("invalid mediafile"),
+}
+
+
+@pytest.fixture
+def config():
+    config = MagicMock()
+    config.crud.return_value = {
+        "creation_preparer": lambda content: content,
+        "document_exception_message_constructor": lambda exception, message: message,
+    }
+    with patch("resources.base.batch.get_object_configuration_mapper") as mapper:
+        mapper.return_value.get.return_value = config
+        yield config
+
+
+@pytest.fixture
+def resources():
+    """The Documents and Document resources Batch.post creates, as one mock so
+    the order of their calls can be checked."""
+    resources = MagicMock()
+    resources.documents.prepare_post.side_effect = lambda spec: dict(g.content)
+    resources.documents.post_prepared.side_effect = lambda items, spec: [
+        failures.get(item["_id"], item) for item in items
+    ]
+    with (
+        patch("resources.base.batch.Documents", return_value=resources.documents),
+        patch("resources.base.batch.Document", return_value=resources.document),
+        patch("resources.base.batch.init_job", return_value="job-1"),
+        patch("resources.base.batch.start_job"),
+        patch("resources.base.batch.finish_job"),
+        patch("resources.base.batch.fail_job"),
+        patch("resources.base.batch.get_user_context"),
+    ):
+        yield resources
+
+
+def post_batch(config, rows, query="bulk=1"):
+    from resources.base.batch import Batch
+
+    config.serialization.return_value = lambda body, **_: iter(rows)
+    with Flask(__name__).test_request_context(
+        f"/batch?{query}", method="POST", data=b"rows", content_type="text/csv"
+    ):
+        return Batch.post.__wrapped__(Batch.__new__(Batch), spec="elody")
+
+
+class TestBulkBatch:
+    def test_rows_are_saved_in_one_chunk(self, config, resources):
+        response, status_code = post_batch(config, [row("a"), row("b")])
+
+        resources.documents.post_prepared.assert_called_once_with(
+            [row("a"), row("b")], spec="elody"
+        )
+        resources.documents.post.assert_not_called()
+        assert status_code == 201
+        assert response["entities"] == [row("a"), row("b")]
+
+    def test_failed_rows_are_reported_on_their_own_line(self, config, resources):
+        rows = [
+            row("a"),
+            row("duplicate"),
+            row("invalid"),
+            row("mediafile", "mediafile"),
+            row("b"),
+        ]
+
+        response, status_code = post_batch(config, rows)
+
+        assert status_code == 400
+        assert response["entities"] == [row("a"), row("b")]
+        assert response["warnings"]["entities"] == ["3) duplicate identifier | asset"]
+        assert response["errors"] == {
+            "entities": ["4) invalid asset | asset"],
+            "mediafiles": ["5) invalid mediafile | mediafile"],
+        }
+
+    def test_the_chunk_is_saved_before_a_row_patching_it(self, config, resources):
+        resources.document.patch.return_value = row("a")
+
+        post_batch(config, [row("a"), row("b"), row("a")])
+
+        calls = [name for name, *_ in resources.mock_calls]
+        assert calls.index("documents.post_prepared") < calls.index("document.patch")
+        resources.documents.post_prepared.assert_called_once_with(
+            [row("a"), row("b")], spec="elody"
+        )
+
+
+class TestPostPrepared:
+    def test_text_responses_are_added_to_the_job(self):
+        from resources.base.documents import Documents
+
+        documents = Documents.__new__(Documents)
+        with (
+            Flask(__name__).test_request_context(
+                "/documents?current_job_id=job-1",
+                method="POST",
+                headers={"Accept": "text/uri-list"},
+            ),
+            patch(
+                "resources.base.documents.GenericObjectV2.post_prepared",
+                return_value=["/entities?id=a", BadRequest("invalid")],
+            ),
+            patch("resources.base.documents.add_document_to_job") as add_to_job,
+        ):
+            documents.post_prepared([row("a"), row("b")], spec="elody")
+
+        add_to_job.assert_called_once()
+        assert add_to_job.call_args.args == ("job-1", "a")
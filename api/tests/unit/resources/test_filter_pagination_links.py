@@ -1,3 +1,5 @@
+from unittest.mock import patch
+
 import pytest
 
 
@@ -73,3 +75,43 @@ class TestAddPaginationLinksCappedCount:
             _items(1200, 20), 1180, 20, self.collection
         )
         assert "next" not in items
+
+
+class TestAddCursorPaginationLinks:
+    collection = "things"
+
+    def test_next_link_carries_cursor_and_order(self, resource):
+        items = {**_items(640, 20), "next_cursor": "abc"}
+        items = resource._add_pagination_links(
+            items, 0, 20, self.collection, order_by="title", asc=False
+        )
+        assert items["next"] == (
+            f"/{self.collection}/filter?cursor=abc&limit=20&order_by=title&asc=0"
+        )
+        assert "previous" not in items
+
+    def test_no_next_link_without_cursor(self, resource):
+        items = {**_items(640, 5), "next_cursor": None}
+        items = resource._add_pagination_links(items, 0, 20, self.collection)
+        assert "next" not in items
+
+
+class TestCursorOnArango:
+    def test_cursor_is_a_bad_request(self, resource):
+        from filters_v2.arango_wrapper import ArangoWrapper
+        from flask import Flask
+        from werkzeug.exceptions import BadRequest
+
+        resource.filter_engine_v2 = ArangoWrapper.__new__(ArangoWrapper)
+        resource._add_cors_headers = lambda: None
+        app = Flask(__name__)
+
+        with (
+            app.test_request_context("/entities/filter?cursor=abc"),
+            patch(
+                "resources.base_filter_resource.get_filter_result_cache",
+                return_value=None,
+            ),
+            pytest.raises(BadRequest),
+        ):
+            resource._execute_advanced_search_with_query_v2([])
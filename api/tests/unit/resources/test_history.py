@@ -0,0 +1,96 @@
+"""Unit tests for the paginated and streamed history of resources/history.py."""
+
+import json
+from unittest.mock import MagicMock
+
+import pytest
+from flask import Flask
+from resources.history import History
+from storage.history_store import HISTORY_PAGE_MAX_LIMIT
+from werkzeug.exceptions import HTTPException
+
+ENTRIES = [
+    {"_id": f"history-{i}", "collection": "entities", "object": {"_id": "e"}}
+    for i in range(3)
+]
+
+
+@pytest.fixture
+def app():
+    return Flask(__name__)
+
+
+@pytest.fixture
+def resource():
+    resource = object.__new__(History)
+    resource.storage = MagicMock()
+    return resource
+
+
+class TestHistory:
+    def test_a_page_links_to_the_next_one(self, app, resource):
+        resource.storage.get_history_page_for_item.return_value = {
+            "results": ENTRIES[:2],
+            "next_cursor": "abc",
+        }
+
+        with app.test_request_context(
+            "/history/entities/e?limit=2&field=object._id&skip_relations=1"
+        ):
+            page = resource.get("entities", "e")
+
+        resource.storage.get_history_page_for_item.assert_called_once_with(
+            "entities", "e", cursor=None, limit=2
+        )
+        assert page["limit"] == 2
+        assert page["next"] == (
+            "/history/entities/e?cursor=abc&limit=2&field=object._id&skip_relations=1"
+        )
+
+    def test_entries_are_streamed_as_ndjson(self, app, resource):
+        resource.storage.iter_history_for_item.return_value = iter(ENTRIES)
+
+        with app.test_request_context(
+            "/history/entities/e", headers={"Accept": "application/x-ndjson"}
+        ):
+            response = resource.get("entities", "e")
+            lines = list(response.response)
+
+        assert response.mimetype == "application/x-ndjson"
+        assert [json.loads(line) for line in lines] == ENTRIES
+
+    def test_a_timestamp_cannot_be_paginated(self, app, resource):
+        with (
+            app.test_request_context(
+                "/history/entities/e?timestamp=2024-01-01&limit=2"
+            ),
+            pytest.raises(HTTPException) as error,
+        ):
+            resource.get("entities", "e")
+
+        assert error.value.code == 400
+
+    @pytest.mark.parametrize("limit", ["0", "-5"])
+    def test_a_limit_below_one_is_rejected(self, app, resource, limit):
+        with (
+            app.test_request_context(f"/history/entities/e?limit={limit}"),
+            pytest.raises(HTTPException) as error,
+        ):
+            resource.get("entities", "e")
+
+        assert error.value.code == 400
+        resource.storage.get_history_page_for_item.assert_not_called()
+
+    def test_a_large_limit_is_capped(self, app, resource):
+        resource.storage.get_history_page_for_item.return_value = {
+            "results": ENTRIES,
+            "next_cursor": None,
+        }
+
+        with app.test_request_context("/history/entities/e?limit=1000000"):
+            page = resource.get("entities", "e")
+
+        resource.storage.get_history_page_for_item.assert_called_once_with(
+            "entities", "e", cursor=None, limit=HISTORY_PAGE_MAX_LIMIT
+        )
+        assert page["limit"] == HISTORY_PAGE_MAX_LIMIT
@@ -0,0 +1,207 @@
+"""Unit tests for the asynchronous batch imports of resources/base/import_jobs.py."""
+
+import os
+from unittest.mock import ANY, MagicMock, patch
+
+import resources.base.import_jobs as import_jobs
+from flask import Flask, g, request
+from policy_factory import _reuse_import_user_context
+from resources.base.import_jobs import ImportProgress
+
+
+def make_storage(job=None):
+    storage = MagicMock()
+    storage.get_item_from_collection_by_id.return_value = job
+    storage.increment_metadata_values.return_value = job
+    return storage
+
+
+class TestImportProgress:
+    def test_progress_is_only_written_every_interval(self):
+        storage = make_storage({"_id": "job", "metadata": []})
+        progress = ImportProgress("job", storage, interval=3600)
+
+        for line in range(1, 1001):
+            progress.report(parsed=line, written=line - 1, failed=1)
+
+        storage.increment_metadata_values.assert_not_called()
+        progress.flush()
+        storage.add_sub_item_to_collection_item.assert_called_once()
+        storage.increment_metadata_values.assert_called_once_with(
+            "job",
+            "jobs",
+            "progress",
+            {"parsed": 1000, "written": 999, "failed": 1},
+            set_fields={"heartbeat": ANY},
+        )
+
+    def test_only_the_change_since_the_last_write_is_added(self):
+        storage = make_storage(
+            {"_id": "job", "metadata": [{"key": "progress", "value": {}}]}
+        )
+        progress = ImportProgress("job", storage, interval=0)
+
+        progress.report(parsed=10, written=10)
+        progress.report(parsed=25, written=20, failed=5)
+
+        storage.add_sub_item_to_collection_item.assert_not_called()
+        assert storage.increment_metadata_values.call_args.args[3] == {
+            "parsed": 15,
+            "written": 10,
+            "failed": 5,
+        }
+
+    def test_counts_are_kept_until_the_job_exists(self):
+        storage = make_storage()
+        progress = ImportProgress("job", storage, interval=0)
+
+        progress.report(parsed=10)
+        storage.get_item_from_collection_by_id.return_value = {"_id": "job"}
+        storage.increment_metadata_values.return_value = {"_id": "job"}
+        progress.report(parsed=12)
+
+        storage.increment_metadata_values.assert_called_once_with(
+            "job", "jobs", "progress", {"parsed": 12}, set_fields={"heartbeat": ANY}
+        )
+
+    def test_a_heartbeat_is_written_without_changed_counts(self):
+        storage = make_storage(
+            {"_id": "job", "metadata": [{"key": "progress", "value": {}}]}
+        )
+        progress = ImportProgress("job", storage, interval=3600)
+
+        progress.flush()
+        storage.increment_metadata_values.assert_not_called()
+        progress.flush(heartbeat=True)
+
+        storage.increment_metadata_values.assert_called_once_with(
+            "job", "jobs", "progress", {}, set_fields={"heartbeat": ANY}
+        )
+
+
+class TestHeartbeats:
+    def test_pending_imports_without_a_recent_heartbeat_get_one(self, monkeypatch):
+        recent = MagicMock(job_id="recent", has_progress_metadata=True)
+        recent.last_write = import_jobs.monotonic()
+        missing = MagicMock(job_id="missing", has_progress_metadata=False)
+        missing.last_write = import_jobs.monotonic()
+        monkeypatch.setattr(
+            import_jobs, "_pending_imports", {"recent": recent, "missing": missing}
+        )
+
+        import_jobs.send_heartbeats()
+
+        recent.flush.assert_not_called()
+        missing.flush.assert_called_once_with(heartbeat=True)
+
+    def test_a_finished_import_is_no_longer_pending(self, tmp_path):
+        app = Flask(__name__)
+        spool_path = tmp_path / "body"
+        spool_path.write_bytes(b"")
+        import_jobs._pending_imports["job-1"] = progress = MagicMock()
+        seen = {}
+
+        import_jobs._run_import(
+            app,
+            str(spool_path),
+            {"path": "/batch", "method": "POST"},
+            "user",
+            "job-1",
+            lambda: seen.update(progress=g.batch_progress),
+        )
+
+        assert seen == {"progress": progress}
+        assert "job-1" not in import_jobs._pending_imports
+
+
+class TestImportUserContext:
+    def make_endpoint(self, authorize=False):
+        authenticated = MagicMock(return_value="authenticated")
+        decorator = MagicMock(return_value=authenticated)
+        endpoint = _reuse_import_user_context(decorator, "request_context", authorize)(
+            lambda: ("endpoint", g.user_context)
+        )
+        return endpoint, authenticated
+
+    def test_requests_are_authenticated(self):
+        endpoint, authenticated = self.make_endpoint()
+
+        with Flask(__name__).test_request_context("/batch"):
+            assert endpoint() == "authenticated"
+        authenticated.assert_called_once()
+
+    def test_imports_reuse_the_user_context_of_the_submitting_request(self):
+        endpoint, authenticated = self.make_endpoint()
+
+        with Flask(__name__).test_request_context("/batch"):
+            g.import_user_context = "user"
+            assert endpoint() == ("endpoint", "user")
+        authenticated.assert_not_called()
+
+    def test_imports_are_still_authorized(self):
+        endpoint, authenticated = self.make_endpoint(authorize=True)
+
+        with (
+            Flask(__name__).test_request_context("/batch"),
+            patch("policy_factory._policy_factory") as policy_factory,
+        ):
+            policy_factory._authorize.return_value = "authorized user"
+            g.import_user_context = "user"
+            assert endpoint() == ("endpoint", "authorized user")
+        policy_factory._authorize.assert_called_once_with(
+            ANY, "user", "request_context"
+        )
+        authenticated.assert_not_called()
+
+
+class TestRunImport:
+    def test_the_import_runs_on_the_spooled_body_in_a_rebuilt_request(
+        self, tmp_path, monkeypatch
+    ):
+        monkeypatch.setattr(import_jobs, "BATCH_SPOOL_DIR", str(tmp_path))
+        app = Flask(__name__)
+        seen = {}
+
+        def run():
+            seen["body"] = request.get_data()
+            seen["args"] = request.args.to_dict()
+            seen["path"] = request.path
+            seen["job_id"] = g.batch_job_id
+            seen["user_context"] = g.user_context
+
+        with app.test_request_context(
+            "/batch?type=asset&async=1", method="POST", data=b"a,b\n1,2\n"
+        ):
+            spool_path = import_jobs.spool_request_body(request)
+            future = import_jobs.submit_import(
+                app, spool_path, request, "user", "job-1", run
+            )
+        future.result()
+
+        assert seen == {
+            "body": b"a,b\n1,2\n",
+            "args": {"type": "asset", "async": "1"},
+            "path": "/batch",
+            "job_id": "job-1",
+            "user_context": "user",
+        }
+        assert not os.path.exists(spool_path)
+
+    def test_a_crashing_import_fails_its_job(self, tmp_path):
+        app = Flask(__name__)
+        spool_path = tmp_path / "body"
+        spool_path.write_bytes(b"")
+
+        with patch.object(import_jobs, "fail_job") as fail_job:
+            import_jobs._run_import(
+                app,
+                str(spool_path),
+                {"path": "/batch", "method": "POST"},
+                "user",
+                "job-1",
+                MagicMock(side_effect=RuntimeError("boom")),
+            )
+
+        fail_job.assert_called_once()
+        assert fail_job.call_args.args[0] == "job-1"
+        assert not spool_path.exists()
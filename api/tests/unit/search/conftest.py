@@ -0,0 +1,10 @@
+import pytest
+import search.typesense_client as tc
+
+
+@pytest.fixture(autouse=True)
+def reset_circuit_breaker():
+    """Failures recorded by one test must not open the breaker for the next."""
+    tc._circuit_breaker.reset()
+    yield
+    tc._circuit_breaker.reset()
@@ -830,3 +830,92 @@ class TestPrepareDocumentWithFacetFields:
             entity, [], facet_fields=["properties.ref_genre.value"]
         )
         assert "properties_ref_genre_value" not in result
+
+
+class _Unavailable(Exception):
+    pass
+
+
+class RequestMalformed(Exception):
+    pass
+
+
+class TestCircuitBreaker:
+    def _open(self, breaker):
+        for _ in range(breaker.failure_threshold):
+            breaker.record(_Unavailable())
+
+    def test_opens_after_consecutive_failures(self):
+        breaker = tc.CircuitBreaker(failure_threshold=3, cooldown_seconds=60)
+        breaker.record(_Unavailable())
+        breaker.record(_Unavailable())
+        assert breaker.allow()
+
+        breaker.record(_Unavailable())
+        assert breaker.is_open
+        assert not breaker.allow()
+
+    def test_success_resets_the_failure_count(self):
+        breaker = tc.CircuitBreaker(failure_threshold=2, cooldown_seconds=60)
+        breaker.record(_Unavailable())
+        breaker.record()
+        breaker.record(_Unavailable())
+        assert not breaker.is_open
+
+    def test_client_errors_do_not_count_as_failures(self):
+        breaker = tc.CircuitBreaker(failure_threshold=1, cooldown_seconds=60)
+        breaker.record(RequestMalformed("Could not find a field named `x`"))
+        assert not breaker.is_open
+
+    def test_lets_one_trial_through_after_cooldown(self):
+        breaker = tc.CircuitBreaker(failure_threshold=1, cooldown_seconds=0)
+        self._open(breaker)
+
+        assert breaker.allow()
+        assert not breaker.allow()
+
+        breaker.record()
+        assert not breaker.is_open
+        assert breaker.allow()
+
+    def test_failed_trial_reopens(self):
+        breaker = tc.CircuitBreaker(failure_threshold=1, cooldown_seconds=0)
+        self._open(breaker)
+        assert breaker.allow()
+
+        breaker.record(_Unavailable())
+        assert breaker.is_open
+
+    def test_open_breaker_skips_search_calls(self):
+        mock_client = MagicMock()
+        search_call = mock_client.collections.__getitem__.return_value.documents.search
+        search_call.side_effect = _Unavailable("read timeout")
+
+        with patch.object(tc, "get_typesense_client", return_value=mock_client):
+            for _ in range(tc._circuit_breaker.failure_threshold):
+                assert search("entities", "mars", "name") is None
+            search_call.reset_mock()
+
+            assert search("entities", "mars", "name") is None
+            assert search_all_ids("entities", "mars", "name") is None
+            assert group_values("entities", "type") is None
+
+        search_call.assert_not_called()
+
+
+class TestParseNode:
+    def test_full_url(self):
+        assert tc._parse_node("https://ts-1.internal:443/typesense/") == {
+            "host": "ts-1.internal",
+            "port": "443",
+            "path": "/typesense",
+            "protocol": "https",
+        }
+
+    def test_host_only_defaults_to_http_and_typesense_port(self):
+        assert tc._parse_node("ts-2") == {
+            "host": "ts-2",
+            "port": "8108",
+            "path": "",
+            "protocol": "http",
+        }
@@ -0,0 +1,87 @@
+"""Unit tests for serialization/streaming.py and the streamed json batch."""
+
+import json
+from io import BytesIO
+
+import pytest
+import serialization.streaming as streaming
+from serialization.json_batch import serialize_json_batch
+from serialization.streaming import iter_csv_rows, iter_json_array
+from werkzeug.exceptions import BadRequest
+
+
+@pytest.fixture(autouse=True)
+def small_reads(monkeypatch):
+    monkeypatch.setattr(streaming, "STREAM_READ_SIZE", 7)
+    monkeypatch.setattr(streaming, "CSV_SNIFF_SIZE", 16)
+
+
+class TestIterJsonArray:
+    def test_items_are_parsed_across_reads(self):
+        items = [{"id": index, "title": "x" * index} for index in range(20)]
+        items += [12345678901234, True, None, "a,b]"]
+
+        parsed = list(iter_json_array(BytesIO(json.dumps(items).encode())))
+
+        assert parsed == items
+
+    def test_items_are_yielded_before_the_body_is_read(self):
+        stream = BytesIO(json.dumps([{"id": i} for i in range(10000)]).encode())
+
+        parsed = iter_json_array(stream)
+        next(parsed)
+
+        assert stream.tell() < len(stream.getvalue())
+
+    @pytest.mark.parametrize("read_size", [1, 2, 3, 4, 5])
+    def test_numbers_split_across_reads_are_parsed_whole(self, read_size, monkeypatch):
+        monkeypatch.setattr(streaming, "STREAM_READ_SIZE", read_size)
+
+        parsed = list(iter_json_array("[\n -2500.0\n, 1e-3,12 ,7]"))
+
+        assert parsed == [-2500.0, 0.001, 12, 7]
+
+    def test_empty_array(self):
+        assert list(iter_json_array(" [ ] ")) == []
+
+    @pytest.mark.parametrize("body", ['{"id": 1}', "", '[{"id": 1} {"id": 2}]', "[1,"])
+    def test_invalid_bodies_are_bad_requests(self, body):
+        with pytest.raises(BadRequest):
+            list(iter_json_array(body))
+
+
+class TestIterCsvRows:
+    def test_dialect_is_sniffed_on_a_prefix(self):
+        body = "identifiers;title\n" + "".join(f"id{i};title {i}\n" for i in range(50))
+
+        rows = list(iter_csv_rows(BytesIO(body.encode())))
+
+        assert rows[0] == ["identifiers", "title"]
+        assert rows[-1] == ["id49", "title 49"]
+        assert len(rows) == 51
+
+    def test_quoted_newlines_survive_the_prefix_boundary(self):
+        body = 'identifiers,description\nid1,"a long\nvalue"\nid2,b\n'
+
+        rows = list(iter_csv_rows(body, dict_reader=True))
+
+        assert rows == [
+            {"identifiers": "id1", "description": "a long\nvalue"},
+            {"identifiers": "id2", "description": "b"},
+        ]
+
+
+class TestSerializeJsonBatch:
+    def test_a_stream_is_serialized_item_by_item(self):
+        body = json.dumps([{"type": "asset", "id": "a"}, {"id": "b"}]).encode()
+
+        documents = list(serialize_json_batch(BytesIO(body), document_type="set"))
+
+        assert documents[0] == {"type": "asset", "id": "a", "identifiers": ["a"]}
+        assert documents[1]["type"] == "set"
+
+    def test_a_broken_body_ends_with_the_error(self):
+        documents = list(serialize_json_batch(b'[{"type": "asset", "id": "a"}, {'))
+
+        assert documents[0]["identifiers"] == ["a"]
+        assert isinstance(documents[1], BadRequest)
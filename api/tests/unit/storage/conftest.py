@@ -0,0 +1,30 @@
+"""Shared fixtures for the storage unit tests."""
+
+from unittest.mock import MagicMock
+
+import pytest
+from storage.mongostore import MongoStorageManager
+
+
+@pytest.fixture
+def mongo_storage():
+    """
+    A MongoStorageManager without a connection. Every collection of its db is
+    a MagicMock of its own, created on first use, and documents pass
+    _prepare_mongo_document unchanged.
+    """
+    collections = {}
+
+    def get_collection(name):
+        if name not in collections:
+            collections[name] = MagicMock()
+        return collections[name]
+
+    storage = MongoStorageManager.__new__(MongoStorageManager)
+    storage.db = MagicMock()
+    storage.db.__getitem__.side_effect = get_collection
+    storage._prepare_mongo_document = lambda document, *_, **__: document
+    storage.allow_disk_use = False
+    storage.bulk_read_chunk_size = 1000
+    storage.relation_transactions = False
+    return storage
@@ -0,0 +1,153 @@
+"""Unit tests for the bulk document shaping and the id cache of
+storage/arangostore.py."""
+
+from unittest.mock import MagicMock
+
+from bounded_cache import BoundedCache
+from storage.arangostore import ArangoStorageManager
+
+
+def make_storage(edges=None, has=False, id_cache_size=1024, items=None):
+    storage = ArangoStorageManager.__new__(ArangoStorageManager)
+    storage.id_cache = BoundedCache("test_arango_ids", id_cache_size)
+    storage.db = MagicMock()
+    storage.db.collection.return_value.has.return_value = has
+
+    def execute(aql, bind_vars):
+        if "@collection" in bind_vars:
+            return [
+                item
+                for item in (items or {}).get(bind_vars["@collection"], [])
+                if item["_key"] in bind_vars["ids"]
+            ]
+        return [
+            edge
+            for edge in (edges or {}).get(bind_vars["@relation"], [])
+            if edge["_from"] in bind_vars["ids"]
+        ]
+
+    storage.db.aql.execute.side_effect = execute
+    return storage
+
+
+class TestPrepareArangoDocuments:
+    def test_relations_are_read_once_per_edge_collection(self):
+        storage = make_storage(
+            {
+                "hasMediafile": [
+                    {
+                        "_id": "hasMediafile/1",
+                        "_from": "entities/a",
+                        "_to": "mediafiles/m1",
+                        "is_primary": True,
+                    },
+                    {"_from": "entities/b", "_to": "mediafiles/m2"},
+                ],
+                "isIn": [{"_from": "entities/b", "_to": "entities/set"}],
+            }
+        )
+        documents = [
+            {
+                "_id": f"entities/{key}",
+                "type": "asset",
+                "metadata": [{"key": "title", "value": key}],
+            }
+            for key in "abc"
+        ]
+
+        storage._prepare_arango_documents("entities", documents)
+
+        queried = [
+            call.kwargs["bind_vars"] for call in storage.db.aql.execute.call_args_list
+        ]
+        assert len(queried) == len({bind_vars["@relation"] for bind_vars in queried})
+        assert all(len(bind_vars["ids"]) == 3 for bind_vars in queried)
+        assert documents[0]["relations"] == [
+            {"is_primary": True, "key": "m1", "type": "hasMediafile"}
+        ]
+        assert documents[1]["relations"] == [
+            {"key": "m2", "type": "hasMediafile"},
+            {"key": "set", "type": "isIn"},
+        ]
+        assert documents[2]["relations"] == []
+        assert documents[2]["metadata"][-1]["key"] == "iiif_presentation"
+
+    def test_mediafiles_get_their_type(self):
+        storage = make_storage()
+        documents = [{"_id": "mediafiles/m1"}]
+
+        storage._prepare_arango_documents("mediafiles", documents)
+
+        assert documents == [
+            {"_id": "mediafiles/m1", "type": "mediafile", "relations": []}
+        ]
+
+
+class TestGetItemsFromCollectionByIds:
+    def test_relations_of_all_items_are_read_once_per_edge_collection(self):
+        storage = make_storage(
+            {
+                "isIn": [
+                    {"_from": "entities/a", "_to": "entities/set"},
+                    {"_from": "entities/b", "_to": "entities/set"},
+                ]
+            },
+            items={
+                "entities": [
+                    {"_id": f"entities/{key}", "_key": key, "type": "asset"}
+                    for key in "ab"
+                ]
+            },
+        )
+
+        items = storage.get_items_from_collection_by_ids(["entities/b", "a"])
+
+        assert [item["_key"] for item in items] == ["b", "a"]
+        assert all(
+            item["relations"] == [{"key": "set", "type": "isIn"}] for item in items
+        )
+        relations = [
+            call.kwargs["bind_vars"]["@relation"]
+            for call in storage.db.aql.execute.call_args_list
+            if "@relation" in call.kwargs["bind_vars"]
+        ]
+        assert len(relations) == len(set(relations))
+        storage.db.collection.assert_not_called()
+
+    def test_projected_reads_skip_the_relations(self):
+        storage = make_storage(
+            items={"mediafiles": [{"_id": "mediafiles/m1", "_key": "m1"}]}
+        )
+
+        items = storage.get_items_from_collection_by_ids(
+            ["m1"], collections="mediafiles", fields=["filename"]
+        )
+
+        assert items == [{"_id": "mediafiles/m1", "_key": "m1", "type": "mediafile"}]
+        assert storage.db.aql.execute.call_count == 1
+
+
+class TestIdCache:
+    def test_cache_is_bounded_and_keeps_recent_lookups(self):
+        storage = make_storage(has=True, id_cache_size=4)
+        get_id = storage._ArangoStorageManager__get_id_for_collection_item
+
+        for key in ["a", "b", "c"]:
+            get_id("entities", f"entities/{key}")
+        get_id("entities", "entities/b")
+        storage.db.collection.return_value.has.reset_mock()
+
+        assert len(storage.id_cache) == 4
+        assert get_id("entities", "entities/b") == "entities/b"
+        assert get_id("entities", "entities/c") == "entities/c"
+        storage.db.collection.return_value.has.assert_not_called()
+
+    def test_invalidation_drops_every_key_of_the_item(self):
+        storage = make_storage(has=True)
+        storage._ArangoStorageManager__get_id_for_collection_item(
+            "entities", "entities/a"
+        )
+
+        storage._ArangoStorageManager__invalidate_id_cache_for_item("entities/a")
+
+        assert len(storage.id_cache) == 0
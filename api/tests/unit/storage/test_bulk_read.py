@@ -0,0 +1,61 @@
+"""Unit tests for get_items_from_collection_by_ids of the storage managers."""
+
+from unittest.mock import MagicMock, patch
+
+from storage.memorystore import MemoryStorageManager
+
+
+def make_document(id, identifiers=()):
+    return {"_id": id, "identifiers": [id, *identifiers]}
+
+
+def make_memory_storage(documents):
+    storage = MemoryStorageManager()
+    storage.collections = {
+        "entities": {document["_id"]: document for document in documents}
+    }
+    return storage
+
+
+def ids(items):
+    return [item["_id"] for item in items]
+
+
+class TestGetItemsFromCollectionByIds:
+    def test_items_are_returned_in_the_order_of_the_ids(self):
+        storage = make_memory_storage([make_document(id) for id in "abc"])
+
+        items = storage.get_items_from_collection_by_ids(["c", "a", "b"])
+
+        assert ids(items) == ["c", "a", "b"]
+
+    def test_items_matching_no_id_come_last(self, mongo_storage):
+        mongo_storage.db["entities"].find.return_value = [
+            make_document(id) for id in ["x", "b", "a"]
+        ]
+
+        items = mongo_storage.get_items_from_collection_by_ids(["a", "b"])
+
+        assert ids(items) == ["a", "b", "x"]
+
+    def test_ids_of_the_same_item_return_it_once(self):
+        storage = make_memory_storage([make_document("doc-1", ["slug-1"])])
+
+        items = storage.get_items_from_collection_by_ids(["doc-1", "slug-1"])
+
+        assert ids(items) == ["doc-1"]
+
+    def test_an_identity_map_hit_and_a_read_of_the_same_item_return_it_once(
+        self, mongo_storage
+    ):
+        document = make_document("doc-1", ["slug-1"])
+        mongo_storage.db["entities"].find.return_value = [document]
+        identity_map = MagicMock()
+        identity_map.get.side_effect = lambda collection, id: (
+            document if id == "doc-1" else None
+        )
+
+        with patch("storage.mongostore.get_identity_map", return_value=identity_map):
+            items = mongo_storage.get_items_from_collection_by_ids(["doc-1", "slug-1"])
+
+        assert ids(items) == ["doc-1"]
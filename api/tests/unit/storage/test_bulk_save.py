@@ -0,0 +1,208 @@
+"""Unit tests for the bulk saves of the storage managers."""
+
+from unittest.mock import MagicMock, patch
+
+import pytest
+from elody.exceptions import NonUniqueException
+from pymongo.errors import BulkWriteError, WriteError
+from storage.arangostore import ArangoStorageManager
+
+
+@pytest.fixture
+def crud():
+    crud = {
+        "collection": "entities",
+        "pre_crud_hook": lambda *, crud, timestamp, document: {
+            **document,
+            "prepared": True,
+        },
+        "post_crud_hook": MagicMock(),
+        "document_exception_message_constructor": lambda exception, message: (
+            f"constructed: {message}"
+        ),
+    }
+    config = MagicMock()
+    config.crud.return_value = crud
+    with patch("storage.mongostore.get_object_configuration_mapper") as mapper:
+        mapper.return_value.get.return_value = config
+        yield crud
+
+
+def fail_inserts(storage, write_errors):
+    storage.db["entities"].insert_many.side_effect = BulkWriteError(
+        {"writeErrors": write_errors}
+    )
+
+
+def items(count):
+    return [
+        {"_id": f"e{index}", "type": "asset", "identifiers": [f"e{index}"]}
+        for index in range(count)
+    ]
+
+
+class TestSaveItemsToCollectionV2:
+    def test_items_are_written_with_one_unordered_insert_many(
+        self, crud, mongo_storage
+    ):
+        results = mongo_storage.save_items_to_collection_v2(None, items(3))
+
+        insert_many = mongo_storage.db["entities"].insert_many
+        insert_many.assert_called_once()
+        assert insert_many.call_args.kwargs["ordered"] is False
+        assert [item["_id"] for item in insert_many.call_args.args[0]] == [
+            "e0",
+            "e1",
+            "e2",
+        ]
+        assert all(result["prepared"] for result in results)
+        assert crud["post_crud_hook"].call_count == 3
+
+    def test_duplicates_are_reported_on_their_own_item(self, crud, mongo_storage):
+        fail_inserts(
+            mongo_storage,
+            [{"index": 1, "code": 11000, "errmsg": 'dup key: { _id: "e1" }'}],
+        )
+
+        results = mongo_storage.save_items_to_collection_v2(None, items(3))
+
+        assert results[0]["_id"] == "e0"
+        assert isinstance(results[1], NonUniqueException)
+        assert results[1].args[0].startswith("constructed: ")
+        assert "e1" in results[1].args[0]
+        assert results[2]["_id"] == "e2"
+        assert crud["post_crud_hook"].call_count == 2
+
+    def test_a_failing_pre_crud_hook_only_fails_its_item(self, crud, mongo_storage):
+        def pre_crud_hook(*, crud, timestamp, document):
+            if document["_id"] == "e0":
+                raise ValueError("invalid")
+            return document
+
+        crud["pre_crud_hook"] = pre_crud_hook
+
+        results = mongo_storage.save_items_to_collection_v2(None, items(2))
+
+        assert isinstance(results[0], ValueError)
+        assert results[1]["_id"] == "e1"
+        assert len(mongo_storage.db["entities"].insert_many.call_args.args[0]) == 1
+
+    def test_other_write_errors_keep_their_code(self, crud, mongo_storage):
+        fail_inserts(mongo_storage, [{"index": 0, "code": 121, "errmsg": "invalid"}])
+
+        results = mongo_storage.save_items_to_collection_v2(None, items(1))
+
+        assert isinstance(results[0], WriteError)
+        assert results[0].code == 121
+        assert results[0].details["errmsg"] == "invalid"
+
+
+class TestBulkUniqueness:
+    @pytest.fixture
+    def resolver(self):
+        with patch("storage.mongostore.get_user_context") as get_user_context:
+            get_user_context.return_value.bag = {
+                "collection_resolver": lambda: ["entities", "mediafiles"]
+            }
+            yield
+
+    def test_identifiers_are_checked_with_one_query_per_collection(
+        self, crud, resolver, mongo_storage
+    ):
+        mongo_storage.db["entities"].find.return_value = [{"identifiers": ["e1", "x"]}]
+        mongo_storage.db["mediafiles"].find.return_value = []
+
+        results = mongo_storage.save_items_to_collection_v2(None, items(3))
+
+        for collection in ["entities", "mediafiles"]:
+            mongo_storage.db[collection].find.assert_called_once_with(
+                {"identifiers": {"$in": ["e0", "e1", "e2"]}}, {"identifiers": 1}
+            )
+        assert isinstance(results[1], NonUniqueException)
+        assert "duplicate_keys:e1 " in results[1].args[0]
+        assert [
+            item["_id"]
+            for item in mongo_storage.db["entities"].insert_many.call_args.args[0]
+        ] == ["e0", "e2"]
+
+    def test_identifiers_shared_within_the_list_keep_the_first_item(
+        self, crud, resolver, mongo_storage
+    ):
+        mongo_storage.db["entities"].find.return_value = []
+        mediafiles = [
+            {"_id": f"m{index}", "type": "mediafile", "identifiers": ["same"]}
+            for index in range(2)
+        ]
+
+        results = mongo_storage.save_items_to_collection_v2(None, mediafiles)
+
+        assert results[0]["_id"] == "m0"
+        assert isinstance(results[1], NonUniqueException)
+        assert "duplicate_keys:same " in results[1].args[0]
+        assert [
+            item["_id"]
+            for item in mongo_storage.db["entities"].insert_many.call_args.args[0]
+        ] == ["m0"]
+
+
+class TestSaveItemToCollectionV2:
+    def test_a_list_is_saved_in_bulk(self, crud, mongo_storage):
+        item = mongo_storage.save_item_to_collection_v2("entities", items(3))
+
+        mongo_storage.db["entities"].insert_many.assert_called_once()
+        mongo_storage.db["entities"].insert_one.assert_not_called()
+        assert item["_id"] == "e2"
+
+    def test_a_list_of_duplicates_raises(self, crud, mongo_storage):
+        fail_inserts(
+            mongo_storage,
+            [
+                {"index": index, "code": 11000, "errmsg": "dup key"}
+                for index in range(2)
+            ],
+        )
+
+        with pytest.raises(NonUniqueException):
+            mongo_storage.save_item_to_collection_v2("entities", items(2))
+
+    def test_a_failing_item_stops_the_list_before_anything_is_written(
+        self, crud, mongo_storage
+    ):
+        def pre_crud_hook(*, crud, timestamp, document):
+            if document["_id"] == "e1":
+                raise ValueError("invalid")
+            return document
+
+        crud["pre_crud_hook"] = pre_crud_hook
+
+        with (
+            patch("storage.mongostore.log"),
+            pytest.raises(ValueError, match="invalid"),
+        ):
+            mongo_storage.save_item_to_collection_v2("entities", items(3))
+
+        mongo_storage.db["entities"].insert_many.assert_not_called()
+        crud["post_crud_hook"].assert_not_called()
+
+    def test_partial_duplicates_return_the_last_saved_item(self, crud, mongo_storage):
+        fail_inserts(mongo_storage, [{"index": 1, "code": 11000, "errmsg": "dup key"}])
+
+        item = mongo_storage.save_item_to_collection_v2("entities", items(2))
+
+        assert item["_id"] == "e0"
+
+
+class TestGenericSaveItemsToCollectionV2:
+    def test_engines_without_bulk_writes_save_item_by_item(self):
+        storage = ArangoStorageManager.__new__(ArangoStorageManager)
+        error = NonUniqueException("dup key")
+        storage.save_item_to_collection_v2 = MagicMock(
+            side_effect=[{"_id": "e0"}, error, {"_id": "e2"}]
+        )
+
+        results = storage.save_items_to_collection_v2(None, items(3))
+
+        assert results == [{"_id": "e0"}, error, {"_id": "e2"}]
+        assert [
+            call.args for call in storage.save_item_to_collection_v2.call_args_list
+        ] == [(None, item) for item in items(3)]
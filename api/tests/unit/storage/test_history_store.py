@@ -0,0 +1,409 @@
+"""Unit tests for storage/history_store.py."""
+
+from copy import deepcopy
+from datetime import UTC, datetime, timedelta
+from unittest.mock import patch
+
+import pytest
+from filters_v2.stages.cursor_stage import InvalidCursor
+from storage.history_store import (
+    HistoryStore,
+    apply_history_diff,
+    get_history_diff,
+    project_history_entry,
+)
+
+STARTED = datetime(2024, 1, 1, tzinfo=UTC)
+
+
+def sort_key(value):
+    # Mongo sorts strings before dates.
+    return isinstance(value, datetime), value
+
+
+class FakeCollection:
+    """The part of a pymongo collection HistoryStore uses, on a list."""
+
+    def __init__(self):
+        self.documents = []
+        self.aggregated = 0
+
+    def insert_one(self, document):
+        self.documents.append(deepcopy(document))
+
+    def bulk_write(self, operations, ordered=True):
+        for operation in operations:
+            index = next(
+                i
+                for i, document in enumerate(self.documents)
+                if document["_id"] == operation._filter["_id"]
+            )
+            self.documents[index] = deepcopy(operation._doc)
+
+    def aggregate(self, pipeline):
+        documents = deepcopy(self.documents)
+        for stage in pipeline:
+            if "$match" in stage:
+                documents = [d for d in documents if self.__matches(d, stage["$match"])]
+            elif "$sort" in stage:
+                for key, direction in reversed(stage["$sort"].items()):
+                    documents.sort(
+                        key=lambda d: sort_key(d[key]), reverse=direction == -1
+                    )
+            elif "$limit" in stage:
+                documents = documents[: stage["$limit"]]
+        self.aggregated += 1
+        return iter(documents)
+
+    def find(self, query, projection=None, sort=None):
+        documents = [d for d in self.documents if self.__matches(d, query)]
+        for key, direction in reversed(sort or []):
+            documents.sort(key=lambda d: sort_key(d[key]), reverse=direction == -1)
+        return [deepcopy(document) for document in documents]
+
+    def find_one(self, query, projection=None, sort=None):
+        documents = self.find(query, projection, sort)
+        return documents[0] if documents else None
+
+    def __matches(self, document, query):
+        for key, condition in query.items():
+            if key == "$or":
+                if not any(self.__matches(document, part) for part in condition):
+                    return False
+                continue
+            if key == "$expr":
+                # The keyset $expr only differs from its $or on arrays, and
+                # history is sorted on scalars.
+                continue
+            value = document
+            for part in key.split("."):
+                value = value.get(part) if isinstance(value, dict) else None
+            if isinstance(condition, dict) and "$type" in condition:
+                if not isinstance(value, str):
+                    return False
+            elif isinstance(condition, dict):
+                # Like Mongo, a range on dates never matches a string.
+                if not all(
+                    isinstance(value, datetime) == isinstance(b, datetime)
+                    for b in condition.values()
+                ):
+                    return False
+                operators = {
+                    "$lte": lambda a, b: a <= b,
+                    "$lt": lambda a, b: a < b,
+                    "$gte": lambda a, b: a >= b,
+                    "$gt": lambda a, b: a > b,
+                }
+                # Mongo stores dates as UTC, cursors decode them as naive.
+                if isinstance(value, datetime):
+                    value = value.replace(tzinfo=None)
+                    condition = {
+                        op: b.replace(tzinfo=None) for op, b in condition.items()
+                    }
+                if not all(operators[op](value, b) for op, b in condition.items()):
+                    return False
+            elif isinstance(value, list):
+                if condition not in value:
+                    return False
+            elif value != condition:
+                return False
+        return True
+
+
+def make_entry(version, title=None, relations=None):
+    return {
+        "_id": f"history-{version}",
+        "identifiers": [f"history-{version}"],
+        "collection": "entities",
+        "timestamp": STARTED + timedelta(minutes=version),
+        "object": {
+            "_id": "entity",
+            "identifiers": ["entity", "slug"],
+            "metadata": [
+                {"key": "title", "value": title or f"title {version}"},
+                {"key": "description", "value": "unchanged"},
+            ],
+        },
+        "relations": relations or [{"key": "mediafile", "type": "hasMediafile"}],
+    }
+
+
+@pytest.fixture
+def history():
+    db = {"history": FakeCollection()}
+    return HistoryStore(db, store_diffs=True, interval=3)
+
+
+class TestHistoryDiff:
+    def test_a_diff_replays_to_the_new_document(self):
+        old = {
+            "a": 1,
+            "list": [{"key": "x", "value": 1}],
+            "gone": True,
+            "nested": {"b": [1, 2]},
+        }
+        new = {"a": 2, "list": [{"key": "x", "value": 2}], "nested": {"b": [1, 2, 3]}}
+
+        diff = get_history_diff(old, new)
+
+        assert diff == {
+            "set": [
+                [["a"], 2],
+                [["list", 0, "value"], 2],
+                [["nested", "b"], [1, 2, 3]],
+            ],
+            "unset": [["gone"]],
+        }
+        assert apply_history_diff(old, diff) == new
+        assert "gone" in old
+
+
+class TestHistoryStore:
+    def test_every_interval_entries_one_is_a_snapshot(self, history):
+        for version in range(7):
+            history.add(make_entry(version))
+
+        documents = history.db["history"].documents
+        assert ["diff" in document for document in documents] == [
+            False,
+            True,
+            True,
+            False,
+            True,
+            True,
+            False,
+        ]
+        assert documents[2]["sequence"] == 2
+        assert documents[2]["snapshot_timestamp"] == STARTED
+        assert documents[2]["diff"] == {
+            "set": [[["object", "metadata", 0, "value"], "title 2"]],
+            "unset": [],
+        }
+        assert documents[2]["object"] == {
+            "_id": "entity",
+            "identifiers": ["entity", "slug"],
+        }
+
+    def test_point_in_time_reads_replay_the_diffs(self, history):
+        for version in range(5):
+            history.add(make_entry(version))
+
+        entry = history.get_at("entities", "slug", STARTED + timedelta(minutes=2.5))
+
+        assert entry == make_entry(2)
+
+    def test_a_timestamp_before_the_history_returns_the_first_entry(self, history):
+        for version in range(2):
+            history.add(make_entry(version))
+
+        entry = history.get_at("entities", "entity", STARTED - timedelta(days=1))
+
+        assert entry["_id"] == "history-0"
+
+    def test_latest_and_all_entries_are_full_entries(self, history):
+        entries = [make_entry(0), make_entry(1, relations=[]), make_entry(2, "x")]
+        for entry in entries:
+            history.add(deepcopy(entry))
+
+        assert history.get_latest("entities", "entity") == entries[2]
+        assert history.get_all("entities", "entity") == entries[::-1]
+
+    def test_the_changed_entity_is_kept_in_diffs(self, history):
+        entries = [make_entry(version) for version in range(3)]
+        for version, entry in enumerate(entries[1:], 1):
+            entry["entity"] = {**entry["object"], "version": version}
+        for entry in entries:
+            history.add(deepcopy(entry))
+
+        assert "entity" not in history.db["history"].documents[2]
+        assert history.get_all("entities", "entity") == entries[::-1]
+        assert (
+            history.get_at("entities", "entity", STARTED + timedelta(minutes=1))
+            == (entries[1])
+        )
+
+    def test_string_timestamps_of_older_versions_are_found(self, history):
+        entries = [make_entry(version) for version in range(4)]
+        for entry in entries[:2]:
+            entry["timestamp"] = entry["timestamp"].isoformat()
+            history.db["history"].insert_one(entry)
+        for entry in entries[2:]:
+            history.add(deepcopy(entry))
+
+        def get_at(minutes):
+            return history.get_at(
+                "entities", "entity", STARTED + timedelta(minutes=minutes)
+            )
+
+        assert get_at(-1) == entries[0]
+        assert get_at(1.5) == entries[1]
+        assert get_at(3) == entries[3]
+
+    def test_without_diffs_entries_are_stored_whole(self):
+        history = HistoryStore({"history": FakeCollection()}, store_diffs=False)
+
+        history.add(make_entry(0))
+        history.add(make_entry(1))
+
+        assert history.db["history"].documents == [make_entry(0), make_entry(1)]
+
+    def test_entries_added_at_the_same_time_replay_on_their_own_base(self):
+        history = HistoryStore({"history": FakeCollection()}, store_diffs=True)
+        documents = history.db["history"].documents
+        entries = [make_entry(0), make_entry(1, relations=[]), make_entry(2, "x")]
+        history.add(deepcopy(entries[0]))
+        history.add(deepcopy(entries[1]))
+        # A second consumer read the latest entry before the first inserted.
+        added = documents.pop()
+        history.add(deepcopy(entries[2]))
+        documents.insert(1, added)
+
+        assert [document["previous_id"] for document in documents[1:]] == [
+            "history-0",
+            "history-0",
+        ]
+        assert history.get_all("entities", "entity") == entries[::-1]
+        assert history.get_latest("entities", "entity") == entries[2]
+        page = history.get_page("entities", "entity", limit=1)
+        assert history.get_page(
+            "entities", "entity", cursor=page["next_cursor"], limit=1
+        )["results"] == [entries[1]]
+
+    def test_an_entry_older_than_the_latest_is_a_snapshot(self, history):
+        history.add(make_entry(0))
+        history.add(make_entry(2))
+
+        history.add(make_entry(1))
+
+        assert "diff" not in history.db["history"].documents[2]
+        assert history.get_all("entities", "entity") == [
+            make_entry(v) for v in [2, 1, 0]
+        ]
+
+
+class TestHistoryPages:
+    def test_pages_follow_each_other_newest_first(self, history):
+        for version in range(7):
+            history.add(make_entry(version))
+
+        pages, cursor = [], None
+        while True:
+            page = history.get_page("entities", "slug", cursor=cursor, limit=3)
+            pages.append([entry["_id"] for entry in page["results"]])
+            if not (cursor := page["next_cursor"]):
+                break
+
+        assert pages == [
+            ["history-6", "history-5", "history-4"],
+            ["history-3", "history-2", "history-1"],
+            ["history-0"],
+        ]
+
+    def test_a_page_starting_inside_a_chain_is_replayed(self, history):
+        for version in range(6):
+            history.add(make_entry(version))
+        first_page = history.get_page("entities", "entity", limit=1)
+
+        page = history.get_page(
+            "entities", "entity", cursor=first_page["next_cursor"], limit=2
+        )
+
+        assert page["results"] == [make_entry(4), make_entry(3)]
+
+    def test_entries_are_streamed_from_one_cursor(self, history):
+        for version in range(5):
+            history.add(make_entry(version))
+
+        entries = history.iter_entries("entities", "entity")
+        assert next(entries) == make_entry(4)
+        assert list(entries) == [make_entry(v) for v in [3, 2, 1, 0]]
+        assert history.db["history"].aggregated == 1
+
+    def test_a_broken_cursor_is_rejected(self, history):
+        history.add(make_entry(0))
+
+        with pytest.raises(InvalidCursor):
+            history.get_page("entities", "entity", cursor="broken", limit=1)
+
+    def test_a_page_holds_at_most_the_maximum_limit(self, history):
+        for version in range(3):
+            history.add(make_entry(version))
+
+        with patch("storage.history_store.HISTORY_PAGE_MAX_LIMIT", 2):
+            page = history.get_page("entities", "entity", limit=1000000)
+
+        assert [entry["_id"] for entry in page["results"]] == [
+            "history-2",
+            "history-1",
+        ]
+        assert page["next_cursor"]
+
+    def test_an_unknown_item_has_no_entries(self, history):
+        assert list(history.iter_entries("entities", "unknown")) == []
+
+
+class TestProjectHistoryEntry:
+    def test_only_the_asked_fields_are_kept(self):
+        entry = project_history_entry(make_entry(1), ["object.metadata"])
+
+        assert entry == {
+            "_id": "history-1",
+            "collection": "entities",
+            "timestamp": STARTED + timedelta(minutes=1),
+            "object": {"metadata": make_entry(1)["object"]["metadata"]},
+        }
+
+    def test_relations_can_be_skipped(self):
+        entry = project_history_entry(make_entry(1), skip_relations=True)
+
+        assert "relations" not in entry
+        assert entry["object"] == make_entry(1)["object"]
+
+
+class TestCompact:
+    def test_existing_history_is_rewritten_as_snapshots_and_diffs(self):
+        db = {"history": FakeCollection()}
+        for version in range(4):
+            entry = make_entry(version)
+            if version == 1:
+                entry["timestamp"] = entry["timestamp"].isoformat()
+            db["history"].insert_one(entry)
+        history = HistoryStore(db, interval=3)
+
+        report = history.compact("entities", "entity")
+
+        assert report["entries"] == 4
+        assert report["size_after"] < report["size_before"]
+        documents = db["history"].documents
+        assert ["diff" in document for document in documents] == [
+            False,
+            True,
+            True,
+            False,
+        ]
+        assert documents[1]["timestamp"] == STARTED + timedelta(minutes=1)
+        assert history.get_at("entities", "entity", STARTED + timedelta(minutes=2)) == (
+            make_entry(2)
+        )
+
+    def test_compacting_twice_changes_nothing(self):
+        db = {"history": FakeCollection()}
+        for version in range(5):
+            db["history"].insert_one(make_entry(version))
+        history = HistoryStore(db, interval=2)
+        history.compact("entities", "entity")
+        compacted = deepcopy(db["history"].documents)
+
+        history.compact("entities", "entity")
+
+        assert db["history"].documents == compacted
+
+    def test_a_dry_run_writes_nothing(self):
+        db = {"history": FakeCollection()}
+        for version in range(3):
+            db["history"].insert_one(make_entry(version))
+        history = HistoryStore(db, interval=2)
+
+        history.compact("entities", "entity", dry_run=True)
+
+        assert db["history"].documents == [make_entry(v) for v in range(3)]
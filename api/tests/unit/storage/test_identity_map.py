@@ -0,0 +1,132 @@
+"""Unit tests for the request-scoped identity map in storage/identity_map.py."""
+
+from storage.identity_map import (
+    IdentityMap,
+    get_identity_map,
+    identity_map_scope,
+    with_identity_map,
+)
+
+
+def make_document(document_id="doc-1", identifiers=None):
+    return {
+        "_id": document_id,
+        "type": "asset",
+        "identifiers": identifiers or [document_id, "slug-1"],
+        "metadata": [{"key": "title", "value": "Title"}],
+    }
+
+
+class TestIdentityMap:
+    def test_miss_on_empty_map(self):
+        identity_map = IdentityMap()
+
+        assert identity_map.get("entities", "doc-1") is None
+        assert identity_map.stats() == {"hits": 0, "misses": 1}
+
+    def test_hit_by_id_and_by_any_identifier(self):
+        identity_map = IdentityMap()
+        identity_map.put("entities", make_document())
+
+        assert identity_map.get("entities", "doc-1")["_id"] == "doc-1"
+        assert identity_map.get("entities", "slug-1")["_id"] == "doc-1"
+        assert identity_map.stats() == {"hits": 2, "misses": 0}
+
+    def test_lookups_are_scoped_per_collection(self):
+        identity_map = IdentityMap()
+        identity_map.put("entities", make_document())
+
+        assert identity_map.get("mediafiles", "doc-1") is None
+
+    def test_returned_documents_are_copies(self):
+        identity_map = IdentityMap()
+        document = make_document()
+        identity_map.put("entities", document)
+        document["metadata"].append({"key": "mutated", "value": True})
+
+        cached = identity_map.get("entities", "doc-1")
+        cached["metadata"].clear()
+
+        assert identity_map.get("entities", "slug-1")["metadata"] == [
+            {"key": "title", "value": "Title"}
+        ]
+
+    def test_invalidate_by_one_identifier_drops_every_key(self):
+        identity_map = IdentityMap()
+        identity_map.put("entities", make_document())
+
+        identity_map.invalidate("entities", ["slug-1"])
+
+        assert identity_map.get("entities", "doc-1") is None
+        assert identity_map.get("entities", "slug-1") is None
+
+    def test_invalidate_without_collection_spans_collections(self):
+        identity_map = IdentityMap()
+        identity_map.put("entities", make_document())
+        identity_map.put("entities_actual", make_document())
+
+        identity_map.invalidate_document(None, make_document())
+
+        assert identity_map.get("entities", "doc-1") is None
+        assert identity_map.get("entities_actual", "doc-1") is None
+
+    def test_invalidate_leaves_other_documents(self):
+        identity_map = IdentityMap()
+        identity_map.put("entities", make_document())
+        identity_map.put("entities", make_document("doc-2", ["doc-2"]))
+
+        identity_map.invalidate("entities", ["doc-1"])
+
+        assert identity_map.get("entities", "doc-2")["_id"] == "doc-2"
+
+
+class TestIdentityMapScope:
+    def test_no_identity_map_outside_a_scope(self):
+        assert get_identity_map() is None
+
+    def test_scope_opens_and_restores(self):
+        with identity_map_scope() as identity_map:
+            assert get_identity_map() is identity_map
+        assert get_identity_map() is None
+
+    def test_handler_decorator_gives_each_call_a_fresh_map(self):
+        seen = []
+
+        @with_identity_map
+        def handler():
+            identity_map = get_identity_map()
+            seen.append(identity_map)
+            identity_map.put("entities", make_document())
+
+        handler()
+        handler()
+
+        assert seen[0] is not seen[1]
+        assert seen[1].stats() == {"hits": 0, "misses": 0}
+
+
+class TestMongoGetItemFromCollectionById:
+    def test_a_read_fills_the_map_and_the_next_one_hits_it(self, mongo_storage):
+        mongo_storage.db["entities"].find_one.return_value = make_document()
+
+        with identity_map_scope() as identity_map:
+            mongo_storage.get_item_from_collection_by_id("entities", "doc-1")
+            document = mongo_storage.get_item_from_collection_by_id(
+                "entities", "slug-1"
+            )
+
+        assert document["_id"] == "doc-1"
+        assert mongo_storage.db["entities"].find_one.call_count == 1
+        assert identity_map.stats() == {"hits": 1, "misses": 1}
+
+    def test_other_formats_bypass_the_map(self, mongo_storage):
+        mongo_storage.db["entities"].find_one.return_value = make_document()
+
+        with identity_map_scope() as identity_map:
+            mongo_storage.get_item_from_collection_by_id("entities", "doc-1")
+            mongo_storage.get_item_from_collection_by_id(
+                "entities", "doc-1", to_format="ld+json"
+            )
+
+        assert mongo_storage.db["entities"].find_one.call_count == 2
+        assert identity_map.stats() == {"hits": 0, "misses": 1}
@@ -0,0 +1,53 @@
+"""Unit tests for MongoStorageManager.increment_metadata_values."""
+
+from pymongo import ReturnDocument
+
+
+def test_counters_are_incremented_in_one_round_trip(mongo_storage):
+    mongo_storage.db["jobs"].find_one_and_update.return_value = {
+        "_id": "job",
+        "metadata": [],
+    }
+
+    document = mongo_storage.increment_metadata_values(
+        "job", "jobs", "child_jobs", {"queued": -1, "running": 1}
+    )
+
+    assert document == {"_id": "job", "metadata": []}
+    mongo_storage.db["jobs"].find_one_and_update.assert_called_once_with(
+        {"_id": "job", "metadata.key": "child_jobs"},
+        {
+            "$inc": {
+                "metadata.$[elem].value.queued": -1,
+                "metadata.$[elem].value.running": 1,
+                "document_version": 1,
+            }
+        },
+        array_filters=[{"elem.key": "child_jobs"}],
+        return_document=ReturnDocument.AFTER,
+    )
+    mongo_storage.db["jobs"].find_one.assert_not_called()
+
+
+def test_a_missing_document_or_metadata_returns_none(mongo_storage):
+    mongo_storage.db["jobs"].find_one_and_update.return_value = None
+
+    assert (
+        mongo_storage.increment_metadata_values("job", "jobs", "child_jobs", {}) is None
+    )
+
+
+def test_set_fields_are_set_in_the_same_update(mongo_storage):
+    mongo_storage.db["jobs"].find_one_and_update.return_value = {
+        "_id": "job",
+        "metadata": [],
+    }
+
+    mongo_storage.increment_metadata_values(
+        "job", "jobs", "progress", {"parsed": 2}, set_fields={"heartbeat": "now"}
+    )
+
+    assert mongo_storage.db["jobs"].find_one_and_update.call_args.args[1] == {
+        "$inc": {"metadata.$[elem].value.parsed": 2, "document_version": 1},
+        "$set": {"metadata.$[elem].value.heartbeat": "now"},
+    }
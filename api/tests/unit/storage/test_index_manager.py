@@ -0,0 +1,116 @@
+"""Unit tests for the managed index set in storage/index_manager.py."""
+
+from unittest.mock import MagicMock, patch
+
+import pytest
+from pymongo import ASCENDING, DESCENDING
+from storage.index_manager import IndexManager
+
+
+class _Config:
+    def crud(self):
+        return {
+            "collection": "entities",
+            "storage_type": "db",
+            "typesense": {"facet_fields": ["metadata.title.value", "format"]},
+            "indexes": [[["date_updated", DESCENDING]]],
+        }
+
+    def document_info(self):
+        return {"object_lists": {"metadata": "key", "relations": "type"}}
+
+
+class _HttpConfig(_Config):
+    def crud(self):
+        return {"collection": "remote", "storage_type": "http"}
+
+
+@pytest.fixture
+def mapper():
+    mapper = MagicMock()
+    mapper.get_all.return_value = {"asset": _Config, "remote": _HttpConfig}
+    with patch(
+        "storage.index_manager.get_object_configuration_mapper", return_value=mapper
+    ):
+        yield mapper
+
+
+def _db(existing=None, index_stats=None):
+    collections = {}
+
+    def get_collection(name):
+        if name not in collections:
+            collection = MagicMock()
+            collection.list_indexes.return_value = [
+                {"name": "index", "key": dict(keys)}
+                for keys in (existing or {}).get(name, [])
+            ]
+            collection.aggregate.return_value = (index_stats or {}).get(name, [])
+            collections[name] = collection
+        return collections[name]
+
+    db = MagicMock()
+    db.__getitem__.side_effect = get_collection
+    return db
+
+
+class TestPlan:
+    def test_indexes_derived_from_configuration(self, mapper):
+        plan = IndexManager(_db()).plan()
+
+        assert plan["entities"] == [
+            [("type", ASCENDING)],
+            [("metadata.key", ASCENDING), ("metadata.value", ASCENDING)],
+            [("relations.type", ASCENDING), ("relations.key", ASCENDING)],
+            [("relations.key", ASCENDING)],
+            [("type", ASCENDING), ("format", ASCENDING)],
+            [("date_updated", DESCENDING)],
+        ]
+
+    def test_history_is_indexed_and_http_storage_is_skipped(self, mapper):
+        plan = IndexManager(_db()).plan()
+
+        assert "history" in plan
+        assert "remote" not in plan
+
+
+class TestApply:
+    def test_only_missing_indexes_are_created(self, mapper):
+        db = _db(existing={"entities": [[("type", 1)]]})
+        plan = {"entities": [[("type", ASCENDING)], [("relations.key", ASCENDING)]]}
+
+        report = IndexManager(db).apply(plan)
+
+        assert report["existing"] == [("entities", [("type", ASCENDING)])]
+        assert report["created"] == [("entities", [("relations.key", ASCENDING)])]
+        db["entities"].create_index.assert_called_once_with(
+            [("relations.key", ASCENDING)]
+        )
+
+
+class TestAdvise:
+    def test_reports_missing_unused_and_scanning_pipelines(self, mapper):
+        db = _db(
+            existing={"entities": [[("type", 1)]]},
+            index_stats={
+                "entities": [
+                    {"name": "_id_", "accesses": {"ops": 0}},
+                    {"name": "type_1", "accesses": {"ops": 12}},
+                    {"name": "stale_1", "accesses": {"ops": 0}},
+                ]
+            },
+        )
+        db.command.return_value = {
+            "queryPlanner": {"winningPlan": {"stage": "COLLSCAN"}}
+        }
+        db["system.profile"].find.return_value = []
+        pipeline = [{"$match": {"title": "x"}}]
+        plan = {"entities": [[("type", ASCENDING)], [("relations.key", ASCENDING)]]}
+
+        report = IndexManager(db).advise(
+            plan, [{"collection": "entities", "pipeline": pipeline}]
+        )
+
+        assert report["missing"] == [("entities", [("relations.key", ASCENDING)])]
+        assert report["unused"] == [("entities", "stale_1")]
+        assert report["collection_scans"] == [("entities", pipeline)]
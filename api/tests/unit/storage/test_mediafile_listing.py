@@ -0,0 +1,66 @@
+"""Unit tests for the mediafile listing aggregation of storage/mongostore.py."""
+
+from unittest.mock import MagicMock
+
+from pymongo import ASCENDING, DESCENDING
+
+
+def get_pipeline(storage):
+    return storage.db["mediafiles"].aggregate.call_args.args[0]
+
+
+def stage_names(pipeline):
+    return [list(stage)[0] for stage in pipeline]
+
+
+class TestGetCollectionItemMediafiles:
+    def test_order_is_sorted_and_paged_before_the_documents_are_read(
+        self, mongo_storage
+    ):
+        mongo_storage.db["mediafiles"].aggregate.return_value = iter([{"_id": "m1"}])
+        mongo_storage.get_item_from_collection_by_id = MagicMock()
+
+        mediafiles = mongo_storage.get_collection_item_mediafiles(
+            "entities", "entity-1", skip=40, limit=20
+        )
+
+        pipeline = get_pipeline(mongo_storage)
+        assert mediafiles == [{"_id": "m1"}]
+        assert stage_names(pipeline) == [
+            "$match",
+            "$project",
+            "$set",
+            "$sort",
+            "$skip",
+            "$limit",
+            "$lookup",
+            "$unwind",
+            "$replaceRoot",
+        ]
+        assert pipeline[0] == {"$match": {"relations.key": "entity-1"}}
+        assert pipeline[3]["$sort"] == {
+            "_unordered": ASCENDING,
+            "_order": ASCENDING,
+            "_id": 1,
+        }
+        mongo_storage.get_item_from_collection_by_id.assert_not_called()
+
+    def test_order_keeps_its_direction_for_asc(self, mongo_storage):
+        mongo_storage.get_collection_item_mediafiles("entities", "entity-1", asc=1)
+
+        pipeline = get_pipeline(mongo_storage)
+        assert pipeline[3]["$sort"]["_order"] == DESCENDING
+        assert "$skip" not in stage_names(pipeline)
+        assert "$limit" not in stage_names(pipeline)
+
+    def test_other_sort_fields_are_sorted_on_the_mediafile(self, mongo_storage):
+
+        mongo_storage.get_collection_item_mediafiles(
+            "entities", "entity-1", skip=0, limit=10, asc=1, sort="filename"
+        )
+
+        assert get_pipeline(mongo_storage) == [
+            {"$match": {"relations.key": "entity-1"}},
+            {"$sort": {"filename": ASCENDING, "_id": 1}},
+            {"$limit": 10},
+        ]
@@ -0,0 +1,157 @@
+"""Unit tests for the relation traversal of the storage managers."""
+
+from copy import deepcopy
+from unittest.mock import MagicMock
+
+from storage.arangostore import ArangoStorageManager
+from storage.memorystore import MemoryStorageManager
+
+
+def mediafile(id, parent=None, children=(), entities=()):
+    relations = [{"key": child, "type": "hasChild"} for child in children]
+    relations += [{"key": entity, "type": "belongsTo"} for entity in entities]
+    if parent:
+        relations.append({"key": parent, "type": "belongsToParent"})
+    return {"_id": id, "relations": relations}
+
+
+# m1 -> m2 -> m3 and m1 -> m4, m1 is linked to entity e1 and m2 to e2
+MEDIAFILES = [
+    mediafile("m1", children=["m2", "m4"], entities=["e1"]),
+    mediafile("m2", parent="m1", children=["m3"], entities=["e2"]),
+    mediafile("m3", parent="m2"),
+    mediafile("m4", parent="m1"),
+]
+
+
+def make_memory_storage():
+    storage = MemoryStorageManager()
+    storage.collections = {
+        "mediafiles": {document["_id"]: document for document in deepcopy(MEDIAFILES)}
+    }
+    return storage
+
+
+def serve_graph(storage, start_id):
+    """Answer the graph lookups of storage from start_id over MEDIAFILES."""
+    start = next(document for document in MEDIAFILES if document["_id"] == start_id)
+    graph = [document for document in MEDIAFILES if document is not start]
+    storage.db["mediafiles"].aggregate.side_effect = lambda *_, **__: iter(
+        [{**start, "graph": graph}]
+    )
+    storage.get_collection_item_relations = lambda collection, id: list(
+        start["relations"]
+    )
+    return storage
+
+
+def make_arango_storage(collections):
+    storage = ArangoStorageManager.__new__(ArangoStorageManager)
+    storage.edges = ["hasMediafile", "isMediafileFor"]
+    storage.id_cache = {"mediafiles/m2": "mediafiles/m2", "m2": "mediafiles/m2"}
+    storage.db = MagicMock()
+    storage.db.has_collection.side_effect = lambda name: name in collections
+    storage.db.aql.execute.return_value = [{"_id": "mediafiles/m1"}]
+    storage._prepare_arango_documents = lambda collection, items: items
+    return storage
+
+
+def ids(items):
+    return [item["_id"] for item in items]
+
+
+class TestMemoryStore:
+    def test_descendants_are_returned_nearest_first(self):
+        storage = make_memory_storage()
+
+        children = storage.traverse_collection_item_relations(
+            "mediafiles", "m1", "hasChild"
+        )
+
+        assert ids(children) == ["m2", "m4", "m3"]
+
+    def test_ancestors_follow_the_parent_chain(self):
+        storage = make_memory_storage()
+
+        parents = storage.traverse_collection_item_relations(
+            "mediafiles", "m3", "belongsToParent"
+        )
+
+        assert ids(parents) == ["m2", "m1"]
+
+    def test_depth_is_limited(self):
+        storage = make_memory_storage()
+
+        children = storage.traverse_collection_item_relations(
+            "mediafiles", "m1", "hasChild", max_depth=1
+        )
+
+        assert ids(children) == ["m2", "m4"]
+
+    def test_cycles_are_walked_once(self):
+        storage = make_memory_storage()
+        storage.collections["mediafiles"]["m3"]["relations"].append(
+            {"key": "m1", "type": "hasChild"}
+        )
+
+        children = storage.traverse_collection_item_relations(
+            "mediafiles", "m2", "hasChild"
+        )
+
+        assert ids(children) == ["m3", "m1", "m4"]
+
+
+class TestMongoStore:
+    def test_one_graph_lookup_is_filtered_on_the_relation_type(self, mongo_storage):
+        storage = serve_graph(mongo_storage, "m2")
+
+        parents = storage.traverse_collection_item_relations(
+            "mediafiles", "m2", "belongsToParent", max_depth=5
+        )
+
+        assert ids(parents) == ["m1"]
+        pipeline = storage.db["mediafiles"].aggregate.call_args.args[0]
+        assert pipeline[1]["$graphLookup"]["maxDepth"] == 4
+        storage.db["mediafiles"].aggregate.assert_called_once()
+
+    def test_linked_entities_include_those_of_the_parents(self, mongo_storage):
+        storage = serve_graph(mongo_storage, "m3")
+
+        linked_entities = storage.get_mediafile_linked_entities({"_id": "m3"})
+
+        assert [item["entity_id"] for item in linked_entities] == ["e2", "e1"]
+
+    def test_linked_entities_do_not_leak_between_calls(self, mongo_storage):
+        storage = serve_graph(mongo_storage, "m3")
+
+        storage.get_mediafile_linked_entities({"_id": "m3"})
+        linked_entities = storage.get_mediafile_linked_entities({"_id": "m3"})
+
+        assert len(linked_entities) == 2
+
+
+class TestArangoStore:
+    def test_a_missing_edge_collection_has_no_relations(self):
+        storage = make_arango_storage(["hasMediafile"])
+
+        for relation_type in ["hasChild", "belongsToParent"]:
+            items = storage.traverse_collection_item_relations(
+                "mediafiles", "mediafiles/m2", relation_type
+            )
+
+            assert items == []
+        storage.db.aql.execute.assert_not_called()
+
+    def test_parents_are_traversed_inbound_over_has_child(self):
+        storage = make_arango_storage(["hasChild"])
+
+        parents = storage.traverse_collection_item_relations(
+            "mediafiles", "mediafiles/m2", "belongsToParent"
+        )
+
+        assert ids(parents) == ["mediafiles/m1"]
+        aql = storage.db.aql.execute.call_args.args[0]
+        assert "INBOUND" in aql
+        assert storage.db.aql.execute.call_args.kwargs["bind_vars"]["@relation"] == (
+            "hasChild"
+        )
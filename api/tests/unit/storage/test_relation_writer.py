@@ -0,0 +1,177 @@
+"""Unit tests for storage/relation_writer.py and the relation writes of
+storage/mongostore.py."""
+
+from unittest.mock import MagicMock
+
+import pytest
+from pymongo.errors import BulkWriteError
+from storage.relation_writer import RelationWriter
+
+
+def id_query(id):
+    return {"_id": id}
+
+
+def make_db(errors=None):
+    collections = {}
+
+    def get_collection(name):
+        if name not in collections:
+            collection = collections[name] = MagicMock()
+            if name in (errors or {}):
+                collection.bulk_write.side_effect = BulkWriteError(
+                    {"writeErrors": errors[name]}
+                )
+        return collections[name]
+
+    db = MagicMock()
+    db.__getitem__.side_effect = get_collection
+    return db, collections
+
+
+class TestRelationWriter:
+    def test_writes_are_grouped_per_collection_and_item(self):
+        db, collections = make_db()
+        writer = RelationWriter(db, id_query)
+        writer.add("entities", "a", {"key": "m1", "type": "hasMediafile"})
+        writer.add("entities", "a", {"key": "m2", "type": "hasMediafile"})
+        writer.add("mediafiles", "m1", {"key": "a", "type": "belongsTo"})
+        writer.remove("entities", "b", "a")
+
+        results = writer.execute()
+
+        assert collections["entities"].bulk_write.call_count == 1
+        operations = collections["entities"].bulk_write.call_args.args[0]
+        assert [operation._doc for operation in operations] == [
+            {
+                "$addToSet": {
+                    "relations": {
+                        "$each": [
+                            {"key": "m1", "type": "hasMediafile"},
+                            {"key": "m2", "type": "hasMediafile"},
+                        ]
+                    }
+                }
+            },
+            {"$pull": {"relations": {"key": {"$in": ["a"]}}}},
+        ]
+        assert collections["entities"].bulk_write.call_args.kwargs["ordered"] is False
+        assert len(results) == 4
+        assert {result["status"] for result in results} == {"written"}
+
+    def test_failed_updates_are_reported_per_relation(self):
+        db, _ = make_db({"entities": [{"index": 1, "errmsg": "boom"}]})
+        writer = RelationWriter(db, id_query)
+        writer.add("entities", "a", {"key": "m1", "type": "hasMediafile"})
+        writer.add("entities", "b", {"key": "m2", "type": "hasMediafile"})
+
+        results = writer.execute()
+
+        assert [(result["id"], result["status"]) for result in results] == [
+            ("a", "written"),
+            ("b", "failed"),
+        ]
+        assert results[1]["error"] == "boom"
+
+    def test_errors_are_raised_for_transactions(self):
+        db, _ = make_db({"entities": [{"index": 0, "errmsg": "boom"}]})
+        writer = RelationWriter(db, id_query)
+        writer.add("entities", "a", {"key": "m1", "type": "hasMediafile"})
+
+        with pytest.raises(BulkWriteError):
+            writer.execute(raise_on_error=True)
+
+
+class TestMongoRelationWrites:
+    def test_forward_and_reverse_edges_share_a_bulk_write(self, mongo_storage):
+        relations = [
+            {"key": f"m{index}", "type": "hasMediafile"} for index in range(500)
+        ]
+        relations.append({"key": "set", "type": "isIn"})
+
+        mongo_storage.add_relations_to_collection_item("entities", "a", relations)
+
+        assert mongo_storage.db["entities"].bulk_write.call_count == 1
+        assert mongo_storage.db["mediafiles"].bulk_write.call_count == 1
+        assert len(mongo_storage.db["mediafiles"].bulk_write.call_args.args[0]) == 500
+        mongo_storage.db["entities"].update_one.assert_not_called()
+
+    def test_reverse_edges_are_removed_in_one_bulk_write(self, mongo_storage):
+        mongo_storage.get_collection_item_sub_item = lambda *_: [
+            {"key": f"m{index}", "type": "hasMediafile"} for index in range(3)
+        ]
+
+        results = mongo_storage._delete_impacted_relations("entities", "a")
+
+        assert mongo_storage.db["mediafiles"].bulk_write.call_count == 1
+        assert [result["id"] for result in results] == ["m0", "m1", "m2"]
+
+    def test_transaction_mode_runs_in_a_session(self, mongo_storage):
+        mongo_storage.relation_transactions = True
+        mongo_storage.client = MagicMock()
+        session = mongo_storage.client.start_session.return_value.__enter__.return_value
+        session.with_transaction.side_effect = lambda callback: callback(session)
+
+        mongo_storage.add_relations_to_collection_item(
+            "entities", "a", [{"key": "m1", "type": "hasMediafile"}]
+        )
+
+        session.with_transaction.assert_called_once()
+        kwargs = mongo_storage.db["mediafiles"].bulk_write.call_args.kwargs
+        assert kwargs["session"] is session
+
+    def test_replacing_relations_is_one_transaction(self, mongo_storage):
+        mongo_storage.relation_transactions = True
+        mongo_storage.client = MagicMock()
+        session = mongo_storage.client.start_session.return_value.__enter__.return_value
+        session.with_transaction.side_effect = lambda callback: callback(session)
+        mongo_storage.get_collection_item_sub_item = lambda *_: [
+            {"key": "m1", "type": "hasMediafile"}
+        ]
+
+        mongo_storage.update_collection_item_relations(
+            "entities", "a", [{"key": "m2", "type": "hasMediafile"}]
+        )
+
+        session.with_transaction.assert_called_once()
+        assert [
+            (operation._doc, call.kwargs["session"])
+            for call in mongo_storage.db["mediafiles"].bulk_write.call_args_list
+            for operation in call.args[0]
+        ] == [
+            ({"$pull": {"relations": {"key": {"$in": ["a"]}}}}, session),
+            (
+                {
+                    "$addToSet": {
+                        "relations": {"$each": [{"key": "a", "type": "belongsTo"}]}
+                    }
+                },
+                session,
+            ),
+        ]
+        call = mongo_storage.db["entities"].bulk_write.call_args
+        assert call.args[0][0]._doc == {
+            "$set": {"relations": [{"key": "m2", "type": "hasMediafile"}]}
+        }
+        assert call.kwargs["session"] is session
+
+    def test_patched_relations_replace_the_ones_with_the_same_key(self, mongo_storage):
+        mongo_storage.get_collection_item_sub_item = lambda *_: [
+            {"key": "m1", "type": "hasMediafile", "is_primary": True},
+            {"key": "m2", "type": "hasMediafile"},
+        ]
+
+        mongo_storage.patch_collection_item_relations(
+            "entities", "a", [{"key": "m1", "type": "hasMediafile"}]
+        )
+
+        operation = mongo_storage.db["entities"].bulk_write.call_args.args[0][0]
+        assert operation._doc == {
+            "$set": {
+                "relations": [
+                    {"key": "m2", "type": "hasMediafile"},
+                    {"key": "m1", "type": "hasMediafile"},
+                ]
+            }
+        }
+        assert mongo_storage.db["mediafiles"].bulk_write.call_count == 2
@@ -0,0 +1,32 @@
+"""Unit tests for the batched TTL expiry methods of MongoStorageManager."""
+
+
+def test_expired_ids_are_read_in_chunks_from_one_cursor(mongo_storage):
+    mongo_storage.db["abstracts"].find.return_value = iter(
+        [{"_id": id} for id in "abcde"]
+    )
+
+    chunks = list(mongo_storage.iter_ttl_expired_ids("abstracts", 2))
+
+    assert chunks == [["a", "b"], ["c", "d"], ["e"]]
+    mongo_storage.db["abstracts"].find.assert_called_once()
+    assert mongo_storage.db["abstracts"].find.call_args.args[1] == {"_id": 1}
+
+
+def test_items_are_deleted_with_one_delete_many(mongo_storage):
+    mongo_storage.db["entities"].find.return_value = [
+        {"_id": "a", "relations": [{"key": "m", "type": "hasMediafile"}]},
+    ]
+    mongo_storage.db["entities"].delete_many.return_value.deleted_count = 2
+
+    deleted = mongo_storage.delete_items_from_collection("entities", ["a", "b"])
+
+    assert deleted == 2
+    mongo_storage.db["entities"].delete_many.assert_called_once_with(
+        {"_id": {"$in": ["a", "b"]}}
+    )
+    mongo_storage.db["entities"].delete_one.assert_not_called()
+    operations = mongo_storage.db["mediafiles"].bulk_write.call_args.args[0]
+    assert [operation._doc for operation in operations] == [
+        {"$pull": {"relations": {"key": {"$in": ["a"]}}}}
+    ]